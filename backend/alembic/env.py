@@ -10,6 +10,11 @@ from sqlalchemy import pool
 from app.models.asset import Asset
 from app.models.allocation import Allocation
 from app.models.movement import Movement
+from app.models.asset_price import AssetPrice
+from app.models.client_summary import ClientSummary
+from app.models.fx_rate import FxRate
+from app.models.sale import Sale
+from app.models.portfolio_snapshot import PortfolioSnapshot
 
 from alembic import context
 
@@ -0,0 +1,43 @@
+"""Add asset_prices table
+
+Revision ID: 3f8a9c2d71b4
+Revises: c9f4163ff49a
+Create Date: 2026-10-19 09:12:41.208311
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f8a9c2d71b4'
+down_revision: Union[str, Sequence[str], None] = 'c9f4163ff49a'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('asset_prices',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('asset_id', sa.Integer(), nullable=False),
+    sa.Column('date', sa.Date(), nullable=False),
+    sa.Column('open', sa.Numeric(precision=18, scale=6), nullable=True),
+    sa.Column('high', sa.Numeric(precision=18, scale=6), nullable=True),
+    sa.Column('low', sa.Numeric(precision=18, scale=6), nullable=True),
+    sa.Column('close', sa.Numeric(precision=18, scale=6), nullable=False),
+    sa.Column('adj_close', sa.Numeric(precision=18, scale=6), nullable=True),
+    sa.Column('volume', sa.BigInteger(), nullable=True),
+    sa.ForeignKeyConstraint(['asset_id'], ['assets.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('asset_id', 'date', name='uq_asset_prices_asset_id_date')
+    )
+    op.create_index(op.f('ix_asset_prices_id'), 'asset_prices', ['id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_asset_prices_id'), table_name='asset_prices')
+    op.drop_table('asset_prices')
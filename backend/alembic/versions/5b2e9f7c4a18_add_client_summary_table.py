@@ -0,0 +1,68 @@
+"""Add client_summary table
+
+Revision ID: 5b2e9f7c4a18
+Revises: 8d41e6b0a5c7
+Create Date: 2026-10-19 14:26:08.331907
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5b2e9f7c4a18'
+down_revision: Union[str, Sequence[str], None] = '8d41e6b0a5c7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('client_summary',
+    sa.Column('client_id', sa.Integer(), nullable=False),
+    sa.Column('aum', sa.Numeric(precision=18, scale=2), server_default='0', nullable=False),
+    sa.Column('cash_balance', sa.Numeric(precision=18, scale=2), server_default='0', nullable=False),
+    sa.Column('last_movement_date', sa.Date(), nullable=True),
+    sa.Column('positions_count', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.ForeignKeyConstraint(['client_id'], ['clients.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('client_id')
+    )
+    op.create_index(op.f('ix_client_summary_aum'), 'client_summary', ['aum'], unique=False)
+    op.create_index(op.f('ix_client_summary_cash_balance'), 'client_summary', ['cash_balance'], unique=False)
+    op.create_index(op.f('ix_client_summary_last_movement_date'), 'client_summary', ['last_movement_date'], unique=False)
+
+    # Preenche o resumo de todos os clientes existentes
+    op.execute("""
+        INSERT INTO client_summary (client_id, aum, cash_balance, last_movement_date, positions_count)
+        SELECT c.id,
+               COALESCE(a.aum, 0),
+               COALESCE(m.cash_balance, 0),
+               m.last_movement_date,
+               COALESCE(a.positions_count, 0)
+        FROM clients c
+        LEFT JOIN (
+            SELECT client_id,
+                   SUM(quantity * buy_price) AS aum,
+                   COUNT(DISTINCT asset_id) AS positions_count
+            FROM allocations
+            GROUP BY client_id
+        ) a ON a.client_id = c.id
+        LEFT JOIN (
+            SELECT client_id,
+                   SUM(CASE WHEN type = 'deposit' THEN amount ELSE -amount END) AS cash_balance,
+                   MAX(date) AS last_movement_date
+            FROM movements
+            GROUP BY client_id
+        ) m ON m.client_id = c.id
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_client_summary_last_movement_date'), table_name='client_summary')
+    op.drop_index(op.f('ix_client_summary_cash_balance'), table_name='client_summary')
+    op.drop_index(op.f('ix_client_summary_aum'), table_name='client_summary')
+    op.drop_table('client_summary')
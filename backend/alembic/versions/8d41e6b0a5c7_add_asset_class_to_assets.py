@@ -0,0 +1,28 @@
+"""Add asset_class to assets
+
+Revision ID: 8d41e6b0a5c7
+Revises: 3f8a9c2d71b4
+Create Date: 2026-10-19 11:03:27.514902
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8d41e6b0a5c7'
+down_revision: Union[str, Sequence[str], None] = '3f8a9c2d71b4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('assets', sa.Column('asset_class', sa.String(length=20), server_default='equity', nullable=False))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('assets', 'asset_class')
@@ -0,0 +1,37 @@
+"""Add fx_rates table
+
+Revision ID: a7c3e1f9d2b6
+Revises: 5b2e9f7c4a18
+Create Date: 2026-10-19 15:02:37.514920
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a7c3e1f9d2b6'
+down_revision: Union[str, Sequence[str], None] = '5b2e9f7c4a18'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('fx_rates',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('currency', sa.String(length=3), nullable=False),
+    sa.Column('date', sa.Date(), nullable=False),
+    sa.Column('rate', sa.Numeric(precision=18, scale=8), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('currency', 'date', name='uq_fx_rates_currency_date')
+    )
+    op.create_index(op.f('ix_fx_rates_id'), 'fx_rates', ['id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_fx_rates_id'), table_name='fx_rates')
+    op.drop_table('fx_rates')
@@ -0,0 +1,44 @@
+"""Add portfolio_snapshots table
+
+Revision ID: c2f7a9e4b813
+Revises: e4b8d2a6c1f3
+Create Date: 2026-10-19 18:21:09.402117
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c2f7a9e4b813'
+down_revision: Union[str, Sequence[str], None] = 'e4b8d2a6c1f3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('portfolio_snapshots',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('client_id', sa.Integer(), nullable=False),
+    sa.Column('date', sa.Date(), nullable=False),
+    sa.Column('market_value', sa.Numeric(precision=18, scale=2), nullable=False),
+    sa.Column('cash', sa.Numeric(precision=18, scale=2), nullable=False),
+    sa.Column('net_flow', sa.Numeric(precision=18, scale=2), nullable=False),
+    sa.Column('positions', sa.JSON(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.ForeignKeyConstraint(['client_id'], ['clients.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('client_id', 'date', name='uq_portfolio_snapshots_client_date')
+    )
+    op.create_index(op.f('ix_portfolio_snapshots_id'), 'portfolio_snapshots', ['id'], unique=False)
+    op.create_index(op.f('ix_portfolio_snapshots_date'), 'portfolio_snapshots', ['date'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_portfolio_snapshots_date'), table_name='portfolio_snapshots')
+    op.drop_index(op.f('ix_portfolio_snapshots_id'), table_name='portfolio_snapshots')
+    op.drop_table('portfolio_snapshots')
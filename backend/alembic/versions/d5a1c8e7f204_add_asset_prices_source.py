@@ -0,0 +1,33 @@
+"""Add source column to asset_prices
+
+Revision ID: d5a1c8e7f204
+Revises: c2f7a9e4b813
+Create Date: 2026-10-19 21:04:37.518204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd5a1c8e7f204'
+down_revision: Union[str, Sequence[str], None] = 'c2f7a9e4b813'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('asset_prices', sa.Column('source', sa.String(length=10), server_default='history', nullable=False))
+    # Linhas gravadas pela atualização de cotações antes da coluna: só o fechamento, sem OHLCV nem volume
+    op.execute(
+        "UPDATE asset_prices SET source = 'quote' "
+        "WHERE open IS NULL AND high IS NULL AND low IS NULL AND volume IS NULL"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('asset_prices', 'source')
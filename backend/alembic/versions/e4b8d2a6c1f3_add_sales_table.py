@@ -0,0 +1,44 @@
+"""Add sales table
+
+Revision ID: e4b8d2a6c1f3
+Revises: a7c3e1f9d2b6
+Create Date: 2026-10-19 16:21:54.702318
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e4b8d2a6c1f3'
+down_revision: Union[str, Sequence[str], None] = 'a7c3e1f9d2b6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('sales',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('client_id', sa.Integer(), nullable=False),
+    sa.Column('asset_id', sa.Integer(), nullable=False),
+    sa.Column('quantity', sa.Numeric(precision=15, scale=6), nullable=False),
+    sa.Column('sell_price', sa.Numeric(precision=15, scale=2), nullable=False),
+    sa.Column('sell_date', sa.Date(), nullable=False),
+    sa.ForeignKeyConstraint(['asset_id'], ['assets.id'], ),
+    sa.ForeignKeyConstraint(['client_id'], ['clients.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_sales_id'), 'sales', ['id'], unique=False)
+    op.create_index('ix_sales_client_asset_date', 'sales', ['client_id', 'asset_id', 'sell_date'], unique=False)
+    op.create_index('ix_allocations_client_asset_date', 'allocations', ['client_id', 'asset_id', 'buy_date'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_allocations_client_asset_date', table_name='allocations')
+    op.drop_index('ix_sales_client_asset_date', table_name='sales')
+    op.drop_index(op.f('ix_sales_id'), table_name='sales')
+    op.drop_table('sales')
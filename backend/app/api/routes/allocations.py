@@ -8,6 +8,11 @@ from typing import List, Optional, Union
 from app.core.database import get_db
 from app.core.dependencies import get_current_active_user
 from app.core.db_helpers import DBHelper
+from app.services.client_summary import client_summary
+from app.services.reports import report_service
+from app.services.fx import fx_service
+from app.services.portfolio_history import portfolio_history
+from app.services.pnl import pnl_service
 from app.models.allocation import Allocation
 from app.models.client import Client
 from app.models.asset import Asset
@@ -64,9 +69,18 @@ async def read_allocations(
 
 @router.get("/total-allocation")
 async def get_total_allocation(
+    base_currency: Optional[str] = Query(None, pattern=r'^[A-Za-z]{3}$'),
     current_user: User = Depends(get_current_active_user),
     db: Union[AsyncSession, Session] = Depends(get_db)
 ):
+    if base_currency:
+        # Soma por moeda no banco, conversão pelas taxas do dia em cache
+        try:
+            total = await fx_service.total_in(db, Allocation.quantity * Allocation.buy_price, base_currency)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        return {"total_allocation": total, "base_currency": base_currency.upper()}
+    
     result = await DBHelper.execute_query(
         db,
         select(func.sum(Allocation.quantity * Allocation.buy_price))
@@ -112,7 +126,14 @@ async def create_allocation(
         raise HTTPException(status_code=400, detail="Buy price must be greater than zero")
     
     db_allocation = Allocation(**allocation.dict())
-    return await DBHelper.add_and_commit(db, db_allocation)
+    db.add(db_allocation)
+    # Resumo do cliente atualizado na mesma transação
+    await client_summary.refresh(db, [db_allocation.client_id])
+    await DBHelper.commit(db)
+    await report_service.invalidate_cache()
+    await portfolio_history.invalidate(db_allocation.client_id, db_allocation.buy_date)
+    await DBHelper.refresh(db, db_allocation)
+    return db_allocation
 
 @router.put("/{allocation_id}", response_model=AllocationSchema)
 async def update_allocation(
@@ -126,12 +147,31 @@ async def update_allocation(
     if db_allocation is None:
         raise HTTPException(status_code=404, detail="Allocation not found")
     
+    previous_client_id = db_allocation.client_id
+    previous_asset_id = db_allocation.asset_id
+    previous_buy_date = db_allocation.buy_date
+    
     # Atualizar campos se fornecidos
     update_data = allocation.dict(exclude_unset=True)
     for key, value in update_data.items():
         setattr(db_allocation, key, value)
     
+    await client_summary.refresh(db, {previous_client_id, db_allocation.client_id})
+    try:
+        # Reduzir, adiar ou mover o lote não pode deixar vendas já registradas sem cobertura
+        await pnl_service.ensure_covered(
+            db, {(previous_client_id, previous_asset_id), (db_allocation.client_id, db_allocation.asset_id)},
+            since=min(previous_buy_date, db_allocation.buy_date)
+        )
+    except ValueError as e:
+        await DBHelper.rollback(db)
+        raise HTTPException(status_code=400, detail=str(e))
     await DBHelper.commit(db)
+    await report_service.invalidate_cache()
+    # A série histórica muda a partir da data mais antiga envolvida, nos dois clientes
+    changed_from = min(previous_buy_date, db_allocation.buy_date)
+    for client_id in {previous_client_id, db_allocation.client_id}:
+        await portfolio_history.invalidate(client_id, changed_from)
     await DBHelper.refresh(db, db_allocation)
     return db_allocation
 
@@ -145,15 +185,35 @@ async def delete_allocation(
     if allocation is None:
         raise HTTPException(status_code=404, detail="Allocation not found")
     
-    await DBHelper.delete_obj(db, allocation)
+    await DBHelper.delete_obj(db, allocation, commit=False)
+    await client_summary.refresh(db, [allocation.client_id])
+    try:
+        await pnl_service.ensure_covered(db, [(allocation.client_id, allocation.asset_id)], since=allocation.buy_date)
+    except ValueError as e:
+        await DBHelper.rollback(db)
+        raise HTTPException(status_code=400, detail=str(e))
+    await DBHelper.commit(db)
+    await report_service.invalidate_cache()
+    await portfolio_history.invalidate(allocation.client_id, allocation.buy_date)
     return {"detail": "Allocation deleted successfully"}
 
 @router.get("/client/{client_id}/allocation")
 async def get_client_allocation(
     client_id: int, 
+    base_currency: Optional[str] = Query(None, pattern=r'^[A-Za-z]{3}$'),
     current_user: User = Depends(get_current_active_user),
     db: Union[AsyncSession, Session] = Depends(get_db)
 ):
+    if base_currency:
+        try:
+            total = await fx_service.total_in(
+                db, Allocation.quantity * Allocation.buy_price, base_currency,
+                where=[Allocation.client_id == client_id]
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        return {"client_id": client_id, "total_allocation": total, "base_currency": base_currency.upper()}
+    
     result = await DBHelper.execute_query(
         db,
         select(func.sum(Allocation.quantity * Allocation.buy_price))
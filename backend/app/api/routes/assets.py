@@ -1,18 +1,34 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi.responses import JSONResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from typing import Optional, List
+from datetime import date, timedelta
 
 from app.core.database import get_db
 from app.core.dependencies import get_current_active_user
 from app.core.db_helpers import DBHelper
 from app.models.asset import Asset
 from app.models.user import User
-from app.schemas.asset import Asset as AssetSchema, AssetCreate, AssetUpdate, YahooFinanceAsset
-from app.services.yahoo_finance import yahoo_finance
+from app.schemas.asset import Asset as AssetSchema, AssetCreate, AssetUpdate, YahooFinanceAsset, AssetPrice as AssetPriceSchema
+from app.services.yahoo_finance import yahoo_finance, HISTORY_PERIODS
+from app.core.rate_limiter import RateLimitExceeded
+from app.services.market_data import MarketDataError
+from app.core.cache_backend import cache_backend
+from app.services.price_history import price_history, last_business_day, PRICE_COLUMNS
+from app.services.price_refresh import price_refresh
+from app.services.reports import report_service
 
 router = APIRouter()
 
+def rate_limited_response(error: RateLimitExceeded) -> JSONResponse:
+    retry_after = max(1, int(error.retry_after + 0.999))
+    return JSONResponse(
+        status_code=status.HTTP_202_ACCEPTED,
+        content={"status": "pending", "detail": "Market data lookup queued, retry later", "retry_after": retry_after},
+        headers={"Retry-After": str(retry_after)}
+    )
+
 @router.get("/", response_model=list[AssetSchema])
 async def read_assets(
     skip: int = 0,
@@ -32,30 +48,93 @@ async def create_asset(
     db_asset = Asset(**asset.model_dump())
     return await DBHelper.add_and_commit(db, db_asset)
 
-@router.get("/search-yahoo/{symbol}", response_model=Optional[YahooFinanceAsset])
+@router.get("/prices")
+async def get_asset_prices(
+    asset_ids: Optional[List[int]] = Query(None),
+    current_user: User = Depends(get_current_active_user),
+    db = Depends(get_db)
+):
+    """
+    Cotações atuais de vários ativos (todos, se asset_ids não for informado).
+    Lidas do cache ou do último fechamento armazenado, mantidos pela atualização em segundo plano.
+    """
+    if asset_ids:
+        result = await DBHelper.execute_query(db, select(Asset).where(Asset.id.in_(asset_ids)))
+        assets = result.scalars().all()
+    else:
+        assets = await DBHelper.get_all(db, Asset)
+    
+    quotes = await price_refresh.current_quotes(db, assets)
+    return [
+        {
+            "asset_id": asset.id,
+            "ticker": asset.ticker,
+            "current_price": quotes[asset.id]["price"] if asset.id in quotes else None,
+            "as_of": quotes[asset.id]["as_of"] if asset.id in quotes else None
+        }
+        for asset in assets
+    ]
+
+@router.get("/market-data/stats")
+async def get_market_data_stats(
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    Estatísticas dos caches de dados de mercado (acertos, falhas, coalescência) e da atualização em segundo plano
+    """
+    return {
+        **yahoo_finance.cache_stats(),
+        "cache_backend": cache_backend.stats(),
+        "price_refresh": price_refresh.stats()
+    }
+
+@router.get("/search-yahoo/{symbol}", response_model=YahooFinanceAsset)
 async def search_yahoo_asset(
     symbol: str,
     current_user: User = Depends(get_current_active_user)
 ):
     """
-    Busca informações de um ativo no Yahoo Finance
+    Busca informações de um ativo no provider de dados de mercado.
+    Com a fila de chamadas cheia, responde 202 e a busca segue em segundo plano.
     """
-    asset_data = await yahoo_finance.search_asset(symbol)
+    try:
+        asset_data = await yahoo_finance.search_asset(symbol)
+    except RateLimitExceeded as e:
+        return rate_limited_response(e)
+    except MarketDataError:
+        raise HTTPException(status_code=503, detail="Market data provider unavailable")
+    if not asset_data:
+        raise HTTPException(status_code=404, detail="Asset not found on market data provider")
     return asset_data
 
 @router.get("/history-yahoo/{symbol}")
 async def get_yahoo_history(
     symbol: str,
     period: str = "1mo",
-    current_user: User = Depends(get_current_active_user)
+    current_user: User = Depends(get_current_active_user),
+    db = Depends(get_db)
 ):
     """
-    Obtém histórico de preços do Yahoo Finance
+    Últimos 5 pregões do período, indexados pela data, lidos apenas do asset_prices.
+    A busca no Yahoo Finance fica com a ingestão e a atualização em segundo plano.
     """
-    history_data = await yahoo_finance.get_stock_history(symbol, period)
-    if not history_data:
+    assets = await DBHelper.get_by_filter(db, Asset, ticker=symbol.upper())
+    if not assets:
+        raise HTTPException(status_code=404, detail="Ativo não cadastrado; use POST /assets/from-yahoo/{symbol}")
+    
+    latest = await price_history.latest_prices(db, [assets[0].id])
+    if assets[0].id not in latest:
+        raise HTTPException(status_code=404, detail="Histórico não encontrado")
+    # O período termina no último pregão armazenado, não hoje (fim de semana, feriado, antes do fechamento)
+    end = min(last_business_day(date.today()), latest[assets[0].id][0])
+    start = end - timedelta(days=HISTORY_PERIODS.get(period, HISTORY_PERIODS["1mo"]))
+    prices = await price_history.get_history(db, assets[0].id, start, end)
+    if not prices:
         raise HTTPException(status_code=404, detail="Histórico não encontrado")
-    return history_data
+    return {
+        price.date.isoformat(): {column: getattr(price, column) for column in PRICE_COLUMNS}
+        for price in prices[-5:]
+    }
 
 @router.post("/from-yahoo/{symbol}", response_model=AssetSchema)
 async def create_asset_from_yahoo(
@@ -70,7 +149,12 @@ async def create_asset_from_yahoo(
         return existing_assets[0]
     
     # Buscar dados do Yahoo Finance
-    asset_data = await yahoo_finance.search_asset(symbol)
+    try:
+        asset_data = await yahoo_finance.search_asset(symbol)
+    except RateLimitExceeded as e:
+        return rate_limited_response(e)
+    except MarketDataError:
+        raise HTTPException(status_code=503, detail="Market data provider unavailable")
     if not asset_data:
         raise HTTPException(status_code=404, detail="Asset not found on Yahoo Finance")
     
@@ -89,6 +173,23 @@ async def read_asset(
         raise HTTPException(status_code=404, detail="Asset not found")
     return asset
 
+@router.get("/{asset_id}/history", response_model=List[AssetPriceSchema])
+async def get_asset_history(
+    asset_id: int,
+    start: Optional[date] = Query(None),
+    end: Optional[date] = Query(None),
+    current_user: User = Depends(get_current_active_user),
+    db = Depends(get_db)
+):
+    """
+    Histórico diário de preços lido do armazenamento local (sem chamadas ao Yahoo Finance)
+    """
+    asset = await DBHelper.get_by_id(db, Asset, asset_id)
+    if asset is None:
+        raise HTTPException(status_code=404, detail="Asset not found")
+    
+    return await price_history.get_history(db, asset_id, start, end)
+
 @router.put("/{asset_id}", response_model=AssetSchema)
 async def update_asset(
     asset_id: int,
@@ -105,6 +206,8 @@ async def update_asset(
     
     await DBHelper.commit(db)
     await DBHelper.refresh(db, db_asset)
+    # Ticker, moeda e bolsa são dimensões dos relatórios de AUM
+    await report_service.invalidate_cache()
     return db_asset
 
 @router.delete("/{asset_id}")
@@ -118,6 +221,7 @@ async def delete_asset(
         raise HTTPException(status_code=404, detail="Asset not found")
     
     await DBHelper.delete_obj(db, db_asset)
+    await report_service.invalidate_cache()
     return {"ok": True}
 
 @router.get("/{asset_id}/price")
@@ -130,9 +234,17 @@ async def get_asset_price(
     if asset is None:
         raise HTTPException(status_code=404, detail="Asset not found")
     
-    # Get current price from Yahoo Finance
-    try:
-        price_data = await yahoo_finance.get_current_price(asset.ticker)
-        return {"asset_id": asset_id, "ticker": asset.ticker, "current_price": price_data}
-    except Exception as e:
-        raise HTTPException(status_code=503, detail="Unable to fetch current price")
\ No newline at end of file
+    # Somente leitura: cache de cotações ou último fechamento armazenado
+    quotes = await price_refresh.current_quotes(db, [asset])
+    quote = quotes.get(asset.id)
+    if quote is None:
+        raise HTTPException(status_code=503, detail="Price not available yet")
+    
+    return {
+        "asset_id": asset_id,
+        "ticker": asset.ticker,
+        "current_price": quote["price"],
+        "previous_close": quote["previous_close"],
+        "change_percent": quote["change_percent"],
+        "as_of": quote["as_of"]
+    }
@@ -1,15 +1,18 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Query
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import select, func
 from typing import Optional
+from datetime import date
 import json
 
 from app.core.database import get_db
 from app.core.dependencies import get_current_active_user
 from app.core.db_helpers import DBHelper
 from app.models.client import Client
+from app.models.client_summary import ClientSummary
 from app.models.user import User
-from app.schemas.client import Client as ClientSchema, ClientCreate, ClientUpdate
+from app.services.reports import report_service
+from app.schemas.client import Client as ClientSchema, ClientCreate, ClientUpdate, ClientWithSummary
 
 router = APIRouter()
 
@@ -54,7 +57,15 @@ def deserialize_json_fields(client) -> dict:
     
     return client_dict
 
-@router.get("/", response_model=list[ClientSchema])
+# Clientes sem linha em client_summary (criados por SQL manual ou carga em massa) valem zero
+SUMMARY_COLUMNS = {
+    "aum": func.coalesce(ClientSummary.aum, 0),
+    "cash_balance": func.coalesce(ClientSummary.cash_balance, 0),
+    "last_movement_date": ClientSummary.last_movement_date,
+    "positions_count": func.coalesce(ClientSummary.positions_count, 0),
+}
+
+@router.get("/", response_model=list[ClientWithSummary])
 async def read_clients(
     skip: int = 0,
     limit: int = 100,
@@ -62,13 +73,40 @@ async def read_clients(
     is_active: Optional[bool] = Query(None),
     status: Optional[str] = Query(None),
     investment_profile: Optional[str] = Query(None),
+    sort_by: str = Query("name", pattern=r'^(name|aum|cash_balance|last_movement_date|positions_count)$'),
+    order: str = Query("asc", pattern=r'^(asc|desc)$'),
+    min_aum: Optional[float] = Query(None),
+    max_aum: Optional[float] = Query(None),
+    min_cash_balance: Optional[float] = Query(None),
+    max_cash_balance: Optional[float] = Query(None),
+    last_movement_after: Optional[date] = Query(None),
+    last_movement_before: Optional[date] = Query(None),
+    min_positions: Optional[int] = Query(None),
     current_user: User = Depends(get_current_active_user),
     db = Depends(get_db)
 ):
-    import time
-    start_time = time.time()
-    
-    query = select(Client)
+    summary_filters = []
+    if min_aum is not None:
+        summary_filters.append(SUMMARY_COLUMNS["aum"] >= min_aum)
+    if max_aum is not None:
+        summary_filters.append(SUMMARY_COLUMNS["aum"] <= max_aum)
+    if min_cash_balance is not None:
+        summary_filters.append(SUMMARY_COLUMNS["cash_balance"] >= min_cash_balance)
+    if max_cash_balance is not None:
+        summary_filters.append(SUMMARY_COLUMNS["cash_balance"] <= max_cash_balance)
+    if last_movement_after is not None:
+        summary_filters.append(SUMMARY_COLUMNS["last_movement_date"] >= last_movement_after)
+    if last_movement_before is not None:
+        summary_filters.append(SUMMARY_COLUMNS["last_movement_date"] <= last_movement_before)
+    if min_positions is not None:
+        summary_filters.append(SUMMARY_COLUMNS["positions_count"] >= min_positions)
+    
+    # Outer join: clientes ainda sem resumo continuam na lista, com os valores zerados
+    query = (
+        select(Client, ClientSummary)
+        .outerjoin(ClientSummary, ClientSummary.client_id == Client.id)
+        .where(*summary_filters)
+    )
     
     # Search in name, email, or CPF - optimized with indexes
     if search and search.strip():  # Only search if not empty
@@ -89,20 +127,26 @@ async def read_clients(
         query = query.where(Client.investment_profile == investment_profile)
     
     # Add ordering for consistent results
-    query = query.order_by(Client.name.asc()).offset(skip).limit(limit)
+    sort_column = SUMMARY_COLUMNS.get(sort_by, Client.name)
+    sort_column = sort_column.desc() if order == "desc" else sort_column.asc()
+    if sort_by == "last_movement_date":
+        sort_column = sort_column.nulls_last()
+    query = query.order_by(sort_column, Client.id.asc()).offset(skip).limit(limit)
     
-    if isinstance(db, AsyncSession):
-        result = await db.execute(query)
-        clients = result.scalars().all()
-    else:
-        result = db.execute(query)
-        clients = result.scalars().all()
+    result = await DBHelper.execute_query(db, query)
     
     # Convert to dictionaries with proper JSON field parsing
     clients_data = []
-    for client in clients:
+    for client, summary in result.all():
         client_dict = deserialize_json_fields(client)
-        clients_data.append(ClientSchema(**client_dict))
+        if summary is not None:
+            client_dict.update(
+                aum=float(summary.aum or 0),
+                cash_balance=float(summary.cash_balance or 0),
+                last_movement_date=summary.last_movement_date,
+                positions_count=summary.positions_count or 0
+            )
+        clients_data.append(ClientWithSummary(**client_dict))
     
     return clients_data
 
@@ -118,6 +162,8 @@ async def create_client(
     client_data['created_by'] = current_user.email
     
     db_client = Client(**client_data)
+    # Resumo começa zerado e é mantido pelas escritas de alocações e movimentações
+    db_client.summary = ClientSummary()
     created_client = await DBHelper.add_and_commit(db, db_client)
     
     # Return with properly parsed JSON fields
@@ -158,6 +204,8 @@ async def update_client(
     
     await DBHelper.commit(db)
     await DBHelper.refresh(db, client)
+    if "investment_profile" in update_data:
+        await report_service.invalidate_cache()
     
     # Return with properly parsed JSON fields
     client_dict = deserialize_json_fields(client)
@@ -174,4 +222,5 @@ async def delete_client(
         raise HTTPException(status_code=404, detail="Client not found")
     
     await DBHelper.delete_obj(db, client)
+    await report_service.invalidate_cache()
     return {"message": "Client deleted successfully"}
\ No newline at end of file
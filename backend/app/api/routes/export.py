@@ -39,4 +39,12 @@ async def export_movements_csv(
     current_user: User = Depends(get_current_active_user),
     db: Union[AsyncSession, Session] = Depends(get_db)
 ):
-    return await export_service.export_movements_to_csv(db, start_date, end_date)
\ No newline at end of file
+    return await export_service.export_movements_to_csv(db, start_date, end_date)
+
+@router.get("/pnl/csv")
+async def export_pnl_csv(
+    method: str = Query("fifo", pattern=r'^(fifo|average)$'),
+    current_user: User = Depends(get_current_active_user),
+    db: Union[AsyncSession, Session] = Depends(get_db)
+):
+    return await export_service.export_pnl_to_csv(db, method)
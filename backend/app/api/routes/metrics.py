@@ -0,0 +1,105 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from app.core.cache import all_caches
+from app.core.cache_backend import cache_backend
+from app.core.database import engine
+from app.core.metrics import registry
+from app.core.slow_queries import slow_query_log
+from app.services.yahoo_finance import yahoo_finance
+from app.services.simulation import simulation_service
+from app.services.statements import statement_service
+
+router = APIRouter()
+
+BREAKER_STATES = {"closed": 0, "half_open": 1, "open": 2}
+
+@registry.collector
+def collect_db_pool():
+    pool = engine.sync_engine.pool
+    if not hasattr(pool, "checkedout"):
+        return []
+    return [
+        ("db_pool_size", "gauge", "Configured connection pool size", [({}, pool.size())]),
+        ("db_pool_checked_out", "gauge", "Connections currently in use", [({}, pool.checkedout())]),
+        ("db_pool_checked_in", "gauge", "Idle connections in the pool", [({}, pool.checkedin())]),
+        ("db_pool_overflow", "gauge", "Connections opened beyond the pool size", [({}, pool.overflow())]),
+    ]
+
+@registry.collector
+def collect_slow_queries():
+    stats = slow_query_log.stats()
+    return [
+        ("db_slow_queries_total", "counter", "Statements slower than SLOW_QUERY_THRESHOLD_MS",
+         [({"logged": "true"}, stats["logged"]), ({"logged": "false"}, stats["suppressed"])]),
+        ("db_slow_query_explains_total", "counter", "EXPLAIN plans captured for slow queries by outcome",
+         [({"result": "ok"}, stats["explained"]), ({"result": "error"}, stats["explain_errors"])]),
+    ]
+
+@registry.collector
+def collect_caches():
+    # Caches com o mesmo nome (ex.: instâncias de teste) são somados
+    totals = {}
+    for cache in all_caches():
+        stats = cache.stats()
+        entry = totals.setdefault(stats["name"], {"size": 0, "hits": 0, "stale_hits": 0, "misses": 0,
+                                                  "evictions": 0, "coalesced": 0, "load_errors": 0})
+        for key in entry:
+            entry[key] += stats[key]
+
+    requests, ratios, sizes, evictions, coalesced, errors = [], [], [], [], [], []
+    for name, stats in totals.items():
+        lookups = stats["hits"] + stats["stale_hits"] + stats["misses"]
+        for result in ("hits", "stale_hits", "misses"):
+            requests.append(({"cache": name, "result": result}, stats[result]))
+        ratios.append(({"cache": name}, (stats["hits"] + stats["stale_hits"]) / lookups if lookups else 0.0))
+        sizes.append(({"cache": name}, stats["size"]))
+        evictions.append(({"cache": name}, stats["evictions"]))
+        coalesced.append(({"cache": name}, stats["coalesced"]))
+        errors.append(({"cache": name}, stats["load_errors"]))
+
+    backend = cache_backend.stats()
+    return [
+        ("cache_lookups_total", "counter", "Cache lookups by result", requests),
+        ("cache_hit_ratio", "gauge", "Fraction of lookups served from the cache (fresh or stale)", ratios),
+        ("cache_entries", "gauge", "Entries currently cached", sizes),
+        ("cache_evictions_total", "counter", "Entries evicted by the LRU bound", evictions),
+        ("cache_coalesced_total", "counter", "Lookups that joined an in-flight load", coalesced),
+        ("cache_load_errors_total", "counter", "Failed cache loads", errors),
+        ("cache_backend_hit_ratio", "gauge", "Hit ratio of the cache backend",
+         [({"backend": backend["backend"]}, backend["hit_ratio"])]),
+    ]
+
+@registry.collector
+def collect_market_data():
+    stats = yahoo_finance.cache_stats()
+    breaker, limiter = stats["circuit_breaker"], stats["rate_limiter"]
+    return [
+        ("circuit_breaker_state", "gauge", "Circuit state (0 closed, 1 half open, 2 open)",
+         [({"name": breaker["name"]}, BREAKER_STATES[breaker["state"]])]),
+        ("circuit_breaker_calls_total", "counter", "Calls through the breaker by outcome",
+         [({"name": breaker["name"], "result": result}, breaker[result])
+          for result in ("successes", "failures", "timeouts", "short_circuited")]),
+        ("circuit_breaker_opened_total", "counter", "Times the circuit opened",
+         [({"name": breaker["name"]}, breaker["opened"])]),
+        ("rate_limiter_queue_depth", "gauge", "Callers waiting for a token",
+         [({"name": limiter["name"]}, limiter["queue_depth"])]),
+        ("rate_limiter_requests_total", "counter", "Token requests by outcome",
+         [({"name": limiter["name"], "result": result}, limiter[result]) for result in ("acquired", "waited", "rejected")]),
+    ]
+
+@registry.collector
+def collect_jobs():
+    samples = []
+    for manager in (simulation_service.jobs, statement_service.jobs):
+        stats = manager.stats()
+        samples.extend(({"manager": stats["name"], "status": status}, stats[status])
+                       for status in ("pending", "running", "done", "failed"))
+    return [("background_jobs", "gauge", "Background jobs kept in memory by status", samples)]
+
+@router.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def metrics():
+    """
+    Métricas no formato de exposição do Prometheus
+    """
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
@@ -9,6 +9,7 @@ from typing import List, Optional, Union
 from app.core.database import get_db
 from app.core.dependencies import get_current_active_user
 from app.core.db_helpers import DBHelper
+from app.services.client_summary import client_summary
 from app.models.movement import Movement, MovementType
 from app.models.client import Client
 from app.models.user import User
@@ -102,7 +103,12 @@ async def create_movement(
             )
     
     db_movement = Movement(**movement.dict())
-    return await DBHelper.add_and_commit(db, db_movement)
+    db.add(db_movement)
+    # Resumo do cliente atualizado na mesma transação
+    await client_summary.refresh(db, [db_movement.client_id])
+    await DBHelper.commit(db)
+    await DBHelper.refresh(db, db_movement)
+    return db_movement
 
 @router.get("/captation-total", response_model=CaptationSummary)
 async def get_total_captation(
@@ -231,9 +237,11 @@ async def update_movement(
         raise HTTPException(status_code=400, detail="Cannot update movement for inactive client")
     
     # Atualizar campos
+    previous_client_id = db_movement.client_id
     for key, value in movement.dict().items():
         setattr(db_movement, key, value)
     
+    await client_summary.refresh(db, {previous_client_id, db_movement.client_id})
     await DBHelper.commit(db)
     await DBHelper.refresh(db, db_movement)
     return db_movement
@@ -248,7 +256,9 @@ async def delete_movement(
     if movement is None:
         raise HTTPException(status_code=404, detail="Movement not found")
     
-    await DBHelper.delete_obj(db, movement)
+    await DBHelper.delete_obj(db, movement, commit=False)
+    await client_summary.refresh(db, [movement.client_id])
+    await DBHelper.commit(db)
     return {"detail": "Movement deleted successfully"}
 
 @router.get("/client/{client_id}", response_model=List[MovementWithDetails])
@@ -0,0 +1,193 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from datetime import date
+from typing import Optional, Union, List
+
+from app.core.database import get_db
+from app.core.dependencies import get_current_active_user
+from app.core.db_helpers import DBHelper
+from app.models.client import Client
+from app.models.user import User
+from app.core.config import settings
+from app.schemas.portfolio import PortfolioPerformance, PortfolioRisk, CorrelationMatrix, ClientPnL, PortfolioHistory, SimulationJob, PortfolioSnapshot
+from app.services.performance import performance_service
+from app.services.risk import risk_service
+from app.services.pnl import pnl_service
+from app.services.portfolio_history import portfolio_history
+from app.services.simulation import simulation_service, DEFAULT_PERCENTILES
+from app.services.snapshots import snapshot_service
+
+router = APIRouter()
+
+@router.get("/correlation", response_model=CorrelationMatrix)
+async def get_correlation_matrix(
+    asset_ids: List[int] = Query(...),
+    window: int = Query(252, ge=20, le=2520),
+    current_user: User = Depends(get_current_active_user),
+    db: Union[AsyncSession, Session] = Depends(get_db)
+):
+    """
+    Matrizes de correlação e covariância (anualizada) dos retornos diários dos ativos
+    """
+    try:
+        return await risk_service.correlation(db, asset_ids, window)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/simulations/{job_id}", response_model=SimulationJob)
+async def get_simulation(
+    job_id: str,
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    Estado de uma simulação Monte Carlo; o resultado aparece quando status=done
+    """
+    job = await simulation_service.jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Simulation not found")
+    return job
+
+@router.get("/{client_id}/performance", response_model=PortfolioPerformance)
+async def get_client_performance(
+    client_id: int,
+    start: Optional[date] = Query(None),
+    end: Optional[date] = Query(None),
+    include_series: bool = Query(True),
+    current_user: User = Depends(get_current_active_user),
+    db: Union[AsyncSession, Session] = Depends(get_db)
+):
+    """
+    Rentabilidade da carteira no período (TWR, MWR, série diária de valor e drawdown).
+    Sem datas, considera o ano corrente.
+    """
+    client = await DBHelper.get_by_id(db, Client, client_id)
+    if client is None:
+        raise HTTPException(status_code=404, detail="Client not found")
+    if start and end and start > end:
+        raise HTTPException(status_code=400, detail="Start date must be before end date")
+    
+    try:
+        performance = await performance_service.client_performance(db, client_id, start, end)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    if not include_series:
+        performance["series"] = []
+    return performance
+
+@router.get("/{client_id}/history", response_model=PortfolioHistory)
+async def get_client_history(
+    client_id: int,
+    start: Optional[date] = Query(None),
+    end: Optional[date] = Query(None),
+    granularity: str = Query("daily", pattern=r'^(daily|weekly|monthly)$'),
+    current_user: User = Depends(get_current_active_user),
+    db: Union[AsyncSession, Session] = Depends(get_db)
+):
+    """
+    Valor de mercado da carteira e valor líquido investido ao longo do tempo, no último
+    pregão de cada dia, semana ou mês. Sem datas, considera os últimos 12 meses.
+    """
+    client = await DBHelper.get_by_id(db, Client, client_id)
+    if client is None:
+        raise HTTPException(status_code=404, detail="Client not found")
+    
+    try:
+        return await portfolio_history.client_history(db, client_id, start, end, granularity)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/{client_id}/snapshots", response_model=List[PortfolioSnapshot])
+async def get_client_snapshots(
+    client_id: int,
+    start: Optional[date] = Query(None),
+    end: Optional[date] = Query(None),
+    current_user: User = Depends(get_current_active_user),
+    db: Union[AsyncSession, Session] = Depends(get_db)
+):
+    """
+    Snapshots diários gravados pelo job noturno (posições, valor de mercado, caixa e fluxo do dia)
+    """
+    client = await DBHelper.get_by_id(db, Client, client_id)
+    if client is None:
+        raise HTTPException(status_code=404, detail="Client not found")
+    
+    return await snapshot_service.client_snapshots(db, client_id, start, end)
+
+@router.get("/{client_id}/risk", response_model=PortfolioRisk)
+async def get_client_risk(
+    client_id: int,
+    window: int = Query(252, ge=20, le=2520),
+    confidence: float = Query(0.95, gt=0.5, lt=1.0),
+    horizon_days: int = Query(1, ge=1, le=252),
+    current_user: User = Depends(get_current_active_user),
+    db: Union[AsyncSession, Session] = Depends(get_db)
+):
+    """
+    Risco da carteira: volatilidade anualizada e VaR histórico e paramétrico
+    """
+    client = await DBHelper.get_by_id(db, Client, client_id)
+    if client is None:
+        raise HTTPException(status_code=404, detail="Client not found")
+    
+    try:
+        risk = await risk_service.client_risk(db, client_id, window, confidence, horizon_days)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    return {
+        **risk,
+        "investment_profile": client.investment_profile,
+        "risk_tolerance": client.risk_tolerance or 5
+    }
+
+@router.get("/{client_id}/pnl", response_model=ClientPnL)
+async def get_client_pnl(
+    client_id: int,
+    method: str = Query("fifo", pattern=r'^(fifo|average)$'),
+    current_user: User = Depends(get_current_active_user),
+    db: Union[AsyncSession, Session] = Depends(get_db)
+):
+    """
+    Resultado realizado (vendas casadas com os lotes por FIFO ou preço médio) e não
+    realizado (posição aberta ao último fechamento armazenado) por ativo
+    """
+    client = await DBHelper.get_by_id(db, Client, client_id)
+    if client is None:
+        raise HTTPException(status_code=404, detail="Client not found")
+    
+    return await pnl_service.client_pnl(db, client_id, method)
+
+@router.post("/{client_id}/simulations", response_model=SimulationJob, status_code=status.HTTP_202_ACCEPTED)
+async def start_client_simulation(
+    client_id: int,
+    response: Response,
+    years: int = Query(10, ge=1, le=10),
+    paths: int = Query(settings.SIMULATION_DEFAULT_PATHS, ge=100, le=settings.SIMULATION_MAX_PATHS),
+    seed: Optional[int] = Query(None, ge=0),
+    window: int = Query(252, ge=20, le=2520),
+    percentiles: List[int] = Query(list(DEFAULT_PERCENTILES)),
+    current_user: User = Depends(get_current_active_user),
+    db: Union[AsyncSession, Session] = Depends(get_db)
+):
+    """
+    Simulação Monte Carlo do valor da carteira em 1 a `years` anos, a partir da
+    covariância histórica dos retornos, para comparar com o risk_tolerance do cliente.
+    Roda em segundo plano: responde 202 com o id do job, consultado em
+    GET /portfolio/simulations/{id}. O mesmo seed reproduz as mesmas faixas.
+    """
+    if any(not 0 < p < 100 for p in percentiles):
+        raise HTTPException(status_code=400, detail="Percentiles must be between 1 and 99")
+    client = await DBHelper.get_by_id(db, Client, client_id)
+    if client is None:
+        raise HTTPException(status_code=404, detail="Client not found")
+    
+    try:
+        inputs = await simulation_service.prepare(db, client, window)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    job = simulation_service.submit(inputs, years=years, paths=paths, seed=seed, percentiles=percentiles)
+    response.headers["Location"] = f"/portfolio/simulations/{job.id}"
+    return job.snapshot()
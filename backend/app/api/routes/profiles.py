@@ -0,0 +1,32 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import PlainTextResponse
+
+from app.core.config import settings
+from app.core.dependencies import get_current_active_user
+from app.core.profiling import profiles, profile_summaries
+from app.models.user import User
+
+router = APIRouter()
+
+def require_profiling_user(current_user: User = Depends(get_current_active_user)) -> User:
+    if current_user.email not in settings.PROFILING_USERS:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not allowed to read profiles")
+    return current_user
+
+@router.get("/")
+async def list_profiles(current_user: User = Depends(require_profiling_user)):
+    """
+    Perfis guardados (sem as pilhas), do mais antigo ao mais recente
+    """
+    return list(profile_summaries())
+
+@router.get("/{profile_id}", response_class=PlainTextResponse)
+async def get_profile(profile_id: str, current_user: User = Depends(require_profiling_user)):
+    """
+    Pilhas colapsadas do perfil ("frame;frame;frame contagem"), prontas para
+    flamegraph.pl, speedscope ou inferno
+    """
+    profile = profiles.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return PlainTextResponse(profile["collapsed"], headers={"X-Profile-Samples": str(profile["samples"])})
@@ -0,0 +1,70 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from typing import List, Optional, Union
+
+from app.core.database import get_db
+from app.core.dependencies import get_current_active_user
+from app.core.db_helpers import DBHelper
+from app.models.client import Client
+from app.models.user import User
+from app.schemas.rebalancing import ClientDrift
+from app.services.rebalancing import rebalancing_service, TARGET_ALLOCATIONS
+
+router = APIRouter()
+
+@router.get("/targets")
+async def get_target_allocations(
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    Alocação alvo por classe de ativo para cada perfil de investimento
+    """
+    return TARGET_ALLOCATIONS
+
+@router.get("/drift", response_model=List[ClientDrift])
+async def get_drift(
+    threshold: float = Query(0.05, gt=0, lt=1),
+    only_flagged: bool = Query(True),
+    skip: int = 0,
+    limit: int = 100,
+    base_currency: Optional[str] = Query(None, pattern=r'^[A-Za-z]{3}$'),
+    current_user: User = Depends(get_current_active_user),
+    db: Union[AsyncSession, Session] = Depends(get_db)
+):
+    """
+    Varredura de toda a carteira: clientes cujo desvio em alguma classe supera o limite,
+    ordenados pelo maior desvio, com as operações sugeridas por classe. Posições e caixa
+    são convertidos para base_currency (BASE_CURRENCY por padrão)
+    """
+    try:
+        return await rebalancing_service.scan(
+            db, threshold=threshold, only_flagged=only_flagged, skip=skip, limit=limit,
+            base_currency=base_currency
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/client/{client_id}", response_model=ClientDrift)
+async def get_client_drift(
+    client_id: int,
+    threshold: float = Query(0.05, gt=0, lt=1),
+    base_currency: Optional[str] = Query(None, pattern=r'^[A-Za-z]{3}$'),
+    current_user: User = Depends(get_current_active_user),
+    db: Union[AsyncSession, Session] = Depends(get_db)
+):
+    client = await DBHelper.get_by_id(db, Client, client_id)
+    if client is None:
+        raise HTTPException(status_code=404, detail="Client not found")
+    if client.investment_profile not in TARGET_ALLOCATIONS:
+        raise HTTPException(status_code=400, detail="Client has no defined investment profile")
+    
+    try:
+        drifts = await rebalancing_service.scan(
+            db, threshold=threshold, client_id=client_id, only_flagged=False, base_currency=base_currency
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not drifts:
+        raise HTTPException(status_code=404, detail="Client has no positions")
+    return drifts[0]
@@ -0,0 +1,30 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from typing import List, Optional, Union
+
+from app.core.database import get_db
+from app.core.dependencies import get_current_active_user
+from app.models.user import User
+from app.schemas.report import AUMReport
+from app.services.reports import report_service
+
+router = APIRouter()
+
+@router.get("/aum", response_model=AUMReport)
+async def get_aum_report(
+    group_by: List[str] = Query(..., description="asset, currency, exchange e/ou profile (até três)"),
+    rollup: bool = Query(False),
+    base_currency: Optional[str] = Query(None, pattern=r'^[A-Za-z]{3}$'),
+    current_user: User = Depends(get_current_active_user),
+    db: Union[AsyncSession, Session] = Depends(get_db)
+):
+    """
+    AUM (a custo) agrupado por ativo, moeda, bolsa ou perfil do cliente; com rollup,
+    inclui os subtotais de cada nível e o total geral. Com base_currency, os valores
+    são convertidos pela última taxa de câmbio armazenada
+    """
+    try:
+        return await report_service.aum(db, group_by, rollup, base_currency)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
@@ -0,0 +1,100 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from sqlalchemy.future import select
+from typing import List, Optional, Union
+
+from app.core.database import get_db
+from app.core.dependencies import get_current_active_user
+from app.core.db_helpers import DBHelper
+from app.models.sale import Sale
+from app.models.client import Client
+from app.models.asset import Asset
+from app.models.user import User
+from app.schemas.sale import Sale as SaleSchema, SaleCreate
+from app.services.client_summary import client_summary
+from app.services.pnl import pnl_service
+from app.services.reports import report_service
+from app.services.portfolio_history import portfolio_history
+
+router = APIRouter()
+
+@router.get("/", response_model=List[SaleSchema])
+async def read_sales(
+    client_id: Optional[int] = Query(None),
+    asset_id: Optional[int] = Query(None),
+    skip: int = 0,
+    limit: int = 100,
+    current_user: User = Depends(get_current_active_user),
+    db: Union[AsyncSession, Session] = Depends(get_db)
+):
+    query = select(Sale)
+    if client_id:
+        query = query.where(Sale.client_id == client_id)
+    if asset_id:
+        query = query.where(Sale.asset_id == asset_id)
+    query = query.order_by(Sale.sell_date.desc(), Sale.id.desc()).offset(skip).limit(limit)
+    
+    result = await DBHelper.execute_query(db, query)
+    return result.scalars().all()
+
+@router.get("/{sale_id}", response_model=SaleSchema)
+async def read_sale(
+    sale_id: int,
+    current_user: User = Depends(get_current_active_user),
+    db: Union[AsyncSession, Session] = Depends(get_db)
+):
+    sale = await DBHelper.get_by_id(db, Sale, sale_id)
+    if sale is None:
+        raise HTTPException(status_code=404, detail="Sale not found")
+    return sale
+
+@router.post("/", response_model=SaleSchema)
+async def create_sale(
+    sale: SaleCreate,
+    current_user: User = Depends(get_current_active_user),
+    db: Union[AsyncSession, Session] = Depends(get_db)
+):
+    # Verificar se cliente existe e está ativo
+    client = await DBHelper.get_by_id(db, Client, sale.client_id)
+    if not client:
+        raise HTTPException(status_code=404, detail="Client not found")
+    if not client.is_active:
+        raise HTTPException(status_code=400, detail="Cannot create sale for inactive client")
+    
+    asset = await DBHelper.get_by_id(db, Asset, sale.asset_id)
+    if not asset:
+        raise HTTPException(status_code=404, detail="Asset not found")
+    
+    db_sale = Sale(**sale.model_dump())
+    db.add(db_sale)
+    # Resumo atualizado na mesma transação; o lock da linha do cliente serializa vendas concorrentes
+    await client_summary.refresh(db, [db_sale.client_id])
+    try:
+        # A venda precisa caber na posição em todas as datas a partir dela, inclusive depois de vendas já registradas
+        await pnl_service.ensure_covered(db, [(db_sale.client_id, db_sale.asset_id)], since=db_sale.sell_date)
+    except ValueError as e:
+        await DBHelper.rollback(db)
+        raise HTTPException(status_code=400, detail=str(e))
+    await DBHelper.commit(db)
+    await report_service.invalidate_cache()
+    await portfolio_history.invalidate(db_sale.client_id, db_sale.sell_date)
+    await DBHelper.refresh(db, db_sale)
+    return db_sale
+
+@router.delete("/{sale_id}")
+async def delete_sale(
+    sale_id: int,
+    current_user: User = Depends(get_current_active_user),
+    db: Union[AsyncSession, Session] = Depends(get_db)
+):
+    sale = await DBHelper.get_by_id(db, Sale, sale_id)
+    if sale is None:
+        raise HTTPException(status_code=404, detail="Sale not found")
+    
+    await DBHelper.delete_obj(db, sale, commit=False)
+    await client_summary.refresh(db, [sale.client_id])
+    await DBHelper.commit(db)
+    await report_service.invalidate_cache()
+    await portfolio_history.invalidate(sale.client_id, sale.sell_date)
+    return {"detail": "Sale deleted successfully"}
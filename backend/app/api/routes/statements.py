@@ -0,0 +1,83 @@
+import os
+from fastapi import APIRouter, Depends, HTTPException, Path, Query, Response, status
+from fastapi.responses import FileResponse
+from typing import List
+
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.core.dependencies import get_current_active_user
+from app.models.user import User
+from app.schemas.statement import StatementJob, StatementRun
+from app.services.statements import statement_service, statement_path, month_bounds, FORMATS
+
+router = APIRouter()
+
+MEDIA_TYPES = {"html": "text/html", "csv": "text/csv", "json": "application/json"}
+
+@router.post("/", response_model=StatementJob, status_code=status.HTTP_202_ACCEPTED)
+async def generate_statements(
+    response: Response,
+    month: str = Query(..., pattern=r'^\d{4}-\d{2}$'),
+    formats: List[str] = Query(["html"]),
+    force: bool = Query(False),
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    Gera os extratos do mês para todos os clientes ativos em segundo plano.
+    Clientes com extrato já gravado são pulados (retomada), a menos que force=true.
+    """
+    try:
+        month_bounds(month)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    unknown = set(formats) - set(FORMATS)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown statement format: {', '.join(sorted(unknown))}")
+    
+    job = statement_service.submit(AsyncSessionLocal, month, formats=formats, force=force)
+    response.headers["Location"] = f"/statements/jobs/{job.id}"
+    return job.snapshot()
+
+@router.get("/jobs/{job_id}", response_model=StatementJob)
+async def get_statement_job(
+    job_id: str,
+    current_user: User = Depends(get_current_active_user)
+):
+    job = await statement_service.jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Statement job not found")
+    return job
+
+@router.get("/{month}/progress", response_model=StatementRun)
+async def get_statement_progress(
+    month: str = Path(..., pattern=r'^\d{4}-\d{2}$'),
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    Progresso gravado pela última execução do mês (também após um reinício)
+    """
+    # O mês vira parte do caminho no disco: só meses válidos chegam até ele
+    try:
+        month_bounds(month)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    progress = statement_service.read_progress(month)
+    if progress is None:
+        raise HTTPException(status_code=404, detail="No statement run for this month")
+    return progress
+
+@router.get("/{month}/{client_id}")
+async def download_statement(
+    month: str,
+    client_id: int,
+    format: str = Query("html", pattern=r'^(html|csv|json)$'),
+    current_user: User = Depends(get_current_active_user)
+):
+    try:
+        month_bounds(month)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    path = statement_path(settings.STATEMENT_DIR, month, client_id, format)
+    if not os.path.exists(path):
+        raise HTTPException(status_code=404, detail="Statement not found")
+    return FileResponse(path, media_type=MEDIA_TYPES[format], filename=f"statement_{month}_{client_id}.{format}")
@@ -0,0 +1,264 @@
+"""
+Bounded in-process cache for market data.
+
+- LRU eviction once `maxsize` entries are stored
+- per-entry TTL, plus an optional stale window during which the old value is
+  served while one background task refreshes it (stale-while-revalidate)
+- single-flight: concurrent misses for the same key share one load
+- optional shared backend (see cache_backend) consulted before loading, so a
+  value loaded by one worker is reused by the others
+"""
+import asyncio
+import time
+import weakref
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Iterable, List, Optional
+
+# Instâncias vivas, lidas pelo endpoint de métricas
+_instances: "weakref.WeakSet[TTLCache]" = weakref.WeakSet()
+
+def all_caches() -> List["TTLCache"]:
+    return sorted(_instances, key=lambda cache: cache.name)
+
+class TTLCache:
+    def __init__(self, maxsize: int = 1024, ttl: float = 300, stale_ttl: float = 0, name: str = "cache",
+                 backend=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.name = name
+        # Backend compartilhado entre workers; o nome do cache é o namespace
+        self.backend = backend
+        # key -> (fresh_until, stale_until, value), em ordem LRU
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self._background = set()
+        self._stats = {
+            "hits": 0, "misses": 0, "stale_hits": 0, "coalesced": 0,
+            "loads": 0, "load_errors": 0, "evictions": 0, "shared_hits": 0,
+        }
+        _instances.add(self)
+
+    def __len__(self):
+        return len(self._data)
+
+    def keys(self) -> List[Hashable]:
+        """Keys currently stored, fresh or stale"""
+        return list(self._data)
+
+    def __contains__(self, key):
+        return self._lookup(key)[0] != "miss"
+
+    def _lookup(self, key):
+        """Return ('fresh' | 'stale' | 'miss', value) without touching the statistics"""
+        entry = self._data.get(key)
+        if entry is None:
+            return "miss", None
+        fresh_until, stale_until, value = entry
+        now = time.monotonic()
+        if now < fresh_until:
+            return "fresh", value
+        if now < stale_until:
+            return "stale", value
+        del self._data[key]
+        return "miss", None
+
+    def get(self, key, default=None):
+        state, value = self._lookup(key)
+        if state == "miss":
+            return default
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key, value, ttl: Optional[float] = None):
+        ttl = self.ttl if ttl is None else ttl
+        fresh_until = time.monotonic() + ttl
+        self._data[key] = (fresh_until, fresh_until + self.stale_ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self._stats["evictions"] += 1
+
+    def delete(self, key):
+        self._data.pop(key, None)
+
+    async def get_many(self, keys: Iterable[Hashable]) -> Dict[Hashable, Any]:
+        """
+        Values already cached for these keys (fresh or within the stale window), from this
+        process or else the shared backend. Never loads.
+        """
+        results, remote = {}, []
+        for key in dict.fromkeys(keys):
+            value = self.get(key)
+            if value is not None:
+                results[key] = value
+            else:
+                remote.append(key)
+        if remote and self.backend is not None:
+            now = time.time()
+            shared = await self.backend.get_many(self.name, remote)
+            for key, (expires_at, value) in shared.items():
+                # Mantém a validade original; vencido, cai direto na janela stale
+                self.set(key, value, expires_at - now)
+                results[key] = value
+            self._stats["shared_hits"] += len(shared)
+        return results
+
+    async def set_many(self, values: Dict[Hashable, Any], ttl: Optional[float] = None):
+        """Store values in this process and in the shared backend"""
+        ttl = self.ttl if ttl is None else ttl
+        for key, value in values.items():
+            self.set(key, value, ttl)
+        if values and self.backend is not None:
+            expires_at = time.time() + ttl
+            await self.backend.set_many(
+                self.name, {key: (expires_at, value) for key, value in values.items()}, ttl + self.stale_ttl
+            )
+
+    def clear(self):
+        self._data.clear()
+
+    async def invalidate(self):
+        """Clear this process's entries and the shared namespace"""
+        self.clear()
+        if self.backend is not None:
+            await self.backend.invalidate(self.name)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self._stats["hits"] + self._stats["stale_hits"] + self._stats["misses"]
+        return {
+            "name": self.name,
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "inflight": len(self._inflight),
+            "shared": self.backend is not None,
+            **self._stats,
+            "hit_ratio": (self._stats["hits"] + self._stats["stale_hits"]) / lookups if lookups else 0.0,
+        }
+
+    def _spawn(self, coro):
+        task = asyncio.ensure_future(coro)
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    async def get_or_load(self, key, loader: Callable[[], Awaitable[Any]], ttl: Optional[float] = None):
+        """
+        Cached value for key, loading it with `loader` on a miss. Concurrent misses
+        wait on the same load. A None result is returned but not cached.
+        """
+        async def load(keys):
+            value = await loader()
+            return {} if value is None else {key: value}
+
+        values = await self.get_many_or_load([key], load, ttl=ttl)
+        return values.get(key)
+
+    async def get_many_or_load(
+        self,
+        keys: Iterable[Hashable],
+        batch_loader: Callable[[List[Hashable]], Awaitable[Dict[Hashable, Any]]],
+        ttl: Optional[float] = None
+    ) -> Dict[Hashable, Any]:
+        """
+        Cached values for many keys; the missing ones are loaded with one call to
+        `batch_loader(keys) -> {key: value}`. Keys absent from its result are not cached.
+        """
+        results = {}
+        to_load, to_refresh, waiting = [], [], {}
+
+        for key in dict.fromkeys(keys):
+            state, value = self._lookup(key)
+            if state == "fresh":
+                self._stats["hits"] += 1
+                self._data.move_to_end(key)
+                results[key] = value
+            elif state == "stale":
+                self._stats["stale_hits"] += 1
+                results[key] = value
+                if key not in self._inflight:
+                    to_refresh.append(key)
+            elif key in self._inflight:
+                self._stats["coalesced"] += 1
+                waiting[key] = self._inflight[key]
+            else:
+                self._stats["misses"] += 1
+                to_load.append(key)
+
+        if to_refresh:
+            # Revalida em segundo plano e devolve o valor antigo agora
+            self._spawn(self._refresh(to_refresh, batch_loader, ttl))
+        if to_load:
+            futures = self._register(to_load)
+            results.update(await self._load(to_load, batch_loader, ttl, futures))
+        for key, future in waiting.items():
+            value = await asyncio.shield(future)
+            if value is not None:
+                results[key] = value
+        return results
+
+    def _register(self, keys: List[Hashable]) -> Dict[Hashable, asyncio.Future]:
+        loop = asyncio.get_running_loop()
+        futures = {key: loop.create_future() for key in keys}
+        self._inflight.update(futures)
+        return futures
+
+    async def _refresh(self, keys, batch_loader, ttl):
+        try:
+            await self._load(keys, batch_loader, ttl, self._register(keys))
+        except Exception:
+            # Falha na revalidação: o valor antigo continua servido até expirar a janela stale
+            pass
+
+    async def _load(self, keys, batch_loader, ttl, futures) -> Dict[Hashable, Any]:
+        try:
+            loaded = await self._load_shared(keys, batch_loader, ttl)
+        except BaseException as e:
+            self._stats["load_errors"] += 1
+            for key, future in futures.items():
+                self._inflight.pop(key, None)
+                if future.done():
+                    continue
+                if isinstance(e, asyncio.CancelledError):
+                    future.cancel()
+                else:
+                    future.set_exception(e)
+                    # Evita o aviso de exceção não lida quando ninguém mais aguardava
+                    future.exception()
+            raise
+
+        results = {}
+        for key, future in futures.items():
+            value, key_ttl = loaded.get(key, (None, None))
+            if value is not None:
+                self.set(key, value, key_ttl)
+                results[key] = value
+            self._inflight.pop(key, None)
+            if not future.done():
+                future.set_result(value)
+        return results
+
+    async def _load_shared(self, keys, batch_loader, ttl) -> Dict[Hashable, tuple]:
+        """{key: (value, ttl)} from the shared backend, then from the loader for the rest"""
+        ttl = self.ttl if ttl is None else ttl
+        loaded = {}
+        if self.backend is not None:
+            now = time.time()
+            for key, (expires_at, value) in (await self.backend.get_many(self.name, keys)).items():
+                if expires_at > now:
+                    # Mantém a validade original, não a reinicia a cada worker
+                    loaded[key] = (value, expires_at - now)
+            self._stats["shared_hits"] += len(loaded)
+
+        missing = [key for key in keys if key not in loaded]
+        if not missing:
+            return loaded
+
+        self._stats["loads"] += 1
+        fetched = {key: value for key, value in (await batch_loader(missing)).items() if value is not None}
+        if fetched and self.backend is not None:
+            expires_at = time.time() + ttl
+            await self.backend.set_many(
+                self.name, {key: (expires_at, value) for key, value in fetched.items()}, ttl + self.stale_ttl
+            )
+        loaded.update({key: (value, ttl) for key, value in fetched.items()})
+        return loaded
@@ -0,0 +1,228 @@
+"""
+Pluggable cache backends shared across uvicorn workers.
+
+- MemoryBackend: per-process dict with TTLs (single worker, tests)
+- RedisBackend: REDIS_URL, shared by every worker and replica
+
+Keys live under `<prefix>:<namespace>:<generation>:<key>`. Invalidating a
+namespace bumps its generation counter, so every key written before becomes
+unreachable at once and simply expires; nothing has to be scanned or deleted.
+Values are pickled, so the Redis instance must only be reachable by the API.
+"""
+import pickle
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Iterable, Optional
+from app.core.config import settings
+
+def _encode_key(key: Hashable) -> str:
+    return key if isinstance(key, str) else repr(key)
+
+class CacheBackend:
+    # Se os valores são visíveis para outros processos
+    shared = False
+
+    def __init__(self):
+        self._stats = {"hits": 0, "misses": 0, "sets": 0, "invalidations": 0, "errors": 0}
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self._stats["hits"] + self._stats["misses"]
+        return {
+            "backend": type(self).__name__,
+            **self._stats,
+            "hit_ratio": self._stats["hits"] / lookups if lookups else 0.0,
+        }
+
+    async def get(self, namespace: str, key: Hashable, default=None):
+        values = await self.get_many(namespace, [key])
+        return values.get(key, default)
+
+    async def set(self, namespace: str, key: Hashable, value: Any, ttl: float):
+        await self.set_many(namespace, {key: value}, ttl)
+
+    async def get_many(self, namespace: str, keys: Iterable[Hashable]) -> Dict[Hashable, Any]:
+        raise NotImplementedError
+
+    async def set_many(self, namespace: str, values: Dict[Hashable, Any], ttl: float):
+        raise NotImplementedError
+
+    async def delete(self, namespace: str, key: Hashable):
+        raise NotImplementedError
+
+    async def invalidate(self, namespace: str):
+        """Drop every key of the namespace"""
+        raise NotImplementedError
+
+    async def claim(self, namespace: str, key: Hashable, owner: str, ttl: float) -> bool:
+        """Take the lease on key for `owner` if it is free, or renew it if `owner` already holds it"""
+        raise NotImplementedError
+
+    async def release(self, namespace: str, key: Hashable, owner: str):
+        """Give the lease up if `owner` holds it"""
+        raise NotImplementedError
+
+    async def close(self):
+        pass
+
+class MemoryBackend(CacheBackend):
+    def __init__(self, maxsize: int = 4096):
+        super().__init__()
+        self.maxsize = maxsize
+        # (namespace, key) -> (expires_at, value), em ordem LRU
+        self._data: "OrderedDict[tuple, tuple]" = OrderedDict()
+
+    async def get_many(self, namespace, keys):
+        now = time.monotonic()
+        values = {}
+        for key in keys:
+            entry = self._data.get((namespace, key))
+            if entry is None or entry[0] <= now:
+                self._data.pop((namespace, key), None)
+                self._stats["misses"] += 1
+                continue
+            self._data.move_to_end((namespace, key))
+            self._stats["hits"] += 1
+            values[key] = entry[1]
+        return values
+
+    async def set_many(self, namespace, values, ttl):
+        expires_at = time.monotonic() + ttl
+        for key, value in values.items():
+            self._data[(namespace, key)] = (expires_at, value)
+            self._data.move_to_end((namespace, key))
+            self._stats["sets"] += 1
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    async def delete(self, namespace, key):
+        self._data.pop((namespace, key), None)
+
+    async def invalidate(self, namespace):
+        self._stats["invalidations"] += 1
+        for entry_key in [k for k in self._data if k[0] == namespace]:
+            del self._data[entry_key]
+
+    async def claim(self, namespace, key, owner, ttl):
+        holder = (await self.get_many(namespace, [key])).get(key)
+        if holder is not None and holder != owner:
+            return False
+        await self.set_many(namespace, {key: owner}, ttl)
+        return True
+
+    async def release(self, namespace, key, owner):
+        if (await self.get_many(namespace, [key])).get(key) == owner:
+            await self.delete(namespace, key)
+
+class RedisBackend(CacheBackend):
+    shared = True
+
+    def __init__(self, client, prefix: str = "invest"):
+        super().__init__()
+        self.client = client
+        self.prefix = prefix
+
+    @classmethod
+    def from_url(cls, url: str, prefix: str = "invest") -> "RedisBackend":
+        import redis.asyncio as redis
+        return cls(redis.from_url(url), prefix=prefix)
+
+    def _generation_key(self, namespace: str) -> str:
+        return f"{self.prefix}:{namespace}:__generation__"
+
+    async def _namespace_prefix(self, namespace: str) -> str:
+        generation = await self.client.get(self._generation_key(namespace))
+        return f"{self.prefix}:{namespace}:{int(generation or 0)}:"
+
+    async def get_many(self, namespace, keys):
+        keys = list(keys)
+        if not keys:
+            return {}
+        try:
+            prefix = await self._namespace_prefix(namespace)
+            raw = await self.client.mget([prefix + _encode_key(key) for key in keys])
+        except Exception as e:
+            # Redis indisponível: comporta-se como cache vazio em vez de derrubar a requisição
+            self._stats["errors"] += 1
+            print(f"Cache backend error on get ({namespace}): {e}")
+            return {}
+
+        values = {}
+        for key, payload in zip(keys, raw):
+            if payload is None:
+                self._stats["misses"] += 1
+                continue
+            self._stats["hits"] += 1
+            values[key] = pickle.loads(payload)
+        return values
+
+    async def set_many(self, namespace, values, ttl):
+        if not values:
+            return
+        try:
+            prefix = await self._namespace_prefix(namespace)
+            async with self.client.pipeline(transaction=False) as pipe:
+                for key, value in values.items():
+                    pipe.set(prefix + _encode_key(key), pickle.dumps(value), px=max(1, int(ttl * 1000)))
+                await pipe.execute()
+            self._stats["sets"] += len(values)
+        except Exception as e:
+            self._stats["errors"] += 1
+            print(f"Cache backend error on set ({namespace}): {e}")
+
+    async def delete(self, namespace, key):
+        try:
+            prefix = await self._namespace_prefix(namespace)
+            await self.client.delete(prefix + _encode_key(key))
+        except Exception as e:
+            self._stats["errors"] += 1
+            print(f"Cache backend error on delete ({namespace}): {e}")
+
+    async def invalidate(self, namespace):
+        try:
+            await self.client.incr(self._generation_key(namespace))
+            self._stats["invalidations"] += 1
+        except Exception as e:
+            self._stats["errors"] += 1
+            print(f"Cache backend error on invalidate ({namespace}): {e}")
+
+    def _lease_key(self, namespace: str, key: Hashable) -> str:
+        # Fora do contador de geração: invalidar o namespace não solta a posse
+        return f"{self.prefix}:{namespace}:lease:{_encode_key(key)}"
+
+    async def claim(self, namespace, key, owner, ttl):
+        lease, px = self._lease_key(namespace, key), max(1, int(ttl * 1000))
+        try:
+            if await self.client.set(lease, owner, nx=True, px=px):
+                return True
+            if (await self.client.get(lease)) == owner.encode():
+                await self.client.pexpire(lease, px)
+                return True
+            return False
+        except Exception as e:
+            # Redis indisponível: cada worker segue sozinho, como sem backend compartilhado
+            self._stats["errors"] += 1
+            print(f"Cache backend error on claim ({namespace}): {e}")
+            return True
+
+    async def release(self, namespace, key, owner):
+        lease = self._lease_key(namespace, key)
+        try:
+            if (await self.client.get(lease)) == owner.encode():
+                await self.client.delete(lease)
+        except Exception as e:
+            self._stats["errors"] += 1
+            print(f"Cache backend error on release ({namespace}): {e}")
+
+    async def close(self):
+        await self.client.aclose()
+
+def create_cache_backend() -> CacheBackend:
+    if settings.CACHE_BACKEND == "redis":
+        return RedisBackend.from_url(settings.REDIS_URL)
+    return MemoryBackend(maxsize=settings.MARKET_DATA_CACHE_SIZE)
+
+cache_backend = create_cache_backend()
+
+def shared_backend() -> Optional[CacheBackend]:
+    """The configured backend when it is shared across processes, else None (in-process caches suffice)"""
+    return cache_backend if cache_backend.shared else None
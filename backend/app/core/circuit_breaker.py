@@ -0,0 +1,118 @@
+"""
+Circuit breaker and hedged calls for upstream dependencies.
+
+closed     calls pass; `failure_threshold` consecutive failures open the circuit
+open       calls fail immediately with CircuitOpenError for `recovery_timeout` seconds
+half_open  up to `half_open_max_calls` trial calls pass; a success closes the
+           circuit, a failure opens it again
+
+Timeouts count as failures, so a slow upstream trips the breaker as well.
+"""
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+class CircuitOpenError(Exception):
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(f"Circuit '{name}' is open")
+        self.retry_after = retry_after
+
+class CircuitBreaker:
+    def __init__(self, name: str, failure_threshold: int = 5, recovery_timeout: float = 30,
+                 half_open_max_calls: int = 1):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_calls = 0
+        self._stats = {"calls": 0, "successes": 0, "failures": 0, "timeouts": 0,
+                       "short_circuited": 0, "opened": 0}
+
+    @property
+    def state(self) -> str:
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self.recovery_timeout:
+            self._state = HALF_OPEN
+            self._trial_calls = 0
+        return self._state
+
+    def stats(self) -> Dict[str, Any]:
+        return {"name": self.name, "state": self.state, "consecutive_failures": self._failures, **self._stats}
+
+    def _open(self):
+        self._state = OPEN
+        self._opened_at = time.monotonic()
+        self._stats["opened"] += 1
+
+    def _record_success(self):
+        self._stats["successes"] += 1
+        self._failures = 0
+        self._state = CLOSED
+
+    def _record_failure(self):
+        self._stats["failures"] += 1
+        self._failures += 1
+        if self._state == HALF_OPEN or self._failures >= self.failure_threshold:
+            self._open()
+
+    async def call(self, fn: Callable[[], Awaitable[Any]], timeout: Optional[float] = None):
+        """Run fn() under the breaker, failing after `timeout` seconds"""
+        state = self.state
+        if state == OPEN or (state == HALF_OPEN and self._trial_calls >= self.half_open_max_calls):
+            self._stats["short_circuited"] += 1
+            retry_after = max(0.0, self.recovery_timeout - (time.monotonic() - self._opened_at))
+            raise CircuitOpenError(self.name, retry_after)
+        if state == HALF_OPEN:
+            self._trial_calls += 1
+
+        self._stats["calls"] += 1
+        try:
+            result = await asyncio.wait_for(fn(), timeout)
+        except asyncio.TimeoutError:
+            self._stats["timeouts"] += 1
+            self._record_failure()
+            raise
+        except asyncio.CancelledError:
+            if state == HALF_OPEN:
+                self._trial_calls -= 1
+            raise
+        except Exception:
+            self._record_failure()
+            raise
+        self._record_success()
+        return result
+
+async def hedged(fn: Callable[[], Awaitable[Any]], delay: float, max_attempts: int = 2):
+    """
+    Start fn(); if it has not finished after `delay` seconds, start another attempt
+    and return whichever finishes first. A failed attempt does not cancel the
+    others; the last error is raised only when every attempt failed.
+    """
+    if delay <= 0 or max_attempts <= 1:
+        return await fn()
+
+    pending = {asyncio.ensure_future(fn())}
+    attempts = 1
+    error = None
+    try:
+        while pending:
+            done, pending = await asyncio.wait(
+                pending,
+                timeout=delay if attempts < max_attempts else None,
+                return_when=asyncio.FIRST_COMPLETED
+            )
+            for task in done:
+                if task.exception() is None:
+                    return task.result()
+                error = task.exception()
+            if attempts < max_attempts and (not done or not pending):
+                pending.add(asyncio.ensure_future(fn()))
+                attempts += 1
+        raise error
+    finally:
+        for task in pending:
+            task.cancel()
@@ -8,6 +8,9 @@ class Settings:
     # Redis
     REDIS_URL: str = os.getenv("REDIS_URL", "redis://localhost:6379/0")
     
+    # Shared cache backend: "memory" (per process) or "redis" (REDIS_URL, shared by all workers)
+    CACHE_BACKEND: str = os.getenv("CACHE_BACKEND", "memory").lower()
+    
     # JWT
     SECRET_KEY: str = os.getenv("SECRET_KEY", "your-super-secret-key-change-in-production")
     ALGORITHM: str = os.getenv("ALGORITHM", "HS256")
@@ -19,5 +22,109 @@ class Settings:
     
     # Yahoo Finance
     YAHOO_FINANCE_BASE_URL: str = os.getenv("YAHOO_FINANCE_BASE_URL", "https://query1.finance.yahoo.com/v8/finance/chart")
+    QUOTE_BATCH_SIZE: int = int(os.getenv("QUOTE_BATCH_SIZE", "100"))
+    
+    # Market data provider: yahoo, fixture (static JSON file) or replay (fixture with latency/error injection)
+    MARKET_DATA_PROVIDER: str = os.getenv("MARKET_DATA_PROVIDER", "yahoo").lower()
+    MARKET_DATA_FIXTURE_PATH: str = os.getenv("MARKET_DATA_FIXTURE_PATH", "")
+    # Com o provider yahoo, grava as respostas neste arquivo (formato fixture) para replay
+    MARKET_DATA_RECORDING_PATH: str = os.getenv("MARKET_DATA_RECORDING_PATH", "")
+    MARKET_DATA_REPLAY_LATENCY_MS: float = float(os.getenv("MARKET_DATA_REPLAY_LATENCY_MS", "0"))
+    MARKET_DATA_REPLAY_JITTER_MS: float = float(os.getenv("MARKET_DATA_REPLAY_JITTER_MS", "0"))
+    MARKET_DATA_REPLAY_ERROR_RATE: float = float(os.getenv("MARKET_DATA_REPLAY_ERROR_RATE", "0"))
+    MARKET_DATA_REPLAY_SEED: Optional[int] = int(os.environ["MARKET_DATA_REPLAY_SEED"]) if os.getenv("MARKET_DATA_REPLAY_SEED") else None
+    
+    # Market data resilience: dedicated threads, per-call timeouts, hedging and circuit breaker
+    MARKET_DATA_THREADS: int = int(os.getenv("MARKET_DATA_THREADS", "8"))
+    MARKET_DATA_CALL_TIMEOUT: float = float(os.getenv("MARKET_DATA_CALL_TIMEOUT", "10"))
+    MARKET_DATA_HISTORY_TIMEOUT: float = float(os.getenv("MARKET_DATA_HISTORY_TIMEOUT", "30"))
+    # Segunda tentativa disparada se a primeira não responder neste prazo (0 desativa)
+    MARKET_DATA_HEDGE_DELAY: float = float(os.getenv("MARKET_DATA_HEDGE_DELAY", "2"))
+    CIRCUIT_FAILURE_THRESHOLD: int = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "5"))
+    CIRCUIT_RECOVERY_TIMEOUT: float = float(os.getenv("CIRCUIT_RECOVERY_TIMEOUT", "30"))
+    
+    # Market data rate limiting (upstream requests per second)
+    MARKET_DATA_RATE_LIMIT: float = float(os.getenv("MARKET_DATA_RATE_LIMIT", "1.0"))
+    MARKET_DATA_BURST: int = int(os.getenv("MARKET_DATA_BURST", "5"))
+    MARKET_DATA_MAX_QUEUE: int = int(os.getenv("MARKET_DATA_MAX_QUEUE", "20"))
+    MARKET_DATA_REQUEST_DEADLINE: float = float(os.getenv("MARKET_DATA_REQUEST_DEADLINE", "5"))
+    MARKET_DATA_BACKGROUND_DEADLINE: float = float(os.getenv("MARKET_DATA_BACKGROUND_DEADLINE", "120"))
+    
+    # Market data cache
+    MARKET_DATA_CACHE_SIZE: int = int(os.getenv("MARKET_DATA_CACHE_SIZE", "2048"))
+    ASSET_INFO_CACHE_TTL: int = int(os.getenv("ASSET_INFO_CACHE_TTL", "300"))
+    ASSET_INFO_STALE_TTL: int = int(os.getenv("ASSET_INFO_STALE_TTL", "86400"))
+    QUOTE_CACHE_TTL: int = int(os.getenv("QUOTE_CACHE_TTL", "60"))
+    QUOTE_STALE_TTL: int = int(os.getenv("QUOTE_STALE_TTL", "900"))
+    
+    # Background price refresh (seconds between cycles, plus random jitter)
+    PRICE_REFRESH_ENABLED: bool = os.getenv("PRICE_REFRESH_ENABLED", "false").lower() in ("true", "1", "yes")
+    PRICE_REFRESH_INTERVAL: int = int(os.getenv("PRICE_REFRESH_INTERVAL", "300"))
+    PRICE_REFRESH_JITTER: float = float(os.getenv("PRICE_REFRESH_JITTER", "30"))
+    
+    # Price history
+    PRICE_HISTORY_YEARS: int = int(os.getenv("PRICE_HISTORY_YEARS", "5"))
+    PRICE_INGEST_BATCH_SIZE: int = int(os.getenv("PRICE_INGEST_BATCH_SIZE", "1000"))
+    PRICE_INGEST_CONCURRENCY: int = int(os.getenv("PRICE_INGEST_CONCURRENCY", "4"))
+    # Diretório do cache colunar (memmap) de fechamentos; vazio desativa
+    PRICE_CACHE_DIR: str = os.getenv("PRICE_CACHE_DIR", "")
+    
+    # Analytics
+    PROCESS_POOL_WORKERS: int = int(os.getenv("PROCESS_POOL_WORKERS", str(os.cpu_count() or 2)))
+    RISK_CACHE_SIZE: int = int(os.getenv("RISK_CACHE_SIZE", "256"))
+    RISK_CACHE_TTL: int = int(os.getenv("RISK_CACHE_TTL", "3600"))
+    HISTORY_CACHE_SIZE: int = int(os.getenv("HISTORY_CACHE_SIZE", "1024"))
+    HISTORY_CACHE_TTL: int = int(os.getenv("HISTORY_CACHE_TTL", "3600"))
+    # Monte Carlo (caminhos por simulação e por lote enviado ao process pool)
+    SIMULATION_DEFAULT_PATHS: int = int(os.getenv("SIMULATION_DEFAULT_PATHS", "10000"))
+    SIMULATION_MAX_PATHS: int = int(os.getenv("SIMULATION_MAX_PATHS", "100000"))
+    SIMULATION_CHUNK_PATHS: int = int(os.getenv("SIMULATION_CHUNK_PATHS", "5000"))
+    SIMULATION_CONCURRENCY: int = int(os.getenv("SIMULATION_CONCURRENCY", "2"))
+    
+    # Snapshots diários das carteiras (job noturno opcional dentro da API)
+    SNAPSHOT_SCHEDULE_ENABLED: bool = os.getenv("SNAPSHOT_SCHEDULE_ENABLED", "false").lower() in ("true", "1", "yes")
+    SNAPSHOT_RUN_AT: str = os.getenv("SNAPSHOT_RUN_AT", "22:00")
+    SNAPSHOT_CHUNK_SIZE: int = int(os.getenv("SNAPSHOT_CHUNK_SIZE", "500"))
+    SNAPSHOT_PARALLEL_CHUNKS: int = int(os.getenv("SNAPSHOT_PARALLEL_CHUNKS", "4"))
+    SNAPSHOT_BATCH_SIZE: int = int(os.getenv("SNAPSHOT_BATCH_SIZE", "1000"))
+    
+    # Extratos mensais (arquivos em STATEMENT_DIR/<AAAA-MM>/)
+    STATEMENT_DIR: str = os.getenv("STATEMENT_DIR", "data/statements")
+    STATEMENT_CHUNK_SIZE: int = int(os.getenv("STATEMENT_CHUNK_SIZE", "200"))
+    STATEMENT_PARALLEL_CHUNKS: int = int(os.getenv("STATEMENT_PARALLEL_CHUNKS", "4"))
+    
+    # Observabilidade
+    METRICS_ENABLED: bool = os.getenv("METRICS_ENABLED", "true").lower() in ("true", "1", "yes")
+    # Contagem de queries por requisição (header Server-Timing e aviso de N+1)
+    QUERY_STATS_ENABLED: bool = os.getenv("QUERY_STATS_ENABLED", "true").lower() in ("true", "1", "yes")
+    QUERY_REPEAT_THRESHOLD: int = int(os.getenv("QUERY_REPEAT_THRESHOLD", "5"))
+    # Log de queries lentas (0 desativa) e EXPLAIN (ANALYZE, BUFFERS) amostrado, só PostgreSQL
+    SLOW_QUERY_THRESHOLD_MS: float = float(os.getenv("SLOW_QUERY_THRESHOLD_MS", "500"))
+    SLOW_QUERY_LOG_LIMIT: int = int(os.getenv("SLOW_QUERY_LOG_LIMIT", "60"))
+    SLOW_QUERY_EXPLAIN: bool = os.getenv("SLOW_QUERY_EXPLAIN", "false").lower() in ("true", "1", "yes")
+    SLOW_QUERY_EXPLAIN_SAMPLE_RATE: float = float(os.getenv("SLOW_QUERY_EXPLAIN_SAMPLE_RATE", "0.1"))
+    SLOW_QUERY_EXPLAIN_INTERVAL: int = int(os.getenv("SLOW_QUERY_EXPLAIN_INTERVAL", "600"))
+    SLOW_QUERY_EXPLAIN_TIMEOUT: float = float(os.getenv("SLOW_QUERY_EXPLAIN_TIMEOUT", "10"))
+    # Profiler por requisição: header X-Profile dos usuários listados ou amostragem
+    PROFILING_ENABLED: bool = os.getenv("PROFILING_ENABLED", "false").lower() in ("true", "1", "yes")
+    PROFILING_USERS: set = {email.strip() for email in os.getenv("PROFILING_USERS", "").split(",") if email.strip()}
+    PROFILING_SAMPLE_RATE: float = float(os.getenv("PROFILING_SAMPLE_RATE", "0"))
+    PROFILING_INTERVAL_MS: float = float(os.getenv("PROFILING_INTERVAL_MS", "5"))
+    PROFILING_STORE_SIZE: int = int(os.getenv("PROFILING_STORE_SIZE", "100"))
+    PROFILING_TTL: int = int(os.getenv("PROFILING_TTL", "3600"))
+    
+    # Background jobs (resultados mantidos para consulta)
+    JOB_RESULTS_SIZE: int = int(os.getenv("JOB_RESULTS_SIZE", "256"))
+    JOB_RESULTS_TTL: int = int(os.getenv("JOB_RESULTS_TTL", "3600"))
+    
+    # Reports
+    REPORT_CACHE_SIZE: int = int(os.getenv("REPORT_CACHE_SIZE", "64"))
+    REPORT_CACHE_TTL: int = int(os.getenv("REPORT_CACHE_TTL", "900"))
+    
+    # FX rates (taxas diárias em memória, invalidadas a cada ingestão)
+    FX_CACHE_SIZE: int = int(os.getenv("FX_CACHE_SIZE", "64"))
+    FX_CACHE_TTL: int = int(os.getenv("FX_CACHE_TTL", "3600"))
+    # Moeda das movimentações de caixa e base padrão do rebalanceamento
+    BASE_CURRENCY: str = os.getenv("BASE_CURRENCY", "BRL").upper()
 
 settings = Settings()
\ No newline at end of file
@@ -4,6 +4,7 @@ Database helpers for hybrid sync/async operations
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from sqlalchemy import select
+from sqlalchemy.dialects import postgresql, sqlite
 from typing import TypeVar, Type, Any, Optional, List
 
 T = TypeVar('T')
@@ -31,6 +32,14 @@ class DBHelper:
         else:
             db.commit()
     
+    @staticmethod
+    async def rollback(db):
+        """Roll back the current transaction (hybrid sync/async)"""
+        if isinstance(db, AsyncSession):
+            await db.rollback()
+        else:
+            db.rollback()
+    
     @staticmethod
     async def refresh(db, obj):
         """Refresh object (hybrid sync/async)"""
@@ -74,19 +83,95 @@ class DBHelper:
             return result.scalars().all()
     
     @staticmethod
-    async def delete_obj(db, obj):
-        """Delete object (hybrid sync/async)"""
+    async def delete_obj(db, obj, commit: bool = True):
+        """Delete object, committing unless commit=False (hybrid sync/async)"""
         if isinstance(db, AsyncSession):
             await db.delete(obj)
-            await db.commit()
+            if commit:
+                await db.commit()
         else:
             db.delete(obj)
-            db.commit()
+            if commit:
+                db.commit()
+    
+    @staticmethod
+    async def execute_query(db, query, params=None):
+        """Execute custom query, optionally with a list of parameter dicts (executemany) (hybrid sync/async)"""
+        if isinstance(db, AsyncSession):
+            return await db.execute(query, params)
+        else:
+            return db.execute(query, params)
+    
+    @staticmethod
+    async def stream(db, query, batch_size: int = 1000):
+        """Iterate over result rows fetched from the server in batches (hybrid sync/async)"""
+        query = query.execution_options(yield_per=batch_size)
+        if isinstance(db, AsyncSession):
+            result = await db.stream(query)
+            async for partition in result.partitions():
+                for row in partition:
+                    yield row
+        else:
+            for partition in db.execute(query).partitions():
+                for row in partition:
+                    yield row
     
     @staticmethod
-    async def execute_query(db, query):
-        """Execute custom query (hybrid sync/async)"""
+    async def flush(db):
+        """Flush pending changes without committing (hybrid sync/async)"""
         if isinstance(db, AsyncSession):
-            return await db.execute(query)
+            await db.flush()
         else:
-            return db.execute(query)
\ No newline at end of file
+            db.flush()
+    
+    @staticmethod
+    def dialect_name(db) -> str:
+        """Name of the database dialect behind the session ('postgresql', 'sqlite', ...)"""
+        return db.bind.dialect.name
+    
+    @staticmethod
+    async def upsert(db, model: Type[T], rows: List[dict], index_elements: List[str],
+                     update_columns: Optional[List[str]] = None, batch_size: int = 1000) -> int:
+        """Insert rows in batches, updating existing rows on conflict (hybrid sync/async)"""
+        if not rows:
+            return 0
+        
+        insert = postgresql.insert if DBHelper.dialect_name(db) == "postgresql" else sqlite.insert
+        
+        if update_columns is None:
+            update_columns = [key for key in rows[0].keys() if key not in index_elements]
+        
+        for start in range(0, len(rows), batch_size):
+            stmt = insert(model).values(rows[start:start + batch_size])
+            if update_columns:
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=index_elements,
+                    set_={column: stmt.excluded[column] for column in update_columns}
+                )
+            else:
+                stmt = stmt.on_conflict_do_nothing(index_elements=index_elements)
+            await DBHelper.execute_query(db, stmt)
+        return len(rows)
+    
+    @staticmethod
+    async def bulk_insert(db, model: Type[T], columns: List[str], records: List[tuple],
+                          batch_size: int = 10000) -> int:
+        """
+        Load rows (tuples in `columns` order) without ORM objects: COPY on PostgreSQL
+        through asyncpg, batched executemany INSERTs on other databases (hybrid sync/async).
+        Nothing is committed.
+        """
+        if not records:
+            return 0
+        table = model.__table__
+        if isinstance(db, AsyncSession) and db.bind.dialect.driver == "asyncpg":
+            connection = await db.connection()
+            raw = await connection.get_raw_connection()
+            await raw.driver_connection.copy_records_to_table(table.name, records=records, columns=columns)
+            return len(records)
+        
+        stmt = table.insert()
+        for start in range(0, len(records), batch_size):
+            params = [dict(zip(columns, record)) for record in records[start:start + batch_size]]
+            await DBHelper.execute_query(db, stmt, params)
+        return len(records)
@@ -0,0 +1,135 @@
+"""
+Background jobs for work that outlives a request (simulations, batch reports).
+
+A job is submitted with a coroutine factory that receives the Job, so it can
+report progress, and runs as a task on the event loop; CPU-heavy parts are
+expected to go through the process pool. At most `concurrency` jobs of a
+manager run at once, the rest wait in order. Finished jobs are kept for `ttl`
+seconds (at most `maxsize` of them) so clients can poll for the result.
+
+Jobs live in the worker that accepted them. When the cache backend is shared,
+every state change is also published there, so a poll answered by another
+worker still sees the job.
+"""
+import asyncio
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+STATUSES = ("pending", "running", "done", "failed")
+
+class Job:
+    __slots__ = ("id", "kind", "status", "progress", "result", "error", "created_at", "started_at", "finished_at")
+
+    def __init__(self, kind: str):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.status = "pending"
+        self.progress = 0.0
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("done", "failed")
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {slot: getattr(self, slot) for slot in self.__slots__}
+
+class JobManager:
+    def __init__(self, name: str = "jobs", concurrency: int = 2, maxsize: int = 256, ttl: float = 3600,
+                 backend=None):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.backend = backend
+        self._semaphore = asyncio.Semaphore(concurrency)
+        # id -> Job, em ordem de criação
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._stats = {"submitted": 0, "succeeded": 0, "errored": 0, "evicted": 0}
+
+    def __len__(self):
+        return len(self._jobs)
+
+    def submit(self, kind: str, run: Callable[[Job], Awaitable[Any]]) -> Job:
+        """Start `run(job)` in the background and return the pending job right away"""
+        self._evict()
+        job = Job(kind)
+        self._jobs[job.id] = job
+        self._stats["submitted"] += 1
+        task = asyncio.ensure_future(self._run(job, run))
+        self._tasks[job.id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(job.id, None))
+        return job
+
+    async def _run(self, job: Job, run: Callable[[Job], Awaitable[Any]]):
+        await self._publish(job)
+        async with self._semaphore:
+            job.status = "running"
+            job.started_at = time.time()
+            await self._publish(job)
+            try:
+                job.result = await run(job)
+                job.status = "done"
+                job.progress = 1.0
+            except asyncio.CancelledError:
+                job.status, job.error = "failed", "Cancelled"
+                raise
+            except Exception as e:
+                job.status, job.error = "failed", str(e) or type(e).__name__
+            finally:
+                job.finished_at = time.time()
+                self._stats["succeeded" if job.status == "done" else "errored"] += 1
+        await self._publish(job)
+
+    async def _publish(self, job: Job):
+        if self.backend is not None:
+            try:
+                await self.backend.set(self.name, job.id, job.snapshot(), self.ttl)
+            except Exception as e:
+                print(f"Error publishing job {job.id}: {e}")
+
+    async def report(self, job: Job, progress: float):
+        """Update the progress (0..1) of a running job"""
+        job.progress = max(0.0, min(1.0, progress))
+        await self._publish(job)
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Snapshot of a job from this worker or, failing that, the shared backend"""
+        self._evict()
+        job = self._jobs.get(job_id)
+        if job is not None:
+            return job.snapshot()
+        if self.backend is not None:
+            return await self.backend.get(self.name, job_id)
+        return None
+
+    def _evict(self):
+        """Drop finished jobs past their TTL, then the oldest finished ones beyond maxsize"""
+        now = time.time()
+        for job_id in [job_id for job_id, job in self._jobs.items()
+                       if job.finished and now - job.finished_at > self.ttl]:
+            del self._jobs[job_id]
+            self._stats["evicted"] += 1
+        if len(self._jobs) > self.maxsize:
+            for job_id in [job_id for job_id, job in self._jobs.items() if job.finished][:len(self._jobs) - self.maxsize]:
+                del self._jobs[job_id]
+                self._stats["evicted"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        counts = {status: 0 for status in STATUSES}
+        for job in self._jobs.values():
+            counts[job.status] += 1
+        return {"name": self.name, "size": len(self._jobs), "maxsize": self.maxsize, **counts, **self._stats}
+
+    async def shutdown(self):
+        """Cancel jobs still queued or running (on application shutdown)"""
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
@@ -0,0 +1,89 @@
+"""
+Leader election for periodic jobs running inside every API worker.
+
+Only the worker holding the lock runs the job; the others skip their cycle.
+
+- shared cache backend (Redis): a lease renewed by the leader every cycle
+  (SET NX with expiry). If the leader dies, the lease expires and the next
+  worker to try takes over.
+- otherwise, on PostgreSQL: a session-level advisory lock held on a dedicated
+  connection for as long as the worker lives, released when it stops (or when
+  the connection drops).
+- otherwise (single process, SQLite): always the leader.
+"""
+import uuid
+import zlib
+from sqlalchemy import text
+from app.core.cache_backend import shared_backend
+
+LEADER_NAMESPACE = "leader"
+
+class LeaderLock:
+    def __init__(self, name: str, backend=None, engine=None):
+        self.name = name
+        self.owner = uuid.uuid4().hex
+        self._backend = backend
+        self._engine = engine
+        self._conn = None
+
+    def _resolve(self):
+        if self._backend is None:
+            self._backend = shared_backend()
+        if self._engine is None:
+            from app.core.database import engine
+            self._engine = engine
+
+    async def acquire(self, ttl: float) -> bool:
+        """Whether this worker leads now; the Redis lease must outlive the interval between calls"""
+        self._resolve()
+        if self._backend is not None:
+            return await self._backend.claim(LEADER_NAMESPACE, self.name, self.owner, ttl)
+        if self._engine.dialect.name == "postgresql":
+            return await self._advisory_lock()
+        return True
+
+    async def _advisory_lock(self) -> bool:
+        if self._conn is not None:
+            try:
+                await self._conn.execute(text("SELECT 1"))
+                await self._conn.commit()
+                return True
+            except Exception:
+                # Conexão perdida: o lock caiu junto, tenta de novo abaixo
+                await self._close()
+        conn = await self._engine.connect()
+        try:
+            locked = (await conn.execute(
+                text("SELECT pg_try_advisory_lock(:key)"), {"key": zlib.crc32(self.name.encode())}
+            )).scalar()
+            # O lock de sessão sobrevive ao commit; a conexão não fica "idle in transaction"
+            await conn.commit()
+        except Exception:
+            await conn.close()
+            raise
+        if not locked:
+            await conn.close()
+            return False
+        self._conn = conn
+        return True
+
+    async def _close(self):
+        conn, self._conn = self._conn, None
+        try:
+            await conn.close()
+        except Exception:
+            pass
+
+    async def release(self):
+        if self._backend is not None:
+            await self._backend.release(LEADER_NAMESPACE, self.name, self.owner)
+        if self._conn is not None:
+            # Fechar a conexão devolvida ao pool não encerra a sessão: o unlock é explícito
+            try:
+                await self._conn.execute(
+                    text("SELECT pg_advisory_unlock(:key)"), {"key": zlib.crc32(self.name.encode())}
+                )
+                await self._conn.commit()
+            except Exception:
+                pass
+            await self._close()
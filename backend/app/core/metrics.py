@@ -0,0 +1,218 @@
+"""
+In-process metrics in the Prometheus text exposition format.
+
+Counters, gauges and histograms keep their samples in plain dicts keyed by the
+tuple of label values. Recording is a dict lookup plus an add (histograms find
+the bucket with bisect and only cumulate at scrape time), so it stays cheap on
+the request path. Values that already live elsewhere (pool usage, cache and
+breaker statistics) are read by collectors when /metrics is scraped, instead of
+being pushed on every change.
+
+Each worker process has its own registry: scrape every worker (or run one
+worker per container) to see the full picture.
+"""
+import time
+from bisect import bisect_left
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Buckets de latência (segundos) e de tamanho de resposta (bytes)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+
+# (nome, tipo, ajuda, [(labels, valor)]) devolvido pelos collectors
+Family = Tuple[str, str, str, List[Tuple[Dict[str, str], float]]]
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(labels: Dict[str, Any]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + "}"
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+
+    def _labels(self, key: Tuple) -> Dict[str, Any]:
+        return dict(zip(self.labelnames, key))
+
+    def samples(self) -> Iterable[Tuple[str, Dict[str, Any], float]]:
+        raise NotImplementedError
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, help, labelnames)
+        self._values: Dict[Tuple, float] = {}
+
+    def inc(self, *labels, amount: float = 1.0):
+        self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def value(self, *labels) -> float:
+        return self._values.get(labels, 0.0)
+
+    def samples(self):
+        for key, value in self._values.items():
+            yield self.name, self._labels(key), value
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value: float, *labels):
+        self._values[labels] = value
+
+    def dec(self, *labels, amount: float = 1.0):
+        self.inc(*labels, amount=-amount)
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [contagem por bucket (não cumulativa, último = +Inf), soma]
+        self._values: Dict[Tuple, list] = {}
+
+    def observe(self, value: float, *labels):
+        entry = self._values.get(labels)
+        if entry is None:
+            entry = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+        entry[0][bisect_left(self.buckets, value)] += 1
+        entry[1] += value
+
+    def count(self, *labels) -> int:
+        entry = self._values.get(labels)
+        return sum(entry[0]) if entry else 0
+
+    def samples(self):
+        for key, (counts, total) in self._values.items():
+            labels = self._labels(key)
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                yield f"{self.name}_bucket", {**labels, "le": _format_value(bound)}, cumulative
+            yield f"{self.name}_sum", labels, total
+            yield f"{self.name}_count", labels, cumulative
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+        self._collectors: List[Callable[[], Iterable[Family]]] = []
+
+    def _register(self, metric: Metric) -> Metric:
+        existing = self._metrics.get(metric.name)
+        if existing is not None:
+            return existing
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, help, labelnames))
+
+    def gauge(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, help, labelnames))
+
+    def histogram(self, name: str, help: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help, labelnames, buckets))
+
+    def collector(self, fn: Callable[[], Iterable[Family]]):
+        """Register a function called at scrape time; usable as a decorator"""
+        self._collectors.append(fn)
+        return fn
+
+    def render(self) -> str:
+        lines = []
+
+        def family(name, kind, help, samples):
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {kind}")
+            for sample_name, labels, value in samples:
+                lines.append(f"{sample_name}{_format_labels(labels)} {_format_value(value)}")
+
+        for metric in self._metrics.values():
+            family(metric.name, metric.kind, metric.help, metric.samples())
+        for collector in self._collectors:
+            try:
+                families = list(collector())
+            except Exception as e:
+                print(f"Error collecting metrics from {getattr(collector, '__name__', collector)}: {e}")
+                continue
+            for name, kind, help, samples in families:
+                family(name, kind, help, ((name, labels, value) for labels, value in samples))
+        return "\n".join(lines) + "\n"
+
+registry = MetricsRegistry()
+
+HTTP_REQUESTS = registry.counter("http_requests_total", "HTTP requests by route and status", ("method", "route", "status"))
+HTTP_LATENCY = registry.histogram("http_request_duration_seconds", "HTTP request latency", ("method", "route"))
+HTTP_IN_PROGRESS = registry.gauge("http_requests_in_progress", "HTTP requests being handled", ("method",))
+HTTP_RESPONSE_SIZE = registry.histogram(
+    "http_response_size_bytes", "HTTP response body size", ("method", "route"), buckets=SIZE_BUCKETS
+)
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording count, latency, in-flight requests and response size
+    per route template (e.g. /clients/{client_id}), so label cardinality stays bounded.
+    """
+
+    def __init__(self, app, excluded_paths: Sequence[str] = ("/metrics",)):
+        self.app = app
+        self.excluded_paths = set(excluded_paths)
+        # endpoint -> template da rota, preenchido na primeira requisição de cada rota
+        self._templates: Dict[Any, str] = {}
+
+    def _route_template(self, scope) -> str:
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return "unmatched"
+        template = self._templates.get(endpoint)
+        if template is None:
+            template = "unmatched"
+            for route in getattr(scope.get("app"), "routes", ()):
+                if getattr(route, "endpoint", None) is endpoint:
+                    template = route.path
+                    break
+            self._templates[endpoint] = template
+        return template
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in self.excluded_paths:
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status = 500
+        size = 0
+
+        async def send_wrapper(message):
+            nonlocal status, size
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        HTTP_IN_PROGRESS.inc(method)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            HTTP_IN_PROGRESS.dec(method)
+            route = self._route_template(scope)
+            HTTP_REQUESTS.inc(method, route, str(status))
+            HTTP_LATENCY.observe(elapsed, method, route)
+            HTTP_RESPONSE_SIZE.observe(size, method, route)
@@ -0,0 +1,34 @@
+"""
+Process pool for CPU-heavy analytics (risk, simulations).
+
+NumPy work on large matrices holds the GIL long enough to stall the event loop,
+so it runs in worker processes instead of the shared threadpool. With
+PROCESS_POOL_WORKERS=0 the work runs in the threadpool (useful for debugging).
+"""
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import Optional, Callable, Any
+from starlette.concurrency import run_in_threadpool
+from app.core.config import settings
+
+_executor: Optional[ProcessPoolExecutor] = None
+
+def get_process_pool() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=settings.PROCESS_POOL_WORKERS or None)
+    return _executor
+
+async def run_in_process(fn: Callable[..., Any], *args, **kwargs) -> Any:
+    """Run a picklable, module-level function in the process pool without blocking the loop"""
+    if settings.PROCESS_POOL_WORKERS == 0:
+        return await run_in_threadpool(fn, *args, **kwargs)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_process_pool(), partial(fn, *args, **kwargs))
+
+def shutdown_process_pool():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
@@ -0,0 +1,169 @@
+"""
+Opt-in per-request sampling profiler.
+
+A request is profiled when:
+- the client sends `X-Profile: 1` with a bearer token whose user is listed in
+  PROFILING_USERS (the token is only decoded, with no database lookup), or
+- it falls in the PROFILING_SAMPLE_RATE fraction of requests
+
+While the handler runs, a daemon thread reads the stack of every busy thread
+(sys._current_frames) every PROFILING_INTERVAL_MS. That covers the event loop
+(async handlers, Pydantic validation and JSON rendering) and the threadpool
+(sync handlers and helpers). Threads parked in a select/wait are skipped. The
+samples are kept in collapsed-stack format ("frame;frame;frame count"), which
+flamegraph.pl, speedscope and inferno read directly. Each profile is stored
+under an id generated here (never taken from the client, so a caller cannot
+overwrite another profile) and returned in the X-Profile-Id header; the
+client's X-Request-ID, if any, is kept as metadata. Fetch it with
+GET /debug/profiles/{id}.
+
+Only one request is profiled at a time: others run normally. Concurrent
+requests sharing the event loop show up in the samples too, so profile on a
+quiet instance when possible. With PROFILING_ENABLED off the middleware is not
+installed at all.
+"""
+import logging
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from typing import Dict, Iterable, Optional
+from jose import JWTError, jwt
+from app.core.cache import TTLCache
+from app.core.config import settings
+
+logger = logging.getLogger("app.profiling")
+
+# Folhas de pilha de threads ociosas (loop esperando I/O, workers esperando tarefa)
+IDLE_FILES = ("selectors.py", "threading.py", "queue.py")
+
+def _frame_label(code) -> str:
+    # Caminho a partir de site-packages ou de app/, para rótulos curtos e estáveis
+    filename = code.co_filename
+    index = filename.rfind("site-packages" + os.sep)
+    if index != -1:
+        filename = filename[index + len("site-packages" + os.sep):]
+    else:
+        index = filename.rfind(os.sep + "app" + os.sep)
+        filename = filename[index + 1:] if index != -1 else os.path.basename(filename)
+    return f"{code.co_name} ({filename}:{code.co_firstlineno})".replace(";", ",")
+
+def collapse(frame, thread_name: str) -> Optional[str]:
+    """Stack of one thread as 'thread;outer;...;leaf', or None if the thread is idle"""
+    if frame.f_code.co_filename.endswith(IDLE_FILES):
+        return None
+    labels = []
+    while frame is not None:
+        labels.append(_frame_label(frame.f_code))
+        frame = frame.f_back
+    labels.append(thread_name)
+    return ";".join(reversed(labels))
+
+class SamplingProfiler:
+    """Samples the stacks of all other threads until stopped"""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.samples: Counter = Counter()
+        self.sample_count = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            self.sample_count += 1
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = collapse(frame, names.get(ident, f"thread-{ident}"))
+                if stack is not None:
+                    self.samples[stack] += 1
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.samples.most_common())
+
+def _header(scope, name: bytes) -> Optional[str]:
+    for key, value in scope.get("headers", ()):
+        if key == name:
+            return value.decode("latin-1")
+    return None
+
+def allowed_user(authorization: Optional[str]) -> Optional[str]:
+    """E-mail of the bearer token's user if they may request profiles"""
+    if not authorization or not authorization.lower().startswith("bearer "):
+        return None
+    try:
+        payload = jwt.decode(authorization[7:], settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+    except JWTError:
+        return None
+    email = payload.get("sub")
+    return email if email in settings.PROFILING_USERS else None
+
+# id do perfil -> perfil; lido por GET /debug/profiles/{id}
+profiles = TTLCache(maxsize=settings.PROFILING_STORE_SIZE, ttl=settings.PROFILING_TTL, name="profiles")
+
+class ProfilingMiddleware:
+    """ASGI middleware running SamplingProfiler around opted-in requests"""
+
+    def __init__(self, app, sample_rate: Optional[float] = None, interval_ms: Optional[float] = None):
+        self.app = app
+        self.sample_rate = settings.PROFILING_SAMPLE_RATE if sample_rate is None else sample_rate
+        self.interval = (interval_ms or settings.PROFILING_INTERVAL_MS) / 1000
+        self._busy = threading.Lock()
+
+    def _wanted(self, scope) -> bool:
+        if _header(scope, b"x-profile") in ("1", "true") and allowed_user(_header(scope, b"authorization")):
+            return True
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self._wanted(scope) or not self._busy.acquire(blocking=False):
+            await self.app(scope, receive, send)
+            return
+
+        profile_id = uuid.uuid4().hex
+        profiler = SamplingProfiler(self.interval)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((b"x-profile-id", profile_id.encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        started = time.perf_counter()
+        profiler.start()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            profiler.stop()
+            self._busy.release()
+            elapsed = time.perf_counter() - started
+            profiles.set(profile_id, {
+                "id": profile_id,
+                "request_id": _header(scope, b"x-request-id"),
+                "route": f"{scope['method']} {scope['path']}",
+                "duration_ms": round(elapsed * 1000, 2),
+                "samples": profiler.sample_count,
+                "collapsed": profiler.collapsed(),
+            })
+            logger.info("Profiled %s %s in %.1f ms (%d samples), profile id %s",
+                        scope["method"], scope["path"], elapsed * 1000, profiler.sample_count, profile_id)
+
+def profile_summaries() -> Iterable[Dict]:
+    for key in profiles.keys():
+        profile = profiles.get(key)
+        if profile is not None:
+            yield {k: v for k, v in profile.items() if k != "collapsed"}
@@ -0,0 +1,130 @@
+"""
+Per-request SQL statistics.
+
+Cursor events on every SQLAlchemy engine (the async engine's sync core
+included) time each statement and add it to the QueryStats of the current
+request, found through a context variable set by QueryStatsMiddleware. Outside
+a request the variable is unset and the listeners return right away.
+
+At the end of a request the middleware:
+- adds a Server-Timing header (db;dur=<ms>;desc="<n> queries") that browser
+  devtools show next to the request
+- logs the query count and DB time at DEBUG on the "app.queries" logger
+- warns when the same statement ran QUERY_REPEAT_THRESHOLD times or more, the
+  usual sign of an N+1 pattern (one query per row of a previous result)
+
+`count_queries()` counts every statement executed in a block regardless of
+context; tests use it to hold endpoints to a query budget.
+
+Every timed statement also goes through the slow-query log
+(app.core.slow_queries), inside or outside a request, while
+SLOW_QUERY_THRESHOLD_MS is set.
+"""
+import logging
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, Optional, Tuple
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from app.core.config import settings
+from app.core.slow_queries import slow_query_log
+
+logger = logging.getLogger("app.queries")
+
+class QueryStats:
+    __slots__ = ("route", "count", "duration", "statements")
+
+    def __init__(self, route: str = ""):
+        self.route = route
+        self.count = 0
+        self.duration = 0.0
+        # SQL (com placeholders) -> execuções
+        self.statements: Counter = Counter()
+
+    def record(self, statement: str, duration: float):
+        self.count += 1
+        self.duration += duration
+        self.statements[statement] += 1
+
+    def repeated(self, threshold: int) -> List[Tuple[str, int]]:
+        return [(statement, count) for statement, count in self.statements.most_common() if count >= threshold]
+
+_current: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+# Contadores de count_queries() ativos (independem do contexto)
+_counters: List[QueryStats] = []
+
+def current_stats() -> Optional[QueryStats]:
+    return _current.get()
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # O início fica no contexto da execução, descartado com ela: um statement que falha
+    # (sem after_cursor_execute) não deixa nada para trás na conexão do pool
+    if context is not None and (_current.get() is not None or _counters or settings.SLOW_QUERY_THRESHOLD_MS > 0):
+        context._query_started = time.perf_counter()
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, "_query_started", None)
+    if started is None:
+        return
+    duration = time.perf_counter() - started
+    stats = _current.get()
+    if stats is not None:
+        stats.record(statement, duration)
+    for counter in _counters:
+        counter.record(statement, duration)
+    slow_query_log.observe(conn, statement, parameters, duration, stats.route if stats is not None else None)
+
+@contextmanager
+def count_queries() -> Iterator[QueryStats]:
+    """Count every statement executed inside the block (any engine, any thread)"""
+    counter = QueryStats()
+    _counters.append(counter)
+    try:
+        yield counter
+    finally:
+        _counters.remove(counter)
+
+def server_timing(stats: QueryStats, total: float) -> str:
+    return f'db;dur={stats.duration * 1000:.2f};desc="{stats.count} queries", total;dur={total * 1000:.2f}'
+
+class QueryStatsMiddleware:
+    """ASGI middleware collecting the SQL statistics of each request"""
+
+    def __init__(self, app, repeat_threshold: Optional[int] = None):
+        self.app = app
+        self.repeat_threshold = repeat_threshold or settings.QUERY_REPEAT_THRESHOLD
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = QueryStats(f"{scope['method']} {scope['path']}")
+        token = _current.set(stats)
+        started = time.perf_counter()
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", server_timing(stats, time.perf_counter() - started).encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current.reset(token)
+            self._report(stats, time.perf_counter() - started)
+
+    def _report(self, stats: QueryStats, total: float):
+        if not stats.count:
+            return
+        logger.debug("%s: %d queries, %.1f ms in DB, %.1f ms total",
+                     stats.route, stats.count, stats.duration * 1000, total * 1000)
+        for statement, count in stats.repeated(self.repeat_threshold):
+            logger.warning("%s: statement executed %d times in one request (possible N+1): %s",
+                           stats.route, count, " ".join(statement.split())[:200])
@@ -0,0 +1,71 @@
+"""
+Async token bucket for upstream calls.
+
+Tokens refill at `rate` per second up to `burst`. A caller that finds no token
+reserves the next one (the balance goes negative) and sleeps until it is due, so
+waiters are served in arrival order without a lock: there is no await between
+checking and reserving. Callers are rejected immediately, instead of parked, when
+the queue is already `max_queue` deep or their turn would come after their deadline.
+"""
+import asyncio
+import math
+import time
+from typing import Optional, Dict, Any
+
+class RateLimitExceeded(Exception):
+    def __init__(self, retry_after: float, message: str = "Upstream rate limit queue is full"):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+class AsyncTokenBucket:
+    def __init__(self, rate: float, burst: int = 1, max_queue: int = 100, name: str = "limiter"):
+        self.rate = rate
+        self.burst = burst
+        self.max_queue = max_queue
+        self.name = name
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._stats = {"acquired": 0, "waited": 0, "rejected": 0}
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    @property
+    def queue_depth(self) -> int:
+        self._refill()
+        return max(0, math.ceil(-self._tokens))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "rate": self.rate,
+            "burst": self.burst,
+            "queue_depth": self.queue_depth,
+            "tokens": max(0.0, self._tokens),
+            **self._stats,
+        }
+
+    async def acquire(self, timeout: Optional[float] = None):
+        """Take one token, waiting at most `timeout` seconds for it"""
+        self._refill()
+        if self._tokens >= 1:
+            self._tokens -= 1
+            self._stats["acquired"] += 1
+            return
+
+        wait = (1 - self._tokens) / self.rate
+        if self.queue_depth >= self.max_queue or (timeout is not None and wait > timeout):
+            self._stats["rejected"] += 1
+            raise RateLimitExceeded(retry_after=wait)
+
+        self._tokens -= 1
+        self._stats["waited"] += 1
+        try:
+            await asyncio.sleep(wait)
+        except asyncio.CancelledError:
+            # Devolve a reserva para não atrasar quem está atrás na fila
+            self._tokens += 1
+            raise
+        self._stats["acquired"] += 1
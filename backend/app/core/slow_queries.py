@@ -0,0 +1,151 @@
+"""
+Slow-query log.
+
+Statements slower than SLOW_QUERY_THRESHOLD_MS are logged on the
+"app.slow_queries" logger. Each entry has the duration, the route that issued
+the statement and the shape of the bound parameters (types and lengths, never
+the values). Logging is capped at SLOW_QUERY_LOG_LIMIT entries per minute. Past
+the cap, entries are only counted and the count is reported with the next
+logged entry.
+
+With SLOW_QUERY_EXPLAIN enabled on PostgreSQL, a sample
+(SLOW_QUERY_EXPLAIN_SAMPLE_RATE) of slow SELECTs is re-run under
+EXPLAIN (ANALYZE, BUFFERS) on a separate connection. This runs as a background
+task, so the request never waits for it. At most one plan is captured at a
+time, and each statement at most once per SLOW_QUERY_EXPLAIN_INTERVAL seconds.
+Only reads are explained, since ANALYZE executes the statement: SELECTs and
+CTEs without INSERT/UPDATE/DELETE/MERGE, SELECT INTO or a locking clause.
+"""
+import asyncio
+import logging
+import random
+import re
+import time
+from typing import Any, Dict, Optional
+from app.core.config import settings
+
+logger = logging.getLogger("app.slow_queries")
+
+def parameter_shapes(parameters: Any) -> str:
+    """Types (and lengths of strings/sequences) of bound parameters, without their values"""
+    def shape(value):
+        if value is None:
+            return "null"
+        if isinstance(value, (str, bytes)):
+            return f"{type(value).__name__}({len(value)})"
+        if isinstance(value, (list, tuple, set)):
+            return f"{type(value).__name__}[{len(value)}]"
+        return type(value).__name__
+
+    if parameters is None:
+        return "()"
+    if isinstance(parameters, dict):
+        return "{" + ", ".join(f"{key}: {shape(value)}" for key, value in parameters.items()) + "}"
+    if isinstance(parameters, list) and parameters and isinstance(parameters[0], (dict, tuple, list)):
+        # executemany: uma forma por lote
+        return f"{len(parameters)} x {parameter_shapes(parameters[0])}"
+    return "(" + ", ".join(shape(value) for value in parameters) + ")"
+
+# Literais, identificadores entre aspas e comentários, removidos antes de procurar palavras-chave
+_QUOTED = re.compile(r"'(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"|--[^\n]*|/\*.*?\*/", re.DOTALL)
+# Escrita (inclusive dentro de uma CTE), SELECT INTO e cláusulas de lock
+_SIDE_EFFECTS = re.compile(
+    r"\b(INSERT|UPDATE|DELETE|MERGE|INTO)\b|\bFOR\s+(NO\s+KEY\s+UPDATE|KEY\s+SHARE|SHARE)\b",
+    re.IGNORECASE
+)
+
+def explainable(statement: str) -> bool:
+    """
+    Only reads without side effects: EXPLAIN ANALYZE executes the statement, so writes
+    (also inside a CTE) and row locks (FOR UPDATE / FOR SHARE) are refused
+    """
+    stripped = _QUOTED.sub(" ", statement)
+    head = stripped.lstrip().split(None, 1)[0].upper() if stripped.strip() else ""
+    return head in ("SELECT", "WITH") and not _SIDE_EFFECTS.search(stripped)
+
+def compact(statement: str, limit: int = 1000) -> str:
+    return " ".join(statement.split())[:limit]
+
+class SlowQueryLog:
+    def __init__(self):
+        self._window_start = time.monotonic()
+        self._logged_in_window = 0
+        self._suppressed = 0
+        self._explaining = False
+        # SQL -> último EXPLAIN (monotonic)
+        self._explained: Dict[str, float] = {}
+        self._background = set()
+        self._stats = {"slow": 0, "logged": 0, "suppressed": 0, "explained": 0, "explain_errors": 0}
+
+    def stats(self) -> Dict[str, Any]:
+        return dict(self._stats)
+
+    def _allow_log(self) -> bool:
+        now = time.monotonic()
+        if now - self._window_start >= 60:
+            self._window_start, self._logged_in_window = now, 0
+        if self._logged_in_window >= settings.SLOW_QUERY_LOG_LIMIT:
+            return False
+        self._logged_in_window += 1
+        return True
+
+    def observe(self, conn, statement: str, parameters: Any, duration: float, route: Optional[str]):
+        """Called after every statement with its duration (seconds)"""
+        if settings.SLOW_QUERY_THRESHOLD_MS <= 0 or duration * 1000 < settings.SLOW_QUERY_THRESHOLD_MS:
+            return
+        self._stats["slow"] += 1
+        if not self._allow_log():
+            self._suppressed += 1
+            self._stats["suppressed"] += 1
+            return
+
+        suppressed, self._suppressed = self._suppressed, 0
+        self._stats["logged"] += 1
+        logger.warning(
+            "Slow query (%.1f ms) from %s, params %s%s: %s",
+            duration * 1000, route or "background", parameter_shapes(parameters),
+            f" [{suppressed} more not logged]" if suppressed else "", compact(statement)
+        )
+        if settings.SLOW_QUERY_EXPLAIN:
+            self._maybe_explain(conn, statement, parameters, route)
+
+    def _maybe_explain(self, conn, statement: str, parameters: Any, route: Optional[str]):
+        if conn.dialect.name != "postgresql" or not explainable(statement) or self._explaining:
+            return
+        if random.random() >= settings.SLOW_QUERY_EXPLAIN_SAMPLE_RATE:
+            return
+        now = time.monotonic()
+        last = self._explained.get(statement)
+        if last is not None and now - last < settings.SLOW_QUERY_EXPLAIN_INTERVAL:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+
+        self._explaining = True
+        self._explained[statement] = now
+        if len(self._explained) > 1000:
+            self._explained.pop(next(iter(self._explained)))
+        task = loop.create_task(self._explain(statement, parameters, route))
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    async def _explain(self, statement: str, parameters: Any, route: Optional[str]):
+        from app.core.database import engine
+        try:
+            async with engine.connect() as conn:
+                # Limita o próprio EXPLAIN; a transação é desfeita ao sair
+                await conn.exec_driver_sql(f"SET LOCAL statement_timeout = {int(settings.SLOW_QUERY_EXPLAIN_TIMEOUT * 1000)}")
+                result = await conn.exec_driver_sql(f"EXPLAIN (ANALYZE, BUFFERS) {statement}", parameters)
+                plan = "\n".join(row[0] for row in result.all())
+                await conn.rollback()
+            self._stats["explained"] += 1
+            logger.warning("Plan of slow query from %s: %s\n%s", route or "background", compact(statement, 300), plan)
+        except Exception as e:
+            self._stats["explain_errors"] += 1
+            logger.warning("Could not EXPLAIN slow query: %s", e)
+        finally:
+            self._explaining = False
+
+slow_query_log = SlowQueryLog()
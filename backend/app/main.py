@@ -1,11 +1,34 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Depends
 from fastapi.middleware.cors import CORSMiddleware
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import text
-from app.api.routes import auth, users, clients, assets, allocations, movements, export
+from app.api.routes import auth, users, clients, assets, allocations, movements, export, portfolio, rebalancing, reports, sales, statements, metrics, profiles
 from app.core.database import get_db
+from app.core.config import settings
+from app.core.process_pool import shutdown_process_pool
+from app.core.metrics import MetricsMiddleware
+from app.core.query_stats import QueryStatsMiddleware
+from app.core.profiling import ProfilingMiddleware
+from app.services.price_refresh import price_refresh
+from app.services.simulation import simulation_service
+from app.services.snapshots import snapshot_scheduler
+from app.services.statements import statement_service
 
-app = FastAPI(title="Investment API", version="1.0.0")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if settings.PRICE_REFRESH_ENABLED:
+        price_refresh.start()
+    if settings.SNAPSHOT_SCHEDULE_ENABLED:
+        snapshot_scheduler.start()
+    yield
+    await price_refresh.stop()
+    await snapshot_scheduler.stop()
+    await simulation_service.jobs.shutdown()
+    await statement_service.jobs.shutdown()
+    shutdown_process_pool()
+
+app = FastAPI(title="Investment API", version="1.0.0", lifespan=lifespan)
 
 # Configurar CORS
 app.add_middleware(
@@ -16,13 +39,29 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+if settings.PROFILING_ENABLED:
+    app.add_middleware(ProfilingMiddleware)
+    app.include_router(profiles.router, prefix="/debug/profiles", tags=["debug"])
+
+if settings.QUERY_STATS_ENABLED:
+    app.add_middleware(QueryStatsMiddleware)
+
+if settings.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+    app.include_router(metrics.router, tags=["metrics"])
+
 app.include_router(auth.router, prefix="/auth", tags=["auth"])
 app.include_router(users.router, prefix="/users", tags=["users"])
 app.include_router(clients.router, prefix="/clients", tags=["clients"])
 app.include_router(assets.router, prefix="/assets", tags=["assets"])
 app.include_router(allocations.router, prefix="/allocations", tags=["allocations"])
+app.include_router(sales.router, prefix="/sales", tags=["sales"])
 app.include_router(movements.router, prefix="/movements", tags=["movements"])
 app.include_router(export.router, prefix="/export", tags=["export"])
+app.include_router(portfolio.router, prefix="/portfolio", tags=["portfolio"])
+app.include_router(rebalancing.router, prefix="/rebalancing", tags=["rebalancing"])
+app.include_router(reports.router, prefix="/reports", tags=["reports"])
+app.include_router(statements.router, prefix="/statements", tags=["statements"])
 
 @app.get("/")
 async def root():
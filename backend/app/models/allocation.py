@@ -1,9 +1,13 @@
-from sqlalchemy import Column, Integer, ForeignKey, Numeric, Date
+from sqlalchemy import Column, Integer, ForeignKey, Numeric, Date, Index
 from sqlalchemy.orm import relationship
 from app.models.base import Base
 
 class Allocation(Base):
     __tablename__ = "allocations"
+    __table_args__ = (
+        # Ordem da passada de casamento de lotes (cliente, ativo, data)
+        Index("ix_allocations_client_asset_date", "client_id", "asset_id", "buy_date"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     client_id = Column(Integer, ForeignKey("clients.id"), nullable=False)
@@ -8,4 +8,5 @@ class Asset(Base):
     ticker = Column(String, unique=True, index=True, nullable=False)
     name = Column(String, nullable=False)
     exchange = Column(String)
-    currency = Column(String, default="USD")
\ No newline at end of file
+    currency = Column(String, default="USD")
+    asset_class = Column(String(20), default="equity", server_default="equity", nullable=False)  # 'equity', 'fixed_income', 'real_estate', 'alternative'
\ No newline at end of file
@@ -0,0 +1,27 @@
+from sqlalchemy import Column, Integer, ForeignKey, Numeric, Date, BigInteger, String, UniqueConstraint
+from sqlalchemy.orm import relationship
+from app.models.base import Base
+
+# Origem da linha: histórico diário completo (ingestão) ou só o fechamento (atualização de cotações)
+PRICE_SOURCE_HISTORY = "history"
+PRICE_SOURCE_QUOTE = "quote"
+
+class AssetPrice(Base):
+    __tablename__ = "asset_prices"
+    __table_args__ = (
+        UniqueConstraint("asset_id", "date", name="uq_asset_prices_asset_id_date"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    asset_id = Column(Integer, ForeignKey("assets.id", ondelete="CASCADE"), nullable=False)
+    date = Column(Date, nullable=False)
+    open = Column(Numeric(18, 6), nullable=True)
+    high = Column(Numeric(18, 6), nullable=True)
+    low = Column(Numeric(18, 6), nullable=True)
+    close = Column(Numeric(18, 6), nullable=False)
+    adj_close = Column(Numeric(18, 6), nullable=True)
+    volume = Column(BigInteger, nullable=True)
+    source = Column(String(10), nullable=False, default=PRICE_SOURCE_HISTORY, server_default=PRICE_SOURCE_HISTORY)
+
+    # Relationships
+    asset = relationship("Asset", backref="prices")
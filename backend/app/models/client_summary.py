@@ -0,0 +1,18 @@
+from sqlalchemy import Column, Integer, ForeignKey, Numeric, Date, DateTime
+from sqlalchemy.orm import relationship, backref
+from sqlalchemy.sql import func
+from app.models.base import Base
+
+class ClientSummary(Base):
+    """Per-client aggregates kept in sync with allocations and movements on every write"""
+    __tablename__ = "client_summary"
+
+    client_id = Column(Integer, ForeignKey("clients.id", ondelete="CASCADE"), primary_key=True)
+    aum = Column(Numeric(18, 2), default=0, server_default="0", nullable=False, index=True)  # posições a custo
+    cash_balance = Column(Numeric(18, 2), default=0, server_default="0", nullable=False, index=True)  # depósitos - saques
+    last_movement_date = Column(Date, nullable=True, index=True)
+    positions_count = Column(Integer, default=0, server_default="0", nullable=False)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    # Relationships
+    client = relationship("Client", backref=backref("summary", uselist=False, cascade="all, delete-orphan"))
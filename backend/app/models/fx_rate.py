@@ -0,0 +1,13 @@
+from sqlalchemy import Column, Integer, String, Numeric, Date, UniqueConstraint
+from app.models.base import Base
+
+class FxRate(Base):
+    __tablename__ = "fx_rates"
+    __table_args__ = (
+        UniqueConstraint("currency", "date", name="uq_fx_rates_currency_date"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    currency = Column(String(3), nullable=False)  # ISO 4217, ex.: 'BRL'
+    date = Column(Date, nullable=False)
+    rate = Column(Numeric(18, 8), nullable=False)  # USD por 1 unidade da moeda (fechamento de <moeda>USD=X)
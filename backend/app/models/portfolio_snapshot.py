@@ -0,0 +1,19 @@
+from sqlalchemy import Column, Integer, ForeignKey, Numeric, Date, DateTime, JSON, UniqueConstraint
+from sqlalchemy.sql import func
+from app.models.base import Base
+
+class PortfolioSnapshot(Base):
+    """End-of-day state of a client's portfolio, written by the snapshot batch job"""
+    __tablename__ = "portfolio_snapshots"
+    __table_args__ = (
+        UniqueConstraint("client_id", "date", name="uq_portfolio_snapshots_client_date"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    client_id = Column(Integer, ForeignKey("clients.id", ondelete="CASCADE"), nullable=False)
+    date = Column(Date, nullable=False, index=True)
+    market_value = Column(Numeric(18, 2), nullable=False, default=0)
+    cash = Column(Numeric(18, 2), nullable=False, default=0)
+    net_flow = Column(Numeric(18, 2), nullable=False, default=0)  # aportes - resgates do dia (inclui aporte implícito)
+    positions = Column(JSON, nullable=False, default=dict)  # {asset_id: quantidade} ao fim do dia
+    updated_at = Column(DateTime(timezone=True), server_default=func.now())
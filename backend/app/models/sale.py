@@ -0,0 +1,21 @@
+from sqlalchemy import Column, Integer, ForeignKey, Numeric, Date, Index
+from sqlalchemy.orm import relationship
+from app.models.base import Base
+
+class Sale(Base):
+    """Sell transaction, matched against the client's allocation lots of the same asset"""
+    __tablename__ = "sales"
+    __table_args__ = (
+        Index("ix_sales_client_asset_date", "client_id", "asset_id", "sell_date"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    client_id = Column(Integer, ForeignKey("clients.id"), nullable=False)
+    asset_id = Column(Integer, ForeignKey("assets.id"), nullable=False)
+    quantity = Column(Numeric(15, 6), nullable=False)
+    sell_price = Column(Numeric(15, 2), nullable=False)
+    sell_date = Column(Date, nullable=False)
+
+    # Relationships
+    client = relationship("Client", backref="sales")
+    asset = relationship("Asset", backref="sales")
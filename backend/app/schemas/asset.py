@@ -1,4 +1,5 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
+from datetime import date
 from typing import Optional
 
 class AssetBase(BaseModel):
@@ -6,6 +7,7 @@ class AssetBase(BaseModel):
     name: str
     exchange: Optional[str] = None
     currency: str = "USD"
+    asset_class: str = Field("equity", pattern=r'^(equity|fixed_income|real_estate|alternative)$')
 
 class AssetCreate(AssetBase):
     pass
@@ -15,6 +17,7 @@ class AssetUpdate(BaseModel):
     name: Optional[str] = None
     exchange: Optional[str] = None
     currency: Optional[str] = None
+    asset_class: Optional[str] = Field(None, pattern=r'^(equity|fixed_income|real_estate|alternative)$')
 
 class Asset(AssetBase):
     id: int
@@ -26,4 +29,16 @@ class YahooFinanceAsset(BaseModel):
     ticker: str
     name: str
     exchange: Optional[str] = None
-    currency: str = "USD"
\ No newline at end of file
+    currency: str = "USD"
+
+class AssetPrice(BaseModel):
+    date: date
+    open: Optional[float] = None
+    high: Optional[float] = None
+    low: Optional[float] = None
+    close: float
+    adj_close: Optional[float] = None
+    volume: Optional[int] = None
+
+    class Config:
+        from_attributes = True
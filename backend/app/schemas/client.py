@@ -110,4 +110,10 @@ class Client(ClientBase):
                     data[field] = []
             else:
                 data[field] = value
-        return cls(**data)
\ No newline at end of file
+        return cls(**data)
+class ClientWithSummary(Client):
+    # Colunas pré-calculadas de client_summary
+    aum: float = 0.0
+    cash_balance: float = 0.0
+    last_movement_date: Optional[date] = None
+    positions_count: int = 0
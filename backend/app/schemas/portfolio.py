@@ -0,0 +1,124 @@
+from pydantic import BaseModel
+from datetime import date, datetime
+from typing import List, Dict, Optional
+
+class PerformancePoint(BaseModel):
+    date: date
+    market_value: float
+    cash: float
+    value: float
+    net_flow: float
+    drawdown: float
+
+class PortfolioPerformance(BaseModel):
+    client_id: int
+    start: date
+    end: date
+    start_value: float
+    end_value: float
+    net_flows: float
+    twr: float
+    twr_annualized: float
+    mwr: float
+    mwr_annualized: float
+    max_drawdown: float
+    series: List[PerformancePoint] = []
+
+class PortfolioRisk(BaseModel):
+    client_id: int
+    investment_profile: str
+    risk_tolerance: int
+    market_value: float
+    window_days: int
+    observations: int
+    confidence: float
+    horizon_days: int
+    daily_volatility: float
+    annualized_volatility: float
+    historical_var: float
+    parametric_var: float
+    weights: Dict[int, float]
+    unpriced_asset_ids: List[int] = []
+
+class CorrelationMatrix(BaseModel):
+    asset_ids: List[int]
+    window_days: int
+    observations: int
+    correlation: List[List[float]]
+    covariance: List[List[float]]
+
+class PositionPnL(BaseModel):
+    client_id: int
+    asset_id: int
+    method: str
+    quantity: float
+    cost_basis: float
+    average_cost: float
+    sold_quantity: float
+    proceeds: float
+    realized_pnl: float
+    market_price: Optional[float] = None
+    market_value: Optional[float] = None
+    unrealized_pnl: Optional[float] = None
+    unmatched_quantity: float = 0.0
+
+class ClientPnL(BaseModel):
+    client_id: int
+    method: str
+    realized_pnl: float
+    unrealized_pnl: float
+    positions: List[PositionPnL] = []
+
+class HistoryPoint(BaseModel):
+    date: date
+    market_value: float
+    invested: float
+
+class PortfolioHistory(BaseModel):
+    client_id: int
+    start: date
+    end: date
+    granularity: str
+    points: List[HistoryPoint] = []
+
+class PortfolioSnapshot(BaseModel):
+    date: date
+    market_value: float
+    cash: float
+    net_flow: float
+    positions: Dict[int, float] = {}
+
+    class Config:
+        from_attributes = True
+
+class SimulationBand(BaseModel):
+    year: int
+    mean: float
+    percentiles: Dict[int, float]
+    probability_of_loss: float
+
+class MonteCarloSimulation(BaseModel):
+    client_id: int
+    investment_profile: str
+    risk_tolerance: int
+    market_value: float
+    window_days: int
+    observations: int
+    years: int
+    paths: int
+    seed: int
+    expected_annual_return: float
+    annualized_volatility: float
+    bands: List[SimulationBand]
+    weights: Dict[int, float]
+    unpriced_asset_ids: List[int] = []
+
+class SimulationJob(BaseModel):
+    id: str
+    status: str
+    progress: float
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    error: Optional[str] = None
+    result: Optional[MonteCarloSimulation] = None
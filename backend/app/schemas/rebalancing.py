@@ -0,0 +1,20 @@
+from pydantic import BaseModel
+from typing import List
+
+class ClassDrift(BaseModel):
+    asset_class: str
+    current_weight: float
+    target_weight: float
+    drift: float
+    trade_amount: float
+
+class ClientDrift(BaseModel):
+    client_id: int
+    client_name: str
+    investment_profile: str
+    base_currency: str
+    total_value: float
+    cash: float
+    max_drift: float
+    needs_rebalancing: bool
+    classes: List[ClassDrift]
@@ -0,0 +1,18 @@
+from pydantic import BaseModel
+from typing import List, Dict, Optional
+
+class AUMGroup(BaseModel):
+    keys: Dict[str, Optional[str]]
+    level: int
+    subtotal: bool
+    aum: float
+    share: float
+    positions: int
+    clients: int
+
+class AUMReport(BaseModel):
+    group_by: List[str]
+    rollup: bool
+    base_currency: Optional[str] = None
+    total_aum: float
+    groups: List[AUMGroup] = []
@@ -0,0 +1,24 @@
+from pydantic import BaseModel, Field, validator
+from datetime import date
+
+class SaleBase(BaseModel):
+    client_id: int = Field(..., gt=0, description="Client ID must be greater than 0")
+    asset_id: int = Field(..., gt=0, description="Asset ID must be greater than 0")
+    quantity: float = Field(..., gt=0, description="Quantity must be greater than 0")
+    sell_price: float = Field(..., gt=0, description="Sell price must be greater than 0")
+    sell_date: date
+    
+    @validator('sell_date')
+    def validate_sell_date(cls, v):
+        if v > date.today():
+            raise ValueError('Sell date cannot be in the future')
+        return v
+
+class SaleCreate(SaleBase):
+    pass
+
+class Sale(SaleBase):
+    id: int
+
+    class Config:
+        from_attributes = True
@@ -0,0 +1,24 @@
+from pydantic import BaseModel
+from datetime import datetime
+from typing import List, Optional
+
+class StatementRun(BaseModel):
+    month: str
+    formats: List[str]
+    total: int
+    done: int
+    skipped: int
+    files: int
+    status: str
+    directory: Optional[str] = None
+    duration: Optional[float] = None
+
+class StatementJob(BaseModel):
+    id: str
+    status: str
+    progress: float
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    error: Optional[str] = None
+    result: Optional[StatementRun] = None
@@ -0,0 +1,94 @@
+"""
+Per-client summary columns (AUM, cash balance, last movement, positions).
+
+Allocation, sale and movement writes call refresh() for the affected clients before
+committing, so the summary row changes in the same transaction as the data it
+is derived from. refresh() locks the client rows first (SELECT ... FOR UPDATE),
+serializing concurrent writes for the same client. Client lists then sort and filter on indexed columns instead
+of aggregating allocations and movements for every client on every request.
+"""
+from typing import Iterable, Union
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from sqlalchemy.future import select
+from sqlalchemy import func, case
+from app.core.db_helpers import DBHelper
+from app.models.client import Client
+from app.models.client_summary import ClientSummary
+from app.models.movement import Movement, MovementType
+from app.services.pnl import PnLService
+
+class ClientSummaryService:
+    async def compute(self, db: Union[AsyncSession, Session], client_ids: Iterable[int], lock: bool = False) -> list:
+        """
+        Summary rows for the given clients, from one GROUP BY per source table. With `lock`,
+        the client rows are locked (FOR UPDATE, in id order) before aggregating.
+        """
+        client_ids = sorted(set(client_ids))
+        if not client_ids:
+            return []
+
+        # Apenas clientes que ainda existem (um update pode ter movido a linha de um cliente removido)
+        existing_query = select(Client.id).where(Client.id.in_(client_ids)).order_by(Client.id)
+        if lock:
+            existing_query = existing_query.with_for_update()
+        existing = await DBHelper.execute_query(db, existing_query)
+        rows = {
+            client_id: {"client_id": client_id, "aum": 0, "cash_balance": 0,
+                        "last_movement_date": None, "positions_count": 0, "updated_at": func.now()}
+            for client_id in existing.scalars().all()
+        }
+        if not rows:
+            return []
+
+        # AUM e posições líquidos das vendas
+        lots = PnLService.open_lots(list(rows))
+        allocations = await DBHelper.execute_query(
+            db,
+            select(
+                lots.c.client_id,
+                func.sum(lots.c.quantity * lots.c.buy_price),
+                func.count(func.distinct(lots.c.asset_id))
+            )
+            .group_by(lots.c.client_id)
+        )
+        for client_id, aum, positions in allocations.all():
+            rows[client_id].update(aum=aum or 0, positions_count=positions)
+
+        movements = await DBHelper.execute_query(
+            db,
+            select(
+                Movement.client_id,
+                func.sum(case((Movement.type == MovementType.deposit, Movement.amount), else_=-Movement.amount)),
+                func.max(Movement.date)
+            )
+            .where(Movement.client_id.in_(list(rows)))
+            .group_by(Movement.client_id)
+        )
+        for client_id, balance, last_date in movements.all():
+            rows[client_id].update(cash_balance=balance or 0, last_movement_date=last_date)
+
+        return list(rows.values())
+
+    async def refresh(self, db: Union[AsyncSession, Session], client_ids: Iterable[int]) -> int:
+        """
+        Recompute and upsert the summary of the given clients without committing:
+        the caller commits together with the allocation or movement change.
+        The client rows stay locked until that commit, so concurrent writes for the
+        same client recompute one after the other and each sees the previous one's data.
+        """
+        await DBHelper.flush(db)
+        rows = await self.compute(db, client_ids, lock=True)
+        return await DBHelper.upsert(db, ClientSummary, rows, index_elements=["client_id"])
+
+    async def rebuild_all(self, db: Union[AsyncSession, Session], batch_size: int = 1000) -> int:
+        """Recompute every client's summary (after bulk loads or manual SQL)"""
+        result = await DBHelper.execute_query(db, select(Client.id).order_by(Client.id))
+        client_ids = result.scalars().all()
+        written = 0
+        for start in range(0, len(client_ids), batch_size):
+            written += await self.refresh(db, client_ids[start:start + batch_size])
+        await DBHelper.commit(db)
+        return written
+
+client_summary = ClientSummaryService()
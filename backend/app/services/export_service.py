@@ -11,6 +11,7 @@ from app.models.allocation import Allocation
 from app.models.movement import Movement, MovementType
 from app.models.asset import Asset
 from app.core.db_helpers import DBHelper
+from app.services.pnl import pnl_service
 
 class ExportService:
     @staticmethod
@@ -155,5 +156,45 @@ class ExportService:
             media_type="text/csv",
             headers={"Content-Disposition": f"attachment; filename=movements.csv"}
         )
+    
+    @staticmethod
+    async def export_pnl_to_csv(db: Union[AsyncSession, Session], method: str = "fifo") -> StreamingResponse:
+        # Tickers são poucos; clientes saem por ID para que a memória não cresça com a base
+        result = await DBHelper.execute_query(db, select(Asset.id, Asset.ticker))
+        tickers = dict(result.all())
+        
+        async def rows():
+            output = io.StringIO()
+            writer = csv.writer(output)
+            writer.writerow([
+                "Client ID", "Asset Ticker", "Method", "Open Quantity", "Average Cost", "Cost Basis",
+                "Sold Quantity", "Proceeds", "Realized P&L", "Market Price", "Unrealized P&L"
+            ])
+            async for position in pnl_service.iter_positions(db, method):
+                writer.writerow([
+                    position["client_id"],
+                    tickers.get(position["asset_id"], position["asset_id"]),
+                    method,
+                    position["quantity"],
+                    round(position["average_cost"], 6),
+                    round(position["cost_basis"], 2),
+                    position["sold_quantity"],
+                    round(position["proceeds"], 2),
+                    round(position["realized_pnl"], 2),
+                    "" if position["market_price"] is None else position["market_price"],
+                    "" if position["unrealized_pnl"] is None else round(position["unrealized_pnl"], 2)
+                ])
+                # Envia em blocos à medida que as posições são liquidadas
+                if output.tell() > 64 * 1024:
+                    yield output.getvalue()
+                    output.seek(0)
+                    output.truncate()
+            yield output.getvalue()
+        
+        return StreamingResponse(
+            rows(),
+            media_type="text/csv",
+            headers={"Content-Disposition": f"attachment; filename=pnl_{method}.csv"}
+        )
 
 export_service = ExportService()
\ No newline at end of file
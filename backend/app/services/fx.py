@@ -0,0 +1,217 @@
+"""
+Foreign-exchange rates for multi-currency aggregation.
+
+fx_rates stores, per currency and day, how many USD one unit of the currency is
+worth (the close of Yahoo's <CUR>USD=X pair), so any cross rate is the ratio of
+two rows. Rates are filled in bulk from the market-data provider (history for
+backfills, one batched quote call for the latest day) and read through an
+in-memory cache of the full rate table for a given day, so converting an
+aggregate costs no extra query once the day is cached.
+"""
+import asyncio
+from datetime import date, timedelta
+from typing import Optional, Dict, List, Iterable, Union
+import numpy as np
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from sqlalchemy.future import select
+from sqlalchemy import func, case
+from app.core.config import settings
+from app.core.rate_limiter import RateLimitExceeded
+from app.core.cache import TTLCache
+from app.core.cache_backend import shared_backend
+from app.core.db_helpers import DBHelper
+from app.models.allocation import Allocation
+from app.models.asset import Asset
+from app.models.fx_rate import FxRate
+from app.services.price_history import missing_ranges
+from app.services.yahoo_finance import yahoo_finance
+
+PIVOT_CURRENCY = "USD"
+
+def fx_symbol(currency: str) -> str:
+    """Market-data symbol quoting USD per unit of the currency"""
+    return f"{currency.upper()}{PIVOT_CURRENCY}=X"
+
+def asset_currency():
+    """Asset currency as stored in aggregates (assets without one are USD)"""
+    return func.upper(func.coalesce(Asset.currency, PIVOT_CURRENCY))
+
+class FxRateService:
+    def __init__(self, provider=None):
+        # O provider precisa expor get_history_range(symbol, start, end) e refresh_quotes(symbols)
+        self.provider = provider or yahoo_finance
+        # dia -> {moeda: USD por unidade}, com a última taxa conhecida até o dia
+        self._rates = TTLCache(
+            maxsize=settings.FX_CACHE_SIZE,
+            ttl=settings.FX_CACHE_TTL,
+            name="fx_rates",
+            backend=shared_backend()
+        )
+
+    def clear_cache(self):
+        self._rates.clear()
+
+    async def invalidate_cache(self):
+        await self._rates.invalidate()
+
+    def cache_stats(self):
+        return self._rates.stats()
+
+    async def held_currencies(self, db: Union[AsyncSession, Session]) -> List[str]:
+        """Currencies of the assets referenced by allocations"""
+        result = await DBHelper.execute_query(
+            db,
+            select(asset_currency()).where(Asset.id.in_(select(Allocation.asset_id).distinct())).distinct()
+        )
+        return sorted(result.scalars().all())
+
+    async def ingest(
+        self,
+        db: Union[AsyncSession, Session],
+        currencies: Iterable[str],
+        start: Optional[date] = None,
+        end: Optional[date] = None
+    ) -> Dict[str, int]:
+        """Fetch the missing daily history of each currency and upsert it; returns rows per currency"""
+        end = end or date.today()
+        start = start or end - timedelta(days=365 * settings.PRICE_HISTORY_YEARS)
+        currencies = sorted({currency.upper() for currency in currencies} - {PIVOT_CURRENCY})
+        if not currencies:
+            return {}
+
+        result = await DBHelper.execute_query(
+            db,
+            select(FxRate.currency, func.min(FxRate.date), func.max(FxRate.date))
+            .where(FxRate.currency.in_(currencies))
+            .group_by(FxRate.currency)
+        )
+        spans = {row[0]: (row[1], row[2]) for row in result.all()}
+        semaphore = asyncio.Semaphore(settings.PRICE_INGEST_CONCURRENCY)
+
+        async def fetch(currency: str):
+            rows = []
+            for range_start, range_end in missing_ranges(*spans.get(currency, (None, None)), start, end):
+                async with semaphore:
+                    try:
+                        rows.extend(await self.provider.get_history_range(fx_symbol(currency), range_start, range_end))
+                    except RateLimitExceeded:
+                        # Sem vaga no limite de chamadas: o intervalo continua faltando e entra na próxima execução
+                        break
+            return rows
+
+        fetched = await asyncio.gather(*(fetch(currency) for currency in currencies))
+
+        written = {}
+        for currency, rows in zip(currencies, fetched):
+            written[currency] = await DBHelper.upsert(
+                db, FxRate,
+                [{"currency": currency, "date": row["date"], "rate": row["close"]}
+                 for row in rows if row.get("close")],
+                index_elements=["currency", "date"],
+                batch_size=settings.PRICE_INGEST_BATCH_SIZE
+            )
+        await DBHelper.commit(db)
+
+        if any(written.values()):
+            await self.invalidate_cache()
+        return written
+
+    async def refresh_latest(self, db: Union[AsyncSession, Session], currencies: Iterable[str]) -> int:
+        """Store today's rate of every currency with a single batched quote call"""
+        currencies = sorted({currency.upper() for currency in currencies} - {PIVOT_CURRENCY})
+        if not currencies:
+            return 0
+        quotes = await self.provider.refresh_quotes([fx_symbol(currency) for currency in currencies])
+        rows = [
+            {"currency": currency, "date": date.fromisoformat(quote["as_of"]), "rate": quote["price"]}
+            for currency in currencies
+            if (quote := quotes.get(fx_symbol(currency))) and quote.get("price")
+        ]
+        written = await DBHelper.upsert(db, FxRate, rows, index_elements=["currency", "date"])
+        await DBHelper.commit(db)
+        if written:
+            await self.invalidate_cache()
+        return written
+
+    async def rates_on(self, db: Union[AsyncSession, Session], day: Optional[date] = None) -> Dict[str, float]:
+        """USD per unit of every known currency, using the last rate on or before `day`"""
+        day = day or date.today()
+
+        async def load():
+            latest = (
+                select(FxRate.currency, func.max(FxRate.date).label("date"))
+                .where(FxRate.date <= day)
+                .group_by(FxRate.currency)
+                .subquery()
+            )
+            result = await DBHelper.execute_query(
+                db,
+                select(FxRate.currency, FxRate.rate)
+                .join(latest, (FxRate.currency == latest.c.currency) & (FxRate.date == latest.c.date))
+            )
+            rates = {currency: float(rate) for currency, rate in result.all()}
+            rates[PIVOT_CURRENCY] = 1.0
+            return rates
+
+        return await self._rates.get_or_load(day.isoformat(), load)
+
+    async def factors(
+        self,
+        db: Union[AsyncSession, Session],
+        base_currency: str,
+        currencies: Iterable[str],
+        day: Optional[date] = None
+    ) -> Dict[str, float]:
+        """
+        Multiplier converting each currency into base_currency.
+        Raises ValueError when a rate is missing rather than summing unconverted amounts.
+        """
+        base_currency = base_currency.upper()
+        currencies = {currency.upper() for currency in currencies}
+        if currencies <= {base_currency}:
+            # Nada a converter: dispensa a consulta às taxas
+            return {currency: 1.0 for currency in currencies}
+        rates = await self.rates_on(db, day)
+        missing = sorted((currencies | {base_currency}) - set(rates))
+        if missing:
+            raise ValueError(f"No FX rate for {', '.join(missing)}")
+        return {currency: rates[currency] / rates[base_currency] for currency in currencies}
+
+    @staticmethod
+    def convert(amounts: np.ndarray, currencies: List[str], factors: Dict[str, float]) -> np.ndarray:
+        """Vectorized conversion of amounts[i] in currencies[i] using `factors`"""
+        codes, inverse = np.unique(np.asarray(currencies, dtype=str), return_inverse=True)
+        multipliers = np.array([factors[code] for code in codes], dtype=float)
+        return np.asarray(amounts, dtype=float) * multipliers[inverse]
+
+    @staticmethod
+    def sql_factor(factors: Dict[str, float]):
+        """SQL expression with the conversion factor of each allocation's asset currency"""
+        return case(factors, value=asset_currency(), else_=None)
+
+    async def total_in(
+        self,
+        db: Union[AsyncSession, Session],
+        amount,
+        base_currency: str,
+        where=(),
+        day: Optional[date] = None
+    ) -> float:
+        """Sum of `amount` over allocations (joined to assets) converted into base_currency"""
+        result = await DBHelper.execute_query(
+            db,
+            select(asset_currency(), func.sum(amount))
+            .select_from(Allocation)
+            .join(Asset, Allocation.asset_id == Asset.id)
+            .where(*where)
+            .group_by(asset_currency())
+        )
+        rows = result.all()
+        if not rows:
+            return 0.0
+        currencies = [row[0] for row in rows]
+        factors = await self.factors(db, base_currency, currencies, day)
+        return float(self.convert(np.array([float(row[1] or 0) for row in rows]), currencies, factors).sum())
+
+fx_service = FxRateService()
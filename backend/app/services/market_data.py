@@ -0,0 +1,325 @@
+"""
+Market-data providers behind YahooFinanceService.
+
+Every provider exposes the same three coroutines:
+
+- get_asset_info(symbol) -> {ticker, name, exchange, currency} or None if unknown
+- get_quotes(symbols) -> {symbol: {ticker, price, previous_close, change_percent, as_of}}
+- get_history_range(symbol, start, end) -> [{date, open, high, low, close, adj_close, volume}]
+
+and raises MarketDataError when the upstream fails. MARKET_DATA_PROVIDER picks:
+
+- yahoo: yfinance, optionally recording every answer to MARKET_DATA_RECORDING_PATH
+- fixture: a static JSON file (MARKET_DATA_FIXTURE_PATH), no network
+- replay: a fixture or recording served with injected latency and errors, for
+  reproducible benchmarks of the pricing pipeline and the caches
+"""
+import asyncio
+import json
+import os
+import random
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from typing import Optional, Dict, Any, List
+import pandas as pd
+import yfinance as yf
+from app.core.config import settings
+
+class MarketDataError(Exception):
+    pass
+
+class MarketDataProvider:
+    name = "base"
+
+    async def get_asset_info(self, symbol: str) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+    async def get_quotes(self, symbols: List[str]) -> Dict[str, Dict[str, Any]]:
+        raise NotImplementedError
+
+    async def get_history_range(self, symbol: str, start: date, end: date) -> List[Dict[str, Any]]:
+        raise NotImplementedError
+
+class YahooProvider(MarketDataProvider):
+    """
+    yfinance is blocking, so calls run in a small dedicated thread pool: a slow
+    Yahoo can only tie up these MARKET_DATA_THREADS threads, never the shared
+    Starlette threadpool used by the rest of the sync work.
+    """
+    name = "yahoo"
+
+    def __init__(self, max_workers: Optional[int] = None):
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers or settings.MARKET_DATA_THREADS, thread_name_prefix="yahoo-finance"
+        )
+
+    async def _run(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    async def get_asset_info(self, symbol):
+        try:
+            info = await self._run(self._get_ticker_info, symbol)
+        except Exception as e:
+            raise MarketDataError(f"Yahoo Finance lookup failed for {symbol}: {e}") from e
+        if not info:
+            return None
+        return {
+            "ticker": symbol,
+            "name": info.get("longName", info.get("shortName", symbol)),
+            "exchange": info.get("exchange", ""),
+            "currency": info.get("currency", "USD")
+        }
+
+    def _get_ticker_info(self, symbol: str) -> Optional[Dict[str, Any]]:
+        """
+        Função síncrona para buscar dados do ticker (uma tentativa; novas tentativas
+        e prazos são tratados de forma assíncrona pelo serviço)
+        """
+        ticker = yf.Ticker(symbol)
+        
+        # Configurar session com user-agent customizado
+        ticker.session.headers.update({
+            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+        })
+        
+        info = ticker.info
+        
+        # Verificar se os dados são válidos
+        if not info or len(info) < 5:
+            return None
+        return info
+
+    async def get_quotes(self, symbols):
+        try:
+            return await self._run(self._download_quotes, symbols)
+        except Exception as e:
+            raise MarketDataError(f"Yahoo Finance quotes failed for {len(symbols)} symbols: {e}") from e
+
+    def _download_quotes(self, symbols: List[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Função síncrona que busca os últimos pregões de vários símbolos em uma única chamada
+        """
+        data = yf.download(
+            tickers=" ".join(symbols),
+            period="5d",
+            interval="1d",
+            group_by="ticker",
+            auto_adjust=False,
+            threads=True,
+            progress=False,
+            timeout=settings.MARKET_DATA_CALL_TIMEOUT
+        )
+        if data is None or data.empty:
+            return {}
+
+        quotes = {}
+        for symbol in symbols:
+            if isinstance(data.columns, pd.MultiIndex):
+                if symbol not in data.columns.get_level_values(0):
+                    continue
+                closes = data[symbol]["Close"].dropna()
+            else:
+                closes = data["Close"].dropna()
+
+            if closes.empty:
+                continue
+
+            price = float(closes.iloc[-1])
+            previous_close = float(closes.iloc[-2]) if len(closes) > 1 else None
+            quotes[symbol] = {
+                "ticker": symbol,
+                "price": price,
+                "previous_close": previous_close,
+                "change_percent": (price / previous_close - 1) * 100 if previous_close else None,
+                "as_of": closes.index[-1].date().isoformat()
+            }
+        return quotes
+
+    async def get_history_range(self, symbol, start, end):
+        try:
+            return await self._run(self._get_history_range, symbol, start, end)
+        except Exception as e:
+            raise MarketDataError(f"Yahoo Finance history failed for {symbol}: {e}") from e
+
+    def _get_history_range(self, symbol: str, start: date, end: date) -> List[Dict[str, Any]]:
+        """
+        Função síncrona para buscar o histórico completo de um intervalo de datas
+        """
+        ticker = yf.Ticker(symbol)
+        # O parâmetro end do yfinance é exclusivo
+        hist = ticker.history(
+            start=start, end=end + timedelta(days=1), auto_adjust=False,
+            timeout=settings.MARKET_DATA_HISTORY_TIMEOUT
+        )
+
+        return history_rows(hist)
+
+def _float_or_none(value) -> Optional[float]:
+    return None if pd.isna(value) else float(value)
+
+def history_rows(hist: pd.DataFrame) -> List[Dict[str, Any]]:
+    """
+    Rows of a yfinance history frame. yfinance returns NaN for some days and
+    instruments: those fields become None, and days without a close are skipped,
+    so one bad row does not fail the whole range.
+    """
+    rows = []
+    for timestamp, row in hist.iterrows():
+        close = _float_or_none(row["Close"])
+        if close is None:
+            continue
+        adj_close = _float_or_none(row.get("Adj Close", row["Close"]))
+        volume = row.get("Volume")
+        rows.append({
+            "date": timestamp.date(),
+            "open": _float_or_none(row["Open"]),
+            "high": _float_or_none(row["High"]),
+            "low": _float_or_none(row["Low"]),
+            "close": close,
+            "adj_close": close if adj_close is None else adj_close,
+            "volume": None if volume is None or pd.isna(volume) else int(volume),
+        })
+    return rows
+
+class FixtureProvider(MarketDataProvider):
+    """
+    Serves a JSON document of the form
+    {"assets": {SYMBOL: {name, exchange, currency}},
+     "quotes": {SYMBOL: {price, previous_close, as_of}},
+     "history": {SYMBOL: [{date, open, high, low, close, adj_close, volume}, ...]}}
+    """
+    name = "fixture"
+
+    def __init__(self, data: Optional[Dict[str, Any]] = None, path: Optional[str] = None):
+        if data is None:
+            with open(path) as f:
+                data = json.load(f)
+        self.assets = {symbol.upper(): info for symbol, info in data.get("assets", {}).items()}
+        self.quotes = {symbol.upper(): quote for symbol, quote in data.get("quotes", {}).items()}
+        self.history = {
+            symbol.upper(): sorted(
+                ({**row, "date": date.fromisoformat(row["date"]) if isinstance(row["date"], str) else row["date"]}
+                 for row in rows),
+                key=lambda row: row["date"]
+            )
+            for symbol, rows in data.get("history", {}).items()
+        }
+
+    async def get_asset_info(self, symbol):
+        info = self.assets.get(symbol.upper())
+        if info is None:
+            return None
+        return {"ticker": symbol.upper(), "exchange": None, "currency": "USD", **info}
+
+    async def get_quotes(self, symbols):
+        quotes = {}
+        for symbol in symbols:
+            quote = self.quotes.get(symbol.upper())
+            if quote is None:
+                continue
+            previous_close = quote.get("previous_close")
+            quotes[symbol.upper()] = {
+                "ticker": symbol.upper(),
+                "price": quote["price"],
+                "previous_close": previous_close,
+                "change_percent": (quote["price"] / previous_close - 1) * 100 if previous_close else None,
+                "as_of": quote["as_of"],
+            }
+        return quotes
+
+    async def get_history_range(self, symbol, start, end):
+        return [dict(row) for row in self.history.get(symbol.upper(), []) if start <= row["date"] <= end]
+
+class ReplayProvider(FixtureProvider):
+    """Fixture or recorded data served with simulated latency (ms) and a random error rate"""
+    name = "replay"
+
+    def __init__(self, data=None, path=None, latency_ms: float = 0, jitter_ms: float = 0,
+                 error_rate: float = 0, seed: Optional[int] = None):
+        super().__init__(data, path)
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self._random = random.Random(seed)
+        self.calls = 0
+
+    async def _simulate(self, operation: str):
+        self.calls += 1
+        delay = self.latency_ms + self._random.uniform(0, self.jitter_ms)
+        failed = self._random.random() < self.error_rate
+        if delay:
+            await asyncio.sleep(delay / 1000)
+        if failed:
+            raise MarketDataError(f"Injected {operation} failure")
+
+    async def get_asset_info(self, symbol):
+        await self._simulate("asset info")
+        return await super().get_asset_info(symbol)
+
+    async def get_quotes(self, symbols):
+        await self._simulate("quotes")
+        return await super().get_quotes(symbols)
+
+    async def get_history_range(self, symbol, start, end):
+        await self._simulate("history")
+        return await super().get_history_range(symbol, start, end)
+
+class RecordingProvider(MarketDataProvider):
+    """Wraps a provider and saves every answer in the fixture format, for later replay"""
+
+    def __init__(self, inner: MarketDataProvider, path: str):
+        self.inner = inner
+        self.path = path
+        self.name = f"{inner.name}+recording"
+        self.data = {"assets": {}, "quotes": {}, "history": {}}
+        if os.path.exists(path):
+            with open(path) as f:
+                self.data.update(json.load(f))
+
+    def _save(self):
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.data, f, default=str)
+        os.replace(tmp, self.path)
+
+    async def get_asset_info(self, symbol):
+        info = await self.inner.get_asset_info(symbol)
+        if info is not None:
+            self.data["assets"][symbol.upper()] = {key: value for key, value in info.items() if key != "ticker"}
+            self._save()
+        return info
+
+    async def get_quotes(self, symbols):
+        quotes = await self.inner.get_quotes(symbols)
+        if quotes:
+            self.data["quotes"].update(quotes)
+            self._save()
+        return quotes
+
+    async def get_history_range(self, symbol, start, end):
+        rows = await self.inner.get_history_range(symbol, start, end)
+        if rows:
+            recorded = {row["date"]: row for row in self.data["history"].get(symbol.upper(), [])}
+            recorded.update({row["date"].isoformat(): {**row, "date": row["date"].isoformat()} for row in rows})
+            self.data["history"][symbol.upper()] = [recorded[day] for day in sorted(recorded)]
+            self._save()
+        return rows
+
+def create_provider() -> MarketDataProvider:
+    """Provider selected by MARKET_DATA_PROVIDER"""
+    kind = settings.MARKET_DATA_PROVIDER
+    if kind == "fixture":
+        return FixtureProvider(path=settings.MARKET_DATA_FIXTURE_PATH)
+    if kind == "replay":
+        return ReplayProvider(
+            path=settings.MARKET_DATA_FIXTURE_PATH,
+            latency_ms=settings.MARKET_DATA_REPLAY_LATENCY_MS,
+            jitter_ms=settings.MARKET_DATA_REPLAY_JITTER_MS,
+            error_rate=settings.MARKET_DATA_REPLAY_ERROR_RATE,
+            seed=settings.MARKET_DATA_REPLAY_SEED
+        )
+    if kind != "yahoo":
+        raise ValueError(f"Unknown MARKET_DATA_PROVIDER: {kind}")
+    if settings.MARKET_DATA_RECORDING_PATH:
+        return RecordingProvider(YahooProvider(), settings.MARKET_DATA_RECORDING_PATH)
+    return YahooProvider()
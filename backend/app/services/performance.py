@@ -0,0 +1,293 @@
+"""
+Vectorized portfolio performance engine.
+
+Everything is computed over dense (client x business day) matrices built from
+allocation lots and sales, movement cash flows and a (business day x asset) price matrix:
+
+- market value of positions and cash balance per day
+- time-weighted return (TWR), chained from daily flow-adjusted returns
+- money-weighted return (MWR), the IRR of the flows solved by vectorized Newton
+- drawdowns of the TWR wealth index (not distorted by deposits/withdrawals)
+
+Cash is the running sum of movements minus the cost of lots bought plus sale
+proceeds; a sale enters as a lot of negative quantity and cost. When a client
+buys more than they deposited, the shortfall is treated as an implicit deposit
+on the day of the purchase, so unfunded portfolios still get meaningful returns.
+"""
+from datetime import date
+from typing import NamedTuple, Optional, Dict, Any, List, Union
+import numpy as np
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from sqlalchemy.future import select
+from app.core.db_helpers import DBHelper
+from app.models.allocation import Allocation
+from app.models.movement import Movement, MovementType
+from app.models.sale import Sale
+from app.services.price_history import price_history
+
+# Lotes processados por bloco ao montar a matriz de valor de mercado (limita memória a ~bloco x dias)
+LOT_CHUNK_SIZE = 2048
+
+class Lots(NamedTuple):
+    """Allocation lots and sales (negative quantity) as parallel arrays (indices into the client/asset/calendar axes)"""
+    client_idx: np.ndarray
+    asset_idx: np.ndarray
+    date_idx: np.ndarray
+    quantity: np.ndarray
+    cost: np.ndarray
+
+class Flows(NamedTuple):
+    """External cash flows (deposits positive, withdrawals negative)"""
+    client_idx: np.ndarray
+    date_idx: np.ndarray
+    amount: np.ndarray
+
+class PerformanceResult(NamedTuple):
+    market_value: np.ndarray   # (clients, days)
+    cash: np.ndarray           # (clients, days)
+    value: np.ndarray          # (clients, days) market value + cash
+    net_flows: np.ndarray      # (clients, days) external flows incl. implicit funding
+    daily_returns: np.ndarray  # (clients, days) flow-adjusted, 0 on day 0
+    drawdown: np.ndarray       # (clients, days) of the TWR wealth index
+    twr: np.ndarray            # (clients,)
+    twr_annualized: np.ndarray # (clients,)
+    mwr: np.ndarray            # (clients,) period IRR
+    mwr_annualized: np.ndarray # (clients,)
+    max_drawdown: np.ndarray   # (clients,)
+
+def day_index(calendar: np.ndarray, days) -> np.ndarray:
+    """
+    Calendar position of each date; non-trading days map to the next business day,
+    dates before the calendar to day 0 and dates after it to the last day
+    """
+    positions = np.searchsorted(calendar, np.asarray(days, dtype="datetime64[D]"), side="left")
+    return np.minimum(positions, max(len(calendar) - 1, 0)).astype(np.int64)
+
+def daily_matrix(client_idx: np.ndarray, date_idx: np.ndarray, amount: np.ndarray,
+                 n_clients: int, n_days: int) -> np.ndarray:
+    """Scatter-add amounts into a (clients, days) matrix"""
+    flat = np.bincount(client_idx * n_days + date_idx, weights=amount, minlength=n_clients * n_days)
+    return flat.reshape(n_clients, n_days)
+
+def market_values(lots: Lots, prices: np.ndarray, n_clients: int,
+                  chunk_size: int = LOT_CHUNK_SIZE) -> np.ndarray:
+    """Market value per (client, day) = sum of quantity x price for lots held on that day"""
+    n_days = prices.shape[0]
+    values = np.zeros((n_clients, n_days))
+    if len(lots.quantity) == 0:
+        return values
+
+    order = np.argsort(lots.client_idx, kind="stable")
+    clients = lots.client_idx[order]
+    assets = lots.asset_idx[order]
+    days = lots.date_idx[order]
+    quantity = lots.quantity[order]
+    day_axis = np.arange(n_days)
+
+    for start in range(0, len(order), chunk_size):
+        stop = start + chunk_size
+        held = day_axis[None, :] >= days[start:stop, None]
+        lot_values = np.where(held, quantity[start:stop, None] * prices[:, assets[start:stop]].T, 0.0)
+
+        # Lotes já estão ordenados por cliente: soma por segmentos contíguos
+        chunk_clients = clients[start:stop]
+        boundaries = np.flatnonzero(np.r_[True, chunk_clients[1:] != chunk_clients[:-1]])
+        values[chunk_clients[boundaries]] += np.add.reduceat(lot_values, boundaries, axis=0)
+    return values
+
+def chain_returns(value: np.ndarray, flows: np.ndarray) -> np.ndarray:
+    """Daily returns with end-of-day flows: r_t = (V_t - F_t) / V_(t-1) - 1"""
+    returns = np.zeros_like(value)
+    previous = value[:, :-1]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        step = (value[:, 1:] - flows[:, 1:]) / previous - 1.0
+    returns[:, 1:] = np.where(previous > 0, step, 0.0)
+    return returns
+
+def money_weighted_return(cash_flows: np.ndarray, period_fraction: np.ndarray,
+                          max_iter: int = 100, tol: float = 1e-10) -> np.ndarray:
+    """
+    Period IRR per row of `cash_flows` (investor perspective: contributions negative,
+    terminal value positive), solved with Newton's method for all rows at once.
+    `period_fraction` is the time of each column as a fraction of the whole period.
+    """
+    rate = np.zeros(cash_flows.shape[0])
+    active = np.any(cash_flows != 0, axis=1)
+
+    for _ in range(max_iter):
+        if not active.any():
+            break
+        rows = np.flatnonzero(active)
+        growth = np.log1p(rate[rows])[:, None]
+        discount = np.exp(-period_fraction[None, :] * growth)
+        npv = np.sum(cash_flows[rows] * discount, axis=1)
+        slope = -np.sum(cash_flows[rows] * period_fraction[None, :] * discount, axis=1) / (1.0 + rate[rows])
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            step = np.where(slope != 0, npv / slope, 0.0)
+        step = np.nan_to_num(step)
+        rate[rows] = np.clip(rate[rows] - step, -0.9999, 1e6)
+        active[rows] = np.abs(step) > tol
+    return rate
+
+def annualize(period_return: np.ndarray, years: float) -> np.ndarray:
+    """Annualize period returns; periods shorter than a year are reported as-is"""
+    if years < 1.0:
+        return np.array(period_return, dtype=np.float64)
+    return np.power(1.0 + period_return, 1.0 / years) - 1.0
+
+def compute_performance(calendar: np.ndarray, prices: np.ndarray, lots: Lots, flows: Flows,
+                        n_clients: int) -> PerformanceResult:
+    """Run the full performance pipeline for every client over the calendar"""
+    n_days = len(calendar)
+    market_value = market_values(lots, prices, n_clients)
+
+    movements = daily_matrix(flows.client_idx, flows.date_idx, flows.amount, n_clients, n_days)
+    purchases = daily_matrix(lots.client_idx, lots.date_idx, lots.cost, n_clients, n_days)
+    cash_raw = np.cumsum(movements - purchases, axis=1)
+    implicit_funding = np.maximum.accumulate(np.maximum(-cash_raw, 0.0), axis=1)
+    cash = cash_raw + implicit_funding
+    net_flows = movements + np.diff(implicit_funding, axis=1, prepend=0.0)
+    value = market_value + cash
+
+    daily_returns = chain_returns(value, net_flows)
+    wealth = np.cumprod(1.0 + daily_returns, axis=1)
+    drawdown = wealth / np.maximum.accumulate(wealth, axis=1) - 1.0
+    twr = wealth[:, -1] - 1.0 if n_days else np.zeros(n_clients)
+
+    # Fluxos do ponto de vista do investidor: valor inicial e aportes negativos, valor final positivo
+    investor_flows = -net_flows.copy()
+    if n_days:
+        investor_flows[:, 0] = -value[:, 0]
+        investor_flows[:, -1] += value[:, -1]
+    elapsed = (calendar - calendar[0]).astype(np.float64) if n_days else np.zeros(0)
+    horizon = elapsed[-1] if n_days else 0.0
+    mwr = money_weighted_return(investor_flows, elapsed / horizon if horizon else elapsed)
+
+    return PerformanceResult(
+        market_value=market_value,
+        cash=cash,
+        value=value,
+        net_flows=net_flows,
+        daily_returns=daily_returns,
+        drawdown=drawdown,
+        twr=twr,
+        twr_annualized=annualize(twr, horizon / 365.0),
+        mwr=mwr,
+        mwr_annualized=annualize(mwr, horizon / 365.0),
+        max_drawdown=drawdown.min(axis=1) if n_days else np.zeros(n_clients)
+    )
+
+class PerformanceService:
+    async def load_client_inputs(
+        self,
+        db: Union[AsyncSession, Session],
+        client_ids: List[int],
+        start: date,
+        end: date
+    ):
+        """Load lots, sales, flows and the price matrix for a set of clients with four set-based queries"""
+        client_of = {client_id: idx for idx, client_id in enumerate(client_ids)}
+
+        buys = (await DBHelper.execute_query(
+            db,
+            select(Allocation.client_id, Allocation.asset_id, Allocation.quantity,
+                   Allocation.buy_price.label("price"), Allocation.buy_date.label("date"))
+            .where(Allocation.client_id.in_(client_ids), Allocation.buy_date <= end)
+        )).all()
+        sells = (await DBHelper.execute_query(
+            db,
+            select(Sale.client_id, Sale.asset_id, Sale.quantity,
+                   Sale.sell_price.label("price"), Sale.sell_date.label("date"))
+            .where(Sale.client_id.in_(client_ids), Sale.sell_date <= end)
+        )).all()
+
+        flows_result = await DBHelper.execute_query(
+            db,
+            select(Movement.client_id, Movement.type, Movement.amount, Movement.date)
+            .where(Movement.client_id.in_(client_ids), Movement.date <= end)
+        )
+        flow_rows = flows_result.all()
+
+        lot_rows = buys + sells
+        asset_ids = sorted({row.asset_id for row in lot_rows})
+        asset_of = {asset_id: idx for idx, asset_id in enumerate(asset_ids)}
+        calendar, prices = await price_history.load_price_matrix(db, asset_ids, start, end)
+
+        # Vendas entram como lotes negativos: reduzem a posição e o custo negativo devolve o caixa
+        sign = np.array([1.0] * len(buys) + [-1.0] * len(sells))
+        quantity = np.array([float(row.quantity) for row in lot_rows]) * sign
+        price = np.array([float(row.price) for row in lot_rows])
+        lot_assets = np.array([asset_of[row.asset_id] for row in lot_rows], dtype=np.int64)
+
+        # Sem cotação armazenada (o ativo todo ou os dias antes do primeiro fechamento),
+        # a posição é avaliada pelo custo médio das compras, nunca por um preço posterior
+        missing = np.flatnonzero(np.isnan(prices).any(axis=0)) if prices.size else np.arange(len(asset_ids))
+        for col in missing:
+            held = (lot_assets == col) & (sign > 0)
+            total = quantity[held].sum()
+            # Sem quantidade investida a média ponderada não existe: a posição vale zero
+            cost = (price[held] * quantity[held]).sum() / total if total > 0 else 0.0
+            prices[:, col] = np.where(np.isnan(prices[:, col]), cost, prices[:, col])
+
+        # Eventos anteriores à janela entram no primeiro dia (compõem o valor inicial)
+        lots = Lots(
+            client_idx=np.array([client_of[row.client_id] for row in lot_rows], dtype=np.int64),
+            asset_idx=lot_assets,
+            date_idx=day_index(calendar, [row.date for row in lot_rows]),
+            quantity=quantity,
+            cost=quantity * price
+        )
+        flow_sign = {MovementType.deposit: 1.0, MovementType.withdrawal: -1.0}
+        flows = Flows(
+            client_idx=np.array([client_of[row.client_id] for row in flow_rows], dtype=np.int64),
+            date_idx=day_index(calendar, [row.date for row in flow_rows]),
+            amount=np.array([flow_sign[row.type] * float(row.amount) for row in flow_rows])
+        )
+        return calendar, prices, lots, flows
+
+    async def client_performance(
+        self,
+        db: Union[AsyncSession, Session],
+        client_id: int,
+        start: Optional[date] = None,
+        end: Optional[date] = None
+    ) -> Dict[str, Any]:
+        end = end or date.today()
+        start = start or date(end.year, 1, 1)
+
+        calendar, prices, lots, flows = await self.load_client_inputs(db, [client_id], start, end)
+        if len(calendar) == 0:
+            raise ValueError("Empty date range")
+
+        result = compute_performance(calendar, prices, lots, flows, n_clients=1)
+        return {
+            "client_id": client_id,
+            "start": calendar[0].item(),
+            "end": calendar[-1].item(),
+            "start_value": float(result.value[0, 0]),
+            "end_value": float(result.value[0, -1]),
+            "net_flows": float(result.net_flows[0, 1:].sum()),
+            "twr": float(result.twr[0]),
+            "twr_annualized": float(result.twr_annualized[0]),
+            "mwr": float(result.mwr[0]),
+            "mwr_annualized": float(result.mwr_annualized[0]),
+            "max_drawdown": float(result.max_drawdown[0]),
+            "series": [
+                {
+                    "date": day,
+                    "market_value": float(mv),
+                    "cash": float(cash),
+                    "value": float(value),
+                    "net_flow": float(flow),
+                    "drawdown": float(dd)
+                }
+                for day, mv, cash, value, flow, dd in zip(
+                    calendar.tolist(), result.market_value[0], result.cash[0],
+                    result.value[0], result.net_flows[0], result.drawdown[0]
+                )
+            ]
+        }
+
+performance_service = PerformanceService()
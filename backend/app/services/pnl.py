@@ -0,0 +1,241 @@
+"""
+Lot matching engine for realized and unrealized P&L.
+
+Buys are allocation lots and sells are rows of `sales`. Both are read as one
+stream ordered by (client, asset, date), buys before sells on the same day, so
+each position is settled in a single pass and only the position being read is
+held in memory:
+
+- fifo: each sale consumes the oldest open lots first (a queue of open lots)
+- average: each sale removes quantity at the position's average cost
+  (preço médio, as required for Brazilian income tax); the state is just
+  quantity and total cost
+
+Unrealized P&L values the open quantity at the last stored close.
+
+Valuations that only need what is still held (reports, summaries, rebalancing,
+risk) read open_lots(): since sales always consume the oldest lots first, what
+remains of a position is its newest (bought - sold) units, which one window
+function over the lots gives without replaying the sales.
+"""
+from collections import deque
+from datetime import date
+from typing import Optional, Dict, Any, AsyncIterator, Iterable, Tuple, Union
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from sqlalchemy.future import select
+from sqlalchemy import literal, union_all, func, case, and_
+from app.core.db_helpers import DBHelper
+from app.models.allocation import Allocation
+from app.models.sale import Sale
+from app.services.price_history import price_history
+
+METHODS = ("fifo", "average")
+
+# Resíduos de ponto flutuante abaixo disso zeram a posição
+EPSILON = 1e-9
+
+class PositionLedger:
+    """Matching state of a single (client, asset) position"""
+    __slots__ = ("method", "lots", "quantity", "cost", "realized", "proceeds", "sold", "unmatched")
+
+    def __init__(self, method: str = "fifo"):
+        if method not in METHODS:
+            raise ValueError(f"Unknown method: {method}")
+        self.method = method
+        # [quantidade, custo unitário] dos lotes abertos, só no FIFO
+        self.lots = deque()
+        self.quantity = 0.0
+        self.cost = 0.0
+        self.realized = 0.0
+        self.proceeds = 0.0
+        self.sold = 0.0
+        self.unmatched = 0.0
+
+    def buy(self, quantity: float, price: float):
+        self.quantity += quantity
+        self.cost += quantity * price
+        if self.method == "fifo":
+            self.lots.append([quantity, price])
+
+    def sell(self, quantity: float, price: float) -> float:
+        """Match a sale against the open quantity; returns the realized P&L of the sale"""
+        matched = min(quantity, self.quantity)
+        # Venda acima da posição (ex.: lote de compra removido depois) não é casada
+        self.unmatched += quantity - matched
+
+        if self.method == "average":
+            cost_out = self.cost * matched / self.quantity if self.quantity > EPSILON else 0.0
+        else:
+            cost_out = 0.0
+            remaining = matched
+            while remaining > EPSILON and self.lots:
+                lot = self.lots[0]
+                taken = min(remaining, lot[0])
+                cost_out += taken * lot[1]
+                lot[0] -= taken
+                remaining -= taken
+                if lot[0] <= EPSILON:
+                    self.lots.popleft()
+
+        self.quantity -= matched
+        self.cost -= cost_out
+        if self.quantity <= EPSILON:
+            self.quantity, self.cost = 0.0, 0.0
+            self.lots.clear()
+
+        realized = matched * price - cost_out
+        self.realized += realized
+        self.proceeds += matched * price
+        self.sold += matched
+        return realized
+
+    def result(self, market_price: Optional[float] = None) -> Dict[str, Any]:
+        market_value = self.quantity * market_price if market_price is not None else None
+        return {
+            "method": self.method,
+            "quantity": self.quantity,
+            "cost_basis": self.cost,
+            "average_cost": self.cost / self.quantity if self.quantity > EPSILON else 0.0,
+            "sold_quantity": self.sold,
+            "proceeds": self.proceeds,
+            "realized_pnl": self.realized,
+            "market_price": market_price,
+            "market_value": market_value,
+            "unrealized_pnl": market_value - self.cost if market_value is not None else None,
+            "unmatched_quantity": self.unmatched,
+        }
+
+class PnLService:
+    @staticmethod
+    def _transactions(client_id: Optional[int] = None, asset_id: Optional[int] = None,
+                      until: Optional[date] = None):
+        """Buys and sells as one query ordered by (client, asset, date, buys first, id)"""
+        buys = select(
+            Allocation.client_id, Allocation.asset_id, Allocation.buy_date.label("date"),
+            literal(0).label("side"), Allocation.id.label("id"),
+            Allocation.quantity.label("quantity"), Allocation.buy_price.label("price")
+        )
+        sells = select(
+            Sale.client_id, Sale.asset_id, Sale.sell_date.label("date"),
+            literal(1).label("side"), Sale.id.label("id"),
+            Sale.quantity.label("quantity"), Sale.sell_price.label("price")
+        )
+        if client_id is not None:
+            buys = buys.where(Allocation.client_id == client_id)
+            sells = sells.where(Sale.client_id == client_id)
+        if asset_id is not None:
+            buys = buys.where(Allocation.asset_id == asset_id)
+            sells = sells.where(Sale.asset_id == asset_id)
+        if until is not None:
+            buys = buys.where(Allocation.buy_date <= until)
+            sells = sells.where(Sale.sell_date <= until)
+        transactions = union_all(buys, sells).subquery()
+        return select(transactions).order_by(
+            transactions.c.client_id, transactions.c.asset_id, transactions.c.date,
+            transactions.c.side, transactions.c.id
+        )
+
+    @staticmethod
+    def open_lots(client_ids: Optional[Iterable[int]] = None):
+        """
+        Allocation lots with the quantity still open after every sale (FIFO), as a subquery
+        with id, client_id, asset_id, buy_date, buy_price and quantity. Fully sold lots are left out.
+        """
+        position = (Allocation.client_id, Allocation.asset_id)
+        lots = select(
+            Allocation.id, Allocation.client_id, Allocation.asset_id, Allocation.buy_date, Allocation.buy_price,
+            Allocation.quantity.label("bought"),
+            func.sum(Allocation.quantity).over(partition_by=position).label("position_bought"),
+            # Quantidade deste lote e de todos os mais novos da mesma posição
+            func.sum(Allocation.quantity).over(
+                partition_by=position, order_by=(Allocation.buy_date.desc(), Allocation.id.desc())
+            ).label("newest_through")
+        )
+        sold = select(Sale.client_id, Sale.asset_id, func.sum(Sale.quantity).label("sold")).group_by(Sale.client_id, Sale.asset_id)
+        if client_ids is not None:
+            client_ids = list(client_ids)
+            lots = lots.where(Allocation.client_id.in_(client_ids))
+            sold = sold.where(Sale.client_id.in_(client_ids))
+        lots, sold = lots.subquery(), sold.subquery()
+
+        # Parte da posição aberta que cabe neste lote depois dos lotes mais novos
+        left = (lots.c.position_bought - func.coalesce(sold.c.sold, 0)) - (lots.c.newest_through - lots.c.bought)
+        return (
+            select(
+                lots.c.id, lots.c.client_id, lots.c.asset_id, lots.c.buy_date, lots.c.buy_price,
+                case((left >= lots.c.bought, lots.c.bought), else_=left).label("quantity")
+            )
+            .select_from(lots)
+            .outerjoin(sold, and_(sold.c.client_id == lots.c.client_id, sold.c.asset_id == lots.c.asset_id))
+            .where(left > EPSILON)
+            .subquery("open_lots")
+        )
+
+    async def iter_positions(
+        self,
+        db: Union[AsyncSession, Session],
+        method: str = "fifo",
+        client_id: Optional[int] = None,
+        batch_size: int = 1000
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Settle every position in one streaming pass, yielding one result per (client, asset)"""
+        if method not in METHODS:
+            raise ValueError(f"Unknown method: {method}")
+        # Um preço por ativo (não por posição): memória proporcional ao número de ativos
+        prices = await price_history.latest_prices(db)
+
+        def settled(key: Tuple[int, int], ledger: PositionLedger) -> Dict[str, Any]:
+            last = prices.get(key[1])
+            return {"client_id": key[0], "asset_id": key[1], **ledger.result(last[1] if last else None)}
+
+        key, ledger = None, None
+        async for row in DBHelper.stream(db, self._transactions(client_id), batch_size):
+            row_key = (row.client_id, row.asset_id)
+            if row_key != key:
+                if ledger is not None:
+                    yield settled(key, ledger)
+                key, ledger = row_key, PositionLedger(method)
+            if row.side == 0:
+                ledger.buy(float(row.quantity), float(row.price))
+            else:
+                ledger.sell(float(row.quantity), float(row.price))
+        if ledger is not None:
+            yield settled(key, ledger)
+
+    async def client_pnl(self, db: Union[AsyncSession, Session], client_id: int, method: str = "fifo") -> Dict[str, Any]:
+        positions = [position async for position in self.iter_positions(db, method, client_id)]
+        return {
+            "client_id": client_id,
+            "method": method,
+            "realized_pnl": sum(position["realized_pnl"] for position in positions),
+            "unrealized_pnl": sum(position["unrealized_pnl"] or 0.0 for position in positions),
+            "positions": positions,
+        }
+
+    async def shortfall(self, db: Union[AsyncSession, Session], client_id: int, asset_id: int,
+                        since: Optional[date] = None) -> Optional[Tuple[date, float]]:
+        """
+        Replay the position day by day (buys first on each day) and return the first date, on
+        or after `since`, on which the quantity sold so far exceeds the quantity bought, with
+        the quantity missing. None when the position never goes short.
+        """
+        running = 0.0
+        async for row in DBHelper.stream(db, self._transactions(client_id, asset_id)):
+            running += float(row.quantity) if row.side == 0 else -float(row.quantity)
+            if running < -EPSILON and (since is None or row.date >= since):
+                return row.date, -running
+        return None
+
+    async def ensure_covered(self, db: Union[AsyncSession, Session], positions: Iterable[Tuple[int, int]],
+                             since: Optional[date] = None):
+        """Raise ValueError if any (client_id, asset_id) position goes short on or after `since`"""
+        for client_id, asset_id in sorted(set(positions)):
+            short = await self.shortfall(db, client_id, asset_id, since=since)
+            if short is not None:
+                raise ValueError(
+                    f"Insufficient position in asset {asset_id} on {short[0].isoformat()}: "
+                    f"sales exceed purchases by {short[1]:g}"
+                )
+
+pnl_service = PnLService()
@@ -0,0 +1,302 @@
+"""
+Portfolio value over time.
+
+The daily series of a client is the row sum of a cumulative (business day x
+asset) position matrix times the price matrix: lot buys and sales are
+scattered as quantity deltas on their day and accumulated down the columns.
+
+Series are cached per client together with the window they cover. Writes only
+mark a client dirty from the date they affect (a lot's buy date, a sale date,
+the first day of new prices); the next read keeps the cached head and
+recomputes the tail from that date, starting from the positions held the day
+before, which one GROUP BY per table provides. Client-level marks (writes) and
+asset-level marks (price ingestion) go through the shared cache backend as
+well, so a write handled by one worker, or by an ingestion job in another
+process, reaches the series cached by the others.
+"""
+import time
+from datetime import date, timedelta
+from typing import Optional, Dict, Any, List, Iterable, Tuple, Union
+import numpy as np
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from sqlalchemy.future import select
+from sqlalchemy import func
+from app.core.config import settings
+from app.core.cache import TTLCache
+from app.core.cache_backend import shared_backend
+from app.core.db_helpers import DBHelper
+from app.models.allocation import Allocation
+from app.models.sale import Sale
+from app.services.performance import day_index
+from app.services.price_history import price_history
+
+GRANULARITIES = ("daily", "weekly", "monthly")
+DIRTY_NAMESPACE = "portfolio_history_dirty"
+ASSET_DIRTY_NAMESPACE = "portfolio_history_asset_dirty"
+
+def period_ends(calendar: np.ndarray, granularity: str) -> np.ndarray:
+    """Index of the last business day of each day/week (Mon-Sun)/month in the calendar"""
+    if granularity == "daily" or not len(calendar):
+        return np.arange(len(calendar))
+    if granularity == "weekly":
+        # 1970-01-01 foi quinta-feira: +3 alinha as semanas na segunda
+        keys = (calendar.astype(np.int64) + 3) // 7
+    else:
+        keys = calendar.astype("datetime64[M]").astype(np.int64)
+    return np.flatnonzero(np.r_[keys[1:] != keys[:-1], True])
+
+def position_values(calendar: np.ndarray, prices: np.ndarray, opening: np.ndarray,
+                    asset_idx: np.ndarray, date_idx: np.ndarray, quantity: np.ndarray) -> np.ndarray:
+    """
+    Market value per day: (opening positions + cumulative quantity deltas) x prices,
+    summed over assets
+    """
+    deltas = np.zeros(prices.shape)
+    np.add.at(deltas, (date_idx, asset_idx), quantity)
+    positions = opening[None, :] + np.cumsum(deltas, axis=0)
+    return np.einsum("ij,ij->i", positions, prices)
+
+class PortfolioHistoryService:
+    def __init__(self):
+        # client_id -> série diária em cache (ver _store)
+        self._cache = TTLCache(
+            maxsize=settings.HISTORY_CACHE_SIZE,
+            ttl=settings.HISTORY_CACHE_TTL,
+            name="portfolio_history"
+        )
+        self._backend = shared_backend()
+        self._stats = {"hits": 0, "full_computes": 0, "tail_computes": 0, "invalidations": 0}
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self._stats, "cached_clients": len(self._cache)}
+
+    def clear_cache(self):
+        self._cache.clear()
+
+    def _mark_dirty(self, entry: Dict[str, Any], from_date: date):
+        if entry["dirty_from"] is None or from_date < entry["dirty_from"]:
+            entry["dirty_from"] = from_date
+
+    async def invalidate(self, client_id: int, from_date: date):
+        """Series of the client changed from `from_date` on (lot or sale written)"""
+        self._stats["invalidations"] += 1
+        entry = self._cache.get(client_id)
+        if entry is not None:
+            self._mark_dirty(entry, from_date)
+        if self._backend is not None:
+            # A marca guarda a menor data ainda não aplicada por todos os workers
+            mark = await self._backend.get(DIRTY_NAMESPACE, client_id)
+            if mark is not None and mark[1] < from_date:
+                from_date = mark[1]
+            await self._backend.set(DIRTY_NAMESPACE, client_id, (time.time(), from_date), settings.HISTORY_CACHE_TTL)
+
+    async def invalidate_assets(self, asset_ids: Iterable[int], from_date: date):
+        """New prices from `from_date` on for these assets: mark every cached series holding them"""
+        asset_ids = set(asset_ids)
+        for client_id in self._cache.keys():
+            entry = self._cache.get(client_id)
+            if entry is not None and asset_ids & entry["asset_ids"]:
+                self._mark_dirty(entry, from_date)
+        if self._backend is not None and asset_ids:
+            # Marca por ativo, lida pelos outros workers (e vinda de jobs de ingestão em outro processo)
+            marks = await self._backend.get_many(ASSET_DIRTY_NAMESPACE, asset_ids)
+            now = time.time()
+            await self._backend.set_many(
+                ASSET_DIRTY_NAMESPACE,
+                {asset_id: (now, min(from_date, marks[asset_id][1]) if asset_id in marks else from_date)
+                 for asset_id in asset_ids},
+                settings.HISTORY_CACHE_TTL
+            )
+
+    async def _apply_shared_marks(self, client_id: int, entry: Dict[str, Any]):
+        if self._backend is None:
+            return
+        mark = await self._backend.get(DIRTY_NAMESPACE, client_id)
+        if mark is not None and mark[0] > entry["computed_at"]:
+            self._mark_dirty(entry, mark[1])
+        if entry["asset_ids"]:
+            marks = await self._backend.get_many(ASSET_DIRTY_NAMESPACE, entry["asset_ids"])
+            for marked_at, from_date in marks.values():
+                if marked_at > entry["computed_at"]:
+                    self._mark_dirty(entry, from_date)
+
+    async def _opening_positions(
+        self,
+        db: Union[AsyncSession, Session],
+        client_id: int,
+        before: date
+    ) -> Dict[int, float]:
+        """Quantity per asset held at the end of the day before `before`"""
+        bought = await DBHelper.execute_query(
+            db,
+            select(Allocation.asset_id, func.sum(Allocation.quantity))
+            .where(Allocation.client_id == client_id, Allocation.buy_date < before)
+            .group_by(Allocation.asset_id)
+        )
+        positions = {asset_id: float(quantity) for asset_id, quantity in bought.all()}
+        sold = await DBHelper.execute_query(
+            db,
+            select(Sale.asset_id, func.sum(Sale.quantity))
+            .where(Sale.client_id == client_id, Sale.sell_date < before)
+            .group_by(Sale.asset_id)
+        )
+        for asset_id, quantity in sold.all():
+            positions[asset_id] = positions.get(asset_id, 0.0) - float(quantity)
+        return positions
+
+    async def _average_costs(self, db: Union[AsyncSession, Session], client_id: int, asset_ids: List[int]) -> Dict[int, float]:
+        result = await DBHelper.execute_query(
+            db,
+            select(Allocation.asset_id, func.sum(Allocation.quantity * Allocation.buy_price) / func.sum(Allocation.quantity))
+            .where(Allocation.client_id == client_id, Allocation.asset_id.in_(asset_ids))
+            .group_by(Allocation.asset_id)
+        )
+        return {asset_id: float(cost) for asset_id, cost in result.all()}
+
+    async def _compute(
+        self,
+        db: Union[AsyncSession, Session],
+        client_id: int,
+        start: date,
+        end: date
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, set]:
+        """Daily (calendar, market value, net invested) for [start, end] and the assets involved"""
+        opening = await self._opening_positions(db, client_id, start)
+
+        lots_result = await DBHelper.execute_query(
+            db,
+            select(Allocation.asset_id, Allocation.buy_date, Allocation.quantity, Allocation.buy_price)
+            .where(Allocation.client_id == client_id, Allocation.buy_date >= start, Allocation.buy_date <= end)
+        )
+        lots = lots_result.all()
+        sales_result = await DBHelper.execute_query(
+            db,
+            select(Sale.asset_id, Sale.sell_date, Sale.quantity, Sale.sell_price)
+            .where(Sale.client_id == client_id, Sale.sell_date >= start, Sale.sell_date <= end)
+        )
+        sales = sales_result.all()
+
+        asset_ids = sorted(set(opening) | {row[0] for row in lots} | {row[0] for row in sales})
+        asset_of = {asset_id: idx for idx, asset_id in enumerate(asset_ids)}
+        calendar, prices = await price_history.load_price_matrix(db, asset_ids, start, end)
+        if not len(calendar):
+            return calendar, np.zeros(0), np.zeros(0), set(asset_ids)
+
+        # Compras positivas, vendas negativas; eventos em dias não úteis caem no próximo pregão
+        events = [(row[0], row[1], float(row[2]), float(row[2]) * float(row[3])) for row in lots]
+        events += [(row[0], row[1], -float(row[2]), -float(row[2]) * float(row[3])) for row in sales]
+        asset_idx = np.array([asset_of[event[0]] for event in events], dtype=np.int64)
+        date_idx = day_index(calendar, [event[1] for event in events])
+        quantity = np.array([event[2] for event in events])
+        amount = np.array([event[3] for event in events])
+
+        opening_quantity = np.array([opening.get(asset_id, 0.0) for asset_id in asset_ids])
+        # Sem cotação armazenada (o ativo todo ou os dias antes do primeiro fechamento),
+        # a posição é avaliada pelo custo médio das compras, nunca por um preço posterior
+        unpriced = np.flatnonzero(np.isnan(prices).any(axis=0)) if prices.size else np.arange(len(asset_ids))
+        if len(unpriced):
+            costs = await self._average_costs(db, client_id, [asset_ids[col] for col in unpriced])
+            for col in unpriced:
+                prices[:, col] = np.where(np.isnan(prices[:, col]), costs.get(asset_ids[col], 0.0), prices[:, col])
+
+        market_value = position_values(calendar, prices, opening_quantity, asset_idx, date_idx, quantity)
+        invested = np.cumsum(np.bincount(date_idx, weights=amount, minlength=len(calendar))) if len(events) else np.zeros(len(calendar))
+        return calendar, market_value, invested, set(asset_ids)
+
+    async def _net_invested_before(self, db: Union[AsyncSession, Session], client_id: int, before: date) -> float:
+        bought = await DBHelper.execute_query(
+            db,
+            select(func.sum(Allocation.quantity * Allocation.buy_price))
+            .where(Allocation.client_id == client_id, Allocation.buy_date < before)
+        )
+        sold = await DBHelper.execute_query(
+            db,
+            select(func.sum(Sale.quantity * Sale.sell_price))
+            .where(Sale.client_id == client_id, Sale.sell_date < before)
+        )
+        return float(bought.scalar() or 0) - float(sold.scalar() or 0)
+
+    async def _store(self, db, client_id: int, start: date, end: date) -> Dict[str, Any]:
+        # Marcas gravadas durante o cálculo são reaplicadas na próxima leitura
+        computed_at = time.time()
+        calendar, market_value, invested, asset_ids = await self._compute(db, client_id, start, end)
+        invested = invested + await self._net_invested_before(db, client_id, start)
+        entry = {
+            "start": start, "end": end, "calendar": calendar,
+            "market_value": market_value, "invested": invested, "asset_ids": asset_ids,
+            "dirty_from": None, "computed_at": computed_at,
+        }
+        self._cache.set(client_id, entry)
+        self._stats["full_computes"] += 1
+        return entry
+
+    async def _recompute_tail(self, db, client_id: int, entry: Dict[str, Any], tail_start: date, end: date) -> Dict[str, Any]:
+        computed_at = time.time()
+        calendar, market_value, invested, asset_ids = await self._compute(db, client_id, tail_start, end)
+        invested = invested + await self._net_invested_before(db, client_id, tail_start)
+
+        keep = entry["calendar"] < np.datetime64(tail_start, "D")
+        entry.update(
+            end=end,
+            calendar=np.concatenate([entry["calendar"][keep], calendar]),
+            market_value=np.concatenate([entry["market_value"][keep], market_value]),
+            invested=np.concatenate([entry["invested"][keep], invested]),
+            asset_ids=entry["asset_ids"] | asset_ids,
+            dirty_from=None,
+            computed_at=computed_at,
+        )
+        self._cache.set(client_id, entry)
+        self._stats["tail_computes"] += 1
+        return entry
+
+    async def client_history(
+        self,
+        db: Union[AsyncSession, Session],
+        client_id: int,
+        start: Optional[date] = None,
+        end: Optional[date] = None,
+        granularity: str = "daily"
+    ) -> Dict[str, Any]:
+        if granularity not in GRANULARITIES:
+            raise ValueError(f"Unknown granularity: {granularity}")
+        end = end or date.today()
+        start = start or end - timedelta(days=365)
+        if start > end:
+            raise ValueError("Start date must be before end date")
+
+        entry = self._cache.get(client_id)
+        if entry is None or start < entry["start"]:
+            entry = await self._store(db, client_id, start, max(end, entry["end"]) if entry else end)
+        else:
+            await self._apply_shared_marks(client_id, entry)
+            tail_start = entry["dirty_from"]
+            if end > entry["end"]:
+                extension = entry["end"] + timedelta(days=1)
+                tail_start = extension if tail_start is None else min(tail_start, extension)
+            if tail_start is None:
+                self._stats["hits"] += 1
+            elif tail_start <= entry["start"]:
+                entry = await self._store(db, client_id, entry["start"], max(end, entry["end"]))
+            else:
+                entry = await self._recompute_tail(db, client_id, entry, tail_start, max(end, entry["end"]))
+
+        calendar = entry["calendar"]
+        window = np.flatnonzero((calendar >= np.datetime64(start, "D")) & (calendar <= np.datetime64(end, "D")))
+        points = window[period_ends(calendar[window], granularity)]
+        return {
+            "client_id": client_id,
+            "start": start,
+            "end": end,
+            "granularity": granularity,
+            "points": [
+                {
+                    "date": calendar[i].item(),
+                    "market_value": float(entry["market_value"][i]),
+                    "invested": float(entry["invested"][i]),
+                }
+                for i in points
+            ]
+        }
+
+portfolio_history = PortfolioHistoryService()
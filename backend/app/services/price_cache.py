@@ -0,0 +1,191 @@
+"""
+Columnar on-disk cache of daily closes for the analytics price matrices.
+
+One .npy file per month holds a dense (business days x assets) float64 matrix;
+its first row carries the asset ids of the columns (sorted), so ids and prices
+are swapped together by a single atomic rename. Files are opened with
+np.load(mmap_mode="r"): every worker maps the same pages from the OS cache
+instead of holding its own copy, and only the requested columns are copied.
+
+A refresh compares a per-month fingerprint (rows, sum of closes, max id) taken
+from one GROUP BY over asset_prices with the manifest, and rebuilds only the
+months that changed. Writers pass the date range they wrote, so the GROUP BY
+and the comparison only cover the months in that range; without one (the
+ingestion CLI) the whole table is checked.
+"""
+import json
+import os
+from datetime import date, timedelta
+from typing import Optional, Dict, List, Union
+import numpy as np
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from sqlalchemy.future import select
+from sqlalchemy import func
+from app.core.config import settings
+from app.core.db_helpers import DBHelper
+from app.models.asset_price import AssetPrice
+
+MANIFEST = "manifest.json"
+
+def month_start(day: date) -> date:
+    return day.replace(day=1)
+
+def month_end(day: date) -> date:
+    return (day.replace(day=28) + timedelta(days=4)).replace(day=1) - timedelta(days=1)
+
+def month_calendar(month: date) -> np.ndarray:
+    days = np.arange(np.datetime64(month_start(month), "D"), np.datetime64(month_end(month), "D") + 1)
+    return days[np.is_busday(days)]
+
+class ColumnarPriceCache:
+    def __init__(self, directory: Optional[str] = None):
+        self.directory = settings.PRICE_CACHE_DIR if directory is None else directory
+        # mês -> ((inode, mtime), memmap) dos arquivos já abertos neste processo
+        self._maps = {}
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.directory)
+
+    def _path(self, month: date) -> str:
+        return os.path.join(self.directory, f"{month:%Y-%m}.npy")
+
+    def _read_manifest(self) -> Dict[str, list]:
+        try:
+            with open(os.path.join(self.directory, MANIFEST)) as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def _write_atomic(self, path: str, write):
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb" if path.endswith(".npy") else "w") as f:
+            write(f)
+        # Leitores com o arquivo antigo mapeado continuam vendo o inode anterior
+        os.replace(tmp, path)
+
+    async def fingerprints(
+        self,
+        db: Union[AsyncSession, Session],
+        start: Optional[date] = None,
+        end: Optional[date] = None
+    ) -> Dict[str, list]:
+        """Per-month (rows, sum of closes, max id) of asset_prices, for the months of [start, end] when given"""
+        query = select(AssetPrice.date, func.count(), func.sum(AssetPrice.close), func.max(AssetPrice.id))
+        if start is not None:
+            query = query.where(AssetPrice.date >= month_start(start))
+        if end is not None:
+            query = query.where(AssetPrice.date <= month_end(end))
+        result = await DBHelper.execute_query(db, query.group_by(AssetPrice.date))
+        months = {}
+        for day, rows, total, max_id in result.all():
+            entry = months.setdefault(f"{day:%Y-%m}", [0, 0.0, 0])
+            entry[0] += rows
+            entry[1] += float(total or 0)
+            entry[2] = max(entry[2], max_id)
+        return {month: [rows, round(total, 6), max_id] for month, (rows, total, max_id) in months.items()}
+
+    async def build_month(self, db: Union[AsyncSession, Session], month: date) -> np.ndarray:
+        """Dense matrix for one month; row 0 holds the asset ids"""
+        result = await DBHelper.execute_query(
+            db,
+            select(AssetPrice.asset_id, AssetPrice.date, AssetPrice.close)
+            .where(AssetPrice.date >= month_start(month), AssetPrice.date <= month_end(month))
+        )
+        rows = result.all()
+        calendar = month_calendar(month)
+        asset_ids = np.unique(np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows)))
+        matrix = np.full((len(calendar) + 1, len(asset_ids)), np.nan)
+        matrix[0] = asset_ids
+        if rows:
+            cols = np.searchsorted(asset_ids, [row[0] for row in rows])
+            days = np.array([row[1] for row in rows], dtype="datetime64[D]")
+            positions = np.minimum(np.searchsorted(calendar, days), len(calendar) - 1)
+            matrix[1 + positions, cols] = [float(row[2]) for row in rows]
+        return matrix
+
+    async def refresh(
+        self,
+        db: Union[AsyncSession, Session],
+        start: Optional[date] = None,
+        end: Optional[date] = None
+    ) -> List[str]:
+        """
+        Rebuild the months whose rows changed since the last refresh; returns them.
+        With start/end (the dates just written), only the months of that range are checked.
+        """
+        if not self.enabled:
+            return []
+        os.makedirs(self.directory, exist_ok=True)
+        manifest = self._read_manifest()
+        current = await self.fingerprints(db, start, end)
+
+        def in_range(month: str) -> bool:
+            return ((start is None or month >= f"{start:%Y-%m}")
+                    and (end is None or month <= f"{end:%Y-%m}"))
+
+        changed = sorted(month for month, fingerprint in current.items() if manifest.get(month) != fingerprint)
+        for month in changed:
+            matrix = await self.build_month(db, date.fromisoformat(f"{month}-01"))
+            self._write_atomic(self._path(date.fromisoformat(f"{month}-01")), lambda f: np.save(f, matrix))
+        # Meses fora do intervalo verificado ficam como estão no manifesto
+        removed = {month for month in manifest if in_range(month)} - set(current)
+        for month in removed:
+            try:
+                os.remove(self._path(date.fromisoformat(f"{month}-01")))
+            except FileNotFoundError:
+                pass
+
+        if changed or removed:
+            updated = {month: fingerprint for month, fingerprint in manifest.items() if month not in removed}
+            updated.update(current)
+            self._write_atomic(os.path.join(self.directory, MANIFEST), lambda f: json.dump(updated, f))
+        return changed
+
+    def open_month(self, month: date) -> Optional[np.ndarray]:
+        """Read-only memmap of a month's matrix, reopened when the file is replaced"""
+        path = self._path(month)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            self._maps.pop(month, None)
+            return None
+        version = (stat.st_ino, stat.st_mtime_ns)
+        cached = self._maps.get(month)
+        if cached is None or cached[0] != version:
+            cached = (version, np.load(path, mmap_mode="r"))
+            self._maps[month] = cached
+        return cached[1]
+
+    def fill(self, matrix: np.ndarray, calendar: np.ndarray, asset_ids: List[int]) -> np.ndarray:
+        """
+        Copy cached closes for asset_ids into matrix (calendar x asset_ids) in place.
+        Returns a boolean mask of the calendar days covered by cached months.
+        """
+        covered = np.zeros(len(calendar), dtype=bool)
+        if not self.enabled or not len(calendar) or not asset_ids:
+            return covered
+
+        wanted = np.asarray(asset_ids, dtype=np.int64)
+        month_keys = calendar.astype("datetime64[M]")
+        for month_key in np.unique(month_keys):
+            month = month_key.astype("datetime64[D]").item()
+            cached = self.open_month(month)
+            if cached is None:
+                continue
+            in_month = np.flatnonzero(month_keys == month_key)
+            covered[in_month] = True
+
+            cached_ids = np.asarray(cached[0], dtype=np.int64)
+            if not len(cached_ids):
+                continue
+            cols = np.searchsorted(cached_ids, wanted)
+            present = (cols < len(cached_ids)) & (cached_ids[np.minimum(cols, len(cached_ids) - 1)] == wanted)
+            if not present.any():
+                continue
+            rows = 1 + np.searchsorted(month_calendar(month), calendar[in_month])
+            matrix[np.ix_(in_month, np.flatnonzero(present))] = cached[np.ix_(rows, cols[present])]
+        return covered
+
+price_cache = ColumnarPriceCache()
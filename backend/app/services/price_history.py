@@ -0,0 +1,237 @@
+import asyncio
+import numpy as np
+from datetime import date, timedelta
+from typing import Optional, Dict, Any, List, Tuple, Union
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from sqlalchemy.future import select
+from sqlalchemy import func
+from app.core.config import settings
+from app.core.rate_limiter import RateLimitExceeded
+from app.core.db_helpers import DBHelper
+from app.models.asset import Asset
+from app.models.asset_price import AssetPrice, PRICE_SOURCE_HISTORY, PRICE_SOURCE_QUOTE
+from app.services.price_cache import price_cache
+from app.services.yahoo_finance import yahoo_finance
+
+PRICE_COLUMNS = ["open", "high", "low", "close", "adj_close", "volume"]
+
+# Dias corridos buscados antes do início da janela para preencher o primeiro pregão
+MATRIX_LOOKBACK_DAYS = 30
+
+def business_days(start: date, end: date) -> np.ndarray:
+    """Weekday calendar between start and end (inclusive) as datetime64[D]"""
+    days = np.arange(np.datetime64(start, "D"), np.datetime64(end, "D") + 1)
+    return days[np.is_busday(days)]
+
+def last_business_day(day: date) -> date:
+    """The day itself if it is a weekday, otherwise the previous Friday"""
+    return np.busday_offset(np.datetime64(day, "D"), 0, roll="backward").item()
+
+def forward_fill(matrix: np.ndarray) -> np.ndarray:
+    """Propagate the last valid value down each column (NaNs before the first value are kept)"""
+    rows = np.arange(matrix.shape[0])[:, None]
+    idx = np.where(np.isnan(matrix), 0, rows)
+    np.maximum.accumulate(idx, axis=0, out=idx)
+    return matrix[idx, np.arange(matrix.shape[1])]
+
+def missing_ranges(
+    stored_min: Optional[date],
+    stored_max: Optional[date],
+    start: date,
+    end: date
+) -> List[Tuple[date, date]]:
+    """Date ranges in [start, end] not covered by the stored [stored_min, stored_max] span"""
+    if start > end:
+        return []
+    if stored_min is None or stored_max is None:
+        return [(start, end)]
+
+    ranges = []
+    if start < stored_min:
+        ranges.append((start, min(end, stored_min - timedelta(days=1))))
+    if end > stored_max:
+        ranges.append((max(start, stored_max + timedelta(days=1)), end))
+    return ranges
+
+class PriceHistoryService:
+    """Local store of daily prices, filled in bulk from a market-data provider"""
+
+    def __init__(self, provider=None):
+        # O provider precisa expor `async get_history_range(symbol, start, end) -> List[dict]`
+        self.provider = provider or yahoo_finance
+
+    async def get_stored_spans(
+        self,
+        db: Union[AsyncSession, Session],
+        asset_ids: List[int]
+    ) -> Dict[int, Tuple[date, date]]:
+        """
+        First and last stored price date per asset, in a single GROUP BY query. Rows
+        written by the quote refresh (only the close) do not count as stored, so the
+        ingestion fetches their full OHLCV.
+        """
+        if not asset_ids:
+            return {}
+        result = await DBHelper.execute_query(
+            db,
+            select(AssetPrice.asset_id, func.min(AssetPrice.date), func.max(AssetPrice.date))
+            .where(AssetPrice.asset_id.in_(asset_ids), AssetPrice.source != PRICE_SOURCE_QUOTE)
+            .group_by(AssetPrice.asset_id)
+        )
+        return {row[0]: (row[1], row[2]) for row in result.all()}
+
+    async def ingest(
+        self,
+        db: Union[AsyncSession, Session],
+        assets: Optional[List[Asset]] = None,
+        start: Optional[date] = None,
+        end: Optional[date] = None,
+        provider=None
+    ) -> Dict[str, int]:
+        """
+        Fetch only the missing date ranges for each asset and upsert them in batches.
+        Returns the number of rows written per ticker.
+        """
+        provider = provider or self.provider
+        end = end or date.today()
+        start = start or end - timedelta(days=365 * settings.PRICE_HISTORY_YEARS)
+
+        if assets is None:
+            assets = await DBHelper.get_all(db, Asset)
+        if not assets:
+            return {}
+
+        spans = await self.get_stored_spans(db, [asset.id for asset in assets])
+        semaphore = asyncio.Semaphore(settings.PRICE_INGEST_CONCURRENCY)
+
+        async def fetch(asset: Asset) -> List[Dict[str, Any]]:
+            stored_min, stored_max = spans.get(asset.id, (None, None))
+            rows = []
+            for range_start, range_end in missing_ranges(stored_min, stored_max, start, end):
+                async with semaphore:
+                    try:
+                        rows.extend(await provider.get_history_range(asset.ticker, range_start, range_end))
+                    except RateLimitExceeded:
+                        # Sem vaga no limite de chamadas: o intervalo continua faltando e entra na próxima execução
+                        break
+            return rows
+
+        # Busca concorrente no provider; a escrita no banco é sequencial na mesma sessão
+        fetched = await asyncio.gather(*(fetch(asset) for asset in assets))
+        return await self._store(db, list(zip(assets, fetched)))
+
+    async def _store(
+        self,
+        db: Union[AsyncSession, Session],
+        fetched: List[Tuple[Asset, List[Dict[str, Any]]]]
+    ) -> Dict[str, int]:
+        """Upsert fetched rows per asset and refresh the derived caches if anything was written"""
+        written = {}
+        for asset, rows in fetched:
+            rows = [
+                {"asset_id": asset.id, "date": row["date"], **{col: row.get(col) for col in PRICE_COLUMNS},
+                 "source": PRICE_SOURCE_HISTORY}
+                for row in rows
+                if row.get("close") is not None
+            ]
+            written[asset.ticker] = await DBHelper.upsert(
+                db, AssetPrice, rows,
+                index_elements=["asset_id", "date"],
+                batch_size=settings.PRICE_INGEST_BATCH_SIZE
+            )
+            # Commit por ativo para que uma falha no meio preserve o que já foi gravado
+            await DBHelper.commit(db)
+        
+        if any(written.values()):
+            days = [row["date"] for _, rows in fetched for row in rows]
+            # Só os meses que receberam linhas são verificados e reconstruídos
+            await price_cache.refresh(db, min(days), max(days))
+            # Séries históricas em cache que contêm esses ativos mudam a partir do primeiro dia gravado
+            from app.services.portfolio_history import portfolio_history
+            await portfolio_history.invalidate_assets([asset.id for asset, rows in fetched if rows], min(days))
+        return written
+
+    async def get_history(
+        self,
+        db: Union[AsyncSession, Session],
+        asset_id: int,
+        start: Optional[date] = None,
+        end: Optional[date] = None
+    ) -> List[AssetPrice]:
+        """Stored daily prices for an asset, ordered by date"""
+        query = select(AssetPrice).where(AssetPrice.asset_id == asset_id)
+        if start:
+            query = query.where(AssetPrice.date >= start)
+        if end:
+            query = query.where(AssetPrice.date <= end)
+        result = await DBHelper.execute_query(db, query.order_by(AssetPrice.date))
+        return result.scalars().all()
+
+    async def latest_prices(
+        self,
+        db: Union[AsyncSession, Session],
+        asset_ids: Optional[List[int]] = None,
+        on: Optional[date] = None
+    ) -> Dict[int, Tuple[date, float]]:
+        """Most recent stored close per asset (date, close), on or before `on` when given"""
+        last_dates = select(AssetPrice.asset_id, func.max(AssetPrice.date).label("date")).group_by(AssetPrice.asset_id)
+        if asset_ids is not None:
+            last_dates = last_dates.where(AssetPrice.asset_id.in_(asset_ids))
+        if on is not None:
+            last_dates = last_dates.where(AssetPrice.date <= on)
+        last_dates = last_dates.subquery()
+
+        result = await DBHelper.execute_query(
+            db,
+            select(AssetPrice.asset_id, AssetPrice.date, AssetPrice.close)
+            .join(last_dates, (AssetPrice.asset_id == last_dates.c.asset_id) & (AssetPrice.date == last_dates.c.date))
+        )
+        return {row.asset_id: (row.date, float(row.close)) for row in result.all()}
+
+    async def load_price_matrix(
+        self,
+        db: Union[AsyncSession, Session],
+        asset_ids: List[int],
+        start: date,
+        end: date
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Dense (business day x asset) matrix of closing prices, forward-filled.
+        Months present in the columnar cache are read from it; only the
+        remaining days are queried. Days before an asset's first stored close stay
+        NaN (never filled with a later price), as do columns without any stored price.
+        """
+        lookback_start = start - timedelta(days=MATRIX_LOOKBACK_DAYS)
+        calendar = business_days(lookback_start, end)
+        matrix = np.full((len(calendar), len(asset_ids)), np.nan)
+
+        if asset_ids and len(calendar):
+            covered = price_cache.fill(matrix, calendar, asset_ids)
+            if not covered.all():
+                uncovered = calendar[~covered]
+                result = await DBHelper.execute_query(
+                    db,
+                    select(AssetPrice.asset_id, AssetPrice.date, AssetPrice.close)
+                    .where(
+                        AssetPrice.asset_id.in_(asset_ids),
+                        AssetPrice.date >= uncovered[0].item(),
+                        AssetPrice.date <= max(uncovered[-1].item(), end)
+                    )
+                )
+                rows = result.all()
+                if rows:
+                    column_of = {asset_id: col for col, asset_id in enumerate(asset_ids)}
+                    cols = np.fromiter((column_of[row[0]] for row in rows), dtype=np.int64, count=len(rows))
+                    days = np.array([row[1] for row in rows], dtype="datetime64[D]")
+                    closes = np.fromiter((float(row[2]) for row in rows), dtype=np.float64, count=len(rows))
+                    # Pregões em fim de semana (raros) caem no próximo dia útil do calendário
+                    positions = np.minimum(np.searchsorted(calendar, days), len(calendar) - 1)
+                    keep = ~covered[positions]
+                    matrix[positions[keep], cols[keep]] = closes[keep]
+            matrix = forward_fill(matrix)
+
+        in_window = calendar >= np.datetime64(start, "D")
+        return calendar[in_window], matrix[in_window]
+
+price_history = PriceHistoryService()
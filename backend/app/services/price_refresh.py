@@ -0,0 +1,196 @@
+"""
+Background refresh of current prices.
+
+A single asyncio task started in the application lifespan periodically fetches
+quotes for every asset referenced in allocations (in batches of QUOTE_BATCH_SIZE,
+with random jitter between cycles and batches) and writes them to the quote cache
+and to asset_prices, along with today's FX rate of every currency involved. Request handlers only read from those two places.
+
+The task starts in every worker, but only the leader (see app.core.leader) runs
+the cycles. Rows written here carry only the close and are marked with source
+"quote": the day stays missing for the history ingestion, which fills in the
+full OHLCV later.
+"""
+import asyncio
+import random
+import time
+from datetime import date
+from typing import Optional, Dict, Any, List, Union
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from sqlalchemy.future import select
+from app.core.config import settings
+from app.core.db_helpers import DBHelper
+from app.core.leader import LeaderLock
+from app.models.allocation import Allocation
+from app.models.asset import Asset
+from app.models.asset_price import AssetPrice, PRICE_SOURCE_QUOTE
+from app.services.yahoo_finance import yahoo_finance
+from app.services.price_history import price_history
+from app.services.price_cache import price_cache
+from app.services.risk import risk_service
+from app.services.fx import fx_service
+from app.services.reports import report_service
+from app.services.portfolio_history import portfolio_history
+
+class PriceRefreshScheduler:
+    def __init__(self, session_factory=None, provider=None):
+        self.session_factory = session_factory
+        self.provider = provider or yahoo_finance
+        self._task: Optional[asyncio.Task] = None
+        # Ativos sem alocação pedidos por alguma requisição, incluídos no próximo ciclo
+        self._requested = set()
+        self._leader = LeaderLock("price_refresh")
+        self.leader = False
+        self._stats = {"runs": 0, "skipped": 0, "errors": 0, "assets": 0, "quotes": 0, "fx_rates": 0,
+                       "last_run": None, "last_duration": None, "last_error": None}
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def stats(self) -> Dict[str, Any]:
+        return {"running": self.running, "leader": self.leader, "requested": len(self._requested), **self._stats}
+
+    def request(self, asset_id: int):
+        self._requested.add(asset_id)
+
+    async def tracked_assets(self, db: Union[AsyncSession, Session]) -> List[Asset]:
+        """Assets held in any allocation, plus the ones requested since the last cycle"""
+        held = select(Allocation.asset_id).distinct()
+        condition = Asset.id.in_(held)
+        if self._requested:
+            condition = condition | Asset.id.in_(list(self._requested))
+        result = await DBHelper.execute_query(db, select(Asset).where(condition).order_by(Asset.id))
+        return result.scalars().all()
+
+    async def refresh(self, db: Union[AsyncSession, Session], batch_jitter: float = 0) -> int:
+        """One refresh cycle; returns the number of quotes written"""
+        started = time.monotonic()
+        requested = set(self._requested)
+        assets = await self.tracked_assets(db)
+        self._requested.difference_update(requested)
+
+        written, written_days = 0, []
+        for start in range(0, len(assets), settings.QUOTE_BATCH_SIZE):
+            if start and batch_jitter:
+                await asyncio.sleep(random.uniform(0, batch_jitter))
+            batch = assets[start:start + settings.QUOTE_BATCH_SIZE]
+            quotes = await self.provider.refresh_quotes([asset.ticker for asset in batch])
+
+            rows = []
+            for asset in batch:
+                quote = quotes.get(asset.ticker.upper())
+                if quote is None:
+                    continue
+                rows.append({
+                    "asset_id": asset.id,
+                    "date": date.fromisoformat(quote["as_of"]),
+                    "close": quote["price"],
+                    "adj_close": quote["price"],
+                    "source": PRICE_SOURCE_QUOTE,
+                })
+            # Só o fechamento é atualizado: uma linha nova fica marcada como cotação e o dia continua
+            # faltando para a ingestão do histórico, que grava o OHLCV completo por cima; uma linha
+            # do histórico já gravada mantém a origem
+            written += await DBHelper.upsert(
+                db, AssetPrice, rows, index_elements=["asset_id", "date"], update_columns=["close"]
+            )
+            await DBHelper.commit(db)
+            if rows:
+                written_days.extend(row["date"] for row in rows)
+                # Séries históricas que contêm esses ativos mudam a partir do novo fechamento
+                await portfolio_history.invalidate_assets([row["asset_id"] for row in rows], min(row["date"] for row in rows))
+
+        # Câmbio das moedas dos ativos acompanhados, em uma única chamada em lote
+        fx_written = await fx_service.refresh_latest(db, {asset.currency or "USD" for asset in assets})
+        if fx_written:
+            await report_service.invalidate_cache()
+
+        if written:
+            # Estatísticas de risco com janela até hoje mudaram com os novos fechamentos
+            await risk_service.invalidate_cache()
+            await price_cache.refresh(db, min(written_days), max(written_days))
+
+        self._stats.update(
+            runs=self._stats["runs"] + 1,
+            assets=len(assets),
+            quotes=written,
+            fx_rates=fx_written,
+            last_run=time.time(),
+            last_duration=time.monotonic() - started,
+        )
+        return written
+
+    async def _run(self):
+        # Atraso inicial aleatório para que vários workers não consultem o provider ao mesmo tempo
+        await asyncio.sleep(random.uniform(0, settings.PRICE_REFRESH_JITTER))
+        # Posse renovada a cada ciclo; dura dois intervalos para que um atraso não a perca
+        lease = 2 * (settings.PRICE_REFRESH_INTERVAL + settings.PRICE_REFRESH_JITTER)
+        while True:
+            try:
+                self.leader = await self._leader.acquire(ttl=lease)
+                if self.leader:
+                    async with self.session_factory() as db:
+                        await self.refresh(db, batch_jitter=settings.PRICE_REFRESH_JITTER / 10)
+                else:
+                    self._stats["skipped"] += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self._stats["errors"] += 1
+                self._stats["last_error"] = str(e)
+                print(f"Error refreshing prices: {e}")
+            await asyncio.sleep(settings.PRICE_REFRESH_INTERVAL + random.uniform(0, settings.PRICE_REFRESH_JITTER))
+
+    def start(self):
+        if self.running:
+            return
+        if self.session_factory is None:
+            from app.core.database import AsyncSessionLocal
+            self.session_factory = AsyncSessionLocal
+        self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        if self.leader:
+            await self._leader.release()
+            self.leader = False
+
+    async def current_quotes(
+        self,
+        db: Union[AsyncSession, Session],
+        assets: List[Asset]
+    ) -> Dict[int, Dict[str, Any]]:
+        """
+        Current quote per asset id, read from the quote cache or else the last stored
+        close. Never calls the provider: assets with no price yet are queued for the next cycle.
+        """
+        cached = await self.provider.cached_quotes([asset.ticker for asset in assets])
+        quotes = {asset.id: cached[asset.ticker.upper()] for asset in assets if asset.ticker.upper() in cached}
+
+        missing = [asset.id for asset in assets if asset.id not in quotes]
+        if missing:
+            stored = await price_history.latest_prices(db, missing)
+            for asset in assets:
+                if asset.id in stored:
+                    as_of, close = stored[asset.id]
+                    quotes[asset.id] = {
+                        "ticker": asset.ticker,
+                        "price": close,
+                        "previous_close": None,
+                        "change_percent": None,
+                        "as_of": as_of.isoformat(),
+                    }
+                elif asset.id in missing:
+                    self.request(asset.id)
+        return quotes
+
+price_refresh = PriceRefreshScheduler()
@@ -0,0 +1,214 @@
+"""
+Profile-based rebalancing and drift detection.
+
+Each investment profile implies a target mix across asset classes. Positions for
+the whole book come from one aggregate query over the lots still open after sales,
+valued at the latest close and converted into a single base currency with the
+cached FX factors. Cash (movements minus purchases plus sale proceeds) is its own
+class with a zero target. Current weights, drift against the target and the
+proposed class-level trades are computed as (client x class) arrays.
+"""
+from typing import NamedTuple, Optional, Dict, Any, List, Union
+import numpy as np
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from sqlalchemy.future import select
+from sqlalchemy import func, case, literal, union_all
+from app.core.config import settings
+from app.core.db_helpers import DBHelper
+from app.models.allocation import Allocation
+from app.models.asset import Asset
+from app.models.client import Client
+from app.models.movement import Movement, MovementType
+from app.models.sale import Sale
+from app.services.fx import fx_service, asset_currency
+from app.services.pnl import PnLService, EPSILON
+from app.services.price_history import price_history
+
+ASSET_CLASSES = ["fixed_income", "equity", "real_estate", "alternative", "cash"]
+
+# Caixa parado não faz parte do alvo: o rebalanceamento propõe investi-lo
+TARGET_ALLOCATIONS = {
+    "conservative": {"fixed_income": 0.70, "equity": 0.20, "real_estate": 0.10, "alternative": 0.00, "cash": 0.00},
+    "moderate": {"fixed_income": 0.45, "equity": 0.35, "real_estate": 0.10, "alternative": 0.10, "cash": 0.00},
+    "aggressive": {"fixed_income": 0.20, "equity": 0.55, "real_estate": 0.10, "alternative": 0.15, "cash": 0.00},
+}
+
+PROFILES = list(TARGET_ALLOCATIONS)
+TARGET_MATRIX = np.array([[TARGET_ALLOCATIONS[p][c] for c in ASSET_CLASSES] for p in PROFILES])
+
+class DriftResult(NamedTuple):
+    total_value: np.ndarray  # (clients,)
+    weights: np.ndarray      # (clients, classes)
+    targets: np.ndarray      # (clients, classes)
+    drift: np.ndarray        # (clients, classes) current - target
+    max_drift: np.ndarray    # (clients,)
+    flagged: np.ndarray      # (clients,) bool
+    trades: np.ndarray       # (clients, classes) amount to buy (+) or sell (-)
+
+def evaluate_drift(client_idx: np.ndarray, class_idx: np.ndarray, values: np.ndarray,
+                   profile_idx: np.ndarray, threshold: float) -> DriftResult:
+    """Current vs target weights for every client at once"""
+    n_clients, n_classes = len(profile_idx), len(ASSET_CLASSES)
+    holdings = np.bincount(
+        client_idx * n_classes + class_idx, weights=values, minlength=n_clients * n_classes
+    ).reshape(n_clients, n_classes)
+
+    total_value = holdings.sum(axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        weights = np.where(total_value[:, None] > 0, holdings / total_value[:, None], 0.0)
+    targets = TARGET_MATRIX[profile_idx]
+    drift = weights - targets
+    max_drift = np.abs(drift).max(axis=1)
+
+    return DriftResult(
+        total_value=total_value,
+        weights=weights,
+        targets=targets,
+        drift=drift,
+        max_drift=max_drift,
+        flagged=(max_drift > threshold) & (total_value > 0),
+        trades=-drift * total_value[:, None]
+    )
+
+class RebalancingService:
+    async def _cash(self, db: Union[AsyncSession, Session], client_filter) -> List[Any]:
+        """
+        (client_id, currency, amount) pieces of each client's cash: movements (in BASE_CURRENCY)
+        minus purchases plus sale proceeds (in the asset's currency)
+        """
+        movements = (
+            select(Movement.client_id, literal(settings.BASE_CURRENCY).label("currency"),
+                   func.sum(case((Movement.type == MovementType.deposit, Movement.amount), else_=-Movement.amount)))
+            .join(Client, Movement.client_id == Client.id)
+            .where(*client_filter)
+            .group_by(Movement.client_id)
+        )
+        purchases = (
+            select(Allocation.client_id, asset_currency(), -func.sum(Allocation.quantity * Allocation.buy_price))
+            .join(Client, Allocation.client_id == Client.id)
+            .join(Asset, Allocation.asset_id == Asset.id)
+            .where(*client_filter)
+            .group_by(Allocation.client_id, asset_currency())
+        )
+        proceeds = (
+            select(Sale.client_id, asset_currency(), func.sum(Sale.quantity * Sale.sell_price))
+            .join(Client, Sale.client_id == Client.id)
+            .join(Asset, Sale.asset_id == Asset.id)
+            .where(*client_filter)
+            .group_by(Sale.client_id, asset_currency())
+        )
+        result = await DBHelper.execute_query(db, union_all(movements, purchases, proceeds))
+        return result.all()
+
+    async def scan(
+        self,
+        db: Union[AsyncSession, Session],
+        threshold: float = 0.05,
+        client_id: Optional[int] = None,
+        only_flagged: bool = True,
+        skip: int = 0,
+        limit: Optional[int] = None,
+        base_currency: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Evaluate drift for every active client with a defined profile (or a single client).
+        Positions and cash are converted into base_currency (BASE_CURRENCY by default);
+        raises ValueError when an FX rate is missing.
+        """
+        base_currency = (base_currency or settings.BASE_CURRENCY).upper()
+        client_filter = [Client.is_active == True, Client.investment_profile.in_(PROFILES)]
+        if client_id is not None:
+            client_filter.append(Client.id == client_id)
+
+        clients_result = await DBHelper.execute_query(
+            db, select(Client.id, Client.name, Client.investment_profile).where(*client_filter)
+        )
+        clients = {row.id: row for row in clients_result.all()}
+        if not clients:
+            return []
+
+        # Só o que continua em carteira depois das vendas
+        lots = PnLService.open_lots(None if client_id is None else [client_id])
+        result = await DBHelper.execute_query(
+            db,
+            select(
+                lots.c.client_id,
+                lots.c.asset_id,
+                Asset.asset_class,
+                asset_currency().label("currency"),
+                func.sum(lots.c.quantity).label("quantity"),
+                func.sum(lots.c.quantity * lots.c.buy_price).label("cost")
+            )
+            .join(Client, lots.c.client_id == Client.id)
+            .join(Asset, lots.c.asset_id == Asset.id)
+            .where(*client_filter)
+            .group_by(lots.c.client_id, lots.c.asset_id, Asset.asset_class, asset_currency())
+        )
+        rows = result.all()
+        cash_rows = await self._cash(db, client_filter)
+
+        factors = await fx_service.factors(
+            db, base_currency, {row.currency for row in rows} | {row[1] for row in cash_rows}
+        )
+        latest = await price_history.latest_prices(db, sorted({row.asset_id for row in rows}))
+        quantity = np.array([float(row.quantity) for row in rows])
+        cost = np.array([float(row.cost) for row in rows])
+        price = np.array([latest[row.asset_id][1] if row.asset_id in latest else np.nan for row in rows])
+        # Sem cotação armazenada, a posição é avaliada pelo custo
+        values = fx_service.convert(np.where(np.isnan(price), cost, quantity * price), [row.currency for row in rows], factors)
+
+        # Caixa por cliente na moeda base; saldo negativo é aporte implícito, não caixa
+        cash_of = dict.fromkeys(clients, 0.0)
+        if cash_rows:
+            amounts = fx_service.convert(
+                np.array([float(row[2] or 0) for row in cash_rows]), [row[1] for row in cash_rows], factors
+            )
+            for row, amount in zip(cash_rows, amounts):
+                cash_of[row[0]] += amount
+        cash = {cid: amount for cid, amount in cash_of.items() if amount > EPSILON}
+
+        row_clients = [row.client_id for row in rows] + list(cash)
+        if not row_clients:
+            return []
+        class_of = {name: idx for idx, name in enumerate(ASSET_CLASSES)}
+        class_idx = np.array(
+            [class_of.get(row.asset_class, class_of["equity"]) for row in rows] + [class_of["cash"]] * len(cash),
+            dtype=np.int64
+        )
+        values = np.concatenate([values, np.array(list(cash.values()), dtype=float)])
+
+        client_ids, client_idx = np.unique(row_clients, return_inverse=True)
+        profile_of = {name: idx for idx, name in enumerate(PROFILES)}
+        profile_idx = np.array([profile_of[clients[cid].investment_profile] for cid in client_ids.tolist()])
+
+        drift = evaluate_drift(client_idx, class_idx, values, profile_idx, threshold)
+
+        selected = np.flatnonzero(drift.flagged) if only_flagged else np.arange(len(client_ids))
+        selected = selected[np.argsort(-drift.max_drift[selected], kind="stable")]
+        selected = selected[skip:None if limit is None else skip + limit]
+        return [
+            {
+                "client_id": int(client_ids[i]),
+                "client_name": clients[int(client_ids[i])].name,
+                "investment_profile": clients[int(client_ids[i])].investment_profile,
+                "base_currency": base_currency,
+                "total_value": float(drift.total_value[i]),
+                "cash": float(cash.get(int(client_ids[i]), 0.0)),
+                "max_drift": float(drift.max_drift[i]),
+                "needs_rebalancing": bool(drift.flagged[i]),
+                "classes": [
+                    {
+                        "asset_class": name,
+                        "current_weight": float(drift.weights[i, k]),
+                        "target_weight": float(drift.targets[i, k]),
+                        "drift": float(drift.drift[i, k]),
+                        "trade_amount": float(drift.trades[i, k]),
+                    }
+                    for k, name in enumerate(ASSET_CLASSES)
+                ],
+            }
+            for i in selected
+        ]
+
+rebalancing_service = RebalancingService()
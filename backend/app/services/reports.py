@@ -0,0 +1,155 @@
+"""
+Management reports aggregated in the database.
+
+AUM (cost basis of the open lots, quantity still held x buy price) grouped by up to three of asset,
+currency, exchange and client profile, in a single GROUP BY. Amounts are in each
+asset's own currency unless a base currency is given, in which case every row
+is multiplied in SQL by the cached FX factor of its asset's currency.
+With rollup, subtotals for every prefix of the grouping plus the grand total
+come from the same statement: GROUP BY ROLLUP on PostgreSQL, and the equivalent
+UNION ALL of the prefix groupings on SQLite, which has no ROLLUP.
+
+Reports are cached (shared across workers when the backend is) and invalidated
+whenever allocations or sales, or the client/asset attributes they are grouped by, change.
+"""
+from datetime import date
+from typing import Optional, Dict, Any, List, Union
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from sqlalchemy.future import select
+from sqlalchemy import func, literal, union_all
+from app.core.config import settings
+from app.core.cache import TTLCache
+from app.core.cache_backend import shared_backend
+from app.core.db_helpers import DBHelper
+from app.models.asset import Asset
+from app.models.client import Client
+from app.services.fx import fx_service
+from app.services.pnl import PnLService
+
+AUM_GROUPS = {
+    "asset": Asset.ticker,
+    "currency": Asset.currency,
+    "exchange": Asset.exchange,
+    "profile": Client.investment_profile,
+}
+
+class ReportService:
+    def __init__(self):
+        # (group_by, rollup) -> relatório
+        self._cache = TTLCache(
+            maxsize=settings.REPORT_CACHE_SIZE,
+            ttl=settings.REPORT_CACHE_TTL,
+            name="aum_reports",
+            backend=shared_backend()
+        )
+
+    def clear_cache(self):
+        self._cache.clear()
+
+    async def invalidate_cache(self):
+        """Drop cached reports in every worker (after allocation, client or asset writes)"""
+        await self._cache.invalidate()
+
+    def cache_stats(self) -> Dict[str, Any]:
+        return self._cache.stats()
+
+    @staticmethod
+    def _aum_query(dimensions: List[str], lots, amount, level: Optional[int] = None):
+        """
+        GROUP BY over the first `level` dimensions (all when None); the remaining
+        ones are returned as NULL, so every level has the same columns
+        """
+        kept = dimensions if level is None else dimensions[:level]
+        columns = [
+            (AUM_GROUPS[name] if name in kept else literal(None)).label(name)
+            for name in dimensions
+        ]
+        return (
+            select(
+                *columns,
+                literal(len(kept)).label("level"),
+                func.sum(amount).label("aum"),
+                func.count(lots.c.id).label("positions"),
+                func.count(func.distinct(lots.c.client_id)).label("clients"),
+            )
+            .select_from(lots)
+            .join(Asset, lots.c.asset_id == Asset.id)
+            .join(Client, lots.c.client_id == Client.id)
+            .group_by(*[AUM_GROUPS[name] for name in kept])
+        )
+
+    async def _load_aum(self, db: Union[AsyncSession, Session], dimensions: List[str], rollup: bool,
+                        base_currency: Optional[str]):
+        # Vendas já descontadas: só a parte ainda aberta de cada lote
+        lots = PnLService.open_lots()
+        amount = lots.c.quantity * lots.c.buy_price
+        if base_currency:
+            factors = await fx_service.factors(db, base_currency, await fx_service.held_currencies(db))
+            amount = amount * fx_service.sql_factor(factors)
+
+        if not rollup:
+            query = self._aum_query(dimensions, lots, amount)
+        elif DBHelper.dialect_name(db) == "postgresql":
+            grouped = [AUM_GROUPS[name] for name in dimensions]
+            # grouping(col) = 1 nas linhas em que a coluna foi agregada; ROLLUP só agrega sufixos
+            level = literal(len(dimensions))
+            for column in grouped:
+                level = level - func.grouping(column)
+            query = (
+                select(
+                    *[column.label(name) for name, column in zip(dimensions, grouped)],
+                    level.label("level"),
+                    func.sum(amount).label("aum"),
+                    func.count(lots.c.id).label("positions"),
+                    func.count(func.distinct(lots.c.client_id)).label("clients"),
+                )
+                .select_from(lots)
+                .join(Asset, lots.c.asset_id == Asset.id)
+                .join(Client, lots.c.client_id == Client.id)
+                .group_by(func.rollup(*grouped))
+            )
+        else:
+            query = union_all(*[self._aum_query(dimensions, lots, amount, level) for level in range(len(dimensions), -1, -1)])
+
+        result = await DBHelper.execute_query(db, query)
+        rows = result.mappings().all()
+
+        total = sum(float(row["aum"] or 0) for row in rows if row["level"] == len(dimensions))
+        groups = [
+            {
+                "keys": {name: row[name] for name in dimensions[:row["level"]]},
+                "level": row["level"],
+                "subtotal": row["level"] < len(dimensions),
+                "aum": float(row["aum"] or 0),
+                "share": float(row["aum"] or 0) / total if total else 0.0,
+                "positions": row["positions"],
+                "clients": row["clients"],
+            }
+            for row in rows
+            # Sem alocações, o total geral do ROLLUP é uma linha com soma nula
+            if row["positions"]
+        ]
+        # Maior AUM primeiro dentro de cada nível, subtotais depois dos detalhes
+        groups.sort(key=lambda group: (-group["level"], -group["aum"]))
+        return {"group_by": dimensions, "rollup": rollup, "base_currency": base_currency,
+                "total_aum": total, "groups": groups}
+
+    async def aum(self, db: Union[AsyncSession, Session], group_by: List[str], rollup: bool = False,
+                  base_currency: Optional[str] = None) -> Dict[str, Any]:
+        """AUM grouped by the given dimensions (see AUM_GROUPS), cached until the next write"""
+        # Aceita group_by repetido ou separado por vírgulas
+        dimensions = list(dict.fromkeys(name.strip() for value in group_by for name in value.split(",") if name.strip()))
+        unknown = [name for name in dimensions if name not in AUM_GROUPS]
+        if unknown:
+            raise ValueError(f"Unknown group_by: {', '.join(unknown)}")
+        if not dimensions or len(dimensions) > 3:
+            raise ValueError("group_by takes between one and three dimensions")
+
+        base_currency = base_currency.upper() if base_currency else None
+
+        # Conversões usam as taxas do dia, então o dia faz parte da chave
+        key = (tuple(dimensions), rollup, base_currency, date.today().isoformat() if base_currency else None)
+        return await self._cache.get_or_load(key, lambda: self._load_aum(db, dimensions, rollup, base_currency))
+
+report_service = ReportService()
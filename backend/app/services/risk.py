@@ -0,0 +1,174 @@
+"""
+Portfolio risk analytics from the local price history.
+
+Return statistics (mean vector, covariance and correlation matrices) depend only
+on the set of assets and the window, so they are cached by that key and shared
+by every client holding the same assets (and by every worker when the cache
+backend is Redis). The NumPy work runs in the process pool.
+"""
+from datetime import date, timedelta
+from statistics import NormalDist
+from typing import NamedTuple, Optional, Dict, Any, List, Tuple, Union
+import numpy as np
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from sqlalchemy.future import select
+from sqlalchemy import func
+from app.core.config import settings
+from app.core.cache import TTLCache
+from app.core.cache_backend import shared_backend
+from app.core.db_helpers import DBHelper
+from app.core.process_pool import run_in_process
+from app.services.price_history import price_history
+from app.services.pnl import PnLService
+
+TRADING_DAYS_PER_YEAR = 252
+
+class ReturnStats(NamedTuple):
+    asset_ids: Tuple[int, ...]
+    returns: np.ndarray      # (days - 1, assets) simple daily returns
+    mean: np.ndarray         # (assets,)
+    covariance: np.ndarray   # (assets, assets) daily
+    correlation: np.ndarray  # (assets, assets)
+
+def compute_return_stats(asset_ids: Tuple[int, ...], prices: np.ndarray) -> ReturnStats:
+    """Daily simple returns and their first two moments (runs in the process pool)"""
+    returns = prices[1:] / prices[:-1] - 1.0
+    covariance = np.atleast_2d(np.cov(returns, rowvar=False))
+    std = np.sqrt(np.diag(covariance))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        correlation = covariance / np.outer(std, std)
+    correlation = np.where(np.outer(std, std) > 0, correlation, 0.0)
+    np.fill_diagonal(correlation, 1.0)
+    return ReturnStats(asset_ids, returns, returns.mean(axis=0), covariance, correlation)
+
+def compute_portfolio_risk(stats: ReturnStats, weights: np.ndarray, value: float,
+                           confidence: float, horizon_days: int) -> Dict[str, float]:
+    """Annualized volatility plus historical and parametric VaR for fixed weights (runs in the process pool)"""
+    daily_std = float(np.sqrt(weights @ stats.covariance @ weights))
+    daily_mean = float(weights @ stats.mean)
+    scale = np.sqrt(horizon_days)
+
+    portfolio_returns = stats.returns @ weights
+    historical_quantile = float(np.quantile(portfolio_returns, 1.0 - confidence))
+    z = NormalDist().inv_cdf(confidence)
+
+    return {
+        "daily_volatility": daily_std,
+        "annualized_volatility": daily_std * np.sqrt(TRADING_DAYS_PER_YEAR),
+        "historical_var": max(0.0, -historical_quantile * scale * value),
+        "parametric_var": max(0.0, (z * daily_std * scale - daily_mean * horizon_days) * value),
+    }
+
+class RiskService:
+    def __init__(self):
+        # (asset_ids, start, end) -> (ReturnStats, últimos preços)
+        self._stats_cache = TTLCache(
+            maxsize=settings.RISK_CACHE_SIZE,
+            ttl=settings.RISK_CACHE_TTL,
+            name="risk_stats",
+            backend=shared_backend()
+        )
+
+    def clear_cache(self):
+        self._stats_cache.clear()
+
+    async def invalidate_cache(self):
+        """Drop cached statistics in every worker (after new prices are stored)"""
+        await self._stats_cache.invalidate()
+
+    @staticmethod
+    def window_bounds(window_days: int, end: Optional[date] = None) -> Tuple[date, date]:
+        """Calendar range covering roughly `window_days` trading days up to end"""
+        end = end or date.today()
+        return end - timedelta(days=int(window_days * 365 / TRADING_DAYS_PER_YEAR) + 1), end
+
+    async def get_return_stats(
+        self,
+        db: Union[AsyncSession, Session],
+        asset_ids: List[int],
+        window_days: int = TRADING_DAYS_PER_YEAR,
+        end: Optional[date] = None
+    ) -> Tuple[ReturnStats, np.ndarray]:
+        """
+        Cached return statistics for a set of assets plus their latest prices.
+        Assets without stored prices are left out of the statistics, and the window starts
+        on the first day every remaining asset has a close (no later price fills earlier days).
+        """
+        start, end = self.window_bounds(window_days, end)
+        key = (tuple(sorted(asset_ids)), start, end)
+
+        async def load():
+            calendar, prices = await price_history.load_price_matrix(db, list(key[0]), start, end)
+            priced = ~np.isnan(prices).all(axis=0) if prices.size else np.zeros(len(key[0]), dtype=bool)
+            priced_ids = tuple(asset_id for asset_id, ok in zip(key[0], priced) if ok)
+            if priced_ids:
+                # Só os dias em que todos os ativos já têm fechamento: nada antes da primeira cotação
+                first = int(np.argmax((~np.isnan(prices[:, priced])).all(axis=1)))
+                calendar, prices = calendar[first:], prices[first:]
+            if len(calendar) < 3 or not priced_ids:
+                raise ValueError("Not enough price history to compute risk")
+
+            stats = await run_in_process(compute_return_stats, priced_ids, prices[:, priced])
+            return stats, prices[-1, priced]
+
+        # Clientes com a mesma carteira aguardam um único cálculo
+        return await self._stats_cache.get_or_load(key, load)
+
+    async def client_risk(
+        self,
+        db: Union[AsyncSession, Session],
+        client_id: int,
+        window_days: int = TRADING_DAYS_PER_YEAR,
+        confidence: float = 0.95,
+        horizon_days: int = 1
+    ) -> Dict[str, Any]:
+        # Quantidades líquidas das vendas
+        lots = PnLService.open_lots([client_id])
+        result = await DBHelper.execute_query(
+            db,
+            select(lots.c.asset_id, func.sum(lots.c.quantity).label("quantity"))
+            .group_by(lots.c.asset_id)
+        )
+        positions = {row.asset_id: float(row.quantity) for row in result.all() if row.quantity}
+        if not positions:
+            raise ValueError("Client has no positions")
+
+        stats, latest_prices = await self.get_return_stats(db, list(positions), window_days)
+        quantities = np.array([positions[asset_id] for asset_id in stats.asset_ids])
+        values = quantities * latest_prices
+        value = float(values.sum())
+        if value <= 0:
+            raise ValueError("Portfolio has no market value")
+
+        risk = await run_in_process(
+            compute_portfolio_risk, stats, values / value, value, confidence, horizon_days
+        )
+        return {
+            "client_id": client_id,
+            "market_value": value,
+            "window_days": window_days,
+            "observations": int(stats.returns.shape[0]),
+            "confidence": confidence,
+            "horizon_days": horizon_days,
+            **risk,
+            "weights": {asset_id: float(w) for asset_id, w in zip(stats.asset_ids, values / value)},
+            "unpriced_asset_ids": sorted(set(positions) - set(stats.asset_ids)),
+        }
+
+    async def correlation(
+        self,
+        db: Union[AsyncSession, Session],
+        asset_ids: List[int],
+        window_days: int = TRADING_DAYS_PER_YEAR
+    ) -> Dict[str, Any]:
+        stats, _ = await self.get_return_stats(db, asset_ids, window_days)
+        return {
+            "asset_ids": list(stats.asset_ids),
+            "window_days": window_days,
+            "observations": int(stats.returns.shape[0]),
+            "correlation": stats.correlation.tolist(),
+            "covariance": (stats.covariance * TRADING_DAYS_PER_YEAR).tolist(),
+        }
+
+risk_service = RiskService()
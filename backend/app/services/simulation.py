@@ -0,0 +1,174 @@
+"""
+Monte Carlo simulation of forward portfolio values for suitability reviews.
+
+Each asset's yearly log return is drawn from a multivariate normal fitted to the
+historical daily returns (mean and covariance scaled to a year, the same cached
+statistics used by the risk endpoint). Positions are held without rebalancing,
+so a path's value is the sum of each position grown by its cumulative return.
+All paths of a chunk are drawn in one (years, paths, assets) array; chunks run
+in parallel in the process pool, each with its own stream spawned from the
+seed, so a given seed always reproduces the same bands.
+
+Simulations run as background jobs: the request loads the positions and return
+statistics, submits the job and answers 202; the result is polled by job id.
+"""
+import asyncio
+import secrets
+from typing import Optional, Dict, Any, List, Union
+import numpy as np
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from sqlalchemy.future import select
+from sqlalchemy import func
+from app.core.config import settings
+from app.core.cache_backend import shared_backend
+from app.core.db_helpers import DBHelper
+from app.core.jobs import JobManager, Job
+from app.core.process_pool import run_in_process
+from app.models.client import Client
+from app.services.risk import risk_service, TRADING_DAYS_PER_YEAR
+from app.services.pnl import PnLService
+
+DEFAULT_PERCENTILES = (5, 25, 50, 75, 95)
+
+def covariance_factor(covariance: np.ndarray) -> np.ndarray:
+    """Matrix L with L @ L.T == covariance; falls back to the eigendecomposition when it is only semidefinite"""
+    try:
+        return np.linalg.cholesky(covariance)
+    except np.linalg.LinAlgError:
+        eigenvalues, eigenvectors = np.linalg.eigh(covariance)
+        return eigenvectors * np.sqrt(np.clip(eigenvalues, 0.0, None))
+
+def simulate_paths(mean: np.ndarray, covariance: np.ndarray, values: np.ndarray,
+                   years: int, paths: int, seed) -> np.ndarray:
+    """
+    (years + 1, paths) portfolio values at the start and at the end of each year
+    for buy-and-hold positions worth `values` today (runs in the process pool)
+    """
+    rng = np.random.default_rng(seed)
+    annual_covariance = covariance * TRADING_DAYS_PER_YEAR
+    # Retorno diário simples -> log-retorno anual (aproximação lognormal)
+    drift = (mean - np.diag(covariance) / 2) * TRADING_DAYS_PER_YEAR
+    shocks = rng.standard_normal((years, paths, len(values))) @ covariance_factor(annual_covariance).T
+    growth = np.exp(np.cumsum(shocks + drift, axis=0))
+    totals = np.empty((years + 1, paths))
+    totals[0] = values.sum()
+    totals[1:] = growth @ values
+    return totals
+
+def summarize_paths(totals: np.ndarray, percentiles: List[int]) -> List[Dict[str, Any]]:
+    """Percentile bands, mean and probability of ending below today's value, per year"""
+    initial = totals[0, 0]
+    bands = np.percentile(totals[1:], percentiles, axis=1)
+    return [
+        {
+            "year": year,
+            "mean": float(totals[year].mean()),
+            "percentiles": {p: float(bands[i, year - 1]) for i, p in enumerate(percentiles)},
+            "probability_of_loss": float((totals[year] < initial).mean()),
+        }
+        for year in range(1, totals.shape[0])
+    ]
+
+class SimulationService:
+    def __init__(self):
+        self.jobs = JobManager(
+            name="simulations",
+            concurrency=settings.SIMULATION_CONCURRENCY,
+            maxsize=settings.JOB_RESULTS_SIZE,
+            ttl=settings.JOB_RESULTS_TTL,
+            backend=shared_backend()
+        )
+
+    async def prepare(
+        self,
+        db: Union[AsyncSession, Session],
+        client: Client,
+        window_days: int = TRADING_DAYS_PER_YEAR
+    ) -> Dict[str, Any]:
+        """Current position values and return statistics of a client (everything the simulation reads from the database)"""
+        client_id = client.id
+        # Quantidades líquidas das vendas
+        lots = PnLService.open_lots([client_id])
+        result = await DBHelper.execute_query(
+            db,
+            select(lots.c.asset_id, func.sum(lots.c.quantity).label("quantity"))
+            .group_by(lots.c.asset_id)
+        )
+        positions = {row.asset_id: float(row.quantity) for row in result.all() if row.quantity}
+        if not positions:
+            raise ValueError("Client has no positions")
+
+        stats, latest_prices = await risk_service.get_return_stats(db, list(positions), window_days)
+        values = np.array([positions[asset_id] for asset_id in stats.asset_ids]) * latest_prices
+        if values.sum() <= 0:
+            raise ValueError("Portfolio has no market value")
+        return {
+            "client_id": client_id,
+            "investment_profile": client.investment_profile,
+            "risk_tolerance": client.risk_tolerance or 5,
+            "window_days": window_days,
+            "observations": int(stats.returns.shape[0]),
+            "asset_ids": stats.asset_ids,
+            "mean": stats.mean,
+            "covariance": stats.covariance,
+            "values": values,
+            "unpriced_asset_ids": sorted(set(positions) - set(stats.asset_ids)),
+        }
+
+    async def simulate(
+        self,
+        inputs: Dict[str, Any],
+        years: int = 10,
+        paths: Optional[int] = None,
+        seed: Optional[int] = None,
+        percentiles: List[int] = DEFAULT_PERCENTILES,
+        job: Optional[Job] = None
+    ) -> Dict[str, Any]:
+        paths = paths or settings.SIMULATION_DEFAULT_PATHS
+        if paths > settings.SIMULATION_MAX_PATHS:
+            raise ValueError(f"At most {settings.SIMULATION_MAX_PATHS} paths per simulation")
+        seed = secrets.randbits(32) if seed is None else seed
+        percentiles = sorted(set(percentiles))
+
+        chunk = settings.SIMULATION_CHUNK_PATHS
+        sizes = [min(chunk, paths - start) for start in range(0, paths, chunk)]
+        streams = np.random.SeedSequence(seed).spawn(len(sizes))
+        weights = inputs["values"] / inputs["values"].sum()
+
+        async def run_chunk(size, stream):
+            totals = await run_in_process(
+                simulate_paths, inputs["mean"], inputs["covariance"], inputs["values"], years, size, stream
+            )
+            if job is not None:
+                await self.jobs.report(job, job.progress + size / paths)
+            return totals
+
+        # Lotes em paralelo no pool; o progresso avança a cada lote concluído
+        chunks = await asyncio.gather(*(run_chunk(size, stream) for size, stream in zip(sizes, streams)))
+        totals = np.concatenate(chunks, axis=1)
+        bands = await run_in_process(summarize_paths, totals, percentiles)
+
+        daily_std = float(np.sqrt(weights @ inputs["covariance"] @ weights))
+        return {
+            "client_id": inputs["client_id"],
+            "investment_profile": inputs["investment_profile"],
+            "risk_tolerance": inputs["risk_tolerance"],
+            "market_value": float(inputs["values"].sum()),
+            "window_days": inputs["window_days"],
+            "observations": inputs["observations"],
+            "years": years,
+            "paths": paths,
+            "seed": seed,
+            "expected_annual_return": float(weights @ inputs["mean"]) * TRADING_DAYS_PER_YEAR,
+            "annualized_volatility": daily_std * float(np.sqrt(TRADING_DAYS_PER_YEAR)),
+            "bands": bands,
+            "weights": {asset_id: float(w) for asset_id, w in zip(inputs["asset_ids"], weights)},
+            "unpriced_asset_ids": inputs["unpriced_asset_ids"],
+        }
+
+    def submit(self, inputs: Dict[str, Any], **params) -> Job:
+        """Run `simulate` as a background job"""
+        return self.jobs.submit("monte_carlo", lambda job: self.simulate(inputs, job=job, **params))
+
+simulation_service = SimulationService()
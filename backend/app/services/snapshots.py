@@ -0,0 +1,382 @@
+"""
+Daily portfolio snapshots.
+
+A batch job writes one row per (client, business day) to portfolio_snapshots
+with the positions held at the end of the day, their market value, the cash
+balance and the day's external flows, so dashboards read one small table
+instead of replaying allocations, sales, movements and prices.
+
+Clients are processed in chunks: the inputs of a chunk are loaded with one
+set-based query per table, the (pair x day) matrices are computed in the
+process pool while the next chunk loads, and the rows are upserted on
+(client_id, date) and committed per chunk. Re-running a range rewrites the
+same rows, so the job is idempotent and a crashed run is resumed by running
+it again. Without an explicit range it continues per client: each client whose
+snapshots stop before the end of the range (a chunk that never committed, a
+night the scheduler missed) is run from the day after its own latest snapshot,
+or from its first activity if it has none yet.
+
+Cash follows the performance engine: movements minus purchases plus sale
+proceeds, with shortfalls treated as implicit deposits. Events before the
+range are accumulated into an opening column, so they count in the positions
+and the cash but not in the net flow of the first day.
+
+The nightly schedule starts in every worker; only the one holding the
+"snapshots" leader lock runs it.
+"""
+import asyncio
+import time
+from collections import deque
+from datetime import date, datetime, timedelta, timezone
+from typing import Optional, Dict, Any, List, Union
+import numpy as np
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from sqlalchemy.future import select
+from sqlalchemy import func
+from app.core.config import settings
+from app.core.db_helpers import DBHelper
+from app.core.leader import LeaderLock
+from app.core.process_pool import run_in_process
+from app.models.allocation import Allocation
+from app.models.client import Client
+from app.models.movement import Movement, MovementType
+from app.models.portfolio_snapshot import PortfolioSnapshot
+from app.models.sale import Sale
+from app.services.performance import Lots, Flows, day_index, daily_matrix
+from app.services.price_history import price_history, business_days
+
+# Resíduos de ponto flutuante abaixo disso zeram a posição
+EPSILON = 1e-9
+
+# Posse do job noturno entre workers, em segundos
+SNAPSHOT_LEASE = 12 * 3600
+
+def compute_snapshots(calendar: np.ndarray, prices: np.ndarray, trades: Lots, flows: Flows,
+                      client_ids: List[int], asset_ids: List[int]) -> List[Dict[str, Any]]:
+    """
+    Snapshot rows of a chunk of clients (runs in the process pool).
+    Day indices are shifted by one: column 0 holds every event before the calendar.
+    """
+    n_clients, n_days, n_assets = len(client_ids), len(calendar), len(asset_ids)
+    columns = n_days + 1
+
+    pairs, pair_idx = np.unique(trades.client_idx * max(n_assets, 1) + trades.asset_idx, return_inverse=True)
+    pair_client = pairs // max(n_assets, 1)
+    pair_asset = pairs % max(n_assets, 1)
+    positions = np.cumsum(daily_matrix(pair_idx, trades.date_idx, trades.quantity, len(pairs), columns), axis=1)
+    positions[np.abs(positions) < EPSILON] = 0.0
+    positions = positions[:, 1:]
+
+    market_value = np.zeros((n_clients, n_days))
+    if len(pairs):
+        np.add.at(market_value, pair_client, positions * prices[:, pair_asset].T)
+
+    movements = daily_matrix(flows.client_idx, flows.date_idx, flows.amount, n_clients, columns)
+    purchases = daily_matrix(trades.client_idx, trades.date_idx, trades.cost, n_clients, columns)
+    cash_raw = np.cumsum(movements - purchases, axis=1)
+    implicit_funding = np.maximum.accumulate(np.maximum(-cash_raw, 0.0), axis=1)
+    cash = (cash_raw + implicit_funding)[:, 1:]
+    net_flow = (movements + np.diff(implicit_funding, axis=1, prepend=0.0))[:, 1:]
+
+    # Só grava a partir do primeiro dia com alguma posição, saldo ou fluxo
+    held = np.zeros((n_clients, n_days), dtype=bool)
+    if len(pairs):
+        np.logical_or.at(held, pair_client, positions != 0)
+    active = np.logical_or.accumulate(held | (np.abs(cash) > EPSILON) | (net_flow != 0), axis=1)
+
+    days = calendar.tolist()
+    rows = []
+    for client in range(n_clients):
+        client_pairs = np.flatnonzero(pair_client == client)
+        for day in np.flatnonzero(active[client]):
+            rows.append({
+                "client_id": client_ids[client],
+                "date": days[day],
+                "market_value": round(float(market_value[client, day]), 2),
+                "cash": round(float(cash[client, day]), 2),
+                "net_flow": round(float(net_flow[client, day]), 2),
+                "positions": {
+                    str(asset_ids[pair_asset[pair]]): float(positions[pair, day])
+                    for pair in client_pairs if positions[pair, day] != 0
+                },
+            })
+    return rows
+
+class SnapshotService:
+    def __init__(self):
+        self._stats = {"runs": 0, "rows": 0, "last_run": None, "last_duration": None, "last_range": None}
+
+    def stats(self) -> Dict[str, Any]:
+        return dict(self._stats)
+
+    async def resume_points(
+        self,
+        db: Union[AsyncSession, Session],
+        client_ids: List[int],
+        end: date
+    ) -> Dict[int, date]:
+        """
+        First missing day per client whose snapshots stop before `end`: the day after its
+        latest snapshot, or its first buy/movement (not before the first snapshot stored
+        for anyone) when it has none. One GROUP BY per table.
+        """
+        first_stored = (await DBHelper.execute_query(db, select(func.min(PortfolioSnapshot.date)))).scalar()
+        if first_stored is None:
+            return {}
+        latest = dict((await DBHelper.execute_query(
+            db, select(PortfolioSnapshot.client_id, func.max(PortfolioSnapshot.date)).group_by(PortfolioSnapshot.client_id)
+        )).all())
+        first_activity = {}
+        for column, client_column in ((Allocation.buy_date, Allocation.client_id), (Movement.date, Movement.client_id)):
+            result = await DBHelper.execute_query(db, select(client_column, func.min(column)).group_by(client_column))
+            for client_id, day in result.all():
+                first_activity[client_id] = min(day, first_activity.get(client_id, day))
+
+        points = {}
+        for client_id in client_ids:
+            if client_id in latest:
+                resume = latest[client_id] + timedelta(days=1)
+            elif client_id in first_activity:
+                resume = max(first_activity[client_id], first_stored)
+            else:
+                continue
+            if resume <= end:
+                points[client_id] = resume
+        return points
+
+    async def _load_chunk(self, db: Union[AsyncSession, Session], client_ids: List[int], start: date, end: date):
+        """Trades, flows and prices of a chunk of clients with one query per table"""
+        client_of = {client_id: idx for idx, client_id in enumerate(client_ids)}
+        buys = (await DBHelper.execute_query(
+            db,
+            select(Allocation.client_id, Allocation.asset_id, Allocation.buy_date.label("date"),
+                   Allocation.quantity, Allocation.buy_price.label("price"))
+            .where(Allocation.client_id.in_(client_ids), Allocation.buy_date <= end)
+        )).all()
+        sells = (await DBHelper.execute_query(
+            db,
+            select(Sale.client_id, Sale.asset_id, Sale.sell_date.label("date"),
+                   Sale.quantity, Sale.sell_price.label("price"))
+            .where(Sale.client_id.in_(client_ids), Sale.sell_date <= end)
+        )).all()
+        movements = (await DBHelper.execute_query(
+            db,
+            select(Movement.client_id, Movement.type, Movement.amount, Movement.date)
+            .where(Movement.client_id.in_(client_ids), Movement.date <= end)
+        )).all()
+
+        asset_ids = sorted({row.asset_id for row in buys} | {row.asset_id for row in sells})
+        asset_of = {asset_id: idx for idx, asset_id in enumerate(asset_ids)}
+        calendar, prices = await price_history.load_price_matrix(db, asset_ids, start, end)
+
+        def columns(days):
+            # Coluna 0 acumula tudo que aconteceu antes do início do intervalo
+            days = np.asarray(days, dtype="datetime64[D]")
+            return np.where(days < np.datetime64(start, "D"), 0, day_index(calendar, days) + 1)
+
+        trades = buys + sells
+        sign = np.array([1.0] * len(buys) + [-1.0] * len(sells))
+        quantity = np.array([float(row.quantity) for row in trades]) * sign
+        price = np.array([float(row.price) for row in trades])
+        trade_assets = np.array([asset_of[row.asset_id] for row in trades], dtype=np.int64)
+
+        # Sem cotação armazenada (o ativo todo ou os dias antes do primeiro fechamento),
+        # a posição é avaliada pelo custo médio das compras, nunca por um preço posterior
+        missing = np.flatnonzero(np.isnan(prices).any(axis=0)) if prices.size else np.arange(len(asset_ids))
+        for col in missing:
+            bought = (trade_assets == col) & (sign > 0)
+            cost = np.average(price[bought], weights=quantity[bought]) if bought.any() else 0.0
+            prices[:, col] = np.where(np.isnan(prices[:, col]), cost, prices[:, col])
+
+        lots = Lots(
+            client_idx=np.array([client_of[row.client_id] for row in trades], dtype=np.int64),
+            asset_idx=trade_assets,
+            date_idx=columns([row.date for row in trades]),
+            quantity=quantity,
+            cost=quantity * price
+        )
+        flow_sign = {MovementType.deposit: 1.0, MovementType.withdrawal: -1.0}
+        flows = Flows(
+            client_idx=np.array([client_of[row.client_id] for row in movements], dtype=np.int64),
+            date_idx=columns([row.date for row in movements]),
+            amount=np.array([flow_sign[row.type] * float(row.amount) for row in movements])
+        )
+        return calendar, prices, lots, flows, asset_ids
+
+    async def _write(self, db: Union[AsyncSession, Session], rows: List[Dict[str, Any]]) -> int:
+        updated_at = datetime.now(timezone.utc)
+        for row in rows:
+            row["updated_at"] = updated_at
+        written = await DBHelper.upsert(
+            db, PortfolioSnapshot, rows, index_elements=["client_id", "date"],
+            batch_size=settings.SNAPSHOT_BATCH_SIZE
+        )
+        # Commit por lote: uma execução interrompida é retomada rodando de novo
+        await DBHelper.commit(db)
+        return written
+
+    async def run(
+        self,
+        db: Union[AsyncSession, Session],
+        start: Optional[date] = None,
+        end: Optional[date] = None,
+        client_ids: Optional[List[int]] = None,
+        chunk_size: Optional[int] = None,
+        progress=None
+    ) -> Dict[str, Any]:
+        """
+        Write the snapshots of every business day in [start, end] for the active clients
+        (or `client_ids`). Without `start`, only the clients behind (see resume_points) are
+        run, from the earliest of their first missing days; with none behind, `end` is rewritten.
+        `progress(done_clients, total_clients)` is called after each chunk.
+        """
+        started = time.monotonic()
+        end = end or date.today()
+        if client_ids is None:
+            result = await DBHelper.execute_query(
+                db, select(Client.id).where(Client.is_active.is_(True)).order_by(Client.id)
+            )
+            client_ids = list(result.scalars().all())
+
+        if start is None:
+            behind = await self.resume_points(db, client_ids, end)
+            if behind:
+                client_ids = [client_id for client_id in client_ids if client_id in behind]
+                start = min(behind.values())
+            else:
+                start = end
+        if start > end:
+            raise ValueError("Start date must be before end date")
+        chunk_size = chunk_size or settings.SNAPSHOT_CHUNK_SIZE
+        chunks = [client_ids[i:i + chunk_size] for i in range(0, len(client_ids), chunk_size)]
+
+        summary = {"start": start, "end": end, "days": int(len(business_days(start, end))),
+                   "clients": len(client_ids), "chunks": len(chunks), "rows": 0}
+        if summary["days"]:
+            # Carga e gravação em sequência na mesma sessão; o cálculo dos lotes seguintes roda em paralelo no pool
+            pending = deque()
+            done = 0
+
+            async def drain():
+                nonlocal done
+                chunk, task = pending.popleft()
+                summary["rows"] += await self._write(db, await task)
+                done += len(chunk)
+                if progress is not None:
+                    progress(done, len(client_ids))
+
+            for chunk in chunks:
+                calendar, prices, lots, flows, asset_ids = await self._load_chunk(db, chunk, start, end)
+                pending.append((chunk, asyncio.ensure_future(
+                    run_in_process(compute_snapshots, calendar, prices, lots, flows, chunk, asset_ids)
+                )))
+                if len(pending) >= settings.SNAPSHOT_PARALLEL_CHUNKS:
+                    await drain()
+            while pending:
+                await drain()
+
+        summary["duration"] = time.monotonic() - started
+        self._stats.update(
+            runs=self._stats["runs"] + 1,
+            rows=summary["rows"],
+            last_run=time.time(),
+            last_duration=summary["duration"],
+            last_range=(start.isoformat(), end.isoformat()),
+        )
+        return summary
+
+    async def client_snapshots(
+        self,
+        db: Union[AsyncSession, Session],
+        client_id: int,
+        start: Optional[date] = None,
+        end: Optional[date] = None
+    ) -> List[PortfolioSnapshot]:
+        query = select(PortfolioSnapshot).where(PortfolioSnapshot.client_id == client_id)
+        if start:
+            query = query.where(PortfolioSnapshot.date >= start)
+        if end:
+            query = query.where(PortfolioSnapshot.date <= end)
+        result = await DBHelper.execute_query(db, query.order_by(PortfolioSnapshot.date))
+        return result.scalars().all()
+
+class SnapshotScheduler:
+    """
+    Runs the snapshot job once a day at SNAPSHOT_RUN_AT (local time) inside the API process.
+    Every worker wakes up, but only the leader (see app.core.leader) runs the job.
+    """
+
+    def __init__(self, service: SnapshotService, session_factory=None):
+        self.service = service
+        self.session_factory = session_factory
+        self._task: Optional[asyncio.Task] = None
+        self._leader = LeaderLock("snapshots")
+        self.leader = False
+        self._stats = {"runs": 0, "skipped": 0, "errors": 0, "next_run": None, "last_error": None}
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def stats(self) -> Dict[str, Any]:
+        return {"running": self.running, "leader": self.leader, **self._stats}
+
+    @staticmethod
+    def seconds_until(run_at: str, now: Optional[datetime] = None) -> float:
+        """Seconds from `now` until the next HH:MM"""
+        now = now or datetime.now()
+        hour, minute = (int(part) for part in run_at.split(":"))
+        target = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+        if target <= now:
+            target += timedelta(days=1)
+        return (target - now).total_seconds()
+
+    async def _run(self):
+        while True:
+            delay = self.seconds_until(settings.SNAPSHOT_RUN_AT)
+            self._stats["next_run"] = time.time() + delay
+            await asyncio.sleep(delay)
+            try:
+                await self.run_scheduled()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self._stats["errors"] += 1
+                self._stats["last_error"] = str(e)
+                print(f"Error writing portfolio snapshots: {e}")
+
+    async def run_scheduled(self) -> bool:
+        """One scheduled run, if this worker leads; returns whether it ran"""
+        # A posse dura mais que o job e vence antes da próxima noite, para outro worker assumir se este cair
+        self.leader = await self._leader.acquire(ttl=SNAPSHOT_LEASE)
+        if not self.leader:
+            self._stats["skipped"] += 1
+            return False
+        async with self.session_factory() as db:
+            await self.service.run(db)
+        self._stats["runs"] += 1
+        return True
+
+    def start(self):
+        if self.running:
+            return
+        if self.session_factory is None:
+            from app.core.database import AsyncSessionLocal
+            self.session_factory = AsyncSessionLocal
+        self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self.leader:
+            await self._leader.release()
+            self.leader = False
+
+snapshot_service = SnapshotService()
+snapshot_scheduler = SnapshotScheduler(snapshot_service)
@@ -0,0 +1,332 @@
+"""
+Monthly client statements.
+
+A run produces one statement per active client for a month: the month's
+movements, the deposit/withdrawal (captação) totals of the month and year to
+date, and the positions held at the end of the month valued at the last close
+on or before it. Clients are processed in chunks; each chunk is loaded with a
+few set-based queries (movements, captação totals, positions, month-end
+prices) and rendered to HTML, CSV and/or JSON in the process pool while the
+next chunk loads. Each worker writes its files directly to
+STATEMENT_DIR/<YYYY-MM>/.
+
+Files are written to a temporary name and renamed, so a statement file either
+exists complete or not at all. A run skips clients whose files already exist,
+so a run interrupted by a crash resumes by starting it again. Progress is kept
+in <YYYY-MM>/_progress.json and reported to the caller after each chunk.
+"""
+import asyncio
+import calendar
+import csv
+import html
+import io
+import json
+import os
+import time
+from collections import deque
+from datetime import date
+from typing import Optional, Dict, Any, List, Iterable, Union
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from sqlalchemy.future import select
+from sqlalchemy import func, case
+from app.core.config import settings
+from app.core.cache_backend import shared_backend
+from app.core.db_helpers import DBHelper
+from app.core.jobs import JobManager, Job
+from app.core.process_pool import run_in_process
+from app.models.allocation import Allocation
+from app.models.asset import Asset
+from app.models.client import Client
+from app.models.movement import Movement, MovementType
+from app.models.sale import Sale
+from app.services.price_history import price_history
+
+FORMATS = ("html", "csv", "json")
+PROGRESS_FILE = "_progress.json"
+
+# Resíduos de ponto flutuante abaixo disso zeram a posição
+EPSILON = 1e-9
+
+def month_bounds(month: str) -> tuple:
+    """First and last day of a 'YYYY-MM' month"""
+    try:
+        year, number = (int(part) for part in month.split("-"))
+        return date(year, number, 1), date(year, number, calendar.monthrange(year, number)[1])
+    except (ValueError, TypeError):
+        raise ValueError(f"Invalid month: {month} (expected YYYY-MM)")
+
+def statement_path(out_dir: str, month: str, client_id: int, fmt: str) -> str:
+    return os.path.join(out_dir, month, f"client_{client_id}.{fmt}")
+
+def _write_atomic(path: str, content: str):
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8", newline="") as f:
+        f.write(content)
+    os.replace(tmp, path)
+
+def render_json(statement: Dict[str, Any]) -> str:
+    return json.dumps(statement, default=str, ensure_ascii=False, indent=2)
+
+def render_csv(statement: Dict[str, Any]) -> str:
+    output = io.StringIO()
+    writer = csv.writer(output)
+    writer.writerow(["Section", "Date", "Type / Ticker", "Quantity", "Amount / Price", "Value", "Note"])
+    for movement in statement["movements"]:
+        writer.writerow(["movement", movement["date"], movement["type"], "", movement["amount"], "", movement["note"] or ""])
+    for position in statement["positions"]:
+        writer.writerow(["position", statement["period_end"], position["ticker"], position["quantity"],
+                         position["price"], position["market_value"], ""])
+    captation = statement["captation"]
+    for key in ("deposits", "withdrawals", "net", "ytd_deposits", "ytd_withdrawals", "ytd_net"):
+        writer.writerow(["captation", statement["period_end"], key, "", captation[key], "", ""])
+    writer.writerow(["total", statement["period_end"], "market_value", "", "", statement["market_value"], ""])
+    return output.getvalue()
+
+def render_html(statement: Dict[str, Any]) -> str:
+    e = lambda value: html.escape(str(value if value is not None else ""))
+    money = lambda value: f"{value:,.2f}" if value is not None else "-"
+    client = statement["client"]
+    captation = statement["captation"]
+    movements = "".join(
+        f"<tr><td>{e(m['date'])}</td><td>{e(m['type'])}</td><td class='n'>{money(m['amount'])}</td><td>{e(m['note'])}</td></tr>"
+        for m in statement["movements"]
+    ) or "<tr><td colspan='4'>Sem movimentações no mês</td></tr>"
+    positions = "".join(
+        f"<tr><td>{e(p['ticker'])}</td><td>{e(p['name'])}</td><td class='n'>{p['quantity']:,.6g}</td>"
+        f"<td class='n'>{money(p['average_cost'])}</td><td class='n'>{money(p['price'])}</td>"
+        f"<td class='n'>{money(p['market_value'])}</td></tr>"
+        for p in statement["positions"]
+    ) or "<tr><td colspan='6'>Sem posições</td></tr>"
+    return f"""<!DOCTYPE html>
+<html lang="pt-BR"><head><meta charset="utf-8"><title>Extrato {e(statement['month'])} - {e(client['name'])}</title>
+<style>body{{font-family:sans-serif;margin:2em}}table{{border-collapse:collapse;width:100%;margin-bottom:1.5em}}
+td,th{{border-bottom:1px solid #ddd;padding:4px 8px;text-align:left}}.n{{text-align:right}}</style></head>
+<body>
+<h1>Extrato mensal {e(statement['month'])}</h1>
+<p>{e(client['name'])} &lt;{e(client['email'])}&gt; &middot; {e(statement['period_start'])} a {e(statement['period_end'])}</p>
+<h2>Movimentações</h2>
+<table><tr><th>Data</th><th>Tipo</th><th class="n">Valor</th><th>Observação</th></tr>{movements}</table>
+<h2>Captação</h2>
+<table><tr><th></th><th class="n">Mês</th><th class="n">Ano</th></tr>
+<tr><td>Aportes</td><td class="n">{money(captation['deposits'])}</td><td class="n">{money(captation['ytd_deposits'])}</td></tr>
+<tr><td>Resgates</td><td class="n">{money(captation['withdrawals'])}</td><td class="n">{money(captation['ytd_withdrawals'])}</td></tr>
+<tr><td>Líquido</td><td class="n">{money(captation['net'])}</td><td class="n">{money(captation['ytd_net'])}</td></tr></table>
+<h2>Posições em {e(statement['period_end'])}</h2>
+<table><tr><th>Ativo</th><th>Nome</th><th class="n">Quantidade</th><th class="n">Preço médio</th><th class="n">Preço</th><th class="n">Valor</th></tr>{positions}</table>
+<p><strong>Valor de mercado: {money(statement['market_value'])}</strong></p>
+</body></html>
+"""
+
+RENDERERS = {"html": render_html, "csv": render_csv, "json": render_json}
+
+def render_statements(statements: List[Dict[str, Any]], formats: List[str], out_dir: str) -> int:
+    """Render and write the statements of a chunk (runs in the process pool); returns files written"""
+    written = 0
+    for statement in statements:
+        for fmt in formats:
+            _write_atomic(statement_path(out_dir, statement["month"], statement["client"]["id"], fmt),
+                          RENDERERS[fmt](statement))
+            written += 1
+    return written
+
+class StatementService:
+    def __init__(self):
+        self.jobs = JobManager(
+            name="statements",
+            concurrency=1,
+            maxsize=settings.JOB_RESULTS_SIZE,
+            ttl=settings.JOB_RESULTS_TTL,
+            backend=shared_backend()
+        )
+
+    @staticmethod
+    def read_progress(month: str, out_dir: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        path = os.path.join(out_dir or settings.STATEMENT_DIR, month, PROGRESS_FILE)
+        if not os.path.exists(path):
+            return None
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+
+    @staticmethod
+    def _save_progress(month_dir: str, progress: Dict[str, Any]):
+        _write_atomic(os.path.join(month_dir, PROGRESS_FILE), json.dumps(progress, default=str))
+
+    async def load_statements(
+        self,
+        db: Union[AsyncSession, Session],
+        clients: List[Any],
+        start: date,
+        end: date
+    ) -> List[Dict[str, Any]]:
+        """Statement data of a chunk of clients with four set-based queries"""
+        client_ids = [client.id for client in clients]
+        month = start.strftime("%Y-%m")
+
+        movements = await DBHelper.execute_query(
+            db,
+            select(Movement.client_id, Movement.date, Movement.type, Movement.amount, Movement.note)
+            .where(Movement.client_id.in_(client_ids), Movement.date >= start, Movement.date <= end)
+            .order_by(Movement.client_id, Movement.date, Movement.id)
+        )
+
+        def total(kind, since):
+            return func.sum(case(((Movement.type == kind) & (Movement.date >= since), Movement.amount), else_=0))
+
+        year_start = date(start.year, 1, 1)
+        captation = await DBHelper.execute_query(
+            db,
+            select(
+                Movement.client_id,
+                total(MovementType.deposit, start).label("deposits"),
+                total(MovementType.withdrawal, start).label("withdrawals"),
+                total(MovementType.deposit, year_start).label("ytd_deposits"),
+                total(MovementType.withdrawal, year_start).label("ytd_withdrawals"),
+            )
+            .where(Movement.client_id.in_(client_ids), Movement.date >= year_start, Movement.date <= end)
+            .group_by(Movement.client_id)
+        )
+
+        # Posição no fim do mês: compras menos vendas até a data
+        sold = (
+            select(Sale.client_id, Sale.asset_id, func.sum(Sale.quantity).label("quantity"))
+            .where(Sale.client_id.in_(client_ids), Sale.sell_date <= end)
+            .group_by(Sale.client_id, Sale.asset_id)
+            .subquery()
+        )
+        positions = await DBHelper.execute_query(
+            db,
+            select(
+                Allocation.client_id, Asset.id.label("asset_id"), Asset.ticker, Asset.name,
+                func.sum(Allocation.quantity).label("bought"),
+                func.sum(Allocation.quantity * Allocation.buy_price).label("cost"),
+                func.max(func.coalesce(sold.c.quantity, 0)).label("sold"),
+            )
+            .join(Asset, Allocation.asset_id == Asset.id)
+            .outerjoin(sold, (sold.c.client_id == Allocation.client_id) & (sold.c.asset_id == Allocation.asset_id))
+            .where(Allocation.client_id.in_(client_ids), Allocation.buy_date <= end)
+            .group_by(Allocation.client_id, Asset.id, Asset.ticker, Asset.name)
+            .order_by(Allocation.client_id, Asset.ticker)
+        )
+        position_rows = positions.all()
+        prices = await price_history.latest_prices(db, sorted({row.asset_id for row in position_rows}), on=end)
+
+        statements = {
+            client.id: {
+                "month": month,
+                "period_start": start.isoformat(),
+                "period_end": end.isoformat(),
+                "client": {"id": client.id, "name": client.name, "email": client.email},
+                "movements": [],
+                "captation": {"deposits": 0.0, "withdrawals": 0.0, "net": 0.0,
+                              "ytd_deposits": 0.0, "ytd_withdrawals": 0.0, "ytd_net": 0.0},
+                "positions": [],
+                "market_value": 0.0,
+            }
+            for client in clients
+        }
+        for row in movements.all():
+            statements[row.client_id]["movements"].append({
+                "date": row.date.isoformat(), "type": row.type.value, "amount": float(row.amount), "note": row.note
+            })
+        for row in captation.all():
+            deposits, withdrawals = float(row.deposits or 0), float(row.withdrawals or 0)
+            ytd_deposits, ytd_withdrawals = float(row.ytd_deposits or 0), float(row.ytd_withdrawals or 0)
+            statements[row.client_id]["captation"] = {
+                "deposits": deposits, "withdrawals": withdrawals, "net": deposits - withdrawals,
+                "ytd_deposits": ytd_deposits, "ytd_withdrawals": ytd_withdrawals, "ytd_net": ytd_deposits - ytd_withdrawals,
+            }
+        for row in position_rows:
+            bought = float(row.bought)
+            quantity = bought - float(row.sold or 0)
+            if quantity <= EPSILON:
+                continue
+            price = prices[row.asset_id][1] if row.asset_id in prices else None
+            statement = statements[row.client_id]
+            statement["positions"].append({
+                "asset_id": row.asset_id,
+                "ticker": row.ticker,
+                "name": row.name,
+                "quantity": quantity,
+                "average_cost": float(row.cost) / bought if bought else 0.0,
+                "price": price,
+                "market_value": quantity * price if price is not None else None,
+            })
+            statement["market_value"] += quantity * price if price is not None else 0.0
+        return list(statements.values())
+
+    async def run(
+        self,
+        db: Union[AsyncSession, Session],
+        month: str,
+        formats: Iterable[str] = ("html",),
+        client_ids: Optional[List[int]] = None,
+        out_dir: Optional[str] = None,
+        force: bool = False,
+        progress=None
+    ) -> Dict[str, Any]:
+        """
+        Generate the statements of `month` ('YYYY-MM') for the active clients (or `client_ids`).
+        Clients whose files already exist are skipped unless `force`.
+        `progress(done_clients, total_clients)` is awaited after each chunk.
+        """
+        started = time.monotonic()
+        start, end = month_bounds(month)
+        formats = sorted(set(formats))
+        unknown = set(formats) - set(FORMATS)
+        if unknown or not formats:
+            raise ValueError(f"Unknown statement format: {', '.join(sorted(unknown)) or '(none)'}")
+        out_dir = out_dir or settings.STATEMENT_DIR
+        month_dir = os.path.join(out_dir, month)
+        os.makedirs(month_dir, exist_ok=True)
+
+        query = select(Client.id, Client.name, Client.email).where(Client.is_active.is_(True)).order_by(Client.id)
+        if client_ids is not None:
+            query = query.where(Client.id.in_(client_ids))
+        clients = (await DBHelper.execute_query(db, query)).all()
+
+        # Retomada: clientes com todos os arquivos já gravados ficam de fora
+        done = {client.id for client in clients
+                if not force and all(os.path.exists(statement_path(out_dir, month, client.id, fmt)) for fmt in formats)}
+        pending_clients = [client for client in clients if client.id not in done]
+        state = {
+            "month": month, "formats": formats, "total": len(clients), "done": len(done),
+            "skipped": len(done), "files": 0, "status": "running", "updated_at": time.time(),
+        }
+        self._save_progress(month_dir, state)
+
+        async def advance(chunk, task):
+            state["files"] += await task
+            state["done"] += len(chunk)
+            state["updated_at"] = time.time()
+            self._save_progress(month_dir, state)
+            if progress is not None:
+                await progress(state["done"], state["total"])
+
+        chunk_size = settings.STATEMENT_CHUNK_SIZE
+        in_flight = deque()
+        for offset in range(0, len(pending_clients), chunk_size):
+            chunk = pending_clients[offset:offset + chunk_size]
+            statements = await self.load_statements(db, chunk, start, end)
+            in_flight.append((chunk, asyncio.ensure_future(run_in_process(render_statements, statements, formats, out_dir))))
+            if len(in_flight) >= settings.STATEMENT_PARALLEL_CHUNKS:
+                await advance(*in_flight.popleft())
+        while in_flight:
+            await advance(*in_flight.popleft())
+
+        state.update(status="done", updated_at=time.time())
+        self._save_progress(month_dir, state)
+        return {**state, "directory": month_dir, "duration": time.monotonic() - started}
+
+    def submit(self, session_factory, month: str, **params) -> Job:
+        """Run a month as a background job with its own session, reporting progress"""
+        async def run(job: Job):
+            async def progress(done, total):
+                await self.jobs.report(job, done / total if total else 1.0)
+
+            async with session_factory() as db:
+                return await self.run(db, month, progress=progress, **params)
+
+        return self.jobs.submit("statements", run)
+
+statement_service = StatementService()
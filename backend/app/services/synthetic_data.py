@@ -0,0 +1,336 @@
+"""
+Seeded synthetic dataset: users, clients, assets, daily prices, allocations and
+movements at a configurable scale, for local benchmarks at production volumes.
+
+Every value is drawn from numpy generators seeded by (seed, stream, chunk), so
+the same seed, scale and chunk size produce the same rows on any machine.
+Clients are generated and loaded in chunks, which keeps memory flat at any
+scale. Rows go through DBHelper.bulk_insert: COPY on PostgreSQL (asyncpg) and
+batched executemany INSERTs on SQLite. Client summaries are computed from the
+generated arrays instead of re-aggregating movements after each chunk.
+
+Ids start after the largest existing id, so a second run appends another
+dataset instead of colliding. On PostgreSQL the id sequences are moved past
+the loaded ids and the tables are analyzed at the end.
+
+Scale 1 is about 1,000 clients, 200 assets and 110,000 movements over 5 years.
+Volumes grow linearly with the scale, except assets (square root).
+"""
+import time
+from datetime import date, timedelta
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple, Union
+import numpy as np
+from sqlalchemy import func, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from app.core.db_helpers import DBHelper
+from app.core.security import get_password_hash
+from app.models.allocation import Allocation
+from app.models.asset import Asset
+from app.models.asset_price import AssetPrice
+from app.models.client import Client
+from app.models.client_summary import ClientSummary
+from app.models.movement import Movement
+from app.models.user import User
+from app.services.price_history import business_days
+
+CHUNK_CLIENTS = 1000
+
+USER_COLUMNS = ["id", "email", "password", "is_active"]
+ASSET_COLUMNS = ["id", "ticker", "name", "exchange", "currency", "asset_class"]
+PRICE_COLUMNS = ["asset_id", "date", "close", "adj_close", "volume"]
+CLIENT_COLUMNS = [
+    "id", "name", "email", "cpf", "birth_date", "gender", "mobile", "city", "state", "country",
+    "investment_profile", "risk_tolerance", "investment_experience", "monthly_income", "net_worth",
+    "is_active", "status", "created_by"
+]
+ALLOCATION_COLUMNS = ["client_id", "asset_id", "quantity", "buy_price", "buy_date"]
+MOVEMENT_COLUMNS = ["client_id", "type", "amount", "date", "note"]
+SUMMARY_COLUMNS = ["client_id", "aum", "cash_balance", "last_movement_date", "positions_count"]
+
+FIRST_NAMES = (
+    "Ana", "Bruno", "Camila", "Daniel", "Eduarda", "Felipe", "Gabriela", "Henrique", "Isabela", "João",
+    "Juliana", "Lucas", "Mariana", "Mateus", "Natália", "Pedro", "Rafaela", "Rodrigo", "Sofia", "Thiago"
+)
+LAST_NAMES = (
+    "Almeida", "Barbosa", "Cardoso", "Costa", "Dias", "Ferreira", "Gomes", "Lima", "Martins", "Oliveira",
+    "Pereira", "Ribeiro", "Rocha", "Santos", "Silva", "Souza", "Teixeira", "Vieira"
+)
+# (cidade, UF, DDD, peso)
+CITIES = (
+    ("São Paulo", "SP", 11, 0.30), ("Rio de Janeiro", "RJ", 21, 0.15), ("Belo Horizonte", "MG", 31, 0.10),
+    ("Brasília", "DF", 61, 0.08), ("Curitiba", "PR", 41, 0.08), ("Porto Alegre", "RS", 51, 0.08),
+    ("Salvador", "BA", 71, 0.06), ("Recife", "PE", 81, 0.05), ("Fortaleza", "CE", 85, 0.05),
+    ("Campinas", "SP", 19, 0.05)
+)
+CITY_WEIGHTS = np.array([city[3] for city in CITIES])
+
+PROFILES = ("conservative", "moderate", "aggressive", "not_defined")
+PROFILE_WEIGHTS = np.array([0.45, 0.35, 0.15, 0.05])
+RISK_RANGES = np.array([[1, 4], [4, 7], [7, 10], [1, 10]])
+EXPERIENCES = ("beginner", "intermediate", "advanced")
+# Lotes médios por perfil
+LOTS_MEAN = np.array([3, 6, 10, 2])
+
+ASSET_CLASSES = ("equity", "fixed_income", "real_estate", "alternative")
+ASSET_CLASS_SHARES = np.array([0.6, 0.2, 0.15, 0.05])
+# Drift e volatilidade anuais por classe
+ASSET_DRIFT = np.array([0.08, 0.10, 0.07, 0.05])
+ASSET_VOL = np.array([0.28, 0.04, 0.18, 0.45])
+# Peso de cada classe na carteira por perfil (linhas na ordem de PROFILES)
+PROFILE_CLASS_WEIGHTS = np.array([
+    [0.20, 0.60, 0.15, 0.05],
+    [0.50, 0.30, 0.15, 0.05],
+    [0.75, 0.05, 0.10, 0.10],
+    [0.60, 0.20, 0.15, 0.05],
+])
+EXCHANGES = (("B3", "BRL"), ("NYSE", "USD"), ("NASDAQ", "USD"))
+
+class DatasetPlan(NamedTuple):
+    users: int
+    clients: int
+    assets: int
+    years: int
+
+class ClientBatch(NamedTuple):
+    """One chunk of generated clients plus the arrays their activity is drawn from"""
+    ids: np.ndarray
+    records: List[tuple]
+    profile: np.ndarray
+    net_worth: np.ndarray
+    income: np.ndarray
+    start_idx: np.ndarray
+
+def plan_dataset(scale: float, years: int = 5, users: Optional[int] = None) -> DatasetPlan:
+    if scale <= 0:
+        raise ValueError("scale must be positive")
+    if years < 1:
+        raise ValueError("years must be at least 1")
+    return DatasetPlan(
+        users=users if users is not None else max(1, round(10 * scale)),
+        clients=max(1, round(1000 * scale)),
+        assets=max(5, round(200 * scale ** 0.5)),
+        years=years
+    )
+
+def cpf(number: int) -> str:
+    """Valid CPF (check digits included) from the last 9 digits of number"""
+    digits = [int(c) for c in f"{number % 10**9:09d}"]
+    for length in (9, 10):
+        total = sum(digit * weight for digit, weight in zip(digits, range(length + 1, 1, -1)))
+        digits.append(total * 10 % 11 % 10)
+    s = "".join(map(str, digits))
+    return f"{s[:3]}.{s[3:6]}.{s[6:9]}-{s[9:]}"
+
+def generate_users(start_id: int, n: int, password_hash: str) -> List[tuple]:
+    return [(user_id, f"user{user_id}@synthetic.example", password_hash, True)
+            for user_id in range(start_id, start_id + n)]
+
+def generate_assets(rng: np.random.Generator, start_id: int, n: int,
+                    calendar: np.ndarray) -> Tuple[List[tuple], np.ndarray, np.ndarray]:
+    """Asset rows, asset class index per asset and a (days, assets) matrix of daily closes"""
+    classes = rng.choice(len(ASSET_CLASSES), size=n, p=ASSET_CLASS_SHARES)
+    exchanges = rng.integers(0, len(EXCHANGES), n)
+    drift, vol = ASSET_DRIFT[classes], ASSET_VOL[classes]
+
+    # Movimento browniano geométrico a partir de preços iniciais log-normais
+    start_price = np.exp(rng.normal(np.log(40), 0.8, n))
+    daily = rng.normal((drift - vol ** 2 / 2) / 252, vol / np.sqrt(252), size=(len(calendar), n))
+    prices = np.round(start_price * np.exp(np.cumsum(daily, axis=0)), 4)
+
+    records = []
+    for i, (asset_class, exchange) in enumerate(zip(classes.tolist(), exchanges.tolist())):
+        asset_id = start_id + i
+        label = ASSET_CLASSES[asset_class].replace("_", " ").title()
+        records.append((asset_id, f"SYN{asset_id:05d}", f"Synthetic {label} {asset_id}",
+                        EXCHANGES[exchange][0], EXCHANGES[exchange][1], ASSET_CLASSES[asset_class]))
+    return records, classes, prices
+
+def price_records(rng: np.random.Generator, asset_ids: np.ndarray, calendar: np.ndarray,
+                  prices: np.ndarray) -> List[tuple]:
+    dates = calendar.astype(object).tolist()
+    volumes = rng.integers(10_000, 5_000_000, size=prices.shape).tolist()
+    records = []
+    for j, asset_id in enumerate(asset_ids.tolist()):
+        closes = prices[:, j].tolist()
+        records.extend((asset_id, day, close, close, volume[j])
+                       for day, close, volume in zip(dates, closes, volumes))
+    return records
+
+def generate_clients(rng: np.random.Generator, start_id: int, n: int, calendar: np.ndarray) -> ClientBatch:
+    ids = np.arange(start_id, start_id + n)
+    today = calendar[-1].astype(object)
+    age = np.clip(rng.normal(45, 14, n), 18, 85)
+    birth = [today - timedelta(days=int(days)) for days in (age * 365.25).astype(int)]
+    profile = rng.choice(len(PROFILES), size=n, p=PROFILE_WEIGHTS)
+    risk = rng.integers(RISK_RANGES[profile, 0], RISK_RANGES[profile, 1] + 1)
+    # Experiência cresce com a idade
+    experience = np.minimum((age - 18) / 20 + rng.normal(0, 0.7, n), 2).clip(0).astype(int)
+    income = np.round(np.exp(rng.normal(np.log(8000), 0.8, n)), 2)
+    net_worth = np.round(income * 12 * np.exp(rng.normal(np.log(3), 1.0, n)), 2)
+    city = rng.choice(len(CITIES), size=n, p=CITY_WEIGHTS / CITY_WEIGHTS.sum())
+    gender = rng.choice(3, size=n, p=[0.49, 0.49, 0.02])
+    status = rng.choice(3, size=n, p=[0.9, 0.05, 0.05])
+    first = rng.integers(0, len(FIRST_NAMES), n)
+    last = rng.integers(0, len(LAST_NAMES), (n, 2))
+    phone = rng.integers(0, 10**8, n)
+    # Clientes antigos são mais comuns que recentes
+    start_idx = (rng.beta(1, 3, n) * len(calendar) * 0.9).astype(int)
+
+    records = []
+    for i, client_id in enumerate(ids.tolist()):
+        name = f"{FIRST_NAMES[first[i]]} {LAST_NAMES[last[i, 0]]} {LAST_NAMES[last[i, 1]]}"
+        city_name, state, ddd, _ = CITIES[city[i]]
+        client_status = ("active", "inactive", "prospect")[status[i]]
+        records.append((
+            client_id, name, f"cliente{client_id}@synthetic.example", cpf(client_id * 7919), birth[i],
+            ("male", "female", "other")[gender[i]], f"({ddd}) 9{phone[i] // 10**4:04d}-{phone[i] % 10**4:04d}",
+            city_name, state, "Brasil", PROFILES[profile[i]], int(risk[i]), EXPERIENCES[experience[i]],
+            float(income[i]), float(net_worth[i]), client_status == "active", client_status, "synthetic"
+        ))
+    return ClientBatch(ids, records, profile, net_worth, income, start_idx)
+
+def _days_after(rng: np.random.Generator, start_idx: np.ndarray, n_days: int) -> np.ndarray:
+    return start_idx + (rng.random(len(start_idx)) * (n_days - start_idx)).astype(int)
+
+def generate_activity(rng: np.random.Generator, clients: ClientBatch, calendar: np.ndarray, prices: np.ndarray,
+                      asset_ids: np.ndarray, asset_classes: np.ndarray) -> Tuple[List[tuple], List[tuple], List[tuple]]:
+    """Allocation, movement and client summary rows of a chunk of clients"""
+    n, n_days = len(clients.ids), len(calendar)
+    dates = calendar.astype(object)
+
+    # Movimentos: depósito inicial no início do relacionamento, depois ~2 por mês (75% depósitos)
+    months = (n_days - clients.start_idx) / 21
+    counts = rng.poisson(np.exp(rng.normal(np.log(2.0), 0.5, n)) * months) + 1
+    owner = np.repeat(np.arange(n), counts)
+    first = np.r_[0, np.cumsum(counts)[:-1]]
+    day = _days_after(rng, clients.start_idx[owner], n_days)
+    day[first] = clients.start_idx
+    deposit = rng.random(len(owner)) < 0.75
+    deposit[first] = True
+    amount = clients.income[owner] * np.exp(rng.normal(np.log(0.3), 0.9, len(owner)))
+    amount = np.where(deposit, amount, amount * 0.6)
+    amount[first] = clients.net_worth * 0.3
+    amount = np.round(np.maximum(amount, 10), 2)
+    movement_type = np.where(deposit, "deposit", "withdrawal")
+
+    client_ids = clients.ids[owner].tolist()
+    movements = list(zip(client_ids, movement_type.tolist(), amount.tolist(), dates[day].tolist(),
+                         [None] * len(client_ids)))
+
+    # Lotes: classe sorteada pelos pesos do perfil, ativo sorteado dentro da classe
+    lots = rng.poisson(LOTS_MEAN[clients.profile]) + 1
+    lot_owner = np.repeat(np.arange(n), lots)
+    cumulative = np.cumsum(PROFILE_CLASS_WEIGHTS, axis=1)[clients.profile[lot_owner]]
+    lot_class = np.minimum((rng.random(len(lot_owner))[:, None] >= cumulative).sum(axis=1), len(ASSET_CLASSES) - 1)
+    lot_asset = np.empty(len(lot_owner), dtype=int)
+    for asset_class in range(len(ASSET_CLASSES)):
+        mask = lot_class == asset_class
+        pool = np.flatnonzero(asset_classes == asset_class)
+        if not len(pool):
+            pool = np.arange(len(asset_ids))
+        lot_asset[mask] = pool[rng.integers(0, len(pool), mask.sum())]
+    lot_day = _days_after(rng, clients.start_idx[lot_owner], n_days)
+    buy_price = np.maximum(np.round(prices[lot_day, lot_asset] * np.exp(rng.normal(0, 0.005, len(lot_owner))), 2), 0.01)
+    value = clients.net_worth[lot_owner] * 0.5 / lots[lot_owner] * np.exp(rng.normal(0, 0.5, len(lot_owner)))
+    quantity = np.maximum(np.floor(value / buy_price), 1)
+
+    allocations = list(zip(clients.ids[lot_owner].tolist(), asset_ids[lot_asset].tolist(), quantity.tolist(),
+                           buy_price.tolist(), dates[lot_day].tolist()))
+
+    # Resumo calculado dos arrays (mesmos valores que ClientSummaryService.compute)
+    aum = np.round(np.bincount(lot_owner, weights=quantity * buy_price, minlength=n), 2)
+    cash = np.round(np.bincount(owner, weights=np.where(deposit, amount, -amount), minlength=n), 2)
+    last_day = np.zeros(n, dtype=int)
+    np.maximum.at(last_day, owner, day)
+    positions = np.bincount(np.unique(lot_owner * len(asset_ids) + lot_asset) // len(asset_ids), minlength=n)
+    summaries = list(zip(clients.ids.tolist(), aum.tolist(), cash.tolist(), dates[last_day].tolist(),
+                         positions.tolist()))
+    return allocations, movements, summaries
+
+class SyntheticDataService:
+    async def _next_id(self, db: Union[AsyncSession, Session], model) -> int:
+        result = await DBHelper.execute_query(db, select(func.max(model.id)))
+        return (result.scalar() or 0) + 1
+
+    async def _finish_postgres(self, db: Union[AsyncSession, Session]):
+        # Ids explícitos não avançam as sequences; ANALYZE atualiza as estatísticas do planner
+        for model in (User, Client, Asset):
+            table = model.__tablename__
+            await DBHelper.execute_query(db, text(
+                f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), (SELECT MAX(id) FROM {table}))"
+            ))
+        await DBHelper.commit(db)
+        for model in (User, Client, Asset, AssetPrice, Allocation, Movement, ClientSummary):
+            await DBHelper.execute_query(db, text(f"ANALYZE {model.__tablename__}"))
+        await DBHelper.commit(db)
+
+    async def load(
+        self,
+        db: Union[AsyncSession, Session],
+        seed: int = 42,
+        scale: float = 1.0,
+        years: int = 5,
+        users: Optional[int] = None,
+        prices: bool = True,
+        password: str = "synthetic123",
+        end: Optional[date] = None,
+        chunk_size: int = CHUNK_CLIENTS,
+        progress: Optional[Callable[[int, int], None]] = None,
+    ) -> Dict:
+        """
+        Generate and load a dataset, committing after each chunk of clients.
+        Returns the number of rows written per table.
+        """
+        plan = plan_dataset(scale, years, users)
+        started = time.perf_counter()
+        end = end or date.today()
+        calendar = business_days(end - timedelta(days=365 * plan.years), end)
+        written = dict.fromkeys(("users", "assets", "asset_prices", "clients", "allocations", "movements"), 0)
+
+        user_id = await self._next_id(db, User)
+        asset_id = await self._next_id(db, Asset)
+        client_id = await self._next_id(db, Client)
+
+        # Um único hash: bcrypt por usuário dominaria o tempo de carga
+        written["users"] = await DBHelper.bulk_insert(
+            db, User, USER_COLUMNS, generate_users(user_id, plan.users, get_password_hash(password))
+        )
+        rng = np.random.default_rng([seed, 0])
+        asset_records, asset_classes, price_matrix = generate_assets(rng, asset_id, plan.assets, calendar)
+        asset_ids = np.arange(asset_id, asset_id + plan.assets)
+        written["assets"] = await DBHelper.bulk_insert(db, Asset, ASSET_COLUMNS, asset_records)
+        if prices:
+            written["asset_prices"] = await DBHelper.bulk_insert(
+                db, AssetPrice, PRICE_COLUMNS, price_records(rng, asset_ids, calendar, price_matrix)
+            )
+        await DBHelper.commit(db)
+
+        for chunk, offset in enumerate(range(0, plan.clients, chunk_size)):
+            rng = np.random.default_rng([seed, 1, chunk])
+            clients = generate_clients(rng, client_id + offset, min(chunk_size, plan.clients - offset), calendar)
+            allocations, movements, summaries = generate_activity(
+                rng, clients, calendar, price_matrix, asset_ids, asset_classes
+            )
+            written["clients"] += await DBHelper.bulk_insert(db, Client, CLIENT_COLUMNS, clients.records)
+            written["allocations"] += await DBHelper.bulk_insert(db, Allocation, ALLOCATION_COLUMNS, allocations)
+            written["movements"] += await DBHelper.bulk_insert(db, Movement, MOVEMENT_COLUMNS, movements)
+            await DBHelper.bulk_insert(db, ClientSummary, SUMMARY_COLUMNS, summaries)
+            await DBHelper.commit(db)
+            if progress:
+                progress(offset + len(clients.ids), plan.clients)
+
+        if DBHelper.dialect_name(db) == "postgresql":
+            await self._finish_postgres(db)
+
+        return {
+            **written,
+            "seed": seed,
+            "scale": scale,
+            "start": calendar[0].astype(object),
+            "end": calendar[-1].astype(object),
+            "first_client_id": client_id,
+            "duration": time.perf_counter() - started,
+        }
+
+synthetic_data = SyntheticDataService()
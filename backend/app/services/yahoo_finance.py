@@ -1,157 +1,193 @@
-import yfinance as yf
 import asyncio
-import time
-from typing import Optional, Dict, Any
-from starlette.concurrency import run_in_threadpool
-import random
+from datetime import date
+from typing import Optional, Dict, Any, List
+from functools import partial
+from app.core.config import settings
+from app.core.cache import TTLCache
+from app.core.cache_backend import shared_backend
+from app.core.rate_limiter import AsyncTokenBucket, RateLimitExceeded
+from app.core.circuit_breaker import CircuitBreaker, CircuitOpenError, hedged
+from app.services.market_data import MarketDataError, MarketDataProvider, create_provider
+
+# Períodos aceitos pelo histórico recente, em dias corridos
+HISTORY_PERIODS = {"5d": 5, "1mo": 31, "3mo": 92, "6mo": 183, "1y": 366, "2y": 731, "5y": 1827}
 
 class YahooFinanceService:
-    def __init__(self):
-        # Cache para evitar muitas requisições
-        self._cache = {}
-        self._last_request_time = 0
+    """
+    Dados de mercado com cache, limite de chamadas e coalescência de buscas.
+    A origem dos dados é o provider configurado em MARKET_DATA_PROVIDER (Yahoo Finance por padrão).
+    """
+    def __init__(self, provider: Optional[MarketDataProvider] = None):
+        self.provider = provider or create_provider()
+        # Caches limitados com TTL, revalidação em segundo plano e coalescência de buscas concorrentes
+        self._cache = TTLCache(
+            maxsize=settings.MARKET_DATA_CACHE_SIZE,
+            ttl=settings.ASSET_INFO_CACHE_TTL,
+            stale_ttl=settings.ASSET_INFO_STALE_TTL,
+            name="asset_info",
+            backend=shared_backend()
+        )
+        self._quotes = TTLCache(
+            maxsize=settings.MARKET_DATA_CACHE_SIZE,
+            ttl=settings.QUOTE_CACHE_TTL,
+            stale_ttl=settings.QUOTE_STALE_TTL,
+            name="quotes",
+            backend=shared_backend()
+        )
+        # Limite de chamadas ao Yahoo Finance compartilhado por todas as requisições
+        self._limiter = AsyncTokenBucket(
+            rate=settings.MARKET_DATA_RATE_LIMIT,
+            burst=settings.MARKET_DATA_BURST,
+            max_queue=settings.MARKET_DATA_MAX_QUEUE,
+            name="yahoo_finance"
+        )
+        # Com o provider fora do ar, as chamadas falham na hora e o cache (inclusive stale) responde
+        self._breaker = CircuitBreaker(
+            "market_data",
+            failure_threshold=settings.CIRCUIT_FAILURE_THRESHOLD,
+            recovery_timeout=settings.CIRCUIT_RECOVERY_TIMEOUT
+        )
+        self._background = set()
+    
+    async def _call(self, fn, *args, timeout: float, hedge: bool = True):
+        """
+        Chamada ao provider com prazo, tentativa paralela (hedge) se a primeira demorar
+        e circuit breaker. Falhas chegam como MarketDataError.
+        """
+        hedge_delay = settings.MARKET_DATA_HEDGE_DELAY if hedge else 0
+        try:
+            return await self._breaker.call(lambda: hedged(lambda: fn(*args), hedge_delay), timeout=timeout)
+        except CircuitOpenError as e:
+            raise MarketDataError(str(e)) from e
+        except asyncio.TimeoutError as e:
+            raise MarketDataError(f"Market data call timed out after {timeout}s") from e
+    
+    def cache_stats(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Estatísticas de acertos, falhas e coalescência dos caches de dados de mercado
+        """
+        return {
+            "provider": self.provider.name,
+            "asset_info": self._cache.stats(),
+            "quotes": self._quotes.stats(),
+            "rate_limiter": self._limiter.stats(),
+            "circuit_breaker": self._breaker.stats()
+        }
         
-    async def search_asset(self, symbol: str) -> Optional[Dict[str, Any]]:
+    async def search_asset(self, symbol: str, deadline: Optional[float] = None) -> Optional[Dict[str, Any]]:
         """
-        Busca informações de um ativo usando yfinance com rate limiting e fallback
+        Busca informações de um ativo no provider, com rate limiting. Retorna None se o
+        símbolo não existir e lança MarketDataError se o provider falhar.
+        Lança RateLimitExceeded quando a fila de chamadas está cheia ou não seria atendida
+        dentro do prazo; nesse caso a busca continua em segundo plano para aquecer o cache.
         """
         symbol = symbol.upper()
+        deadline = settings.MARKET_DATA_REQUEST_DEADLINE if deadline is None else deadline
         
-        # Verificar cache primeiro
-        if symbol in self._cache:
-            cache_time, data = self._cache[symbol]
-            # Cache válido por 5 minutos
-            if time.time() - cache_time < 300:
-                return data
+        # Requisições simultâneas pelo mesmo símbolo compartilham uma única busca
+        try:
+            result = await self._cache.get_or_load(symbol, lambda: self._fetch_asset_info(symbol, deadline))
+        except RateLimitExceeded:
+            self._spawn(self._warm_asset_info(symbol))
+            raise
         
+        return result
+    
+    def _spawn(self, coro):
+        task = asyncio.ensure_future(coro)
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+    
+    async def _warm_asset_info(self, symbol: str):
+        """
+        Busca em segundo plano, com prazo maior, para que a próxima requisição encontre o cache
+        """
         try:
-            # Rate limiting - esperar mais tempo entre requisições
-            current_time = time.time()
-            time_since_last = current_time - self._last_request_time
-            if time_since_last < 10:  # Aumentado para 10 segundos
-                wait_time = 10 - time_since_last + random.uniform(2, 5)
-                await asyncio.sleep(wait_time)
-            
-            # Executa em thread pool para não bloquear o loop principal
-            ticker_data = await run_in_threadpool(self._get_ticker_info, symbol)
-            self._last_request_time = time.time()
-            
-            if not ticker_data:
-                # Fallback para dados mock quando Yahoo Finance não está disponível
-                return self._get_fallback_data(symbol)
-            
-            result = {
-                "ticker": symbol,
-                "name": ticker_data.get("longName", ticker_data.get("shortName", symbol)),
-                "exchange": ticker_data.get("exchange", ""),
-                "currency": ticker_data.get("currency", "USD")
-            }
-            
-            # Salvar no cache
-            self._cache[symbol] = (time.time(), result)
-            
-            return result
-            
-        except Exception as e:
-            print(f"Error fetching Yahoo Finance data for {symbol}: {e}")
-            # Fallback para dados mock em caso de erro
-            return self._get_fallback_data(symbol)
+            await self._cache.get_or_load(
+                symbol, lambda: self._fetch_asset_info(symbol, settings.MARKET_DATA_BACKGROUND_DEADLINE)
+            )
+        except (RateLimitExceeded, MarketDataError):
+            pass
     
-    def _get_ticker_info(self, symbol: str) -> Optional[Dict[str, Any]]:
+    async def _fetch_asset_info(self, symbol: str, deadline: float) -> Optional[Dict[str, Any]]:
         """
-        Função síncrona para buscar dados do ticker com retry e configurações otimizadas
+        Busca as informações no provider (None, que não é cacheado, se o símbolo não existir)
         """
-        max_retries = 2  # Reduzido para evitar muitas tentativas
-        for attempt in range(max_retries):
+        await self._limiter.acquire(timeout=deadline)
+        try:
+            return await self._call(self.provider.get_asset_info, symbol, timeout=settings.MARKET_DATA_CALL_TIMEOUT)
+        except MarketDataError as e:
+            print(f"Error fetching market data for {symbol}: {e}")
+            raise
+    
+    async def get_quotes(self, symbols: List[str], deadline: Optional[float] = None) -> Dict[str, Dict[str, Any]]:
+        """
+        Cotações de vários símbolos: servidas do cache quando recentes, e as que faltam
+        buscadas em lotes (uma chamada ao Yahoo Finance por lote de QUOTE_BATCH_SIZE símbolos)
+        """
+        deadline = settings.MARKET_DATA_REQUEST_DEADLINE if deadline is None else deadline
+        return await self._quotes.get_many_or_load(
+            [symbol.upper() for symbol in symbols], partial(self._fetch_quotes, deadline=deadline)
+        )
+    
+    async def _fetch_quotes(self, symbols: List[str], deadline: float) -> Dict[str, Dict[str, Any]]:
+        quotes = {}
+        for start in range(0, len(symbols), settings.QUOTE_BATCH_SIZE):
+            batch = symbols[start:start + settings.QUOTE_BATCH_SIZE]
+            try:
+                await self._limiter.acquire(timeout=deadline)
+            except RateLimitExceeded:
+                # Sem vaga no limite: devolve o que já foi obtido, o restante fica sem cotação
+                break
             try:
-                # Delay exponencial entre tentativas
-                if attempt > 0:
-                    time.sleep((2 ** attempt) + random.uniform(1, 3))
-                
-                # Configurar yfinance com headers customizados
-                ticker = yf.Ticker(symbol)
-                
-                # Configurar session com user-agent customizado
-                ticker.session.headers.update({
-                    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-                })
-                
-                info = ticker.info
-                
-                # Verificar se os dados são válidos
-                if not info or len(info) < 5:
-                    if attempt < max_retries - 1:
-                        continue
-                    return None
-                    
-                return info
-                
-            except Exception as e:
-                print(f"Attempt {attempt + 1} failed for {symbol}: {e}")
-                if attempt == max_retries - 1:
-                    return None
-                
-        return None
+                quotes.update(await self._call(self.provider.get_quotes, batch, timeout=settings.MARKET_DATA_CALL_TIMEOUT))
+            except MarketDataError as e:
+                print(f"Error fetching quotes for {len(batch)} symbols: {e}")
+                if self._breaker.state != "closed":
+                    # Circuito aberto: os lotes restantes falhariam na hora, devolve o que já foi obtido
+                    break
+        return quotes
     
-    def _get_fallback_data(self, symbol: str) -> Dict[str, Any]:
-        """
-        Retorna dados mock quando Yahoo Finance não está disponível
-        """
-        # Dados mock para alguns symbols conhecidos
-        fallback_data = {
-            "AAPL": {"name": "Apple Inc.", "exchange": "NASDAQ", "currency": "USD"},
-            "GOOGL": {"name": "Alphabet Inc.", "exchange": "NASDAQ", "currency": "USD"},
-            "MSFT": {"name": "Microsoft Corporation", "exchange": "NASDAQ", "currency": "USD"},
-            "TSLA": {"name": "Tesla, Inc.", "exchange": "NASDAQ", "currency": "USD"},
-            "AMZN": {"name": "Amazon.com, Inc.", "exchange": "NASDAQ", "currency": "USD"},
-            "META": {"name": "Meta Platforms, Inc.", "exchange": "NASDAQ", "currency": "USD"},
-            "NFLX": {"name": "Netflix, Inc.", "exchange": "NASDAQ", "currency": "USD"},
-            "NVDA": {"name": "NVIDIA Corporation", "exchange": "NASDAQ", "currency": "USD"},
-        }
-        
-        if symbol in fallback_data:
-            data = fallback_data[symbol]
-            return {
-                "ticker": symbol,
-                "name": data["name"],
-                "exchange": data["exchange"],
-                "currency": data["currency"]
-            }
-        else:
-            # Fallback genérico para symbols desconhecidos
-            return {
-                "ticker": symbol,
-                "name": f"{symbol} Corp.",
-                "exchange": "NYSE",
-                "currency": "USD"
-            }
+    async def cached_quotes(self, symbols: List[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Cotações já presentes no cache (inclusive as vencidas dentro da janela stale), deste
+        processo ou do backend compartilhado, sem buscar no Yahoo Finance
+        """
+        return await self._quotes.get_many([symbol.upper() for symbol in symbols])
     
-    async def get_stock_history(self, symbol: str, period: str = "1mo") -> Optional[Dict[str, Any]]:
+    async def refresh_quotes(self, symbols: List[str], deadline: Optional[float] = None) -> Dict[str, Dict[str, Any]]:
         """
-        Obtém histórico de preços do ativo
+        Busca cotações ignorando o cache e as grava nele, inclusive no backend compartilhado
+        para os outros workers (usado pela atualização em segundo plano)
         """
-        try:
-            history_data = await run_in_threadpool(self._get_history_data, symbol, period)
-            return history_data
-        except Exception as e:
-            print(f"Error fetching history for {symbol}: {e}")
-            return None
+        deadline = settings.MARKET_DATA_BACKGROUND_DEADLINE if deadline is None else deadline
+        quotes = await self._fetch_quotes([symbol.upper() for symbol in symbols], deadline)
+        await self._quotes.set_many(quotes)
+        return quotes
+    
+    async def get_current_price(self, symbol: str) -> Optional[Dict[str, Any]]:
+        """
+        Cotação atual de um símbolo, servida pelo cache de cotações em lote
+        """
+        quotes = await self.get_quotes([symbol])
+        return quotes.get(symbol.upper())
     
-    def _get_history_data(self, symbol: str, period: str) -> Optional[Dict[str, Any]]:
+    async def get_history_range(self, symbol: str, start: date, end: date,
+                                deadline: Optional[float] = None) -> List[Dict[str, Any]]:
         """
-        Função síncrona para buscar histórico de preços
+        Obtém o histórico diário (OHLCV + fechamento ajustado) entre start e end, inclusive.
+        Passa pelo rate limiting com o prazo informado (padrão: o de segundo plano, usado pela
+        ingestão em lote) e lança RateLimitExceeded se não houver vaga dentro dele.
         """
+        deadline = settings.MARKET_DATA_BACKGROUND_DEADLINE if deadline is None else deadline
+        await self._limiter.acquire(timeout=deadline)
         try:
-            ticker = yf.Ticker(symbol)
-            hist = ticker.history(period=period)
-            
-            if hist.empty:
-                return None
-            
-            # Converter para formato serializável
-            return hist.tail(5).to_dict(orient="index")  # Últimos 5 registros
-        except Exception as e:
-            print(f"Error in _get_history_data for {symbol}: {e}")
-            return None
+            return await self._call(
+                self.provider.get_history_range, symbol.upper(), start, end,
+                timeout=settings.MARKET_DATA_HISTORY_TIMEOUT, hedge=False
+            )
+        except MarketDataError as e:
+            print(f"Error fetching history range for {symbol}: {e}")
+            return []
 
-yahoo_finance = YahooFinanceService()
\ No newline at end of file
+yahoo_finance = YahooFinanceService()
@@ -0,0 +1,69 @@
+"""
+Benchmark of the market-data path (cache, single-flight, rate limiter) against
+the offline replay provider, so results do not depend on the network.
+
+    python -m benchmarks.bench_market_data --symbols 500 --requests 5000 --latency-ms 50
+"""
+import argparse
+import asyncio
+import time
+import numpy as np
+from app.core.rate_limiter import AsyncTokenBucket, RateLimitExceeded
+from app.services.market_data import ReplayProvider, MarketDataError
+from app.services.yahoo_finance import YahooFinanceService
+
+def synthetic_fixture(n_symbols: int):
+    symbols = [f"SYM{i:05d}" for i in range(n_symbols)]
+    return symbols, {
+        "assets": {symbol: {"name": f"Synthetic {symbol}", "exchange": "TEST", "currency": "USD"} for symbol in symbols},
+        "quotes": {symbol: {"price": 100.0, "previous_close": 99.0, "as_of": "2024-01-02"} for symbol in symbols},
+    }
+
+async def run(args):
+    symbols, data = synthetic_fixture(args.symbols)
+    provider = ReplayProvider(data=data, latency_ms=args.latency_ms, jitter_ms=args.latency_ms / 2,
+                              error_rate=args.error_rate, seed=args.seed)
+    service = YahooFinanceService(provider=provider)
+    service._limiter = AsyncTokenBucket(rate=args.rate, burst=args.burst, max_queue=args.requests)
+
+    rng = np.random.default_rng(args.seed)
+    # Popularidade com cauda longa: poucos símbolos concentram a maior parte das buscas
+    picks = np.minimum(rng.zipf(1.3, args.requests) - 1, args.symbols - 1)
+    outcomes = {"ok": 0, "rate_limited": 0, "errors": 0}
+    latencies = []
+
+    async def one(symbol):
+        started = time.perf_counter()
+        try:
+            await service.search_asset(symbol, deadline=args.deadline)
+            outcomes["ok"] += 1
+        except RateLimitExceeded:
+            outcomes["rate_limited"] += 1
+        except MarketDataError:
+            outcomes["errors"] += 1
+        latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(symbols[i]) for i in picks))
+    elapsed = time.perf_counter() - started
+
+    stats = service.cache_stats()["asset_info"]
+    print(f"symbols={args.symbols} requests={args.requests} latency={args.latency_ms}ms error_rate={args.error_rate}")
+    print(f"total: {elapsed * 1000:.1f}ms, upstream calls={provider.calls}, outcomes={outcomes}")
+    print(f"latency p50={np.percentile(latencies, 50) * 1000:.1f}ms p99={np.percentile(latencies, 99) * 1000:.1f}ms")
+    print(f"cache: hit_ratio={stats['hit_ratio']:.3f} coalesced={stats['coalesced']} misses={stats['misses']}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--symbols", type=int, default=500)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--latency-ms", type=float, default=50)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate", type=float, default=1000, help="Rate limiter tokens per second")
+    parser.add_argument("--burst", type=int, default=100)
+    parser.add_argument("--deadline", type=float, default=30)
+    parser.add_argument("--seed", type=int, default=42)
+    asyncio.run(run(parser.parse_args()))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Benchmark of the vectorized performance engine on synthetic data.
+
+    python -m benchmarks.bench_performance --clients 10000 --years 5
+"""
+import argparse
+import time
+from datetime import date, timedelta
+import numpy as np
+from app.services.performance import compute_performance, Lots, Flows
+from app.services.price_history import business_days
+
+def synthetic_inputs(n_clients: int, years: int, n_assets: int, lots_per_client: int,
+                     flows_per_client: int, seed: int):
+    rng = np.random.default_rng(seed)
+    end = date.today()
+    calendar = business_days(end - timedelta(days=365 * years), end)
+    n_days = len(calendar)
+
+    # Random walk de preços com drift e volatilidade anual típicos de ações
+    daily_returns = rng.normal(0.0003, 0.015, size=(n_days, n_assets))
+    prices = 50.0 * np.exp(np.cumsum(daily_returns, axis=0))
+
+    n_lots = n_clients * lots_per_client
+    lot_assets = rng.integers(0, n_assets, n_lots)
+    lot_days = rng.integers(0, n_days, n_lots)
+    quantity = rng.integers(1, 500, n_lots).astype(np.float64)
+    lots = Lots(
+        client_idx=np.repeat(np.arange(n_clients), lots_per_client),
+        asset_idx=lot_assets,
+        date_idx=lot_days,
+        quantity=quantity,
+        cost=quantity * prices[lot_days, lot_assets]
+    )
+
+    n_flows = n_clients * flows_per_client
+    amount = rng.uniform(100, 20000, n_flows) * np.where(rng.random(n_flows) < 0.8, 1.0, -1.0)
+    flows = Flows(
+        client_idx=np.repeat(np.arange(n_clients), flows_per_client),
+        date_idx=rng.integers(0, n_days, n_flows),
+        amount=amount
+    )
+    return calendar, prices, lots, flows
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=10000)
+    parser.add_argument("--years", type=int, default=5)
+    parser.add_argument("--assets", type=int, default=300)
+    parser.add_argument("--lots-per-client", type=int, default=8)
+    parser.add_argument("--flows-per-client", type=int, default=24)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    calendar, prices, lots, flows = synthetic_inputs(
+        args.clients, args.years, args.assets, args.lots_per_client, args.flows_per_client, args.seed
+    )
+    generated = time.perf_counter()
+    result = compute_performance(calendar, prices, lots, flows, n_clients=args.clients)
+    finished = time.perf_counter()
+
+    print(f"clients={args.clients} days={len(calendar)} assets={args.assets} "
+          f"lots={len(lots.quantity)} flows={len(flows.amount)}")
+    print(f"data generation: {generated - started:.2f}s")
+    print(f"compute_performance: {finished - generated:.2f}s "
+          f"({(finished - generated) / args.clients * 1e6:.0f}us per client)")
+    print(f"median TWR={np.median(result.twr):.4f} median MWR={np.median(result.mwr):.4f} "
+          f"median max drawdown={np.median(result.max_drawdown):.4f}")
+
+if __name__ == "__main__":
+    main()
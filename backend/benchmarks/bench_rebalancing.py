@@ -0,0 +1,34 @@
+"""
+Benchmark of the vectorized drift evaluation on a synthetic book.
+
+    python -m benchmarks.bench_rebalancing --clients 50000
+"""
+import argparse
+import time
+import numpy as np
+from app.services.rebalancing import evaluate_drift, ASSET_CLASSES, PROFILES
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=50000)
+    parser.add_argument("--positions-per-client", type=int, default=12)
+    parser.add_argument("--threshold", type=float, default=0.05)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    n_rows = args.clients * args.positions_per_client
+    client_idx = np.repeat(np.arange(args.clients), args.positions_per_client)
+    class_idx = rng.integers(0, len(ASSET_CLASSES), n_rows)
+    values = rng.lognormal(8, 1.5, n_rows)
+    profile_idx = rng.integers(0, len(PROFILES), args.clients)
+
+    started = time.perf_counter()
+    result = evaluate_drift(client_idx, class_idx, values, profile_idx, args.threshold)
+    finished = time.perf_counter()
+
+    print(f"clients={args.clients} positions={n_rows}")
+    print(f"evaluate_drift: {(finished - started) * 1000:.1f}ms, flagged={int(result.flagged.sum())}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,37 @@
+import argparse
+import asyncio
+from app.core.database import AsyncSessionLocal
+from app.services.synthetic_data import synthetic_data, plan_dataset, CHUNK_CLIENTS
+
+async def generate_dataset(seed, scale, years, users=None, prices=True, password="synthetic123",
+                           chunk_size=CHUNK_CLIENTS):
+    plan = plan_dataset(scale, years, users)
+    print(f'Generating {plan.users} users, {plan.clients} clients and {plan.assets} assets '
+          f'over {plan.years} years (seed {seed})')
+    async with AsyncSessionLocal() as db:
+        def progress(done, total):
+            print(f'{done}/{total} clients')
+        
+        summary = await synthetic_data.load(
+            db, seed=seed, scale=scale, years=years, users=users, prices=prices,
+            password=password, chunk_size=chunk_size, progress=progress
+        )
+    print(
+        f'Loaded {summary["clients"]} clients, {summary["allocations"]} allocations, '
+        f'{summary["movements"]} movements and {summary["asset_prices"]} prices '
+        f'({summary["start"]} to {summary["end"]}) in {summary["duration"]:.1f}s'
+    )
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load a seeded synthetic dataset (appends to existing data)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--scale", type=float, default=1.0,
+                        help="1 = ~1,000 clients and ~110,000 movements; grows linearly")
+    parser.add_argument("--years", type=int, default=5, help="Years of history")
+    parser.add_argument("--users", type=int, help="Number of users (default: 10 x scale)")
+    parser.add_argument("--no-prices", action="store_false", dest="prices", help="Skip the daily asset_prices history")
+    parser.add_argument("--password", default="synthetic123", help="Password of every generated user")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_CLIENTS, help="Clients per chunk (part of the seed)")
+    args = parser.parse_args()
+    asyncio.run(generate_dataset(args.seed, args.scale, args.years, args.users, args.prices, args.password,
+                                 args.chunk_size))
@@ -0,0 +1,31 @@
+import argparse
+import asyncio
+from app.core.database import AsyncSessionLocal
+from app.core.process_pool import shutdown_process_pool
+from app.services.statements import statement_service, FORMATS
+
+async def generate_statements(month, formats, client_ids=None, out_dir=None, force=False):
+    async with AsyncSessionLocal() as db:
+        async def progress(done, total):
+            print(f'{done}/{total} clients')
+        
+        summary = await statement_service.run(
+            db, month, formats=formats, client_ids=client_ids or None, out_dir=out_dir, force=force, progress=progress
+        )
+        print(
+            f'Wrote {summary["files"]} files for {summary["total"] - summary["skipped"]} clients '
+            f'({summary["skipped"]} already done) to {summary["directory"]} in {summary["duration"]:.1f}s'
+        )
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate monthly client statements (resumable)")
+    parser.add_argument("month", help="Month (YYYY-MM)")
+    parser.add_argument("--format", action="append", dest="formats", choices=FORMATS, help="Output format (repeatable, default: html)")
+    parser.add_argument("--client", type=int, action="append", dest="client_ids", help="Only this client (repeatable)")
+    parser.add_argument("--out-dir", help="Output directory (default: STATEMENT_DIR)")
+    parser.add_argument("--force", action="store_true", help="Regenerate statements that already exist")
+    args = parser.parse_args()
+    try:
+        asyncio.run(generate_statements(args.month, args.formats or ["html"], args.client_ids, args.out_dir, args.force))
+    finally:
+        shutdown_process_pool()
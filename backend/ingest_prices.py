@@ -0,0 +1,44 @@
+import argparse
+import asyncio
+from datetime import date
+from app.core.database import AsyncSessionLocal
+from app.core.db_helpers import DBHelper
+from app.models.asset import Asset
+from app.services.price_history import price_history
+from app.services.price_cache import price_cache
+from app.services.fx import fx_service
+from app.services.reports import report_service
+
+async def ingest_prices(tickers=None, start=None, end=None, refresh_cache=False, fx=False):
+    async with AsyncSessionLocal() as db:
+        assets = await DBHelper.get_all(db, Asset)
+        if tickers:
+            wanted = {ticker.upper() for ticker in tickers}
+            assets = [asset for asset in assets if asset.ticker in wanted]
+        
+        written = await price_history.ingest(db, assets, start=start, end=end)
+        for ticker, count in sorted(written.items()):
+            print(f'{ticker}: {count} rows')
+        print(f'Ingested {sum(written.values())} price rows for {len(written)} assets')
+        
+        if fx:
+            currencies = {asset.currency or "USD" for asset in assets}
+            written = await fx_service.ingest(db, currencies, start=start, end=end)
+            for currency, count in sorted(written.items()):
+                print(f'{currency}: {count} FX rows')
+            if any(written.values()):
+                await report_service.invalidate_cache()
+        
+        if refresh_cache:
+            months = await price_cache.refresh(db)
+            print(f'Rebuilt {len(months)} months of the columnar price cache')
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fetch missing daily price history into asset_prices")
+    parser.add_argument("tickers", nargs="*", help="Tickers to ingest (default: all assets)")
+    parser.add_argument("--start", type=date.fromisoformat, help="First date (YYYY-MM-DD)")
+    parser.add_argument("--end", type=date.fromisoformat, help="Last date (YYYY-MM-DD)")
+    parser.add_argument("--refresh-cache", action="store_true", help="Bring the columnar price cache (PRICE_CACHE_DIR) up to date")
+    parser.add_argument("--fx", action="store_true", help="Also fetch the daily FX rates of the assets' currencies into fx_rates")
+    args = parser.parse_args()
+    asyncio.run(ingest_prices(args.tickers, args.start, args.end, args.refresh_cache, args.fx))
@@ -0,0 +1,32 @@
+import argparse
+import asyncio
+from datetime import date
+from app.core.database import AsyncSessionLocal
+from app.core.process_pool import shutdown_process_pool
+from app.services.snapshots import snapshot_service
+
+async def snapshot_portfolios(start=None, end=None, client_ids=None, chunk_size=None):
+    async with AsyncSessionLocal() as db:
+        def progress(done, total):
+            print(f'{done}/{total} clients')
+        
+        summary = await snapshot_service.run(
+            db, start=start, end=end, client_ids=client_ids or None, chunk_size=chunk_size, progress=progress
+        )
+        print(
+            f'Wrote {summary["rows"]} snapshots for {summary["clients"]} clients, '
+            f'{summary["start"]} to {summary["end"]} ({summary["days"]} business days) '
+            f'in {summary["duration"]:.1f}s'
+        )
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write daily per-client portfolio snapshots (idempotent)")
+    parser.add_argument("--start", type=date.fromisoformat, help="First date (YYYY-MM-DD); default: day after the latest snapshot")
+    parser.add_argument("--end", type=date.fromisoformat, help="Last date (YYYY-MM-DD); default: today")
+    parser.add_argument("--client", type=int, action="append", dest="client_ids", help="Only this client (repeatable)")
+    parser.add_argument("--chunk-size", type=int, help="Clients per chunk (default: SNAPSHOT_CHUNK_SIZE)")
+    args = parser.parse_args()
+    try:
+        asyncio.run(snapshot_portfolios(args.start, args.end, args.client_ids, args.chunk_size))
+    finally:
+        shutdown_process_pool()
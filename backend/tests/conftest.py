@@ -1,5 +1,6 @@
 import pytest
 import asyncio
+from datetime import timedelta
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
@@ -83,4 +84,76 @@ def test_asset(db_session):
     db_session.add(asset)
     db_session.commit()
     db_session.refresh(asset)
-    return asset
\ No newline at end of file
+    return asset
+
+class FixturePriceProvider:
+    """Offline provider returning a deterministic daily series for weekdays"""
+    
+    def __init__(self, base_price=100.0):
+        self.base_price = base_price
+        self.calls = []
+    
+    async def get_history_range(self, symbol, start, end):
+        self.calls.append((symbol, start, end))
+        rows = []
+        day = start
+        while day <= end:
+            if day.weekday() < 5:
+                price = self.base_price + day.toordinal() % 10
+                rows.append({
+                    "date": day,
+                    "open": price,
+                    "high": price + 1,
+                    "low": price - 1,
+                    "close": price,
+                    "adj_close": price,
+                    "volume": 1000
+                })
+            day += timedelta(days=1)
+        return rows
+
+@pytest.fixture
+def price_provider():
+    return FixturePriceProvider()
+
+@pytest.fixture
+def market_data(monkeypatch):
+    """Offline market-data provider installed on the service, with empty caches"""
+    from app.core.circuit_breaker import CircuitBreaker
+    from app.services.market_data import ReplayProvider
+    from app.services.yahoo_finance import yahoo_finance
+    
+    provider = ReplayProvider(data={
+        "assets": {
+            "AAPL": {"name": "Apple Inc.", "exchange": "NASDAQ", "currency": "USD"},
+            "MSFT": {"name": "Microsoft Corporation", "exchange": "NASDAQ", "currency": "USD"},
+        },
+        "quotes": {
+            "AAPL": {"price": 10.0, "previous_close": 9.0, "as_of": "2024-01-02"},
+            "MSFT": {"price": 10.0, "previous_close": 9.0, "as_of": "2024-01-02"},
+        },
+    })
+    monkeypatch.setattr(yahoo_finance, "provider", provider)
+    monkeypatch.setattr(yahoo_finance, "_breaker", CircuitBreaker("market_data", failure_threshold=3, recovery_timeout=60))
+    yahoo_finance._cache.clear()
+    yahoo_finance._quotes.clear()
+    yield provider
+    yahoo_finance._cache.clear()
+    yahoo_finance._quotes.clear()
+
+@pytest.fixture
+def query_budget():
+    """
+    Context manager asserting how many SQL statements a block may execute:
+    `with query_budget(3): client.get(...)`
+    """
+    from contextlib import contextmanager
+    from app.core.query_stats import count_queries
+    
+    @contextmanager
+    def budget(max_queries: int):
+        with count_queries() as counter:
+            yield counter
+        executed = "\n".join(f"{count}x {statement}" for statement, count in counter.statements.most_common())
+        assert counter.count <= max_queries, f"{counter.count} queries, budget {max_queries}:\n{executed}"
+    return budget
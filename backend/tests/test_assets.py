@@ -1,4 +1,5 @@
 import pytest
+import asyncio
 from fastapi.testclient import TestClient
 
 def test_unauthorized_access(client: TestClient):
@@ -64,8 +65,169 @@ def test_get_asset_price(client, auth_headers, test_asset):
     # This might fail if Yahoo Finance is down, so we test for either success or service unavailable
     assert response.status_code in [200, 503]
 
-def test_search_yahoo_with_auth(client, auth_headers):
-    """Test Yahoo Finance search with authentication"""
+def test_search_yahoo_with_auth(client, auth_headers, market_data):
+    """Test market data search with authentication"""
     response = client.get("/assets/search-yahoo/AAPL", headers=auth_headers)
-    # Test for success or service unavailable (Yahoo Finance might be down)
-    assert response.status_code in [200, 503]
\ No newline at end of file
+    assert response.status_code == 200
+    assert response.json()["name"] == "Apple Inc."
+
+def test_search_unknown_symbol_is_not_fabricated(client, auth_headers, market_data):
+    response = client.get("/assets/search-yahoo/XYZ", headers=auth_headers)
+    assert response.status_code == 404
+
+def test_search_returns_503_when_provider_fails(client, auth_headers, market_data):
+    market_data.error_rate = 1.0
+    response = client.get("/assets/search-yahoo/AAPL", headers=auth_headers)
+    assert response.status_code == 503
+
+def test_ingest_prices_fetches_only_missing_ranges(db_session, test_asset, price_provider):
+    """Test that a second ingestion only requests dates after the stored range"""
+    from datetime import date
+    from app.services.price_history import price_history
+    
+    written = asyncio.run(price_history.ingest(
+        db_session, [test_asset], start=date(2024, 1, 1), end=date(2024, 1, 31), provider=price_provider
+    ))
+    assert written["AAPL"] == 23
+    
+    written = asyncio.run(price_history.ingest(
+        db_session, [test_asset], start=date(2024, 1, 1), end=date(2024, 2, 9), provider=price_provider
+    ))
+    assert written["AAPL"] == 7
+    assert price_provider.calls[-1] == ("AAPL", date(2024, 2, 1), date(2024, 2, 9))
+
+def test_get_asset_history_from_local_store(client, auth_headers, db_session, test_asset, price_provider):
+    """Test that history is served from the asset_prices table"""
+    from datetime import date
+    from app.services.price_history import price_history
+    
+    asyncio.run(price_history.ingest(
+        db_session, [test_asset], start=date(2024, 1, 1), end=date(2024, 1, 31), provider=price_provider
+    ))
+    
+    response = client.get(
+        f"/assets/{test_asset.id}/history?start=2024-01-08&end=2024-01-12", headers=auth_headers
+    )
+    assert response.status_code == 200
+    dates = [row["date"] for row in response.json()]
+    assert dates == ["2024-01-08", "2024-01-09", "2024-01-10", "2024-01-11", "2024-01-12"]
+
+def test_yahoo_history_reads_only_stored_prices(client, auth_headers, db_session, test_asset, market_data, price_provider, monkeypatch):
+    """Test that /history-yahoo never calls upstream and ends at the last stored session"""
+    from datetime import date
+    from app.services.price_history import price_history
+    from app.services.yahoo_finance import yahoo_finance
+    
+    monkeypatch.setattr(yahoo_finance, "provider", price_provider)
+    response = client.get("/assets/history-yahoo/AAPL?period=1mo", headers=auth_headers)
+    assert response.status_code == 404
+    
+    asyncio.run(price_history.ingest(
+        db_session, [test_asset], start=date(2024, 1, 1), end=date(2024, 1, 31), provider=price_provider
+    ))
+    calls = len(price_provider.calls)
+    response = client.get("/assets/history-yahoo/aapl?period=1mo", headers=auth_headers)
+    assert response.status_code == 200
+    assert list(response.json()) == ["2024-01-25", "2024-01-26", "2024-01-29", "2024-01-30", "2024-01-31"]
+    assert len(price_provider.calls) == calls
+
+def test_yahoo_history_requires_registered_asset(client, auth_headers, market_data):
+    response = client.get("/assets/history-yahoo/UNKNOWN", headers=auth_headers)
+    assert response.status_code == 404
+
+def test_quotes_are_refreshed_in_batches_and_served_from_cache(client, auth_headers, db_session, test_asset, test_client_model, market_data):
+    """Test that the background refresh fetches held assets in one upstream call and handlers only read"""
+    from datetime import date
+    from app.models.asset import Asset
+    from app.models.allocation import Allocation
+    from app.services.yahoo_finance import yahoo_finance
+    from app.services.price_refresh import price_refresh
+    
+    msft = Asset(ticker="MSFT", name="Microsoft Corporation", exchange="NASDAQ", currency="USD")
+    db_session.add(msft)
+    db_session.commit()
+    for asset in (test_asset, msft):
+        db_session.add(Allocation(client_id=test_client_model.id, asset_id=asset.id,
+                                  quantity=1, buy_price=5, buy_date=date(2024, 1, 2)))
+    db_session.commit()
+    
+    assert asyncio.run(price_refresh.refresh(db_session)) == 2
+    assert market_data.calls == 1
+    
+    response = client.get("/assets/prices", headers=auth_headers)
+    assert response.status_code == 200
+    assert {row["ticker"]: row["current_price"] for row in response.json()} == {"AAPL": 10.0, "MSFT": 10.0}
+    
+    # Sem cache, o handler lê o último fechamento gravado na tabela
+    yahoo_finance._quotes.clear()
+    response = client.get(f"/assets/{test_asset.id}/price", headers=auth_headers)
+    assert response.status_code == 200
+    assert response.json()["current_price"] == 10.0
+    assert response.json()["as_of"] == "2024-01-02"
+    assert market_data.calls == 1
+
+def test_refreshed_close_is_backfilled_with_full_ohlcv(db_session, test_asset, test_client_model, market_data, price_provider):
+    """Test that a day written by the quote refresh is still fetched by the history ingestion"""
+    from datetime import date
+    from app.models.allocation import Allocation
+    from app.models.asset_price import AssetPrice
+    from app.services.price_history import price_history
+    from app.services.price_refresh import price_refresh
+    
+    db_session.add(Allocation(client_id=test_client_model.id, asset_id=test_asset.id,
+                              quantity=1, buy_price=5, buy_date=date(2024, 1, 2)))
+    db_session.commit()
+    asyncio.run(price_refresh.refresh(db_session))
+    
+    asyncio.run(price_history.ingest(
+        db_session, [test_asset], start=date(2024, 1, 1), end=date(2024, 1, 5), provider=price_provider
+    ))
+    assert price_provider.calls == [("AAPL", date(2024, 1, 1), date(2024, 1, 5))]
+    row = db_session.query(AssetPrice).filter_by(asset_id=test_asset.id, date=date(2024, 1, 2)).one()
+    db_session.refresh(row)
+    assert row.open is not None and row.volume == 1000
+    assert row.source == "history"
+
+def test_history_without_open_counts_as_stored(db_session, test_asset, price_provider):
+    """Test that funds/indices without an Open column are not refetched on every ingestion"""
+    from datetime import date
+    from app.services.price_history import price_history
+    
+    class NoOpenProvider:
+        def __init__(self):
+            self.calls = []
+        async def get_history_range(self, symbol, start, end):
+            self.calls.append((symbol, start, end))
+            rows = await price_provider.get_history_range(symbol, start, end)
+            return [{**row, "open": None, "high": None, "low": None} for row in rows]
+    
+    provider = NoOpenProvider()
+    for _ in range(2):
+        asyncio.run(price_history.ingest(
+            db_session, [test_asset], start=date(2024, 1, 1), end=date(2024, 1, 31), provider=provider
+        ))
+    assert provider.calls == [("AAPL", date(2024, 1, 1), date(2024, 1, 31))]
+
+def test_only_one_worker_leads_the_refresh():
+    from app.core.cache_backend import MemoryBackend
+    from app.core.leader import LeaderLock
+    
+    async def run():
+        backend = MemoryBackend()
+        worker_a = LeaderLock("price_refresh", backend=backend)
+        worker_b = LeaderLock("price_refresh", backend=backend)
+        leads = [await worker_a.acquire(ttl=60), await worker_b.acquire(ttl=60), await worker_a.acquire(ttl=60)]
+        await worker_a.release()
+        leads.append(await worker_b.acquire(ttl=60))
+        return leads
+    
+    assert asyncio.run(run()) == [True, False, True, True]
+
+def test_price_without_quote_is_queued_for_refresh(client, auth_headers, test_asset, market_data):
+    from app.services.price_refresh import price_refresh
+    
+    response = client.get(f"/assets/{test_asset.id}/price", headers=auth_headers)
+    assert response.status_code == 503
+    assert market_data.calls == 0
+    assert test_asset.id in price_refresh._requested
+    price_refresh._requested.clear()
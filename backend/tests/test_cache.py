@@ -0,0 +1,147 @@
+import pytest
+import asyncio
+from app.core.cache import TTLCache
+
+def test_concurrent_misses_share_one_load():
+    """Test single-flight: simultaneous requests for the same key trigger one load"""
+    cache = TTLCache(maxsize=10, ttl=60)
+    calls = []
+    
+    async def loader():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return {"ticker": "PETR4.SA"}
+    
+    async def run():
+        return await asyncio.gather(*(cache.get_or_load("PETR4.SA", loader) for _ in range(10)))
+    
+    results = asyncio.run(run())
+    assert len(calls) == 1
+    assert all(result == {"ticker": "PETR4.SA"} for result in results)
+    assert cache.stats()["misses"] == 1
+    assert cache.stats()["coalesced"] == 9
+
+def test_lru_eviction():
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert "a" in cache and "c" in cache and "b" not in cache
+    assert cache.stats()["evictions"] == 1
+
+def test_stale_value_served_while_revalidating():
+    """Test stale-while-revalidate: the old value is returned and refreshed in the background"""
+    cache = TTLCache(maxsize=10, ttl=0, stale_ttl=60)
+    cache.set("AAPL", 1)
+    
+    async def loader():
+        return 2
+    
+    async def run():
+        stale = await cache.get_or_load("AAPL", loader)
+        await asyncio.sleep(0)
+        await asyncio.sleep(0)
+        return stale
+    
+    assert asyncio.run(run()) == 1
+    assert cache._data["AAPL"][2] == 2
+    assert cache.stats()["stale_hits"] == 1
+
+def test_failed_load_is_not_cached():
+    cache = TTLCache(maxsize=10, ttl=60)
+    
+    async def failing():
+        raise RuntimeError("upstream down")
+    
+    with pytest.raises(RuntimeError):
+        asyncio.run(cache.get_or_load("AAPL", failing))
+    assert "AAPL" not in cache
+    assert cache.stats()["load_errors"] == 1
+
+def test_memory_backend_namespaced_invalidation():
+    from app.core.cache_backend import MemoryBackend
+    backend = MemoryBackend()
+    
+    async def run():
+        await backend.set_many("quotes", {"AAPL": 1, "MSFT": 2}, ttl=60)
+        await backend.set("risk_stats", "AAPL", 3, ttl=60)
+        await backend.invalidate("quotes")
+        return await backend.get_many("quotes", ["AAPL", "MSFT"]), await backend.get("risk_stats", "AAPL")
+    
+    quotes, risk = asyncio.run(run())
+    assert quotes == {}
+    assert risk == 3
+
+def test_redis_backend_round_trip_and_invalidation():
+    fakeredis = pytest.importorskip("fakeredis")
+    from app.core.cache_backend import RedisBackend
+    
+    async def run():
+        backend = RedisBackend(fakeredis.FakeAsyncRedis(), prefix="test")
+        await backend.set("risk_stats", ((1, 2), "2024-01-01"), {"value": [1.5, 2.5]}, ttl=60)
+        await backend.set("quotes", "AAPL", {"price": 10.0}, ttl=60)
+        before = await backend.get("risk_stats", ((1, 2), "2024-01-01"))
+        await backend.invalidate("risk_stats")
+        after = await backend.get("risk_stats", ((1, 2), "2024-01-01"))
+        return before, after, await backend.get("quotes", "AAPL")
+    
+    before, after, quote = asyncio.run(run())
+    assert before == {"value": [1.5, 2.5]}
+    assert after is None
+    assert quote == {"price": 10.0}
+
+def test_workers_share_loads_through_redis_backend():
+    """Test that a value loaded by one worker's cache is reused by another's"""
+    fakeredis = pytest.importorskip("fakeredis")
+    from app.core.cache_backend import RedisBackend
+    calls = []
+    
+    async def loader():
+        calls.append(1)
+        return {"ticker": "AAPL"}
+    
+    async def run():
+        backend = RedisBackend(fakeredis.FakeAsyncRedis(), prefix="test")
+        worker_a = TTLCache(maxsize=10, ttl=60, name="asset_info", backend=backend)
+        worker_b = TTLCache(maxsize=10, ttl=60, name="asset_info", backend=backend)
+        first = await worker_a.get_or_load("AAPL", loader)
+        second = await worker_b.get_or_load("AAPL", loader)
+        await worker_a.invalidate()
+        third = await TTLCache(maxsize=10, ttl=60, name="asset_info", backend=backend).get_or_load("AAPL", loader)
+        return first, second, third, worker_b.stats()
+    
+    first, second, third, stats = asyncio.run(run())
+    assert first == second == third == {"ticker": "AAPL"}
+    assert len(calls) == 2
+    assert stats["shared_hits"] == 1
+    assert stats["loads"] == 0
+
+def test_values_written_by_one_worker_are_read_by_another():
+    """Test that set_many/get_many go through the shared backend, stale values included"""
+    from app.core.cache_backend import MemoryBackend
+    
+    async def run():
+        backend = MemoryBackend()
+        worker_a = TTLCache(maxsize=10, ttl=60, stale_ttl=600, name="quotes", backend=backend)
+        worker_b = TTLCache(maxsize=10, ttl=60, stale_ttl=600, name="quotes", backend=backend)
+        await worker_a.set_many({"AAPL": {"price": 10.0}})
+        await worker_a.set_many({"MSFT": {"price": 20.0}}, ttl=-1)
+        return await worker_b.get_many(["AAPL", "MSFT", "NVDA"]), worker_b
+    
+    values, worker_b = asyncio.run(run())
+    assert values == {"AAPL": {"price": 10.0}, "MSFT": {"price": 20.0}}
+    assert worker_b.stats()["shared_hits"] == 2
+    assert worker_b._lookup("MSFT")[0] == "stale"
+
+def test_redis_backend_unavailable_behaves_as_miss():
+    pytest.importorskip("redis")
+    from app.core.cache_backend import RedisBackend
+    backend = RedisBackend.from_url("redis://127.0.0.1:1/0")
+    
+    async def run():
+        await backend.set("quotes", "AAPL", 1, ttl=60)
+        return await backend.get("quotes", "AAPL")
+    
+    assert asyncio.run(run()) is None
+    assert backend.stats()["errors"] == 2
@@ -0,0 +1,91 @@
+import pytest
+import asyncio
+import time
+from app.core.circuit_breaker import CircuitBreaker, CircuitOpenError, hedged
+from app.services.yahoo_finance import yahoo_finance
+
+async def failing():
+    raise ValueError("upstream down")
+
+async def succeeding():
+    return "ok"
+
+def test_opens_after_consecutive_failures_and_short_circuits():
+    breaker = CircuitBreaker("test", failure_threshold=2, recovery_timeout=60)
+    
+    async def run():
+        for _ in range(2):
+            with pytest.raises(ValueError):
+                await breaker.call(failing)
+        with pytest.raises(CircuitOpenError):
+            await breaker.call(succeeding)
+    
+    asyncio.run(run())
+    assert breaker.state == "open"
+    assert breaker.stats()["short_circuited"] == 1
+
+def test_half_open_trial_closes_or_reopens(monkeypatch):
+    breaker = CircuitBreaker("test", failure_threshold=1, recovery_timeout=0.01)
+    
+    async def run():
+        with pytest.raises(ValueError):
+            await breaker.call(failing)
+        await asyncio.sleep(0.02)
+        assert breaker.state == "half_open"
+        with pytest.raises(ValueError):
+            await breaker.call(failing)
+        assert breaker.state == "open"
+        await asyncio.sleep(0.02)
+        assert await breaker.call(succeeding) == "ok"
+    
+    asyncio.run(run())
+    assert breaker.state == "closed"
+
+def test_timeout_counts_as_failure():
+    breaker = CircuitBreaker("test", failure_threshold=1, recovery_timeout=60)
+    
+    async def slow():
+        await asyncio.sleep(1)
+    
+    async def run():
+        with pytest.raises(asyncio.TimeoutError):
+            await breaker.call(slow, timeout=0.01)
+    
+    asyncio.run(run())
+    assert breaker.state == "open"
+    assert breaker.stats()["timeouts"] == 1
+
+def test_hedged_call_returns_the_faster_attempt():
+    delays = [1.0, 0.01]
+    
+    async def attempt():
+        delay = delays.pop(0)
+        await asyncio.sleep(delay)
+        return delay
+    
+    async def run():
+        started = time.monotonic()
+        result = await hedged(attempt, delay=0.02)
+        return result, time.monotonic() - started
+    
+    result, elapsed = asyncio.run(run())
+    assert result == 0.01
+    assert elapsed < 0.5
+
+def test_open_circuit_serves_stale_quotes_without_calling_provider(market_data, monkeypatch):
+    """Test that with the provider failing, cached (stale) data is served and the upstream is left alone"""
+    monkeypatch.setattr(yahoo_finance._quotes, "ttl", 0)
+    monkeypatch.setattr(yahoo_finance._quotes, "stale_ttl", 3600)
+    first = asyncio.run(yahoo_finance.get_quotes(["AAPL"]))
+    market_data.error_rate = 1.0
+    
+    async def failing_lookups():
+        for symbol in ["MSFT", "XYZ", "ABC", "DEF"]:
+            await yahoo_finance.get_quotes([symbol])
+    asyncio.run(failing_lookups())
+    calls = market_data.calls
+    assert yahoo_finance._breaker.state == "open"
+    
+    stale = asyncio.run(yahoo_finance.get_quotes(["AAPL"]))
+    assert stale == first
+    assert market_data.calls == calls
@@ -55,4 +55,84 @@ def test_delete_client(client, auth_headers, test_client_model):
     
     # Verify client is deleted
     response = client.get(f"/clients/{test_client_model.id}", headers=auth_headers)
-    assert response.status_code == 404
\ No newline at end of file
+    assert response.status_code == 404
+def _create_client(client, auth_headers, name, email):
+    response = client.post("/clients/", json={"name": name, "email": email, "is_active": True}, headers=auth_headers)
+    assert response.status_code == 200
+    return response.json()["id"]
+
+def test_client_list_includes_summary_maintained_by_writes(client, auth_headers, test_asset):
+    """Allocation and movement writes keep the summary columns of the client list current"""
+    client_id = _create_client(client, auth_headers, "Summary Client", "summary@example.com")
+    
+    allocation = client.post("/allocations/", json={
+        "client_id": client_id, "asset_id": test_asset.id,
+        "quantity": 10, "buy_price": 20.0, "buy_date": "2024-01-02"
+    }, headers=auth_headers).json()
+    client.post("/movements/", json={
+        "client_id": client_id, "type": "deposit", "amount": 1000.0, "date": "2024-01-02"
+    }, headers=auth_headers)
+    client.post("/movements/", json={
+        "client_id": client_id, "type": "withdrawal", "amount": 300.0, "date": "2024-02-05"
+    }, headers=auth_headers)
+    
+    row = client.get("/clients/", headers=auth_headers).json()[0]
+    assert row["aum"] == 200.0
+    assert row["cash_balance"] == 700.0
+    assert row["last_movement_date"] == "2024-02-05"
+    assert row["positions_count"] == 1
+    
+    client.put(f"/allocations/{allocation['id']}", json={"quantity": 5}, headers=auth_headers)
+    assert client.get("/clients/", headers=auth_headers).json()[0]["aum"] == 100.0
+    
+    client.delete(f"/allocations/{allocation['id']}", headers=auth_headers)
+    row = client.get("/clients/", headers=auth_headers).json()[0]
+    assert row["aum"] == 0.0
+    assert row["positions_count"] == 0
+
+def test_sort_and_filter_clients_by_aum(client, auth_headers, test_asset):
+    """sort_by/order and the summary range filters are served from client_summary"""
+    for name, quantity in [("Alpha", 1), ("Beta", 30), ("Gamma", 10)]:
+        client_id = _create_client(client, auth_headers, name, f"{name.lower()}@example.com")
+        client.post("/allocations/", json={
+            "client_id": client_id, "asset_id": test_asset.id,
+            "quantity": quantity, "buy_price": 10.0, "buy_date": "2024-01-02"
+        }, headers=auth_headers)
+    _create_client(client, auth_headers, "Delta", "delta@example.com")
+    
+    response = client.get("/clients/?sort_by=aum&order=desc", headers=auth_headers)
+    assert response.status_code == 200
+    assert [row["name"] for row in response.json()] == ["Beta", "Gamma", "Alpha", "Delta"]
+    
+    response = client.get("/clients/?min_aum=50&sort_by=aum", headers=auth_headers)
+    assert [row["name"] for row in response.json()] == ["Gamma", "Beta"]
+    
+    response = client.get("/clients/?sort_by=revenue", headers=auth_headers)
+    assert response.status_code == 422
+
+def test_clients_without_summary_row_are_listed(client, auth_headers, db_session, test_client_model):
+    """Sorting or filtering by a summary column keeps clients that have no client_summary row"""
+    response = client.get("/clients/?sort_by=aum&order=desc", headers=auth_headers)
+    assert [row["name"] for row in response.json()] == [test_client_model.name]
+    assert response.json()[0]["aum"] == 0.0
+    
+    response = client.get("/clients/?max_aum=0&sort_by=positions_count", headers=auth_headers)
+    assert [row["name"] for row in response.json()] == [test_client_model.name]
+
+def test_summary_refresh_locks_client_rows(db_session, test_client_model, monkeypatch):
+    """refresh() locks the client rows (FOR UPDATE on PostgreSQL) before aggregating"""
+    import asyncio
+    from sqlalchemy.dialects import postgresql
+    from app.core.db_helpers import DBHelper
+    from app.services.client_summary import client_summary
+    
+    executed = []
+    original = DBHelper.execute_query
+    
+    async def capture(db, query, params=None):
+        executed.append(query)
+        return await original(db, query, params)
+    
+    monkeypatch.setattr(DBHelper, "execute_query", capture)
+    asyncio.run(client_summary.refresh(db_session, [test_client_model.id]))
+    assert "FOR UPDATE" in str(executed[0].compile(dialect=postgresql.dialect()))
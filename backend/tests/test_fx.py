@@ -0,0 +1,99 @@
+import asyncio
+import pytest
+import numpy as np
+from datetime import date
+from app.models.allocation import Allocation
+from app.models.asset import Asset
+from app.models.client import Client
+from app.models.fx_rate import FxRate
+from app.services.fx import FxRateService, fx_service
+from app.services.reports import report_service
+
+class FixtureFxProvider:
+    """Offline FX history: BRL at 0.2 USD every day"""
+    
+    def __init__(self):
+        self.calls = []
+    
+    async def get_history_range(self, symbol, start, end):
+        self.calls.append((symbol, start, end))
+        return [{"date": date.fromordinal(day), "close": 0.2} for day in range(start.toordinal(), end.toordinal() + 1)]
+    
+    async def refresh_quotes(self, symbols):
+        return {symbol: {"ticker": symbol, "price": 0.25, "as_of": "2024-03-01"} for symbol in symbols}
+
+@pytest.fixture(autouse=True)
+def clear_fx_caches():
+    fx_service.clear_cache()
+    report_service.clear_cache()
+    yield
+    fx_service.clear_cache()
+    report_service.clear_cache()
+
+@pytest.fixture
+def multi_currency_portfolio(db_session):
+    apple = Asset(ticker="AAPL", name="Apple Inc.", exchange="NASDAQ", currency="USD")
+    petro = Asset(ticker="PETR4", name="Petrobras", exchange="B3", currency="BRL")
+    investor = Client(name="Investor", email="investor@example.com")
+    db_session.add_all([apple, petro, investor])
+    db_session.flush()
+    db_session.add_all([
+        Allocation(client_id=investor.id, asset_id=apple.id, quantity=10, buy_price=100.0, buy_date=date(2024, 1, 2)),
+        Allocation(client_id=investor.id, asset_id=petro.id, quantity=100, buy_price=30.0, buy_date=date(2024, 1, 2)),
+    ])
+    db_session.add(FxRate(currency="BRL", date=date(2024, 1, 2), rate=0.2))
+    db_session.commit()
+    return investor
+
+def test_ingest_fetches_only_missing_days(db_session):
+    provider = FixtureFxProvider()
+    service = FxRateService(provider=provider)
+    
+    written = asyncio.run(service.ingest(db_session, ["BRL", "USD"], date(2024, 1, 1), date(2024, 1, 10)))
+    assert written == {"BRL": 10}
+    assert provider.calls == [("BRLUSD=X", date(2024, 1, 1), date(2024, 1, 10))]
+    
+    written = asyncio.run(service.ingest(db_session, ["BRL"], date(2024, 1, 1), date(2024, 1, 12)))
+    assert written == {"BRL": 2}
+    assert provider.calls[-1] == ("BRLUSD=X", date(2024, 1, 11), date(2024, 1, 12))
+
+def test_latest_rate_is_used_until_a_newer_one_is_stored(db_session):
+    service = FxRateService(provider=FixtureFxProvider())
+    asyncio.run(service.ingest(db_session, ["BRL"], date(2024, 1, 1), date(2024, 1, 5)))
+    assert asyncio.run(service.rates_on(db_session, date(2024, 2, 1)))["BRL"] == pytest.approx(0.2)
+    
+    # Nova taxa invalida o cache do dia
+    asyncio.run(service.refresh_latest(db_session, ["BRL"]))
+    assert asyncio.run(service.rates_on(db_session, date(2024, 3, 1)))["BRL"] == pytest.approx(0.25)
+    assert asyncio.run(service.rates_on(db_session, date(2024, 2, 1)))["BRL"] == pytest.approx(0.2)
+
+def test_convert_is_vectorized_over_currencies():
+    factors = {"USD": 5.0, "BRL": 1.0}
+    converted = FxRateService.convert(np.array([10.0, 20.0, 30.0]), ["USD", "BRL", "USD"], factors)
+    np.testing.assert_allclose(converted, [50.0, 20.0, 150.0])
+
+def test_total_allocation_in_base_currency(client, auth_headers, multi_currency_portfolio):
+    response = client.get("/allocations/total-allocation?base_currency=BRL", headers=auth_headers)
+    assert response.status_code == 200
+    # 1000 USD a 0,2 USD/BRL + 3000 BRL
+    assert response.json() == {"total_allocation": pytest.approx(8000.0), "base_currency": "BRL"}
+    
+    response = client.get(
+        f"/allocations/client/{multi_currency_portfolio.id}/allocation?base_currency=usd", headers=auth_headers
+    )
+    assert response.json()["total_allocation"] == pytest.approx(1600.0)
+
+def test_aum_report_in_base_currency(client, auth_headers, multi_currency_portfolio):
+    response = client.get("/reports/aum?group_by=currency&rollup=true&base_currency=BRL", headers=auth_headers)
+    assert response.status_code == 200
+    report = response.json()
+    assert report["base_currency"] == "BRL"
+    assert report["total_aum"] == pytest.approx(8000.0)
+    groups = {group["keys"].get("currency"): group["aum"] for group in report["groups"]}
+    assert groups["USD"] == pytest.approx(5000.0)
+    assert groups[None] == pytest.approx(8000.0)
+
+def test_missing_fx_rate_is_an_error(client, auth_headers, multi_currency_portfolio):
+    response = client.get("/allocations/total-allocation?base_currency=EUR", headers=auth_headers)
+    assert response.status_code == 400
+    assert "EUR" in response.json()["detail"]
@@ -0,0 +1,97 @@
+import pytest
+import asyncio
+import json
+from datetime import date
+from app.core.config import settings
+from app.services.market_data import (
+    FixtureProvider, ReplayProvider, RecordingProvider, MarketDataError, create_provider, history_rows
+)
+
+FIXTURE = {
+    "assets": {"PETR4.SA": {"name": "Petrobras PN", "exchange": "SAO", "currency": "BRL"}},
+    "quotes": {"PETR4.SA": {"price": 38.5, "previous_close": 38.0, "as_of": "2024-01-03"}},
+    "history": {"PETR4.SA": [
+        {"date": "2024-01-03", "close": 38.5},
+        {"date": "2024-01-02", "close": 38.0},
+    ]},
+}
+
+def test_fixture_provider_from_file(tmp_path, monkeypatch):
+    path = tmp_path / "market.json"
+    path.write_text(json.dumps(FIXTURE))
+    monkeypatch.setattr(settings, "MARKET_DATA_PROVIDER", "fixture")
+    monkeypatch.setattr(settings, "MARKET_DATA_FIXTURE_PATH", str(path))
+    provider = create_provider()
+    
+    async def run():
+        return (
+            await provider.get_asset_info("petr4.sa"),
+            await provider.get_asset_info("XYZ"),
+            await provider.get_quotes(["PETR4.SA", "XYZ"]),
+            await provider.get_history_range("PETR4.SA", date(2024, 1, 1), date(2024, 1, 2)),
+        )
+    
+    info, unknown, quotes, history = asyncio.run(run())
+    assert isinstance(provider, FixtureProvider)
+    assert info == {"ticker": "PETR4.SA", "name": "Petrobras PN", "exchange": "SAO", "currency": "BRL"}
+    assert unknown is None
+    assert list(quotes) == ["PETR4.SA"]
+    assert round(quotes["PETR4.SA"]["change_percent"], 4) == 1.3158
+    assert history == [{"date": date(2024, 1, 2), "close": 38.0}]
+
+def test_replay_error_injection_is_reproducible():
+    def failures(seed):
+        provider = ReplayProvider(data=FIXTURE, error_rate=0.5, seed=seed)
+        
+        async def run():
+            outcome = []
+            for _ in range(20):
+                try:
+                    await provider.get_quotes(["PETR4.SA"])
+                    outcome.append(True)
+                except MarketDataError:
+                    outcome.append(False)
+            return outcome
+        return asyncio.run(run())
+    
+    assert failures(7) == failures(7)
+    assert 0 < failures(7).count(False) < 20
+
+def test_recorded_answers_can_be_replayed(tmp_path):
+    path = tmp_path / "recording.json"
+    recorder = RecordingProvider(FixtureProvider(data=FIXTURE), str(path))
+    
+    async def record():
+        await recorder.get_asset_info("PETR4.SA")
+        await recorder.get_quotes(["PETR4.SA"])
+        return await recorder.get_history_range("PETR4.SA", date(2024, 1, 1), date(2024, 1, 31))
+    
+    recorded_history = asyncio.run(record())
+    replay = ReplayProvider(path=str(path), latency_ms=1)
+    
+    async def replayed():
+        return (
+            await replay.get_asset_info("PETR4.SA"),
+            (await replay.get_quotes(["PETR4.SA"]))["PETR4.SA"]["price"],
+            await replay.get_history_range("PETR4.SA", date(2024, 1, 1), date(2024, 1, 31)),
+        )
+    
+    info, price, history = asyncio.run(replayed())
+    assert info["name"] == "Petrobras PN"
+    assert price == 38.5
+    assert history == recorded_history
+    assert replay.calls == 3
+
+def test_history_rows_tolerate_nan():
+    import pandas as pd
+    nan = float("nan")
+    hist = pd.DataFrame(
+        {"Open": [10.0, nan, 11.0], "High": [10.5, nan, 11.5], "Low": [9.5, nan, 10.5],
+         "Close": [10.2, nan, 11.2], "Adj Close": [10.1, nan, nan], "Volume": [1000.0, nan, nan]},
+        index=pd.to_datetime(["2024-01-02", "2024-01-03", "2024-01-04"])
+    )
+    rows = history_rows(hist)
+    assert [row["date"] for row in rows] == [date(2024, 1, 2), date(2024, 1, 4)]
+    assert rows[0] == {"date": date(2024, 1, 2), "open": 10.0, "high": 10.5, "low": 9.5,
+                       "close": 10.2, "adj_close": 10.1, "volume": 1000}
+    assert rows[1]["volume"] is None and rows[1]["adj_close"] == 11.2
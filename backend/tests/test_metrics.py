@@ -0,0 +1,44 @@
+from app.core.metrics import MetricsRegistry, HTTP_REQUESTS, HTTP_LATENCY
+
+def test_registry_renders_prometheus_text():
+    registry = MetricsRegistry()
+    requests = registry.counter("requests_total", "Requests", ("route",))
+    latency = registry.histogram("latency_seconds", "Latency", ("route",), buckets=(0.1, 1.0))
+    requests.inc("/a")
+    requests.inc("/a", amount=2)
+    for value in (0.05, 0.5, 3.0):
+        latency.observe(value, "/a")
+    registry.collector(lambda: [("pool_size", "gauge", "Pool size", [({}, 5)])])
+    
+    text = registry.render()
+    assert "# TYPE requests_total counter" in text
+    assert 'requests_total{route="/a"} 3' in text
+    # Buckets cumulativos, com +Inf igual à contagem
+    assert 'latency_seconds_bucket{route="/a",le="0.1"} 1' in text
+    assert 'latency_seconds_bucket{route="/a",le="1"} 2' in text
+    assert 'latency_seconds_bucket{route="/a",le="+Inf"} 3' in text
+    assert 'latency_seconds_count{route="/a"} 3' in text
+    assert "pool_size 5" in text
+
+def test_metrics_endpoint_records_route_templates(client, auth_headers, test_client_model):
+    labels = ("GET", "/clients/{client_id}", "200")
+    before = HTTP_REQUESTS.value(*labels)
+    latency_before = HTTP_LATENCY.count("GET", "/clients/{client_id}")
+    for _ in range(3):
+        assert client.get(f"/clients/{test_client_model.id}", headers=auth_headers).status_code == 200
+    client.get("/no-such-route")
+    
+    assert HTTP_REQUESTS.value(*labels) == before + 3
+    assert HTTP_LATENCY.count("GET", "/clients/{client_id}") == latency_before + 3
+    assert HTTP_REQUESTS.value("GET", "unmatched", "404") >= 1
+    
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    text = response.text
+    assert 'http_request_duration_seconds_bucket{method="GET",route="/clients/{client_id}",le="+Inf"}' in text
+    assert 'http_requests_in_progress{method="GET"} 0' in text
+    assert "http_response_size_bytes_sum" in text
+    assert 'circuit_breaker_state{name="market_data"}' in text
+    assert 'cache_hit_ratio{cache="quotes"}' in text
+    assert "db_pool_size" in text
@@ -0,0 +1,133 @@
+import asyncio
+import csv
+import io
+import pytest
+from datetime import date
+from app.models.allocation import Allocation
+from app.models.asset_price import AssetPrice
+from app.models.sale import Sale
+from app.services.client_summary import client_summary
+from app.services.pnl import PositionLedger, pnl_service
+
+def test_fifo_consumes_oldest_lots_first():
+    ledger = PositionLedger("fifo")
+    ledger.buy(10, 10.0)
+    ledger.buy(10, 20.0)
+    
+    assert ledger.sell(15, 25.0) == pytest.approx(15 * 25.0 - (10 * 10.0 + 5 * 20.0))
+    assert ledger.quantity == pytest.approx(5)
+    assert ledger.cost == pytest.approx(100.0)
+
+def test_average_cost_keeps_average_after_sales():
+    ledger = PositionLedger("average")
+    ledger.buy(10, 10.0)
+    ledger.buy(10, 20.0)
+    
+    assert ledger.sell(15, 25.0) == pytest.approx(15 * (25.0 - 15.0))
+    assert ledger.result()["average_cost"] == pytest.approx(15.0)
+    ledger.buy(5, 30.0)
+    assert ledger.result()["average_cost"] == pytest.approx(22.5)
+
+def test_sale_beyond_position_is_reported_as_unmatched():
+    ledger = PositionLedger("fifo")
+    ledger.buy(5, 10.0)
+    ledger.sell(8, 12.0)
+    result = ledger.result()
+    assert result["quantity"] == 0
+    assert result["unmatched_quantity"] == pytest.approx(3)
+    assert result["realized_pnl"] == pytest.approx(10.0)
+
+@pytest.fixture
+def traded_position(db_session, test_client_model, test_asset):
+    db_session.add_all([
+        Allocation(client_id=test_client_model.id, asset_id=test_asset.id, quantity=10, buy_price=10.0, buy_date=date(2024, 1, 2)),
+        Allocation(client_id=test_client_model.id, asset_id=test_asset.id, quantity=10, buy_price=20.0, buy_date=date(2024, 2, 1)),
+        Sale(client_id=test_client_model.id, asset_id=test_asset.id, quantity=15, sell_price=25.0, sell_date=date(2024, 3, 1)),
+        AssetPrice(asset_id=test_asset.id, date=date(2024, 3, 28), close=30.0),
+    ])
+    db_session.commit()
+    return test_client_model
+
+def test_streaming_pass_settles_each_position(db_session, traded_position, test_asset):
+    async def collect():
+        return [position async for position in pnl_service.iter_positions(db_session, "fifo", batch_size=1)]
+    
+    positions = asyncio.run(collect())
+    assert len(positions) == 1
+    position = positions[0]
+    assert (position["client_id"], position["asset_id"]) == (traded_position.id, test_asset.id)
+    assert position["realized_pnl"] == pytest.approx(175.0)
+    assert position["unrealized_pnl"] == pytest.approx(5 * 30.0 - 5 * 20.0)
+
+def test_client_pnl_endpoint_by_method(client, auth_headers, traded_position):
+    fifo = client.get(f"/portfolio/{traded_position.id}/pnl", headers=auth_headers).json()
+    average = client.get(f"/portfolio/{traded_position.id}/pnl?method=average", headers=auth_headers).json()
+    
+    assert fifo["realized_pnl"] == pytest.approx(175.0)
+    assert average["realized_pnl"] == pytest.approx(150.0)
+    assert average["unrealized_pnl"] == pytest.approx(5 * (30.0 - 15.0))
+    assert client.get(f"/portfolio/{traded_position.id}/pnl?method=lifo", headers=auth_headers).status_code == 422
+
+def test_sale_cannot_exceed_open_position(client, auth_headers, traded_position, test_asset):
+    sale = {"client_id": traded_position.id, "asset_id": test_asset.id, "quantity": 6, "sell_price": 30.0, "sell_date": "2024-03-15"}
+    response = client.post("/sales/", json=sale, headers=auth_headers)
+    assert response.status_code == 400
+    
+    # Antes da primeira compra não há posição
+    sale.update(quantity=5, sell_date="2024-01-01")
+    assert client.post("/sales/", json=sale, headers=auth_headers).status_code == 400
+    
+    sale.update(sell_date="2024-03-15")
+    response = client.post("/sales/", json=sale, headers=auth_headers)
+    assert response.status_code == 200
+    assert response.json()["quantity"] == 5
+
+def test_backdated_sale_cannot_oversell_a_later_sale(client, auth_headers, db_session, test_client_model, test_asset):
+    db_session.add_all([
+        Allocation(client_id=test_client_model.id, asset_id=test_asset.id, quantity=10, buy_price=10.0, buy_date=date(2024, 1, 2)),
+        Sale(client_id=test_client_model.id, asset_id=test_asset.id, quantity=10, sell_price=12.0, sell_date=date(2024, 2, 1)),
+        Allocation(client_id=test_client_model.id, asset_id=test_asset.id, quantity=10, buy_price=15.0, buy_date=date(2024, 3, 1)),
+    ])
+    db_session.commit()
+    
+    # Em 15/01 há 10 em carteira e 10 ao final, mas a venda de 01/02 ficaria descoberta
+    sale = {"client_id": test_client_model.id, "asset_id": test_asset.id, "quantity": 5, "sell_price": 11.0, "sell_date": "2024-01-15"}
+    response = client.post("/sales/", json=sale, headers=auth_headers)
+    assert response.status_code == 400
+    assert "2024-02-01" in response.json()["detail"]
+    assert len(client.get(f"/sales/?client_id={test_client_model.id}", headers=auth_headers).json()) == 1
+    
+    sale.update(sell_date="2024-03-15")
+    assert client.post("/sales/", json=sale, headers=auth_headers).status_code == 200
+
+def test_allocation_changes_cannot_uncover_sales(client, auth_headers, db_session, traded_position, test_asset):
+    newest = db_session.query(Allocation).filter(Allocation.buy_date == date(2024, 2, 1)).one()
+    
+    # A venda de 15 em 01/03 precisa de pelo menos 5 do segundo lote
+    assert client.put(f"/allocations/{newest.id}", json={"quantity": 4}, headers=auth_headers).status_code == 400
+    assert client.put(f"/allocations/{newest.id}", json={"buy_date": "2024-03-02"}, headers=auth_headers).status_code == 400
+    assert client.delete(f"/allocations/{newest.id}", headers=auth_headers).status_code == 400
+    assert client.get(f"/allocations/{newest.id}", headers=auth_headers).json()["quantity"] == 10
+    
+    response = client.put(f"/allocations/{newest.id}", json={"quantity": 5}, headers=auth_headers)
+    assert response.status_code == 200
+
+def test_summary_is_net_of_sales(client, auth_headers, db_session, traded_position, test_asset):
+    (row,) = asyncio.run(client_summary.compute(db_session, [traded_position.id]))
+    # Sobram 5 do lote mais novo (FIFO), comprado a 20
+    assert row["aum"] == pytest.approx(100.0)
+    assert row["positions_count"] == 1
+    
+    sale = {"client_id": traded_position.id, "asset_id": test_asset.id, "quantity": 5, "sell_price": 30.0, "sell_date": "2024-03-15"}
+    assert client.post("/sales/", json=sale, headers=auth_headers).status_code == 200
+    (row,) = asyncio.run(client_summary.compute(db_session, [traded_position.id]))
+    assert row["aum"] == 0
+    assert row["positions_count"] == 0
+
+def test_pnl_csv_export(client, auth_headers, traded_position):
+    response = client.get("/export/pnl/csv?method=average", headers=auth_headers)
+    assert response.status_code == 200
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert len(rows) == 1
+    assert rows[0]["Asset Ticker"] == "AAPL"
+    assert float(rows[0]["Realized P&L"]) == pytest.approx(150.0)
@@ -0,0 +1,326 @@
+import pytest
+import asyncio
+import numpy as np
+from fastapi.testclient import TestClient
+from datetime import date
+from app.models.allocation import Allocation
+from app.models.asset_price import AssetPrice
+from app.models.movement import Movement, MovementType
+from app.services.performance import compute_performance, Lots, Flows
+
+def add_prices(db_session, asset, prices):
+    for day, close in prices.items():
+        db_session.add(AssetPrice(asset_id=asset.id, date=day, close=close))
+    db_session.commit()
+
+def test_unauthorized_access(client: TestClient):
+    response = client.get("/portfolio/1/performance")
+    assert response.status_code == 403
+
+def test_performance_client_not_found(client, auth_headers):
+    response = client.get("/portfolio/999/performance", headers=auth_headers)
+    assert response.status_code == 404
+
+def test_client_performance(client, auth_headers, db_session, test_client_model, test_asset):
+    """Test TWR/MWR for a funded position that gains 10%"""
+    add_prices(db_session, test_asset, {
+        date(2024, 1, 2): 100.0,
+        date(2024, 1, 3): 105.0,
+        date(2024, 1, 4): 110.0,
+    })
+    db_session.add(Movement(client_id=test_client_model.id, type=MovementType.deposit,
+                            amount=1000, date=date(2024, 1, 2)))
+    db_session.add(Allocation(client_id=test_client_model.id, asset_id=test_asset.id,
+                              quantity=10, buy_price=100, buy_date=date(2024, 1, 2)))
+    db_session.commit()
+    
+    response = client.get(
+        f"/portfolio/{test_client_model.id}/performance?start=2024-01-02&end=2024-01-04",
+        headers=auth_headers
+    )
+    assert response.status_code == 200
+    data = response.json()
+    assert data["start_value"] == pytest.approx(1000.0)
+    assert data["end_value"] == pytest.approx(1100.0)
+    assert data["twr"] == pytest.approx(0.10)
+    assert data["mwr"] == pytest.approx(0.10)
+    assert [point["value"] for point in data["series"]] == pytest.approx([1000.0, 1050.0, 1100.0])
+
+def test_days_before_first_close_are_not_valued_at_a_later_price(client, auth_headers, db_session, test_client_model, test_asset):
+    """Test that a lot bought before the first stored close is valued at cost, not at that future close"""
+    from app.services.price_history import price_history
+    
+    add_prices(db_session, test_asset, {date(2024, 1, 4): 120.0})
+    db_session.add(Movement(client_id=test_client_model.id, type=MovementType.deposit,
+                            amount=1000, date=date(2024, 1, 2)))
+    db_session.add(Allocation(client_id=test_client_model.id, asset_id=test_asset.id,
+                              quantity=10, buy_price=100, buy_date=date(2024, 1, 2)))
+    db_session.commit()
+    
+    _, prices = asyncio.run(price_history.load_price_matrix(db_session, [test_asset.id], date(2024, 1, 2), date(2024, 1, 5)))
+    assert np.isnan(prices[:2, 0]).all()
+    assert prices[2:, 0].tolist() == [120.0, 120.0]
+    
+    data = client.get(
+        f"/portfolio/{test_client_model.id}/performance?start=2024-01-02&end=2024-01-05", headers=auth_headers
+    ).json()
+    assert [point["market_value"] for point in data["series"]] == pytest.approx([1000.0, 1000.0, 1200.0, 1200.0])
+
+def test_performance_without_invested_value(client, auth_headers, db_session, test_client_model, test_asset):
+    """An unpriced asset whose lots hold no quantity is valued at zero instead of failing"""
+    db_session.add(Allocation(client_id=test_client_model.id, asset_id=test_asset.id,
+                              quantity=0, buy_price=100, buy_date=date(2024, 1, 2)))
+    db_session.commit()
+    
+    response = client.get(
+        f"/portfolio/{test_client_model.id}/performance?start=2024-01-02&end=2024-01-04",
+        headers=auth_headers
+    )
+    assert response.status_code == 200
+    data = response.json()
+    assert data["end_value"] == 0.0
+    assert data["twr"] == 0.0 and data["mwr"] == 0.0
+
+def test_twr_ignores_external_flows():
+    """Test that a deposit mid-period does not count as return, while MWR weights it"""
+    calendar = np.arange(np.datetime64("2024-01-01"), np.datetime64("2024-01-04"))
+    prices = np.array([[100.0], [110.0], [110.0]])
+    lots = Lots(
+        client_idx=np.array([0, 0]),
+        asset_idx=np.array([0, 0]),
+        date_idx=np.array([0, 1]),
+        quantity=np.array([10.0, 10.0]),
+        cost=np.array([1000.0, 1100.0])
+    )
+    flows = Flows(client_idx=np.array([], dtype=np.int64), date_idx=np.array([], dtype=np.int64),
+                  amount=np.array([]))
+    
+    result = compute_performance(calendar, prices, lots, flows, n_clients=1)
+    
+    assert result.value[0] == pytest.approx([1000.0, 2200.0, 2200.0])
+    assert result.twr[0] == pytest.approx(0.10)
+    assert result.max_drawdown[0] == pytest.approx(0.0)
+    # The second lot is bought at the top and earns nothing, so MWR ends below TWR
+    assert result.mwr[0] == pytest.approx(0.0649, abs=1e-4)
+
+def test_client_risk(client, auth_headers, db_session, test_client_model, test_asset):
+    """Test volatility and VaR for a single-asset portfolio"""
+    from datetime import timedelta
+    from app.services.price_history import business_days
+    
+    days = business_days(date.today() - timedelta(days=120), date.today())
+    closes = 100.0 * np.cumprod(np.where(np.arange(len(days)) % 2 == 0, 1.01, 0.99))
+    add_prices(db_session, test_asset, dict(zip(days.tolist(), closes.tolist())))
+    db_session.add(Allocation(client_id=test_client_model.id, asset_id=test_asset.id,
+                              quantity=10, buy_price=100, buy_date=days[0].item()))
+    db_session.commit()
+    
+    response = client.get(f"/portfolio/{test_client_model.id}/risk?window=60", headers=auth_headers)
+    assert response.status_code == 200
+    data = response.json()
+    assert data["market_value"] == pytest.approx(10 * closes[-1])
+    assert data["daily_volatility"] == pytest.approx(0.01, rel=0.05)
+    assert data["historical_var"] > 0
+    assert data["parametric_var"] > 0
+    assert data["weights"] == {str(test_asset.id): pytest.approx(1.0)}
+
+def test_risk_window_starts_when_every_asset_has_a_close(db_session, test_asset):
+    """Test that an asset listed mid-window shortens the window instead of back-filling its first close"""
+    from datetime import timedelta
+    from app.models.asset import Asset
+    from app.services.price_history import business_days
+    from app.services.risk import risk_service
+    
+    listed = Asset(ticker="NEW3", name="Newly Listed", currency="BRL")
+    db_session.add(listed)
+    db_session.commit()
+    days = business_days(date.today() - timedelta(days=120), date.today())
+    closes = 100.0 * np.cumprod(np.where(np.arange(len(days)) % 2 == 0, 1.01, 0.99))
+    add_prices(db_session, test_asset, dict(zip(days.tolist(), closes.tolist())))
+    add_prices(db_session, listed, dict(zip(days[-10:].tolist(), closes[-10:].tolist())))
+    
+    asyncio.run(risk_service.invalidate_cache())
+    stats, latest = asyncio.run(risk_service.get_return_stats(db_session, [test_asset.id, listed.id], 60))
+    assert stats.returns.shape == (9, 2)
+    assert latest.tolist() == pytest.approx([closes[-1], closes[-1]])
+
+def test_risk_without_positions(client, auth_headers, test_client_model):
+    response = client.get(f"/portfolio/{test_client_model.id}/risk", headers=auth_headers)
+    assert response.status_code == 400
+
+def test_correlation_matrix_is_shared_across_calls(client, auth_headers, db_session, test_asset):
+    """Test the correlation endpoint and that return statistics are cached per asset set"""
+    from datetime import timedelta
+    from app.models.asset import Asset
+    from app.services.price_history import business_days
+    from app.services.risk import risk_service
+    
+    other = Asset(ticker="MSFT", name="Microsoft Corporation", exchange="NASDAQ", currency="USD")
+    db_session.add(other)
+    db_session.commit()
+    days = business_days(date.today() - timedelta(days=60), date.today())
+    moves = np.where(np.arange(len(days)) % 3 == 0, 1.02, 0.99)
+    add_prices(db_session, test_asset, dict(zip(days.tolist(), (100 * np.cumprod(moves)).tolist())))
+    add_prices(db_session, other, dict(zip(days.tolist(), (50 * np.cumprod(moves)).tolist())))
+    risk_service.clear_cache()
+    
+    url = f"/portfolio/correlation?asset_ids={test_asset.id}&asset_ids={other.id}&window=30"
+    response = client.get(url, headers=auth_headers)
+    assert response.status_code == 200
+    assert np.array(response.json()["correlation"]) == pytest.approx(np.ones((2, 2)))
+    assert len(risk_service._stats_cache) == 1
+    
+    client.get(url.replace(f"asset_ids={test_asset.id}&asset_ids={other.id}",
+                           f"asset_ids={other.id}&asset_ids={test_asset.id}"), headers=auth_headers)
+    assert len(risk_service._stats_cache) == 1
+
+@pytest.fixture
+def history_cache():
+    from app.services.portfolio_history import portfolio_history
+    portfolio_history.clear_cache()
+    yield portfolio_history
+    portfolio_history.clear_cache()
+
+def test_client_history_values_positions_daily(client, auth_headers, db_session, test_client_model, test_asset, history_cache):
+    add_prices(db_session, test_asset, {
+        date(2024, 1, 2): 100.0,
+        date(2024, 1, 3): 105.0,
+        date(2024, 1, 4): 110.0,
+        date(2024, 1, 5): 120.0,
+    })
+    db_session.add(Allocation(client_id=test_client_model.id, asset_id=test_asset.id,
+                              quantity=10, buy_price=100, buy_date=date(2024, 1, 3)))
+    db_session.commit()
+    
+    response = client.get(
+        f"/portfolio/{test_client_model.id}/history?start=2024-01-02&end=2024-01-05", headers=auth_headers
+    )
+    assert response.status_code == 200
+    points = response.json()["points"]
+    assert [point["date"] for point in points] == ["2024-01-02", "2024-01-03", "2024-01-04", "2024-01-05"]
+    assert [point["market_value"] for point in points] == pytest.approx([0.0, 1050.0, 1100.0, 1200.0])
+    assert [point["invested"] for point in points] == pytest.approx([0.0, 1000.0, 1000.0, 1000.0])
+
+def test_history_granularity_takes_last_business_day_of_period():
+    from app.services.portfolio_history import period_ends
+    calendar = np.arange(np.datetime64("2024-01-29"), np.datetime64("2024-02-10"))
+    calendar = calendar[np.is_busday(calendar)]
+    assert calendar[period_ends(calendar, "weekly")].astype(str).tolist() == ["2024-02-02", "2024-02-09"]
+    assert calendar[period_ends(calendar, "monthly")].astype(str).tolist() == ["2024-01-31", "2024-02-09"]
+
+def test_history_recomputes_only_the_tail_after_a_new_lot(client, auth_headers, db_session, test_client_model, test_asset, history_cache):
+    add_prices(db_session, test_asset, {date(2024, 1, day): 100.0 + day for day in range(2, 13)})
+    db_session.add(Allocation(client_id=test_client_model.id, asset_id=test_asset.id,
+                              quantity=10, buy_price=100, buy_date=date(2024, 1, 2)))
+    db_session.commit()
+    url = f"/portfolio/{test_client_model.id}/history?start=2024-01-02&end=2024-01-12"
+    before = history_cache.stats()
+    
+    def computed(counter):
+        return history_cache.stats()[counter] - before[counter]
+    
+    client.get(url, headers=auth_headers)
+    client.get(url, headers=auth_headers)
+    assert computed("full_computes") == 1
+    assert computed("hits") == 1
+    
+    response = client.post("/allocations/", json={
+        "client_id": test_client_model.id, "asset_id": test_asset.id,
+        "quantity": 5, "buy_price": 100.0, "buy_date": "2024-01-10"
+    }, headers=auth_headers)
+    assert response.status_code == 200
+    
+    points = client.get(url, headers=auth_headers).json()["points"]
+    assert computed("full_computes") == 1
+    assert computed("tail_computes") == 1
+    values = {point["date"]: point["market_value"] for point in points}
+    assert values["2024-01-09"] == pytest.approx(10 * 109.0)
+    assert values["2024-01-10"] == pytest.approx(15 * 110.0)
+    assert values["2024-01-12"] == pytest.approx(15 * 112.0)
+
+def test_history_recomputes_the_tail_after_price_ingestion(client, auth_headers, db_session, test_client_model, test_asset, history_cache, price_provider):
+    from app.services.price_history import price_history
+    
+    add_prices(db_session, test_asset, {date(2024, 1, day): 100.0 for day in range(2, 6)})
+    db_session.add(Allocation(client_id=test_client_model.id, asset_id=test_asset.id,
+                              quantity=10, buy_price=100, buy_date=date(2024, 1, 2)))
+    db_session.commit()
+    url = f"/portfolio/{test_client_model.id}/history?start=2024-01-02&end=2024-01-12"
+    before = history_cache.stats()
+    client.get(url, headers=auth_headers)
+    
+    asyncio.run(price_history.ingest(db_session, [test_asset], start=date(2024, 1, 8), end=date(2024, 1, 12),
+                                     provider=price_provider))
+    points = client.get(url, headers=auth_headers).json()["points"]
+    assert history_cache.stats()["tail_computes"] - before["tail_computes"] == 1
+    values = {point["date"]: point["market_value"] for point in points}
+    assert values["2024-01-05"] == pytest.approx(10 * 100.0)
+    assert values["2024-01-10"] == pytest.approx(10 * (100.0 + date(2024, 1, 10).toordinal() % 10))
+
+def test_simulated_paths_are_reproducible_and_follow_the_drift():
+    from app.services.simulation import simulate_paths, summarize_paths
+    
+    mean = np.array([0.0004, 0.0002])
+    covariance = np.array([[1e-4, 5e-5], [5e-5, 2e-4]])
+    values = np.array([1000.0, 500.0])
+    first = simulate_paths(mean, covariance, values, 3, 2000, 42)
+    assert first.shape == (4, 2000)
+    assert np.array_equal(first, simulate_paths(mean, covariance, values, 3, 2000, 42))
+    
+    # Sem volatilidade todos os caminhos crescem pelo drift
+    flat = simulate_paths(mean, np.zeros((2, 2)), values, 2, 10, 1)
+    assert flat[2] == pytest.approx(1000 * np.exp(0.0004 * 504) + 500 * np.exp(0.0002 * 504))
+    
+    bands = summarize_paths(first, [5, 50, 95])
+    assert [band["year"] for band in bands] == [1, 2, 3]
+    assert bands[0]["percentiles"][5] < bands[0]["percentiles"][50] < bands[0]["percentiles"][95]
+    # A dispersão aumenta com o horizonte
+    assert bands[2]["percentiles"][95] - bands[2]["percentiles"][5] > bands[0]["percentiles"][95] - bands[0]["percentiles"][5]
+
+def test_client_simulation_job(client, auth_headers, db_session, test_client_model, test_asset):
+    """The simulation runs in the background and is polled by job id"""
+    import time
+    from datetime import timedelta
+    from app.services.price_history import business_days
+    
+    days = business_days(date.today() - timedelta(days=120), date.today())
+    closes = 100.0 * np.cumprod(np.where(np.arange(len(days)) % 2 == 0, 1.01, 0.99))
+    add_prices(db_session, test_asset, dict(zip(days.tolist(), closes.tolist())))
+    db_session.add(Allocation(client_id=test_client_model.id, asset_id=test_asset.id,
+                              quantity=10, buy_price=100, buy_date=days[0].item()))
+    db_session.commit()
+    
+    url = f"/portfolio/{test_client_model.id}/simulations?window=60&years=5&paths=2000&seed=7"
+    response = client.post(url, headers=auth_headers)
+    assert response.status_code == 202
+    job = response.json()
+    assert response.headers["location"] == f"/portfolio/simulations/{job['id']}"
+    
+    for _ in range(100):
+        job = client.get(f"/portfolio/simulations/{job['id']}", headers=auth_headers).json()
+        if job["status"] in ("done", "failed"):
+            break
+        time.sleep(0.05)
+    assert job["status"] == "done", job["error"]
+    result = job["result"]
+    assert result["paths"] == 2000 and result["seed"] == 7
+    assert result["market_value"] == pytest.approx(10 * closes[-1])
+    assert [band["year"] for band in result["bands"]] == [1, 2, 3, 4, 5]
+    assert set(result["bands"][0]["percentiles"]) == {"5", "25", "50", "75", "95"}
+    
+    # Mesmo seed, mesmas faixas
+    again = client.post(url, headers=auth_headers).json()
+    for _ in range(100):
+        again = client.get(f"/portfolio/simulations/{again['id']}", headers=auth_headers).json()
+        if again["status"] == "done":
+            break
+        time.sleep(0.05)
+    assert again["result"]["bands"] == result["bands"]
+
+def test_simulation_errors(client, auth_headers, test_client_model):
+    response = client.post(f"/portfolio/{test_client_model.id}/simulations", headers=auth_headers)
+    assert response.status_code == 400
+    response = client.post("/portfolio/999/simulations", headers=auth_headers)
+    assert response.status_code == 404
+    response = client.get("/portfolio/simulations/unknown", headers=auth_headers)
+    assert response.status_code == 404
@@ -0,0 +1,84 @@
+import pytest
+import asyncio
+import numpy as np
+from datetime import date
+from app.models.asset import Asset
+from app.models.asset_price import AssetPrice
+from app.services.price_cache import ColumnarPriceCache
+from app.services.price_history import price_history
+
+@pytest.fixture
+def columnar_cache(tmp_path, monkeypatch):
+    cache = ColumnarPriceCache(str(tmp_path))
+    monkeypatch.setattr("app.services.price_history.price_cache", cache)
+    return cache
+
+@pytest.fixture
+def two_assets(db_session, test_asset, price_provider):
+    msft = Asset(ticker="MSFT", name="Microsoft Corporation", exchange="NASDAQ", currency="USD")
+    db_session.add(msft)
+    db_session.commit()
+    asyncio.run(price_history.ingest(
+        db_session, [test_asset, msft], start=date(2024, 1, 1), end=date(2024, 3, 15), provider=price_provider
+    ))
+    return [test_asset.id, msft.id]
+
+def test_matrix_from_cache_matches_database(db_session, two_assets, columnar_cache):
+    _, expected = asyncio.run(price_history.load_price_matrix(db_session, two_assets, date(2024, 2, 1), date(2024, 3, 15)))
+    
+    assert asyncio.run(columnar_cache.refresh(db_session)) == ["2024-01", "2024-02", "2024-03"]
+    assert isinstance(columnar_cache.open_month(date(2024, 2, 1)), np.memmap)
+    
+    calendar, cached = asyncio.run(price_history.load_price_matrix(db_session, two_assets, date(2024, 2, 1), date(2024, 3, 15)))
+    np.testing.assert_array_equal(cached, expected)
+    assert calendar[0] == np.datetime64("2024-02-01")
+
+def test_refresh_rebuilds_only_changed_months(db_session, two_assets, columnar_cache):
+    asyncio.run(columnar_cache.refresh(db_session))
+    assert asyncio.run(columnar_cache.refresh(db_session)) == []
+    
+    price = db_session.query(AssetPrice).filter(AssetPrice.date == date(2024, 2, 15)).first()
+    price.close = 999
+    db_session.commit()
+    
+    assert asyncio.run(columnar_cache.refresh(db_session)) == ["2024-02"]
+    _, matrix = asyncio.run(price_history.load_price_matrix(
+        db_session, [price.asset_id], date(2024, 2, 15), date(2024, 2, 15)
+    ))
+    assert matrix[0, 0] == 999
+
+def test_days_after_cached_months_come_from_database(db_session, two_assets, columnar_cache, test_asset, price_provider):
+    asyncio.run(columnar_cache.refresh(db_session))
+    asyncio.run(price_history.ingest(
+        db_session, [test_asset], start=date(2024, 1, 1), end=date(2024, 4, 5), provider=price_provider
+    ))
+    # A ingestão atualiza o cache; sem ele, abril ainda viria do banco
+    assert columnar_cache.open_month(date(2024, 4, 1)) is not None
+    calendar, matrix = asyncio.run(price_history.load_price_matrix(
+        db_session, two_assets, date(2024, 3, 25), date(2024, 4, 5)
+    ))
+    assert not np.isnan(matrix[:, 0]).any()
+    # MSFT não tem preços em abril: o último fechamento de março é propagado
+    assert not np.isnan(matrix[:, 1]).any()
+    assert (matrix[:, 1] == matrix[0, 1]).all()
+
+def test_ranged_refresh_checks_only_the_written_months(db_session, two_assets, columnar_cache, monkeypatch):
+    from app.core.db_helpers import DBHelper
+    asyncio.run(columnar_cache.refresh(db_session))
+    for day in (date(2024, 1, 15), date(2024, 3, 1)):
+        price = db_session.query(AssetPrice).filter(AssetPrice.date == day).first()
+        price.close = 999
+    db_session.commit()
+    
+    statements = []
+    execute_query = DBHelper.execute_query
+    async def recording(db, query, params=None):
+        statements.append(str(query.compile(compile_kwargs={"literal_binds": True})))
+        return await execute_query(db, query, params)
+    monkeypatch.setattr(DBHelper, "execute_query", recording)
+    
+    # Só março foi "gravado": janeiro continua desatualizado até uma verificação completa
+    assert asyncio.run(columnar_cache.refresh(db_session, date(2024, 3, 1), date(2024, 3, 1))) == ["2024-03"]
+    assert "'2024-03-01'" in statements[0] and "'2024-03-31'" in statements[0]
+    assert set(columnar_cache._read_manifest()) == {"2024-01", "2024-02", "2024-03"}
+    assert asyncio.run(columnar_cache.refresh(db_session)) == ["2024-01"]
@@ -0,0 +1,66 @@
+import time
+import pytest
+from fastapi import FastAPI, HTTPException
+from fastapi.testclient import TestClient
+from app.api.routes.profiles import require_profiling_user
+from app.core.config import settings
+from app.core.profiling import ProfilingMiddleware, collapse, profiles
+from app.core.security import create_access_token
+from app.models.user import User
+
+def busy_handler():
+    deadline = time.perf_counter() + 0.1
+    while time.perf_counter() < deadline:
+        sum(range(1000))
+    return {"ok": True}
+
+def make_client(sample_rate: float = 0) -> TestClient:
+    app = FastAPI()
+    app.get("/busy")(busy_handler)
+    app.add_middleware(ProfilingMiddleware, sample_rate=sample_rate, interval_ms=1)
+    return TestClient(app)
+
+@pytest.fixture
+def profiling_user(monkeypatch):
+    monkeypatch.setattr(settings, "PROFILING_USERS", {"dev@example.com"})
+    return {"Authorization": f"Bearer {create_access_token({'sub': 'dev@example.com'})}", "X-Profile": "1"}
+
+def test_authorized_header_profiles_request(profiling_user):
+    response = make_client().get("/busy", headers={**profiling_user, "X-Request-ID": "req-123"})
+    assert response.status_code == 200
+    # Id gerado no servidor; o X-Request-ID do cliente fica só como metadado
+    profile_id = response.headers["x-profile-id"]
+    assert profile_id != "req-123" and profiles.get("req-123") is None
+    
+    profile = profiles.get(profile_id)
+    assert profile["route"] == "GET /busy" and profile["samples"] > 0
+    assert profile["request_id"] == "req-123"
+    # Handler síncrono roda no threadpool e aparece nas pilhas
+    lines = profile["collapsed"].splitlines()
+    assert any("busy_handler (" in line for line in lines)
+    stack, count = lines[0].rsplit(" ", 1)
+    assert int(count) > 0 and ";" in stack
+
+def test_header_from_other_users_is_ignored(profiling_user):
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': 'other@example.com'})}", "X-Profile": "1"}
+    response = make_client().get("/busy", headers=headers)
+    assert "x-profile-id" not in response.headers
+    assert "x-profile-id" not in make_client().get("/busy", headers={"X-Profile": "1"}).headers
+
+def test_sampled_requests_are_profiled():
+    response = make_client(sample_rate=1.0).get("/busy")
+    assert profiles.get(response.headers["x-profile-id"]) is not None
+
+def test_idle_threads_are_skipped():
+    class Code:
+        co_name, co_firstlineno = "select", 1
+        co_filename = "/usr/lib/python3.11/selectors.py"
+    class Frame:
+        f_code, f_back = Code, None
+    assert collapse(Frame, "MainThread") is None
+
+def test_profiles_route_requires_listed_user(profiling_user):
+    assert require_profiling_user(User(email="dev@example.com")).email == "dev@example.com"
+    with pytest.raises(HTTPException) as exc:
+        require_profiling_user(User(email="other@example.com"))
+    assert exc.value.status_code == 403
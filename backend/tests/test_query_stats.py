@@ -0,0 +1,99 @@
+import logging
+from types import SimpleNamespace
+from app.core import query_stats
+from app.core.config import settings
+from app.core.query_stats import QueryStats, QueryStatsMiddleware
+from app.core.slow_queries import SlowQueryLog, explainable, parameter_shapes
+
+def test_server_timing_header(client, auth_headers, test_client_model):
+    response = client.get(f"/clients/{test_client_model.id}", headers=auth_headers)
+    assert response.status_code == 200
+    timing = response.headers["server-timing"]
+    assert timing.startswith("db;dur=")
+    assert 'desc="2 queries"' in timing
+
+def test_endpoint_query_budgets(client, auth_headers, test_client_model, test_asset, query_budget):
+    # Autenticação (1) + leitura do cliente
+    with query_budget(3):
+        client.get(f"/clients/{test_client_model.id}", headers=auth_headers)
+    with query_budget(4):
+        client.get(f"/movements/client/{test_client_model.id}", headers=auth_headers)
+    # Cliente, ativo, inserção, resumo do cliente, refresh
+    with query_budget(10):
+        response = client.post("/allocations/", headers=auth_headers, json={
+            "client_id": test_client_model.id, "asset_id": test_asset.id,
+            "quantity": 1, "buy_price": 10, "buy_date": "2024-01-02"
+        })
+    assert response.status_code == 200
+
+def test_repeated_statements_are_reported(caplog):
+    stats = QueryStats("GET /clients/")
+    for _ in range(6):
+        stats.record("SELECT * FROM assets WHERE assets.id = ?", 0.001)
+    stats.record("SELECT * FROM clients", 0.001)
+    
+    middleware = QueryStatsMiddleware(app=None, repeat_threshold=5)
+    with caplog.at_level(logging.WARNING, logger="app.queries"):
+        middleware._report(stats, 0.01)
+    assert len(caplog.records) == 1
+    assert "executed 6 times" in caplog.records[0].getMessage()
+    assert "FROM assets" in caplog.records[0].getMessage()
+
+def test_slow_queries_are_logged_with_route(client, auth_headers, test_client_model, monkeypatch, caplog):
+    monkeypatch.setattr(settings, "SLOW_QUERY_THRESHOLD_MS", 1e-6)
+    monkeypatch.setattr(query_stats, "slow_query_log", SlowQueryLog())
+    with caplog.at_level(logging.WARNING, logger="app.slow_queries"):
+        client.get(f"/clients/{test_client_model.id}", headers=auth_headers)
+    messages = [record.getMessage() for record in caplog.records if record.name == "app.slow_queries"]
+    assert any(f"from GET /clients/{test_client_model.id}" in message and "FROM clients" in message for message in messages)
+    # Só a forma dos parâmetros, nunca os valores
+    assert all("test@example.com" not in message for message in messages)
+
+def test_slow_query_log_is_rate_limited(monkeypatch, caplog):
+    monkeypatch.setattr(settings, "SLOW_QUERY_THRESHOLD_MS", 100)
+    monkeypatch.setattr(settings, "SLOW_QUERY_LOG_LIMIT", 2)
+    monkeypatch.setattr(settings, "SLOW_QUERY_EXPLAIN", True)
+    monkeypatch.setattr(settings, "SLOW_QUERY_EXPLAIN_SAMPLE_RATE", 1.0)
+    log = SlowQueryLog()
+    conn = SimpleNamespace(dialect=SimpleNamespace(name="sqlite"))
+    
+    with caplog.at_level(logging.WARNING, logger="app.slow_queries"):
+        log.observe(conn, "SELECT 1", (), 0.05, None)
+        for _ in range(5):
+            log.observe(conn, "SELECT * FROM movements WHERE client_id = ?", (7,), 0.2, "GET /movements/client/7")
+        log._window_start -= 60
+        log.observe(conn, "SELECT 2", (), 0.3, None)
+    
+    assert log.stats() == {"slow": 6, "logged": 3, "suppressed": 3, "explained": 0, "explain_errors": 0}
+    messages = [record.getMessage() for record in caplog.records]
+    assert len(messages) == 3
+    assert "params (int)" in messages[0] and "from GET /movements/client/7" in messages[0]
+    assert "[3 more not logged]" in messages[2]
+
+def test_parameter_shapes_and_explainable():
+    assert parameter_shapes(("abc", 1, None, [1, 2])) == "(str(3), int, null, list[2])"
+    assert parameter_shapes({"email": "a@b.c"}) == "{email: str(5)}"
+    assert parameter_shapes([(1, "x"), (2, "y")]) == "2 x (int, str(1))"
+    assert explainable("  select * from movements")
+    assert not explainable("UPDATE movements SET quantity = 1")
+    assert not explainable("WITH d AS (DELETE FROM movements RETURNING *) SELECT * FROM d")
+    assert explainable("WITH d AS (SELECT * FROM movements) SELECT * FROM d WHERE note = 'delete'")
+    assert not explainable("SELECT clients.id FROM clients WHERE clients.id IN (1, 2) ORDER BY clients.id FOR UPDATE")
+    assert not explainable("select * from clients for no key update")
+    assert not explainable("SELECT * FROM clients FOR SHARE OF clients")
+    assert not explainable("WITH u AS (UPDATE clients SET name = 'x' RETURNING id) SELECT * FROM u")
+    assert not explainable("SELECT * INTO backup FROM clients")
+
+def test_failed_statement_leaves_nothing_on_the_connection(db_session):
+    import pytest
+    from sqlalchemy import text
+    from sqlalchemy.exc import OperationalError
+    
+    with query_stats.count_queries() as counter:
+        with pytest.raises(OperationalError):
+            db_session.execute(text("SELECT * FROM missing_table"))
+        db_session.rollback()
+        db_session.execute(text("SELECT 1"))
+    connection = db_session.connection()
+    assert "query_started" not in connection.info
+    assert counter.count == 1
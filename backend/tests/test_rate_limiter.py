@@ -0,0 +1,88 @@
+import pytest
+import asyncio
+import time
+from app.core.rate_limiter import AsyncTokenBucket, RateLimitExceeded
+from app.services.yahoo_finance import yahoo_finance
+
+def test_burst_is_served_without_waiting():
+    bucket = AsyncTokenBucket(rate=1, burst=3, max_queue=10)
+    
+    async def run():
+        started = time.monotonic()
+        for _ in range(3):
+            await bucket.acquire()
+        return time.monotonic() - started
+    
+    assert asyncio.run(run()) < 0.1
+    assert bucket.stats()["acquired"] == 3
+    assert bucket.stats()["waited"] == 0
+
+def test_waiters_are_spaced_by_rate():
+    bucket = AsyncTokenBucket(rate=50, burst=1, max_queue=10)
+    
+    async def run():
+        started = time.monotonic()
+        await asyncio.gather(*(bucket.acquire() for _ in range(4)))
+        return time.monotonic() - started
+    
+    # Um token imediato e três reservas espaçadas de 20ms
+    assert asyncio.run(run()) >= 0.05
+    assert bucket.stats()["waited"] == 3
+
+def test_rejects_when_queue_is_full():
+    bucket = AsyncTokenBucket(rate=10, burst=1, max_queue=2)
+    
+    async def run():
+        await bucket.acquire()
+        waiters = [asyncio.ensure_future(bucket.acquire()) for _ in range(2)]
+        await asyncio.sleep(0)
+        with pytest.raises(RateLimitExceeded) as exc:
+            await bucket.acquire()
+        await asyncio.gather(*waiters)
+        return exc.value
+    
+    error = asyncio.run(run())
+    assert error.retry_after > 0
+    assert bucket.stats()["rejected"] == 1
+
+def test_rejects_when_deadline_would_be_missed():
+    bucket = AsyncTokenBucket(rate=1, burst=1, max_queue=10)
+    
+    async def run():
+        await bucket.acquire()
+        await bucket.acquire(timeout=0.1)
+    
+    with pytest.raises(RateLimitExceeded):
+        asyncio.run(run())
+    assert bucket.queue_depth == 0
+
+def test_cancelled_waiter_returns_its_reservation():
+    bucket = AsyncTokenBucket(rate=1, burst=1, max_queue=10)
+    
+    async def run():
+        await bucket.acquire()
+        waiter = asyncio.ensure_future(bucket.acquire())
+        await asyncio.sleep(0)
+        assert bucket.queue_depth == 1
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        return bucket.queue_depth
+    
+    assert asyncio.run(run()) == 0
+
+def test_search_yahoo_returns_202_when_queue_is_full(client, auth_headers, monkeypatch):
+    monkeypatch.setattr(yahoo_finance, "_limiter", AsyncTokenBucket(rate=0.1, burst=0, max_queue=0))
+    yahoo_finance._cache.delete("QUEUED")
+    
+    response = client.get("/assets/search-yahoo/QUEUED", headers=auth_headers)
+    assert response.status_code == 202
+    assert response.json()["status"] == "pending"
+    assert int(response.headers["Retry-After"]) >= 1
+
+def test_history_range_waits_for_rate_limit(monkeypatch, market_data):
+    from datetime import date
+    monkeypatch.setattr(yahoo_finance, "_limiter", AsyncTokenBucket(rate=0.1, burst=0, max_queue=0))
+    
+    with pytest.raises(RateLimitExceeded):
+        asyncio.run(yahoo_finance.get_history_range("AAPL", date(2024, 1, 1), date(2024, 1, 31)))
@@ -0,0 +1,118 @@
+import pytest
+import numpy as np
+from fastapi.testclient import TestClient
+from datetime import date
+from app.models.allocation import Allocation
+from app.models.asset import Asset
+from app.models.fx_rate import FxRate
+from app.models.movement import Movement, MovementType
+from app.models.sale import Sale
+from app.services.fx import fx_service
+from app.services.rebalancing import evaluate_drift, ASSET_CLASSES, PROFILES
+
+@pytest.fixture(autouse=True)
+def clear_fx_cache():
+    fx_service.clear_cache()
+    yield
+    fx_service.clear_cache()
+
+def test_unauthorized_access(client: TestClient):
+    response = client.get("/rebalancing/drift")
+    assert response.status_code == 403
+
+def test_evaluate_drift_flags_only_clients_beyond_threshold():
+    """Test vectorized drift for a balanced and an unbalanced moderate client"""
+    moderate = PROFILES.index("moderate")
+    fixed_income, equity = ASSET_CLASSES.index("fixed_income"), ASSET_CLASSES.index("equity")
+    real_estate, alternative = ASSET_CLASSES.index("real_estate"), ASSET_CLASSES.index("alternative")
+    
+    result = evaluate_drift(
+        client_idx=np.array([0, 0, 0, 0, 1]),
+        class_idx=np.array([fixed_income, equity, real_estate, alternative, equity]),
+        values=np.array([450.0, 350.0, 100.0, 100.0, 1000.0]),
+        profile_idx=np.array([moderate, moderate]),
+        threshold=0.05
+    )
+    
+    assert result.flagged.tolist() == [False, True]
+    assert result.max_drift[1] == pytest.approx(0.65)
+    assert result.trades[1, equity] == pytest.approx(-650.0)
+    assert result.trades[1, fixed_income] == pytest.approx(450.0)
+
+def test_client_drift(client, auth_headers, db_session, test_client_model, test_asset):
+    """Test the drift of an aggressive client fully invested in fixed income"""
+    test_client_model.investment_profile = "aggressive"
+    bond = Asset(ticker="TESOURO", name="Tesouro Selic", currency="BRL", asset_class="fixed_income")
+    db_session.add(bond)
+    db_session.commit()
+    db_session.add(Allocation(client_id=test_client_model.id, asset_id=bond.id,
+                              quantity=10, buy_price=100, buy_date=date.today()))
+    db_session.commit()
+    
+    response = client.get(f"/rebalancing/client/{test_client_model.id}", headers=auth_headers)
+    assert response.status_code == 200
+    data = response.json()
+    assert data["needs_rebalancing"] is True
+    assert data["total_value"] == pytest.approx(1000.0)
+    classes = {row["asset_class"]: row for row in data["classes"]}
+    assert classes["fixed_income"]["current_weight"] == pytest.approx(1.0)
+    assert classes["equity"]["trade_amount"] == pytest.approx(550.0)
+    
+    response = client.get("/rebalancing/drift", headers=auth_headers)
+    assert response.status_code == 200
+    assert [row["client_id"] for row in response.json()] == [test_client_model.id]
+
+def test_client_drift_is_net_of_sales(client, auth_headers, db_session, test_client_model):
+    """Test that sold quantity no longer counts in the drift"""
+    test_client_model.investment_profile = "aggressive"
+    bond = Asset(ticker="TESOURO", name="Tesouro Selic", currency="BRL", asset_class="fixed_income")
+    stock = Asset(ticker="PETR4", name="Petrobras", currency="BRL", asset_class="equity")
+    db_session.add_all([bond, stock])
+    db_session.commit()
+    db_session.add_all([
+        Allocation(client_id=test_client_model.id, asset_id=bond.id, quantity=10, buy_price=100, buy_date=date(2024, 1, 2)),
+        Allocation(client_id=test_client_model.id, asset_id=stock.id, quantity=10, buy_price=100, buy_date=date(2024, 1, 2)),
+        Sale(client_id=test_client_model.id, asset_id=bond.id, quantity=8, sell_price=100, sell_date=date(2024, 2, 1)),
+    ])
+    db_session.commit()
+    
+    data = client.get(f"/rebalancing/client/{test_client_model.id}", headers=auth_headers).json()
+    classes = {row["asset_class"]: row for row in data["classes"]}
+    assert classes["fixed_income"]["current_weight"] == pytest.approx(200.0 / 1200.0)
+    assert classes["equity"]["current_weight"] == pytest.approx(1000.0 / 1200.0)
+
+def test_client_drift_converts_currencies_and_counts_cash(client, auth_headers, db_session, test_client_model, test_asset):
+    """Test a USD stock and a BRL bond weighted in one currency, with the cash left after trades"""
+    test_client_model.investment_profile = "aggressive"
+    bond = Asset(ticker="TESOURO", name="Tesouro Selic", currency="BRL", asset_class="fixed_income")
+    db_session.add(bond)
+    db_session.commit()
+    db_session.add_all([
+        FxRate(currency="BRL", date=date(2024, 1, 2), rate=0.2),
+        Movement(client_id=test_client_model.id, type=MovementType.deposit, amount=12000, date=date(2024, 1, 2)),
+        Allocation(client_id=test_client_model.id, asset_id=bond.id, quantity=100, buy_price=50, buy_date=date(2024, 1, 2)),
+        Allocation(client_id=test_client_model.id, asset_id=test_asset.id, quantity=10, buy_price=100, buy_date=date(2024, 1, 2)),
+        Sale(client_id=test_client_model.id, asset_id=test_asset.id, quantity=5, sell_price=120, sell_date=date(2024, 2, 1)),
+    ])
+    db_session.commit()
+    
+    # Em BRL: título 5000, 5 AAPL pelo custo (500 USD = 2500), caixa 12000 - 5000 - 5000 + 3000
+    data = client.get(f"/rebalancing/client/{test_client_model.id}", headers=auth_headers).json()
+    assert data["base_currency"] == "BRL"
+    assert data["total_value"] == pytest.approx(12500.0)
+    assert data["cash"] == pytest.approx(5000.0)
+    classes = {row["asset_class"]: row for row in data["classes"]}
+    assert classes["fixed_income"]["current_weight"] == pytest.approx(0.4)
+    assert classes["equity"]["current_weight"] == pytest.approx(0.2)
+    assert classes["cash"]["current_weight"] == pytest.approx(0.4)
+    assert classes["cash"]["trade_amount"] == pytest.approx(-5000.0)
+    
+    data = client.get(f"/rebalancing/client/{test_client_model.id}?base_currency=usd", headers=auth_headers).json()
+    assert data["total_value"] == pytest.approx(2500.0)
+    
+    response = client.get(f"/rebalancing/client/{test_client_model.id}?base_currency=EUR", headers=auth_headers)
+    assert response.status_code == 400
+
+def test_client_drift_requires_profile(client, auth_headers, test_client_model):
+    response = client.get(f"/rebalancing/client/{test_client_model.id}", headers=auth_headers)
+    assert response.status_code == 400
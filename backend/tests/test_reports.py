@@ -0,0 +1,94 @@
+import pytest
+from datetime import date
+from app.models.allocation import Allocation
+from app.models.asset import Asset
+from app.models.client import Client
+from app.services.reports import report_service
+
+@pytest.fixture(autouse=True)
+def clear_report_cache():
+    report_service.clear_cache()
+    yield
+    report_service.clear_cache()
+
+@pytest.fixture
+def report_data(db_session):
+    apple = Asset(ticker="AAPL", name="Apple Inc.", exchange="NASDAQ", currency="USD")
+    petro = Asset(ticker="PETR4", name="Petrobras", exchange="B3", currency="BRL")
+    vale = Asset(ticker="VALE3", name="Vale", exchange="B3", currency="BRL")
+    conservative = Client(name="Conservative", email="c@example.com", investment_profile="conservative")
+    aggressive = Client(name="Aggressive", email="a@example.com", investment_profile="aggressive")
+    db_session.add_all([apple, petro, vale, conservative, aggressive])
+    db_session.flush()
+    for client, asset, quantity, price in [
+        (conservative, apple, 10, 100.0),
+        (conservative, petro, 100, 30.0),
+        (aggressive, petro, 50, 30.0),
+        (aggressive, vale, 20, 60.0),
+    ]:
+        db_session.add(Allocation(client_id=client.id, asset_id=asset.id, quantity=quantity,
+                                  buy_price=price, buy_date=date(2024, 1, 2)))
+    db_session.commit()
+    return {"apple": apple, "petro": petro, "conservative": conservative}
+
+def test_aum_by_currency(client, auth_headers, report_data):
+    response = client.get("/reports/aum?group_by=currency", headers=auth_headers)
+    assert response.status_code == 200
+    report = response.json()
+    assert report["total_aum"] == 1000.0 + 3000.0 + 1500.0 + 1200.0
+    groups = {group["keys"]["currency"]: group for group in report["groups"]}
+    assert groups["BRL"]["aum"] == 5700.0
+    assert groups["BRL"]["positions"] == 3
+    assert groups["BRL"]["clients"] == 2
+    assert groups["USD"]["aum"] == 1000.0
+    assert all(not group["subtotal"] for group in report["groups"])
+
+def test_aum_rollup_includes_subtotals_and_grand_total(client, auth_headers, report_data):
+    response = client.get("/reports/aum?group_by=exchange,asset&rollup=true", headers=auth_headers)
+    assert response.status_code == 200
+    groups = response.json()["groups"]
+    
+    details = [group for group in groups if group["level"] == 2]
+    assert {(group["keys"]["exchange"], group["keys"]["asset"]) for group in details} == {
+        ("NASDAQ", "AAPL"), ("B3", "PETR4"), ("B3", "VALE3")
+    }
+    subtotals = {group["keys"]["exchange"]: group["aum"] for group in groups if group["level"] == 1}
+    assert subtotals == {"B3": 5700.0, "NASDAQ": 1000.0}
+    grand_total = [group for group in groups if group["level"] == 0]
+    assert len(grand_total) == 1
+    assert grand_total[0]["aum"] == 6700.0
+    assert grand_total[0]["clients"] == 2
+
+def test_aum_report_is_invalidated_by_allocation_writes(client, auth_headers, report_data):
+    before = client.get("/reports/aum?group_by=profile", headers=auth_headers).json()
+    
+    response = client.post("/allocations/", json={
+        "client_id": report_data["conservative"].id, "asset_id": report_data["apple"].id,
+        "quantity": 1, "buy_price": 500.0, "buy_date": "2024-02-01"
+    }, headers=auth_headers)
+    assert response.status_code == 200
+    
+    after = client.get("/reports/aum?group_by=profile", headers=auth_headers).json()
+    assert after["total_aum"] == before["total_aum"] + 500.0
+
+def test_aum_report_is_net_of_sales(client, auth_headers, report_data):
+    before = client.get("/reports/aum?group_by=exchange&rollup=true", headers=auth_headers).json()
+    assert before["total_aum"] == 6700.0
+    
+    response = client.post("/sales/", json={
+        "client_id": report_data["conservative"].id, "asset_id": report_data["apple"].id,
+        "quantity": 10, "sell_price": 150.0, "sell_date": "2024-03-01"
+    }, headers=auth_headers)
+    assert response.status_code == 200
+    
+    # Posição totalmente vendida: sai do relatório, pelo custo do que foi comprado
+    after = client.get("/reports/aum?group_by=exchange&rollup=true", headers=auth_headers).json()
+    assert after["total_aum"] == 5700.0
+    assert {group["keys"].get("exchange") for group in after["groups"]} == {"B3", None}
+    
+    assert client.delete(f"/sales/{response.json()['id']}", headers=auth_headers).status_code == 200
+    assert client.get("/reports/aum?group_by=exchange", headers=auth_headers).json()["total_aum"] == 6700.0
+
+def test_aum_report_rejects_unknown_dimension(client, auth_headers):
+    response = client.get("/reports/aum?group_by=sector", headers=auth_headers)
+    assert response.status_code == 400
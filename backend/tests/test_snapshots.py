@@ -0,0 +1,118 @@
+import asyncio
+import pytest
+from datetime import date
+from sqlalchemy import func, select
+from app.models.allocation import Allocation
+from app.models.asset_price import AssetPrice
+from app.models.movement import Movement, MovementType
+from app.models.portfolio_snapshot import PortfolioSnapshot
+from app.models.sale import Sale
+from app.services.snapshots import snapshot_service, SnapshotScheduler
+
+CLOSES = {date(2024, 1, 2): 100.0, date(2024, 1, 3): 102.0, date(2024, 1, 4): 110.0,
+          date(2024, 1, 5): 108.0, date(2024, 1, 8): 111.0}
+
+@pytest.fixture
+def portfolio(db_session, test_client_model, test_asset):
+    for day, close in CLOSES.items():
+        db_session.add(AssetPrice(asset_id=test_asset.id, date=day, close=close))
+    db_session.add_all([
+        Movement(client_id=test_client_model.id, type=MovementType.deposit, amount=2000, date=date(2023, 12, 29)),
+        Allocation(client_id=test_client_model.id, asset_id=test_asset.id, quantity=10, buy_price=100,
+                   buy_date=date(2024, 1, 2)),
+        Movement(client_id=test_client_model.id, type=MovementType.deposit, amount=100, date=date(2024, 1, 3)),
+        Sale(client_id=test_client_model.id, asset_id=test_asset.id, quantity=4, sell_price=110,
+             sell_date=date(2024, 1, 4)),
+    ])
+    db_session.commit()
+    return test_client_model
+
+def stored(db_session):
+    return db_session.execute(select(PortfolioSnapshot).order_by(PortfolioSnapshot.date)).scalars().all()
+
+def test_snapshots_positions_cash_and_flows(db_session, portfolio, test_asset):
+    summary = asyncio.run(snapshot_service.run(db_session, start=date(2024, 1, 3), end=date(2024, 1, 5)))
+    assert summary["days"] == 3 and summary["rows"] == 3
+    
+    jan3, jan4, jan5 = stored(db_session)
+    # Eventos anteriores ao intervalo entram nas posições e no caixa, mas não no fluxo do dia
+    assert jan3.positions == {str(test_asset.id): 10.0}
+    assert float(jan3.market_value) == pytest.approx(1020.0)
+    assert float(jan3.cash) == pytest.approx(1100.0)
+    assert float(jan3.net_flow) == pytest.approx(100.0)
+    assert jan4.positions == {str(test_asset.id): 6.0}
+    assert float(jan4.cash) == pytest.approx(1540.0)
+    assert float(jan4.net_flow) == 0
+    assert float(jan5.market_value) == pytest.approx(6 * 108.0)
+
+def test_snapshots_are_idempotent_and_resume_after_latest(db_session, portfolio):
+    asyncio.run(snapshot_service.run(db_session, start=date(2024, 1, 3), end=date(2024, 1, 5)))
+    asyncio.run(snapshot_service.run(db_session, start=date(2024, 1, 3), end=date(2024, 1, 5), chunk_size=1))
+    assert db_session.execute(select(func.count(PortfolioSnapshot.id))).scalar() == 3
+    
+    # Sem início, continua do dia seguinte ao último snapshot gravado
+    summary = asyncio.run(snapshot_service.run(db_session, end=date(2024, 1, 8)))
+    assert (summary["start"], summary["days"]) == (date(2024, 1, 6), 1)
+    assert [snapshot.date for snapshot in stored(db_session)][-1] == date(2024, 1, 8)
+
+def test_resume_fills_the_clients_left_behind(db_session, portfolio, test_asset):
+    """A backfill that stopped after some chunks is resumed per client, not from the latest day overall"""
+    from app.models.client import Client
+    
+    other = Client(name="Other Client", email="other@example.com", is_active=True)
+    db_session.add(other)
+    db_session.commit()
+    db_session.add(Allocation(client_id=other.id, asset_id=test_asset.id, quantity=1, buy_price=100,
+                              buy_date=date(2024, 1, 2)))
+    db_session.commit()
+    # Só o primeiro lote chegou a gravar
+    asyncio.run(snapshot_service.run(db_session, start=date(2024, 1, 3), end=date(2024, 1, 8), client_ids=[portfolio.id]))
+    
+    summary = asyncio.run(snapshot_service.run(db_session, end=date(2024, 1, 8)))
+    assert (summary["start"], summary["clients"]) == (date(2024, 1, 3), 1)
+    dates = db_session.execute(
+        select(PortfolioSnapshot.date).where(PortfolioSnapshot.client_id == other.id).order_by(PortfolioSnapshot.date)
+    ).scalars().all()
+    assert dates == [date(2024, 1, 3), date(2024, 1, 4), date(2024, 1, 5), date(2024, 1, 8)]
+
+def test_client_snapshots_endpoint(client, auth_headers, db_session, portfolio):
+    asyncio.run(snapshot_service.run(db_session, start=date(2024, 1, 2), end=date(2024, 1, 8)))
+    response = client.get(f"/portfolio/{portfolio.id}/snapshots?start=2024-01-04", headers=auth_headers)
+    assert response.status_code == 200
+    assert [row["date"] for row in response.json()] == ["2024-01-04", "2024-01-05", "2024-01-08"]
+    assert client.get("/portfolio/999/snapshots", headers=auth_headers).status_code == 404
+
+def test_scheduler_waits_until_next_run():
+    from datetime import datetime
+    assert SnapshotScheduler.seconds_until("22:00", datetime(2024, 1, 3, 21, 30)) == 1800
+    assert SnapshotScheduler.seconds_until("22:00", datetime(2024, 1, 3, 22, 30)) == 23.5 * 3600
+
+def test_only_the_leader_runs_the_nightly_job():
+    from contextlib import asynccontextmanager
+    from app.core.cache_backend import MemoryBackend
+    from app.core.leader import LeaderLock
+    
+    class CountingService:
+        runs = 0
+        async def run(self, db):
+            CountingService.runs += 1
+    
+    @asynccontextmanager
+    async def session_factory():
+        yield None
+    
+    async def run():
+        backend = MemoryBackend()
+        workers = [SnapshotScheduler(CountingService(), session_factory) for _ in range(3)]
+        for worker in workers:
+            worker._leader = LeaderLock("snapshots", backend=backend)
+        ran = [await worker.run_scheduled() for worker in workers]
+        await workers[0].stop()
+        # Líder saiu: o próximo worker a acordar assume
+        ran.append(await workers[1].run_scheduled())
+        return ran, [worker.stats()["skipped"] for worker in workers]
+    
+    ran, skipped = asyncio.run(run())
+    assert ran == [True, False, False, True]
+    assert skipped == [0, 1, 1]
+    assert CountingService.runs == 2
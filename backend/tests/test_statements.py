@@ -0,0 +1,79 @@
+import asyncio
+import json
+import os
+import pytest
+from datetime import date
+from app.models.allocation import Allocation
+from app.models.asset_price import AssetPrice
+from app.models.movement import Movement, MovementType
+from app.models.sale import Sale
+from app.services.statements import statement_service, statement_path, month_bounds
+
+@pytest.fixture
+def month_data(db_session, test_client_model, test_asset):
+    db_session.add_all([
+        Movement(client_id=test_client_model.id, type=MovementType.deposit, amount=1000, date=date(2024, 1, 10)),
+        Movement(client_id=test_client_model.id, type=MovementType.deposit, amount=500, date=date(2024, 2, 5), note="Aporte <mensal>"),
+        Movement(client_id=test_client_model.id, type=MovementType.withdrawal, amount=200, date=date(2024, 2, 20)),
+        Allocation(client_id=test_client_model.id, asset_id=test_asset.id, quantity=10, buy_price=100,
+                   buy_date=date(2024, 1, 15)),
+        Allocation(client_id=test_client_model.id, asset_id=test_asset.id, quantity=5, buy_price=130,
+                   buy_date=date(2024, 3, 1)),
+        Sale(client_id=test_client_model.id, asset_id=test_asset.id, quantity=4, sell_price=120,
+             sell_date=date(2024, 2, 12)),
+        AssetPrice(asset_id=test_asset.id, date=date(2024, 2, 28), close=125),
+        AssetPrice(asset_id=test_asset.id, date=date(2024, 3, 4), close=140),
+    ])
+    db_session.commit()
+    return test_client_model
+
+def test_month_bounds():
+    assert month_bounds("2024-02") == (date(2024, 2, 1), date(2024, 2, 29))
+    with pytest.raises(ValueError):
+        month_bounds("2024-13")
+
+def test_statement_contents(db_session, month_data, test_asset, tmp_path):
+    summary = asyncio.run(statement_service.run(db_session, "2024-02", formats=["json", "html", "csv"], out_dir=str(tmp_path)))
+    assert (summary["total"], summary["files"], summary["status"]) == (1, 3, "done")
+    
+    with open(statement_path(str(tmp_path), "2024-02", month_data.id, "json")) as f:
+        statement = json.load(f)
+    assert [m["amount"] for m in statement["movements"]] == [500.0, 200.0]
+    assert statement["captation"]["net"] == pytest.approx(300.0)
+    assert statement["captation"]["ytd_net"] == pytest.approx(1300.0)
+    # Compra de março fica de fora; a venda de fevereiro reduz a posição
+    [position] = statement["positions"]
+    assert position["quantity"] == pytest.approx(6.0)
+    assert position["price"] == pytest.approx(125.0)
+    assert statement["market_value"] == pytest.approx(750.0)
+    
+    with open(statement_path(str(tmp_path), "2024-02", month_data.id, "html"), encoding="utf-8") as f:
+        assert "Aporte &lt;mensal&gt;" in f.read()
+
+def test_statements_resume_after_interruption(db_session, month_data, tmp_path):
+    out_dir = str(tmp_path)
+    asyncio.run(statement_service.run(db_session, "2024-02", formats=["csv"], out_dir=out_dir))
+    
+    # Arquivos já gravados são pulados; os que faltam são gerados na próxima execução
+    again = asyncio.run(statement_service.run(db_session, "2024-02", formats=["csv"], out_dir=out_dir))
+    assert (again["skipped"], again["files"]) == (1, 0)
+    os.remove(statement_path(out_dir, "2024-02", month_data.id, "csv"))
+    resumed = asyncio.run(statement_service.run(db_session, "2024-02", formats=["csv"], out_dir=out_dir))
+    assert (resumed["skipped"], resumed["files"]) == (0, 1)
+    assert statement_service.read_progress("2024-02", out_dir)["status"] == "done"
+
+def test_statement_routes(client, auth_headers, db_session, month_data, tmp_path, monkeypatch):
+    from app.core.config import settings
+    monkeypatch.setattr(settings, "STATEMENT_DIR", str(tmp_path))
+    asyncio.run(statement_service.run(db_session, "2024-02", formats=["html"]))
+    
+    response = client.get(f"/statements/2024-02/{month_data.id}?format=html", headers=auth_headers)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/html")
+    assert client.get(f"/statements/2024-02/{month_data.id}?format=csv", headers=auth_headers).status_code == 404
+    assert client.get("/statements/2024-02/progress", headers=auth_headers).json()["done"] == 1
+    assert client.get("/statements/2024-13/progress", headers=auth_headers).status_code == 422
+    assert client.get("/statements/%2E%2E/progress", headers=auth_headers).status_code == 422
+    assert client.get("/statements/2024-03/progress", headers=auth_headers).status_code == 404
+    assert client.post("/statements/?month=2024-13", headers=auth_headers).status_code == 400
+    assert client.post("/statements/?month=2024-02&formats=pdf", headers=auth_headers).status_code == 400